@@ -1,18 +1,69 @@
 from models.entidades import Cliente, Produto, Endereco, ProdutoFisico
 from models.vendas import Carrinho, Pedido 
-from models.exceptions import ValorInvalidoError, DocumentoInvalidoError, EntidadeNaoEncontradaError
-from datetime import datetime
+from models.exceptions import ValorInvalidoError, DocumentoInvalidoError, EntidadeNaoEncontradaError, ConflitoVersaoError
+from datetime import datetime, timedelta
 from models.transacoes import Frete, Cupom
-import repositories.cliente_repository as cliente_repository
-import repositories.produto_repository as produto_repository
-import repositories.pedido_repository as pedido_repository
-import services.pedido_service as pedido_service
-import services.relatorio_service as relatorio_service 
-import services.carrinho_service as carrinho_service
-from services.estoque_service import EstoqueService
-
-
-CARRINHO_SESSAO = Carrinho() 
+import importlib.util
+import os
+import sys
+import time
+
+
+def _importacao_tardia(nome: str):
+    """
+    Registra o módulo sem executá-lo: o código só roda no primeiro acesso a um atributo.
+    Assim o menu aparece sem carregar repositórios, serviços e monitoramento.
+    """
+    if nome in sys.modules:
+        return sys.modules[nome]
+    spec = importlib.util.find_spec(nome)
+    carregador = importlib.util.LazyLoader(spec.loader)
+    spec.loader = carregador
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo
+    carregador.exec_module(modulo)
+    return modulo
+
+
+cliente_repository = _importacao_tardia('repositories.cliente_repository')
+produto_repository = _importacao_tardia('repositories.produto_repository')
+pedido_repository = _importacao_tardia('repositories.pedido_repository')
+pedido_service = _importacao_tardia('services.pedido_service')
+relatorio_service = _importacao_tardia('services.relatorio_service')
+carrinho_service = _importacao_tardia('services.carrinho_service')
+reserva_service = _importacao_tardia('services.reserva_service')
+boleto_service = _importacao_tardia('services.boleto_service')
+transferencia_service = _importacao_tardia('services.transferencia_service')
+lote_service = _importacao_tardia('services.lote_service')
+arquivamento_service = _importacao_tardia('services.arquivamento_service')
+sessao_service = _importacao_tardia('services.sessao_service')
+dados_loja = _importacao_tardia('repositories.dados')
+hidratacao = _importacao_tardia('repositories.hidratacao')
+instrumentacao = _importacao_tardia('monitoramento.instrumentacao')
+rastreamento = _importacao_tardia('monitoramento.rastreamento')
+perfilador = _importacao_tardia('monitoramento.perfilador')
+
+
+# O carrinho do CLI fica no armazenamento de sessões (services/sessao_service.py) sob um
+# id fixo: é gravado na saída e volta na próxima execução. O armazenamento (e o
+# carrinhos.sqlite3) só é aberto na primeira opção que usa o carrinho, não ao mostrar o menu.
+SESSAO_CLI = 'cli'
+_carrinho_em_uso = False
+
+
+def _carrinho_da_sessao() -> Carrinho:
+    global _carrinho_em_uso
+    _carrinho_em_uso = True
+    return sessao_service.sessoes.obter(SESSAO_CLI)
+
+
+def _iniciar_varredor_boletos():
+    """
+    Liga a varredura de boletos vencidos em segundo plano na primeira opção escolhida no
+    menu (e não na abertura do CLI). Não faz nada se ela já estiver ativa.
+    """
+    if not boleto_service.varredor.esta_ativo():
+        boleto_service.varredor.iniciar()
 
 
 def cadastrar_produto():
@@ -76,6 +127,8 @@ def ajustar_estoque():
         
         print(f"✅ Estoque de '{produto.nome}' atualizado. Novo estoque: {produto.estoque}")
         
+    except ConflitoVersaoError:
+        print("❌ O produto foi alterado por outra operação (ex.: uma venda) enquanto o ajuste era digitado. Tente novamente.")
     except ValueError:
         print("❌ Quantidade de ajuste inválida. Digite um número inteiro.")
     except ValorInvalidoError as e:
@@ -89,10 +142,14 @@ def mostrar_menu():
     print("      SISTEMA SIMPLIFICADO E-COMMERCE")
     print("="*35)
     
-    # Exibe o status do carrinho
-    print(f"🛒 Carrinho Atual: {len(CARRINHO_SESSAO.itens)} item(s)")
-    if CARRINHO_SESSAO.cliente:
-         print(f"👤 Cliente Associado: {CARRINHO_SESSAO.cliente.nome}")
+    # Exibe o status do carrinho (depois que alguma opção já o abriu)
+    if _carrinho_em_uso:
+        carrinho = _carrinho_da_sessao()
+        print(f"🛒 Carrinho Atual: {len(carrinho.itens)} item(s)")
+        if carrinho.cliente:
+             print(f"👤 Cliente Associado: {carrinho.cliente.nome}")
+    else:
+        print("🛒 Carrinho: aberto na primeira opção que o usar (1, 2 ou 3)")
     print("-----------------------------------")
     
     print("1. Adicionar produto ao carrinho")
@@ -104,6 +161,8 @@ def mostrar_menu():
     print("7. Gerenciar Endereços de Cliente")
     print("8. Avançar Status do Pedido (Mudar para PAGO, ENVIADO, etc.)")
     print("9. Gerar Relatório de Vendas")
+    print("10. Exportar/Importar Dados (NDJSON/CSV)")
+    print("11. Métricas de Desempenho (Instrumentação)")
     print("0. Sair")
     print("="*35)
 
@@ -126,6 +185,9 @@ def listar_produtos():
 
     for p in produtos:
         estoque_info = f"Estoque: {p.estoque}" if hasattr(p, 'estoque') else "Estoque: N/A"
+        reservado = reserva_service.reservas.reservado(p.sku)
+        if reservado:
+            estoque_info += f" ({reservado} reservado(s) em carrinhos)"
         print(f"[{p.sku}] {p.nome} | R$ {p.preco_unitario:.2f} | {estoque_info}")
     return produtos
 
@@ -149,16 +211,17 @@ def adicionar_ao_carrinho():
         quantidade = int(input("Digite a quantidade: "))
         
         # Chama a lógica de serviço/validação
-        carrinho_service.adicionar_item_ao_carrinho(CARRINHO_SESSAO, sku, quantidade)
+        carrinho = _carrinho_da_sessao()
+        carrinho_service.adicionar_item_ao_carrinho(carrinho, sku, quantidade)
         
         # Pergunta se deseja associar um cliente
-        if not CARRINHO_SESSAO.cliente:
+        if not carrinho.cliente:
             associar = input("Deseja associar um cliente (necessário para checkout)? (s/n): ").strip().lower()
             if associar == 's':
                  cpf = input("Digite o CPF do cliente: ").strip()
                  cliente = cliente_repository.buscar_por_cpf(cpf)
                  if cliente:
-                     CARRINHO_SESSAO.cliente = cliente
+                     carrinho.cliente = cliente
                      print(f"✅ Cliente {cliente.nome} associado ao carrinho.")
                  else:
                       print("❌ Cliente não encontrado. Cadastre-se na Opção 4.")
@@ -177,30 +240,31 @@ def visualizar_carrinho():
     """Opção 2: Visualizar itens do carrinho."""
     print("\n--- SEU CARRINHO ---")
     
-    if not CARRINHO_SESSAO.itens: 
+    carrinho = _carrinho_da_sessao()
+    if not carrinho.itens: 
         print("🛒 O carrinho está vazio.")
         return
 
-    print(CARRINHO_SESSAO)
+    print(carrinho)
 
 
 def finalizar_compra():
     """Opção 3: Inicia o checkout chamando o PedidoService completo."""
-    global CARRINHO_SESSAO
+    carrinho = _carrinho_da_sessao()
     
-    if not CARRINHO_SESSAO.itens:
+    if not carrinho.itens:
         print("❌ O carrinho está vazio. Adicione itens antes de finalizar a compra.")
         return
         
     # Associa o cliente se ainda não estiver
-    if not CARRINHO_SESSAO.cliente:
+    if not carrinho.cliente:
         cpf_cliente = input("Digite o CPF do cliente para checkout: ").strip()
         try:
             cliente = cliente_repository.buscar_por_cpf(cpf_cliente)
             if not cliente:
                  print("❌ Cliente não encontrado. Por favor, cadastre-se (Opção 4).")
                  return
-            CARRINHO_SESSAO.cliente = cliente
+            carrinho.cliente = cliente
         except (DocumentoInvalidoError, EntidadeNaoEncontradaError) as e:
             print(f"❌ Erro: {e}")
             return
@@ -208,14 +272,14 @@ def finalizar_compra():
 
     print("\n--- FINALIZAR COMPRA (CHECKOUT) ---")
     
-    cliente = CARRINHO_SESSAO.cliente
+    cliente = carrinho.cliente
     
     if not cliente.enderecos:
         print("❌ Cliente sem endereço cadastrado. Use a Opção 7 para adicionar um endereço.")
         return
 
     cep_destino = cliente.enderecos[0].cep 
-    frete = carrinho_service.calcular_frete(CARRINHO_SESSAO, cep_destino)
+    frete = carrinho_service.calcular_frete(carrinho, cep_destino)
     
     # Simulação de cupom para teste
     cupom = None
@@ -232,7 +296,7 @@ def finalizar_compra():
              
     
     # Exibição de Resumo (cria um pedido temporário para simular)
-    pedido_simulado = Pedido(cliente, CARRINHO_SESSAO, frete, cupom)
+    pedido_simulado = Pedido(cliente, carrinho, frete, cupom)
     
     print(f"\nDetalhes do Pedido para {cliente.nome}:")
     # Acessando atributos protegidos para exibição simples no CLI
@@ -252,7 +316,7 @@ def finalizar_compra():
     try:
         # CHAMADA CRUCIAL: Finaliza a compra usando o PedidoService
         pedido_final = pedido_service.PedidoService.finalizar_compra(
-            carrinho=CARRINHO_SESSAO, 
+            carrinho=carrinho, 
             frete=frete, 
             metodo_pagamento=metodo, 
             info_pagamento=info_pagamento, 
@@ -267,7 +331,7 @@ def finalizar_compra():
         print("="*40)
         
         # LIMPAR CARRINHO
-        CARRINHO_SESSAO = Carrinho() 
+        sessao_service.sessoes.descartar(SESSAO_CLI)
 
     except (DocumentoInvalidoError, ValorInvalidoError, EntidadeNaoEncontradaError) as e:
         print(f"❌ Erro de Validação/Checkout: {e}")
@@ -405,11 +469,6 @@ def avancar_status_pedido():
     print("\n--- AVANÇAR STATUS DO PEDIDO ---")
     codigo = input("Digite o código do pedido a ser atualizado: ").strip()
     
-    print("\nStatus Disponíveis (Exemplos de entrada):")
-    print("PAGO | SEPARACAO | ENVIADO | ENTREGUE | CANCELADO")
-    
-    novo_status = input("Digite o NOVO status: ").strip().upper()
-
     try:
         # Busca o pedido para referência
         pedido_anterior = pedido_repository.buscar_por_codigo(codigo)
@@ -418,6 +477,13 @@ def avancar_status_pedido():
             raise EntidadeNaoEncontradaError(f"Pedido com código '{codigo}' não encontrado.")
             
         print(f"Status Atual: **{pedido_anterior._estado}**")
+        proximos = [e for e in Pedido.ESTADOS_VALIDOS if e in Pedido.TRANSICOES.get(pedido_anterior.estado, set())]
+        if not proximos:
+            print("Este pedido está em um estado final e não pode mais mudar.")
+            return
+        print(f"Status Disponíveis: {' | '.join(proximos)}")
+        
+        novo_status = input("Digite o NOVO status: ").strip().upper()
         
         # CORREÇÃO: Chama o método correto do PedidoService
         pedido_atualizado = pedido_service.PedidoService.atualizar_estado_pedido(codigo, novo_status)
@@ -432,6 +498,22 @@ def avancar_status_pedido():
         print(f"❌ Erro inesperado: {e}")
 
 
+def _ler_intervalo():
+    """Pede as datas inicial e final (inclusivas) de um relatório; vazio = sem limite."""
+    def ler_data(rotulo: str):
+        texto = input(f"{rotulo} (AAAA-MM-DD, vazio = sem limite): ").strip()
+        try:
+            return datetime.strptime(texto, '%Y-%m-%d') if texto else None
+        except ValueError:
+            print(f"⚠️ Data '{texto}' inválida; usando sem limite.")
+            return None
+
+    inicio = ler_data("Desde")
+    ate = ler_data("Até")
+    # O último dia entra inteiro no relatório
+    return inicio, (ate + timedelta(days=1)) if ate else None
+
+
 def visualizar_relatorio():
     """Opção 9: Menu de relatórios."""
     print("\n--- OPÇÕES DE RELATÓRIO ---")
@@ -449,13 +531,15 @@ def visualizar_relatorio():
     elif escolha == '2':
         print(relatorio_service.RelatorioService.relatorio_produtos())
     elif escolha == '3':
-        print(relatorio_service.RelatorioService.relatorio_pedidos())
+        inicio, fim = _ler_intervalo()
+        print(relatorio_service.RelatorioService.relatorio_pedidos(inicio, fim))
     elif escolha == '4':
         periodo = input("Agrupar por 'dia' ou 'mes'? (Padrão: dia): ").strip().lower()
         if periodo not in ['dia', 'mes']:
             periodo = 'dia'
+        inicio, fim = _ler_intervalo()
             
-        dados = relatorio_service.RelatorioService.relatorio_ocupacao_por_periodo(periodo)
+        dados = relatorio_service.RelatorioService.relatorio_ocupacao_por_periodo(periodo, inicio, fim)
         
         print(f"\n--- FATURAMENTO POR {periodo.upper()} ---")
         if not dados:
@@ -474,15 +558,366 @@ def visualizar_relatorio():
         print("Opção inválida.")
 
 
+def _imprimir_resultado_importacao(resultado, segundos: float):
+    print(f"✅ Importados: {resultado['importados']} | ❌ Rejeitados: {resultado['rejeitados']} | ⏱️ {segundos:.2f}s")
+    for erro in resultado['erros']:
+        print(f"   - {erro}")
+
+
+def transferir_dados():
+    """Opção 10: Exportação e importação em massa."""
+    print("\n--- EXPORTAR / IMPORTAR DADOS ---")
+    print("1. Exportar (produtos, clientes ou pedidos)")
+    print("2. Importar Produtos")
+    print("3. Importar Clientes")
+    print("0. Voltar ao Menu Principal")
+
+    escolha = input("Selecione uma opção: ").strip()
+    if escolha == '0':
+        return
+    if escolha not in ['1', '2', '3']:
+        print("Opção inválida.")
+        return
+
+    caminho = input("Caminho do arquivo (.ndjson, .csv; acrescente .gz para gzip): ").strip()
+
+    try:
+        inicio = time.perf_counter()
+        if escolha == '1':
+            colecao = input("Coleção (produtos/clientes/pedidos): ").strip().lower()
+            total = transferencia_service.TransferenciaService.exportar(colecao, caminho)
+            print(f"✅ {total} registro(s) de {colecao} exportado(s) em {time.perf_counter() - inicio:.2f}s.")
+        elif escolha == '2':
+            resultado = transferencia_service.TransferenciaService.importar_produtos(caminho)
+            _imprimir_resultado_importacao(resultado, time.perf_counter() - inicio)
+        else:
+            resultado = transferencia_service.TransferenciaService.importar_clientes(caminho)
+            _imprimir_resultado_importacao(resultado, time.perf_counter() - inicio)
+
+    except ValorInvalidoError as e:
+        print(f"❌ Erro: {e}")
+    except OSError as e:
+        print(f"❌ Erro de arquivo: {e}")
+
+
+def gerenciar_metricas():
+    """Opção 11: Liga/desliga a instrumentação e exibe ou exporta as métricas."""
+    while True:
+        estado = "ATIVA" if instrumentacao.esta_ativo() else "DESATIVADA"
+        print(f"\n--- MÉTRICAS DE DESEMPENHO (instrumentação {estado}) ---")
+        print("1. Ativar/Desativar Instrumentação")
+        print("2. Visualizar Métricas")
+        print("3. Salvar Métricas em JSON")
+        print("4. Zerar Métricas")
+        print("5. Ativar/Desativar Rastreamento do Checkout (traces JSONL)")
+        print("6. Ativar/Desativar Perfilador por Amostragem (collapsed stacks)")
+        print("7. Visualizar Fila da Escrita Adiada")
+        print("0. Voltar ao Menu Principal")
+
+        escolha = input("Selecione uma opção: ").strip()
+
+        if escolha == '1':
+            if instrumentacao.esta_ativo():
+                instrumentacao.desativar()
+                print("⏸️ Instrumentação desativada (as métricas coletadas foram mantidas).")
+            else:
+                instrumentacao.ativar()
+                print("▶️ Instrumentação ativada.")
+        elif escolha == '2':
+            print(instrumentacao.formatar_relatorio())
+        elif escolha == '3':
+            caminho = input("Caminho do arquivo (padrão: metricas.json): ").strip() or 'metricas.json'
+            try:
+                instrumentacao.salvar_json(caminho)
+                print(f"✅ Métricas salvas em {caminho}.")
+            except OSError as e:
+                print(f"❌ Erro ao salvar métricas: {e}")
+        elif escolha == '4':
+            instrumentacao.limpar()
+            print("✅ Métricas zeradas.")
+        elif escolha == '5':
+            if rastreamento.esta_ativo():
+                caminho = rastreamento.caminho_saida()
+                rastreamento.desativar()
+                print(f"⏸️ Rastreamento desativado. Traces em {caminho} (veja com: python -m monitoramento.rastreamento resumo {caminho}).")
+            else:
+                caminho = input("Arquivo de traces (padrão: traces.jsonl): ").strip() or 'traces.jsonl'
+                try:
+                    rastreamento.ativar(caminho)
+                    print(f"▶️ Rastreamento ativado. Cada checkout gera um trace em {caminho}.")
+                except OSError as e:
+                    print(f"❌ Erro ao abrir o arquivo de traces: {e}")
+        elif escolha == '6':
+            if perfilador.esta_ativo():
+                _imprimir_resumo_perfil(perfilador.parar())
+            else:
+                caminho = input("Arquivo de saída (padrão: perfil.collapsed): ").strip() or 'perfil.collapsed'
+                try:
+                    frequencia = float(input(f"Amostras por segundo (padrão: {perfilador.FREQUENCIA_PADRAO_HZ}): ").strip() or perfilador.FREQUENCIA_PADRAO_HZ)
+                    perfilador.iniciar(caminho, frequencia)
+                    print(f"▶️ Perfilador ativado ({frequencia:g} Hz). Desative nesta opção para gravar {caminho}.")
+                except ValueError as e:
+                    print(f"❌ Frequência inválida: {e}")
+        elif escolha == '7':
+            _imprimir_escrita_adiada()
+        elif escolha == '0':
+            break
+        else:
+            print("Opção inválida.")
+
+
+def _imprimir_escrita_adiada():
+    estatisticas = dados_loja.estatisticas_escrita_adiada()
+    if not estatisticas:
+        print("Escrita adiada inativa: nenhuma alteração adiada até agora (ligue com --escrita-adiada).")
+        return
+    print(f"Fila: {estatisticas['fila']} alteração(ões) pendente(s), {estatisticas['em_gravacao']} em gravação "
+          f"(máx. {estatisticas['fila_max']}; mais antiga há {estatisticas['idade_fila_ms']:.0f} ms)")
+    print(f"Descargas: {estatisticas['descargas']} ({estatisticas['alteracoes_por_descarga']:.1f} alterações/descarga, "
+          f"{estatisticas['falhas']} falha(s)) | Latência: média {estatisticas['media_ms']:.1f} ms, "
+          f"última {estatisticas['ultima_ms']:.1f} ms, máx. {estatisticas['max_ms']:.1f} ms")
+    print(f"Limites: {estatisticas['intervalo_s']:g}s ou {estatisticas['max_alteracoes']} alterações | "
+          f"fsync: {'sim' if estatisticas['duravel'] else 'não'}")
+
+
+def _imprimir_resumo_perfil(resumo):
+    if not resumo:
+        return
+    if resumo['erro']:
+        print(f"❌ Erro ao gravar o perfil: {resumo['erro']}")
+        return
+    custo = resumo['custo_s'] / resumo['duracao_s'] * 100 if resumo['duracao_s'] else 0.0
+    print(f"🔥 Perfil gravado em {resumo['arquivo']}: {resumo['amostras']} amostra(s) em {resumo['duracao_s']:.1f}s "
+          f"(custo da amostragem: {custo:.2f}% do tempo). Veja com: python -m monitoramento.perfilador topo {resumo['arquivo']}")
+
+
+# --- LINHA DE COMANDO (não interativa) ---
+
+def executar_comando(argumentos) -> int:
+    """Executa os subcomandos (exportação/importação, lote, boletos) sem passar pelo menu."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sistema Simplificado E-commerce")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    exportar = subparsers.add_parser('exportar', help="Exporta uma coleção para NDJSON/CSV")
+    exportar.add_argument('colecao', choices=['produtos', 'clientes', 'pedidos'])
+    exportar.add_argument('arquivo')
+    exportar.add_argument('--formato', choices=['ndjson', 'csv'])
+    exportar.add_argument('--gzip', action='store_true', default=None, help="Comprime a saída (padrão: pela extensão .gz)")
+
+    importar = subparsers.add_parser('importar', help="Importa produtos ou clientes de NDJSON/CSV")
+    importar.add_argument('colecao', choices=['produtos', 'clientes'])
+    importar.add_argument('arquivo')
+    importar.add_argument('--formato', choices=['ndjson', 'csv'])
+    importar.add_argument('--lote', type=int, default=250000, help="Registros por escrita no arquivo")
+
+    lote = subparsers.add_parser('lote', help="Executa um roteiro de comandos (modo não interativo)")
+    lote.add_argument('arquivo', help="Arquivo com um comando por linha")
+    lote.add_argument('--silencioso', action='store_true', help="Mostra apenas o resumo final")
+    lote.add_argument('--metricas', metavar='ARQUIVO_JSON', help="Ativa a instrumentação e grava as métricas ao final")
+    lote.add_argument('--traces', metavar='ARQUIVO_JSONL', help="Grava um trace por checkout (formato Chrome Trace)")
+    lote.add_argument('--perfil', metavar='ARQUIVO', help="Perfila o lote por amostragem (collapsed stacks)")
+    lote.add_argument('--perfil-hz', type=float, default=100.0, help="Amostras por segundo do perfilador")
+
+    subparsers.add_parser('boletos', help="Cancela os pedidos de boleto vencidos e devolve o estoque")
+
+    arquivar = subparsers.add_parser('arquivar', help="Move pedidos antigos e finalizados para o arquivo comprimido")
+    arquivar.add_argument('--idade-dias', type=int, help="Idade mínima dos pedidos (padrão: settings.json)")
+    arquivar.add_argument('--compressao', choices=['gzip', 'lzma'], help="Padrão: settings.json")
+
+    formato = subparsers.add_parser('formato', help="Mostra ou converte o formato do arquivo da loja (JSON ou binário)")
+    formato.add_argument('novo_formato', nargs='?', choices=['json', 'binario'], help="Converte a loja para este formato")
+
+    layout = subparsers.add_parser('layout', help="Mostra ou migra a disposição da loja (arquivo único ou um arquivo por coleção)")
+    layout.add_argument('novo_layout', nargs='?', choices=list(dados_loja.LAYOUTS), help="Migra a loja para esta disposição")
+
+    subparsers.add_parser('conferir', help="Confere os registros da loja e libera a hidratação pelo caminho confiável")
+
+    transicionar = subparsers.add_parser('transicionar', help="Muda o estado de vários pedidos de uma vez (ex.: SEPARACAO ENVIADO)")
+    transicionar.add_argument('estado_origem')
+    transicionar.add_argument('novo_estado')
+    transicionar.add_argument('--codigos', metavar='ARQUIVO', help="Um código por linha (padrão: todos os pedidos no estado de origem)")
+    transicionar.add_argument('--tudo-ou-nada', action='store_true', help="Não grava nada se alguma transição for inválida")
+
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'transicionar':
+        inicio = time.perf_counter()
+        PedidoService = pedido_service.PedidoService
+        if args.codigos:
+            with open(args.codigos, 'r', encoding='utf-8') as f:
+                codigos = [linha.strip() for linha in f if linha.strip()]
+        else:
+            codigos = PedidoService.codigos_no_estado(args.estado_origem)
+        resultados = PedidoService.transicionar_pedidos(
+            {codigo: args.novo_estado for codigo in codigos},
+            estado_origem=args.estado_origem.upper(), tudo_ou_nada=args.tudo_ou_nada
+        )
+        falhas = [r for r in resultados if not r.sucesso]
+        for resultado in falhas[:20]:
+            print(f"  {resultado}")
+        if len(falhas) > 20:
+            print(f"  ... e mais {len(falhas) - 20} falha(s)")
+        print(f"{'✅' if not falhas else '⚠️'} {len(resultados) - len(falhas)} de {len(resultados)} pedido(s) "
+              f"{args.estado_origem.upper()} -> {args.novo_estado.upper()} em {time.perf_counter() - inicio:.2f}s.")
+        return 0 if not falhas else 1
+
+    if args.comando == 'formato':
+        if args.novo_formato:
+            resultado = dados_loja.converter_formato(args.novo_formato)
+            if resultado['convertido']:
+                print(f"✅ {os.path.basename(resultado['origem'])} ({resultado['bytes_antes'] / 1024:.1f} KB) convertido para "
+                      f"{os.path.basename(resultado['destino'])} ({resultado['bytes_depois'] / 1024:.1f} KB) em {resultado['duracao_s']:.2f}s.")
+            else:
+                print(f"A loja já está no formato {args.novo_formato}.")
+        print(f"Formato: {dados_loja.formato_atual()} ({dados_loja.caminho_loja()}, {dados_loja.tamanho_loja() / 1024:.1f} KB)")
+        return 0
+
+    if args.comando == 'layout':
+        if args.novo_layout:
+            resultado = dados_loja.converter_layout(args.novo_layout)
+            if resultado['convertido']:
+                print(f"✅ Loja migrada de '{resultado['origem']}' ({resultado['bytes_antes'] / 1024:.1f} KB) para "
+                      f"'{resultado['layout']}' ({resultado['bytes_depois'] / 1024:.1f} KB) em {resultado['duracao_s']:.2f}s.")
+            else:
+                print(f"A loja já está na disposição '{args.novo_layout}'.")
+        print(f"Disposição: {dados_loja.layout_atual()} ({dados_loja.caminho_loja()}, {dados_loja.tamanho_loja() / 1024:.1f} KB)")
+        for nome, particoes in dados_loja.particoes_da_loja().items():
+            detalhe = f" ({particoes[0]} a {particoes[-1]})" if len(particoes) > 1 else ""
+            print(f"  {nome}: {len(particoes)} arquivo(s){detalhe}")
+        return 0
+
+    if args.comando == 'conferir':
+        inicio = time.perf_counter()
+        resultado = hidratacao.conferir_loja()
+        for erro in resultado['erros']:
+            print(f"  {erro}")
+        if resultado['total_erros'] > len(resultado['erros']):
+            print(f"  ... e mais {resultado['total_erros'] - len(resultado['erros'])} erro(s)")
+        contagem = ', '.join(f"{quantidade} {nome}" for nome, quantidade in resultado['registros'].items())
+        if resultado['total_erros']:
+            print(f"⚠️ {resultado['total_erros']} registro(s) fora do padrão em {contagem}: a loja segue pelo caminho com validação.")
+        else:
+            print(f"✅ {contagem} conferidos em {time.perf_counter() - inicio:.2f}s: "
+                  f"hidratação pelo caminho confiável liberada (esquema v{resultado['versao']}).")
+        return 0 if not resultado['total_erros'] else 1
+
+    if args.comando == 'arquivar':
+        ArquivamentoService = arquivamento_service.ArquivamentoService
+        try:
+            resultado = ArquivamentoService.arquivar_pedidos(args.idade_dias, args.compressao)
+        except ValorInvalidoError as e:
+            print(f"❌ Erro: {e}")
+            return 2
+        for segmento in resultado['segmentos']:
+            print(f"  {segmento['arquivo']}: {segmento['quantidade']} pedido(s), {segmento['bytes'] / 1024:.1f} KB")
+        print(f"✅ {resultado['arquivados']} pedido(s) anteriores a {resultado['limite']:%d/%m/%Y} arquivado(s) "
+              f"em {len(resultado['segmentos'])} segmento(s); {resultado['removidos_do_ativo']} retirado(s) do loja.json "
+              f"em {resultado['duracao_s']:.2f}s.")
+        if resultado['recuperados']:
+            print(f"   ({resultado['recuperados']} já estavam arquivados por uma execução interrompida)")
+        resumo = ArquivamentoService.resumo_arquivo()
+        print(f"Arquivo: {resumo['pedidos']} pedido(s) em {resumo['segmentos']} segmento(s), {resumo['bytes'] / 1024:.1f} KB.")
+        return 0
+
+    if args.comando == 'boletos':
+        inicio = time.perf_counter()
+        varredor = boleto_service.varredor
+        pendentes = varredor.indexar()
+        resultado = varredor.varrer()
+        print(f"✅ {resultado['cancelados']} de {pendentes} boleto(s) pendente(s) cancelado(s) por vencimento "
+              f"em {time.perf_counter() - inicio:.2f}s.")
+        proximo = varredor.proximo_vencimento()
+        if proximo:
+            print(f"Próximo vencimento: {proximo:%d/%m/%Y %H:%M}")
+        return 0
+
+    if args.comando == 'lote':
+        if args.metricas:
+            instrumentacao.ativar()
+        if args.traces:
+            rastreamento.ativar(args.traces)
+        if args.perfil:
+            perfilador.iniciar(args.perfil, args.perfil_hz)
+        codigo_saida = executar_lote(args.arquivo, args.silencioso)
+        if args.perfil:
+            _imprimir_resumo_perfil(perfilador.parar())
+        if args.traces:
+            rastreamento.desativar()
+            print(f"🧭 Traces gravados em {args.traces}")
+        if args.metricas:
+            instrumentacao.salvar_json(args.metricas)
+            print(f"📊 Métricas gravadas em {args.metricas}")
+        return codigo_saida
+
+    try:
+        inicio = time.perf_counter()
+        if args.comando == 'exportar':
+            total = transferencia_service.TransferenciaService.exportar(args.colecao, args.arquivo, args.formato, args.gzip)
+            print(f"✅ {total} registro(s) de {args.colecao} exportado(s) em {time.perf_counter() - inicio:.2f}s.")
+            return 0
+
+        if args.colecao == 'produtos':
+            resultado = transferencia_service.TransferenciaService.importar_produtos(args.arquivo, args.formato, args.lote)
+        else:
+            resultado = transferencia_service.TransferenciaService.importar_clientes(args.arquivo, args.formato, args.lote)
+        _imprimir_resultado_importacao(resultado, time.perf_counter() - inicio)
+        return 0 if resultado['rejeitados'] == 0 else 1
+
+    except (ValorInvalidoError, OSError) as e:
+        print(f"❌ Erro: {e}")
+        return 2
+
+
+def executar_lote(caminho: str, silencioso: bool = False) -> int:
+    """Executa um roteiro de comandos, exibindo a latência de cada um e a vazão total."""
+    executor = lote_service.LoteService()
+
+    inicio = time.perf_counter()
+    try:
+        for resultado in executor.executar_arquivo(caminho):
+            if not silencioso:
+                print(resultado)
+    except OSError as e:
+        print(f"❌ Erro ao ler o roteiro: {e}")
+        return 2
+    resumo = executor.resumo(time.perf_counter() - inicio)
+
+    print("\n--- RESUMO DO LOTE ---")
+    print(f"Comandos: {resumo['comandos']} | Sucessos: {resumo['sucessos']} | Falhas: {resumo['falhas']}")
+    print(f"Duração: {resumo['duracao_s']:.3f}s | Vazão: {resumo['comandos_por_s']:.1f} comandos/s")
+    print(f"{'COMANDO':<18} {'QTD':>6} {'MÉDIA ms':>10} {'P50 ms':>10} {'P95 ms':>10} {'MÁX ms':>10}")
+    for comando, est in resumo['por_comando'].items():
+        print(f"{comando:<18} {est['quantidade']:>6} {est['media_ms']:>10.3f} {est['p50_ms']:>10.3f} {est['p95_ms']:>10.3f} {est['max_ms']:>10.3f}")
+
+    return 0 if resumo['falhas'] == 0 else 1
+
+
 # --- MAIN ---
 
 def main():
     print("\n[Inicialização]: Carregando dados da loja...")
-    
+    try:
+        _executar_menu()
+    finally:
+        # Carrinho da sessão: gravado para a próxima execução (se foi aberto nesta)
+        if _carrinho_em_uso:
+            sessao_service.sessoes.gravar_todos()
+        # Escrita adiada: grava as alterações ainda pendentes antes de sair
+        if dados_loja.escrita_adiada_ativa():
+            print("Gravando alterações pendentes...")
+        dados_loja.desativar_escrita_adiada()
+
+
+def _executar_menu():
     while True:
         try:
             mostrar_menu() 
             escolha = input("Selecione uma opção: ").strip()
+            if escolha != '0':
+                # Cancela em segundo plano os pedidos de boleto vencidos (devolvendo o estoque)
+                _iniciar_varredor_boletos()
             
             if escolha == '1':
                 adicionar_ao_carrinho()
@@ -502,6 +937,10 @@ def main():
                 avancar_status_pedido()
             elif escolha == '9':
                 visualizar_relatorio()
+            elif escolha == '10':
+                transferir_dados()
+            elif escolha == '11':
+                gerenciar_metricas()
             elif escolha == '0':
                 print("Saindo do CLI. Até logo!")
                 break
@@ -515,4 +954,22 @@ def main():
 
 
 if __name__ == '__main__':
+    argumentos = sys.argv[1:]
+    # --rapido: usa o snapshot binário ao lado do loja.json (ver repositories/dados.py).
+    # Vai pela variável de ambiente para não carregar a persistência antes do menu.
+    if '--rapido' in argumentos:
+        argumentos.remove('--rapido')
+        os.environ['LOJA_INICIO_RAPIDO'] = '1'
+    # --escrita-adiada: confirma as alterações em memória e grava o loja.json em segundo
+    # plano (ver repositories/dados.py); --sem-fsync dispensa o fsync de cada gravação.
+    if '--escrita-adiada' in argumentos:
+        argumentos.remove('--escrita-adiada')
+        os.environ['LOJA_ESCRITA_ADIADA'] = '1'
+    if '--sem-fsync' in argumentos:
+        argumentos.remove('--sem-fsync')
+        os.environ['LOJA_ESCRITA_ADIADA_FSYNC'] = '0'
+    # kill -USR1 <pid> liga o perfilador por 60s em um processo em execução (e desliga antes, se repetido)
+    perfilador.instalar_sinal()
+    if argumentos:
+        sys.exit(executar_comando(argumentos))
     main()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import repositories.dados as dados_loja
+import repositories.pedido_repository as pedido_repository
+from services.arquivamento_service import ArquivamentoService
+from services.relatorio_service import RelatorioService
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, medir
+
+# Arquivamento de pedidos antigos: mede, antes e depois de arquivar, o tamanho do
+# loja.json, a carga a frio (decodificação completa), a busca por código de um pedido
+# recente e de um arquivado e os relatórios de faturamento (inteiro e do último mês).
+# Confere que os relatórios dão o mesmo resultado antes e depois do arquivamento.
+# A loja sintética tem pedidos dos dois anos anteriores a 31/12/2025.
+
+CLIENTES_PADRAO = 2000
+PRODUTOS_PADRAO = 3000
+PEDIDOS_PADRAO = 20000
+REPETICOES = 5
+AGORA = datetime(2025, 12, 31, 12, 0, 0)
+
+
+def _medir_cenario(codigo_recente: str, codigo_antigo: str) -> Dict[str, Any]:
+    caminho = dados_loja.caminho_loja()
+
+    def carga_fria(_):
+        dados_loja.invalidar_cache()
+        dados_loja.carregar_dados_loja()
+
+    ultimo_mes = (AGORA - timedelta(days=30), AGORA)
+    resultado = {
+        'tamanho_loja_kb': _tamanho_kb(caminho),
+        'carga_fria': medir(carga_fria, REPETICOES),
+        'busca_recente': medir(lambda _: pedido_repository.buscar_por_codigo(codigo_recente), REPETICOES),
+        'busca_antigo': medir(lambda _: pedido_repository.buscar_por_codigo(codigo_antigo), REPETICOES),
+        'faturamento_total': medir(lambda _: RelatorioService.relatorio_ocupacao_por_periodo('mes'), REPETICOES),
+        'faturamento_ultimo_mes': medir(
+            lambda _: RelatorioService.relatorio_ocupacao_por_periodo('dia', *ultimo_mes), REPETICOES
+        ),
+    }
+    resultado['relatorio_mes'] = RelatorioService.relatorio_ocupacao_por_periodo('mes')
+    resultado['relatorio_ultimo_mes'] = RelatorioService.relatorio_ocupacao_por_periodo('dia', *ultimo_mes)
+    resultado['antigo_encontrado'] = pedido_repository.buscar_por_codigo(codigo_antigo) is not None
+    return resultado
+
+
+def _tamanho_kb(caminho: str) -> float:
+    return os.path.getsize(caminho) / 1024
+
+
+def _mesmos_valores(a: Dict[str, float], b: Dict[str, float]) -> bool:
+    return a.keys() == b.keys() and all(abs(a[k] - b[k]) < 0.01 for k in a)
+
+
+def executar(
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    idade_dias: int = 180,
+    compressao: str = 'gzip',
+    saida=None
+) -> Dict[str, Any]:
+    with pasta_dados_temporaria('loja-arquivamento-'):
+        dados_loja.salvar_dados_loja(gerar_loja(clientes, produtos, pedidos))
+        lista = pedido_repository.carregar_todos_pedidos_raw()
+        codigo_recente = lista[-1]['codigo_pedido']
+        codigo_antigo = next(p['codigo_pedido'] for p in lista if p['estado'] in ('ENTREGUE', 'CANCELADO'))
+
+        antes = _medir_cenario(codigo_recente, codigo_antigo)
+        arquivamento = ArquivamentoService.arquivar_pedidos(idade_dias, compressao, agora=AGORA)
+        depois = _medir_cenario(codigo_recente, codigo_antigo)
+        resumo_arquivo = ArquivamentoService.resumo_arquivo()
+
+    verificacoes = {
+        'faturamento_mensal_igual': _mesmos_valores(antes['relatorio_mes'], depois['relatorio_mes']),
+        'faturamento_ultimo_mes_igual': _mesmos_valores(antes['relatorio_ultimo_mes'], depois['relatorio_ultimo_mes']),
+        'pedido_arquivado_encontrado': depois['antigo_encontrado'],
+    }
+    for cenario in (antes, depois):
+        del cenario['relatorio_mes'], cenario['relatorio_ultimo_mes']
+    relatorio = {
+        'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos,
+        'idade_dias': idade_dias, 'compressao': compressao,
+        'arquivados': arquivamento['arquivados'],
+        'segmentos': len(arquivamento['segmentos']),
+        'arquivo_kb': resumo_arquivo['bytes'] / 1024,
+        'duracao_arquivamento_s': arquivamento['duracao_s'],
+        'antes': antes, 'depois': depois,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+    if saida:
+        print(f"{arquivamento['arquivados']} de {pedidos} pedido(s) arquivado(s) em {len(arquivamento['segmentos'])} segmento(s) "
+              f"{compressao} ({relatorio['arquivo_kb']:.0f} KB) em {arquivamento['duracao_s']:.2f}s", file=saida)
+        print(f"{'MEDIDA':<24} {'ANTES':>12} {'DEPOIS':>12}", file=saida)
+        print(f"{'loja.json (KB)':<24} {antes['tamanho_loja_kb']:>12.0f} {depois['tamanho_loja_kb']:>12.0f}", file=saida)
+        for medida in ('carga_fria', 'busca_recente', 'busca_antigo', 'faturamento_total', 'faturamento_ultimo_mes'):
+            print(f"{medida + ' p50 (ms)':<24} {antes[medida]['p50_ms']:>12.2f} {depois[medida]['p50_ms']:>12.2f}", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+    return relatorio
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Custo das consultas antes e depois do arquivamento de pedidos antigos.")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS_PADRAO)
+    parser.add_argument('--idade-dias', type=int, default=180)
+    parser.add_argument('--compressao', choices=['gzip', 'lzma'], default='gzip')
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.clientes, args.produtos, args.pedidos, args.idade_dias, args.compressao, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False, default=str)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import repositories.dados as dados_loja
+import repositories.produto_repository as produto_repository
+from repositories import catalogo_compartilhado
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria
+
+# Workers em processos separados consultando o catálogo de produtos de dois jeitos:
+#   - json: cada processo lê o loja.json e monta o próprio índice SKU -> Produto;
+#   - compartilhado: cada processo mapeia o catálogo publicado em memória compartilhada.
+# Mede por worker o tempo até estar pronto, o custo das buscas e a memória privada
+# (a parte do RSS que não é compartilhada com os outros processos).
+
+WORKERS_PADRAO = 4
+PRODUTOS_PADRAO = 200000
+BUSCAS_PADRAO = 20000
+
+
+def _memoria_kb() -> Dict[str, int]:
+    """RSS e memória privada do processo atual (Linux: /proc/self/smaps_rollup)."""
+    campos = {}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            for linha in f:
+                nome, _, valor = linha.partition(':')
+                if nome in ('Rss', 'Private_Clean', 'Private_Dirty'):
+                    campos[nome] = int(valor.split()[0])
+    except OSError:
+        return {'rss_kb': 0, 'privada_kb': 0}
+    return {'rss_kb': campos.get('Rss', 0), 'privada_kb': campos.get('Private_Clean', 0) + campos.get('Private_Dirty', 0)}
+
+
+def _worker(modo: str, pasta: str, nome: str, skus: List[str], fila):
+    inicio = time.perf_counter()
+    if modo == 'json':
+        dados_loja.definir_pasta_dados(pasta)
+        indice = {p['sku']: p for p in produto_repository.carregar_todos_produtos_raw()}
+        buscar = lambda sku: produto_repository._deserializar_produto(indice[sku])
+    else:
+        catalogo = catalogo_compartilhado.CatalogoCompartilhado(nome)
+        buscar = catalogo.buscar_por_sku
+    pronto_s = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    valor = 0.0
+    for sku in skus:
+        valor += buscar(sku).preco_unitario
+    buscas_s = time.perf_counter() - inicio
+
+    fila.put({'pronto_s': pronto_s, 'buscas_s': buscas_s, 'valor': round(valor, 2), **_memoria_kb()})
+
+
+def _rodar_workers(modo: str, workers: int, pasta: str, nome: str, skus: List[str]) -> List[Dict[str, Any]]:
+    # spawn: cada worker começa do zero, sem herdar por fork o que o processo pai já carregou
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processos = [contexto.Process(target=_worker, args=(modo, pasta, nome, skus, fila)) for _ in range(workers)]
+    for p in processos:
+        p.start()
+    resultados = [fila.get() for _ in processos]
+    for p in processos:
+        p.join()
+    return resultados
+
+
+def executar(
+    workers: int = WORKERS_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    buscas: int = BUSCAS_PADRAO,
+    saida=None
+) -> Dict[str, Any]:
+    nome = f"loja_bench_{os.getpid()}"
+    with pasta_dados_temporaria('loja-catalogo-') as pasta:
+        dados_loja.salvar_dados_loja(gerar_loja(10, produtos, 0))
+        todos = [p['sku'] for p in produto_repository.carregar_todos_produtos_raw()]
+        skus = random.Random(42).choices(todos, k=buscas)
+
+        inicio = time.perf_counter()
+        catalogo_compartilhado.publicar_catalogo(nome=nome)
+        publicacao_s = time.perf_counter() - inicio
+        try:
+            with catalogo_compartilhado.CatalogoCompartilhado(nome) as catalogo:
+                tamanho_segmento = catalogo._dados.size
+            modos = {modo: _rodar_workers(modo, workers, pasta, nome, skus) for modo in ('json', 'compartilhado')}
+        finally:
+            catalogo_compartilhado.remover_catalogo(nome)
+
+    relatorio = {
+        'workers': workers, 'produtos': produtos, 'buscas_por_worker': buscas,
+        'publicacao_s': publicacao_s, 'segmento_mb': tamanho_segmento / 1e6,
+        'mesmo_resultado': len({r['valor'] for rs in modos.values() for r in rs}) == 1,
+        'modos': {},
+    }
+    for modo, resultados in modos.items():
+        n = len(resultados)
+        relatorio['modos'][modo] = {
+            'pronto_ms': sum(r['pronto_s'] for r in resultados) / n * 1000,
+            'busca_us': sum(r['buscas_s'] for r in resultados) / (n * buscas) * 1e6,
+            'rss_mb': sum(r['rss_kb'] for r in resultados) / n / 1024,
+            'privada_mb': sum(r['privada_kb'] for r in resultados) / n / 1024,
+            'privada_total_mb': sum(r['privada_kb'] for r in resultados) / 1024,
+        }
+
+    if saida:
+        print(f"{produtos} produtos, {workers} workers x {buscas} buscas; publicação {publicacao_s:.2f}s, "
+              f"segmento {relatorio['segmento_mb']:.1f} MB", file=saida)
+        print(f"  {'MODO':<14} {'PRONTO':>10} {'BUSCA':>10} {'RSS/WORKER':>11} {'PRIVADA/WORKER':>15} {'PRIVADA TOTAL':>14}", file=saida)
+        for modo, m in relatorio['modos'].items():
+            print(f"  {modo:<14} {m['pronto_ms']:>7.0f} ms {m['busca_us']:>7.2f} µs {m['rss_mb']:>8.1f} MB "
+                  f"{m['privada_mb']:>12.1f} MB {m['privada_total_mb']:>11.1f} MB", file=saida)
+        print(f"  {'OK  ' if relatorio['mesmo_resultado'] else 'FALHA'} mesmo_resultado", file=saida)
+    return relatorio
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Workers multi-processo: catálogo lido do JSON x memória compartilhada.")
+    parser.add_argument('--workers', type=int, default=WORKERS_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--buscas', type=int, default=BUSCAS_PADRAO, help="Buscas por SKU em cada worker")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.workers, args.produtos, args.buscas, saida=sys.stdout)
+    sys.exit(0 if relatorio['mesmo_resultado'] else 1)
+
+
+if __name__ == '__main__':
+    main()
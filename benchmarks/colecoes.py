@@ -0,0 +1,128 @@
+import argparse
+import json
+import random
+import sys
+from typing import Any, Callable, Dict, List, Optional
+from models.vendas import Carrinho
+import repositories.dados as dados_loja
+import repositories.cliente_repository as cliente_repository
+import repositories.produto_repository as produto_repository
+import services.carrinho_service as carrinho_service
+from services.pedido_service import PedidoService
+from monitoramento import instrumentacao
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, medir, tamanho_arquivo_loja
+
+# Disposição da loja: arquivo único x um arquivo por coleção (pedidos por mês).
+# Para cada disposição mede latência e bytes gravados por operação:
+#   - cliente_salvar: regrava um cliente (ex.: endereço novo);
+#   - estoque_salvar: relê e regrava um produto (ex.: ajuste de estoque);
+#   - checkout: carrinho + finalizar_compra com cartão (estoque e pedido na mesma transação);
+#   - busca_cliente_fria: busca por CPF logo depois de descartar o cache (lê do disco).
+# Confere que a loja relida do disco bate com a memória depois das operações.
+
+CLIENTES_PADRAO = 5000
+PRODUTOS_PADRAO = 5000
+PEDIDOS_PADRAO = 50000
+REPETICOES = 10
+
+
+def _operacoes(rng: random.Random) -> Dict[str, Callable[[int], Any]]:
+    clientes = [c for c in cliente_repository.carregar_todos() if c.enderecos]
+    produtos = [p for p in produto_repository.carregar_todos() if p.is_ativo]
+    skus = [p['sku'] for p in produto_repository.carregar_todos_produtos_raw()
+            if p.get('tipo') == 'ProdutoFisico' and p.get('is_ativo', True) and p.get('estoque', 0) > 50]
+
+    def checkout(_):
+        carrinho = Carrinho()
+        carrinho.cliente = rng.choice(clientes)
+        carrinho_service.adicionar_item_ao_carrinho(carrinho, rng.choice(skus), 1)
+        frete = carrinho_service.calcular_frete(carrinho, carrinho.cliente.enderecos[0].cep)
+        PedidoService.finalizar_compra(carrinho, frete, 'cartao', {'bandeira': 'VISA'})
+
+    def busca_cliente_fria(_):
+        dados_loja.invalidar_cache()
+        cliente_repository.buscar_por_cpf(rng.choice(clientes).cpf)
+
+    return {
+        'cliente_salvar': lambda _: cliente_repository.salvar(rng.choice(clientes)),
+        # Relê o produto antes de regravar: a cópia da carga pode ter ficado desatualizada pelo checkout
+        'estoque_salvar': lambda _: produto_repository.salvar(produto_repository.buscar_por_sku(rng.choice(produtos).sku)),
+        'checkout': checkout,
+        'busca_cliente_fria': busca_cliente_fria,
+    }
+
+
+def _medir_layout(layout: str, loja: Dict[str, Any], repeticoes: int, semente: int) -> Dict[str, Any]:
+    with pasta_dados_temporaria('loja-colecoes-'):
+        dados_loja.salvar_dados_loja(loja)
+        migracao = dados_loja.converter_layout(layout)
+        dados_loja.invalidar_cache()
+
+        resultado: Dict[str, Any] = {'bytes': tamanho_arquivo_loja(), 'migracao_s': migracao['duracao_s'], 'operacoes': {}}
+        instrumentacao.limpar()
+        instrumentacao.ativar()
+        try:
+            for nome, operacao in _operacoes(random.Random(semente)).items():
+                medida = medir(instrumentacao.instrumentar(f'bench.{nome}')(operacao), repeticoes)
+                estatistica = instrumentacao.obter_estatisticas().get(f'bench.{nome}', {})
+                medida['bytes_gravados_por_operacao'] = estatistica.get('bytes_gravados', 0) / max(1, estatistica.get('chamadas', 1))
+                resultado['operacoes'][nome] = medida
+        finally:
+            instrumentacao.desativar()
+            instrumentacao.limpar()
+
+        memoria = dados_loja.carregar_dados_loja()
+        dados_loja.invalidar_cache()
+        resultado['disco_igual_memoria'] = dados_loja.carregar_dados_loja() == memoria
+    return resultado
+
+
+def executar(
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    repeticoes: int = REPETICOES,
+    semente: int = 42,
+    saida=None
+) -> Dict[str, Any]:
+    loja = gerar_loja(clientes, produtos, pedidos, semente)
+    resultados = {layout: _medir_layout(layout, loja, repeticoes, semente) for layout in dados_loja.LAYOUTS}
+
+    if saida:
+        print(f"# {clientes} clientes / {produtos} produtos / {pedidos} pedidos", file=saida)
+        print(f"{'OPERAÇÃO':<20} {'DISPOSIÇÃO':<10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'GRAVADO/OP (KB)':>16}", file=saida)
+        for nome in resultados['arquivo']['operacoes']:
+            for layout, r in resultados.items():
+                op = r['operacoes'][nome]
+                print(f"{nome:<20} {layout:<10} {op['p50_ms']:>10.1f} {op['p95_ms']:>10.1f} "
+                      f"{op['bytes_gravados_por_operacao'] / 1024:>16.1f}", file=saida)
+        for layout, r in resultados.items():
+            print(f"  {'OK  ' if r['disco_igual_memoria'] else 'FALHA'} {layout}: disco igual à memória "
+                  f"({r['bytes'] / 1e6:.1f} MB, migração {r['migracao_s']:.2f}s)", file=saida)
+
+    return {
+        'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos, 'repeticoes': repeticoes,
+        'layouts': resultados,
+        'sucesso': all(r['disco_igual_memoria'] for r in resultados.values()),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Latência e bytes gravados por operação: arquivo único x um arquivo por coleção.")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.clientes, args.produtos, args.pedidos, args.repeticoes, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
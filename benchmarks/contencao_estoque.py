@@ -0,0 +1,181 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from models.entidades import ProdutoFisico
+from models.exceptions import ValorInvalidoError, ConflitoVersaoError
+from models.vendas import Carrinho
+import repositories.dados as dados_loja
+import repositories.produto_repository as produto_repository
+from services.estoque_service import EstoqueService
+from services.reserva_service import reservas
+import services.carrinho_service as carrinho_service
+from monitoramento import instrumentacao
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, resumir
+
+# Contenção na baixa de estoque: vários workers fazem checkouts (validação + baixa)
+# ao mesmo tempo, a maioria sobre poucos SKUs "quentes" com estoque limitado e o resto
+# sobre SKUs "frios". Ao final confere que não houve venda acima do estoque (nem abaixo
+# do limite de segurança) e mede latência, conflitos e novas tentativas por tipo de SKU.
+# Com --modo reservas, cada checkout reserva ao adicionar o item e converte a reserva na
+# baixa (fluxo do carrinho_service + PedidoService, também pelo compare-and-swap, com as
+# versões lidas ao reservar) em vez de validar o estoque no checkout.
+
+WORKERS_PADRAO = 8
+CHECKOUTS_PADRAO = 40
+SKUS_QUENTES_PADRAO = 3
+ESTOQUE_QUENTE_PADRAO = 60
+FRACAO_QUENTE_PADRAO = 0.8
+MODOS = ('otimista', 'reservas')
+SKUS_FRIOS = 20
+ESTOQUE_FRIO = 100000
+
+
+def _criar_produtos(skus_quentes: int, estoque_quente: int) -> Dict[str, ProdutoFisico]:
+    produtos = {}
+    for i in range(skus_quentes):
+        produtos[f"QUENTE-{i:02d}"] = ProdutoFisico(f"QUENTE-{i:02d}", f"Produto quente {i}", "Testes", 10.0, estoque_quente, 1.0)
+    for i in range(SKUS_FRIOS):
+        produtos[f"FRIO-{i:02d}"] = ProdutoFisico(f"FRIO-{i:02d}", f"Produto frio {i}", "Testes", 10.0, ESTOQUE_FRIO, 1.0)
+    produto_repository.salvar_em_lote(produtos.values())
+    return produtos
+
+
+def executar(
+    workers: int = WORKERS_PADRAO,
+    checkouts: int = CHECKOUTS_PADRAO,
+    skus_quentes: int = SKUS_QUENTES_PADRAO,
+    estoque_quente: int = ESTOQUE_QUENTE_PADRAO,
+    fracao_quente: float = FRACAO_QUENTE_PADRAO,
+    modo: str = 'otimista',
+    semente: int = 42,
+    saida=None
+) -> Dict[str, Any]:
+    with pasta_dados_temporaria('loja-contencao-'):
+        dados_loja.salvar_dados_loja(gerar_loja(100, 200, 0, semente))
+        produtos = _criar_produtos(skus_quentes, estoque_quente)
+        limite_seguranca = _limite_seguranca()
+        quentes = [sku for sku in produtos if sku.startswith('QUENTE')]
+        frios = [sku for sku in produtos if sku.startswith('FRIO')]
+
+        trava = threading.Lock()
+        vendidos = {sku: 0 for sku in produtos}
+        latencias = {'quente': [], 'frio': []}
+        resultados = {'sucesso': 0, 'sem_estoque': 0, 'conflito_esgotado': 0, 'outros_erros': []}
+
+        def worker(indice: int):
+            rng = random.Random(semente + indice)
+            for _ in range(checkouts):
+                tipo = 'quente' if rng.random() < fracao_quente else 'frio'
+                sku = rng.choice(quentes if tipo == 'quente' else frios)
+                quantidade = rng.randint(1, 2)
+                carrinho = Carrinho()
+
+                inicio = time.perf_counter()
+                try:
+                    if modo == 'reservas':
+                        carrinho_service.adicionar_item_ao_carrinho(carrinho, sku, quantidade)
+                        reservas.converter(carrinho)
+                    else:
+                        carrinho.adicionar_item(produtos[sku], quantidade)
+                        EstoqueService.validar_baixa_estoque(carrinho.itens)
+                        EstoqueService.realizar_baixa_estoque(carrinho.itens)
+                    status = 'sucesso'
+                except ValorInvalidoError:
+                    status = 'sem_estoque'
+                except ConflitoVersaoError:
+                    status = 'conflito_esgotado'
+                except Exception as e:
+                    status = None
+                    with trava:
+                        resultados['outros_erros'].append(f"{e.__class__.__name__}: {e}")
+                duracao = time.perf_counter() - inicio
+
+                with trava:
+                    latencias[tipo].append(duracao)
+                    if status:
+                        resultados[status] += 1
+                    if status == 'sucesso':
+                        vendidos[sku] += quantidade
+
+        instrumentacao.limpar()
+        instrumentacao.ativar()
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracao = time.perf_counter() - inicio
+        instrumentacao.desativar()
+
+        cas = instrumentacao.obter_estatisticas().get('produto_repository.ajustar_estoques_se_versao', {})
+        finais = {p['sku']: p['estoque'] for p in produto_repository.carregar_todos_produtos_raw() if p['sku'] in produtos}
+
+    verificacoes = {
+        'sem_erros_inesperados': not resultados['outros_erros'],
+        'estoque_conservado': all(finais[sku] + vendidos[sku] == produtos[sku].estoque for sku in produtos),
+        'sem_venda_acima_do_limite': all(finais[sku] >= limite_seguranca for sku in produtos),
+    }
+    relatorio = {
+        'modo': modo, 'workers': workers, 'checkouts_por_worker': checkouts, 'skus_quentes': skus_quentes,
+        'estoque_quente': estoque_quente, 'fracao_quente': fracao_quente,
+        'duracao_s': duracao,
+        'checkouts_por_s': workers * checkouts / duracao if duracao else 0.0,
+        'resultados': {k: v for k, v in resultados.items() if k != 'outros_erros'},
+        'tentativas_cas': cas.get('chamadas', 0),
+        'conflitos_cas': cas.get('erros', 0),
+        'latencia_quente': resumir(latencias['quente']),
+        'latencia_frio': resumir(latencias['frio']),
+        'vendidos_quentes': {sku: vendidos[sku] for sku in quentes},
+        'erros': resultados['outros_erros'][:10],
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+    if saida:
+        r = relatorio['resultados']
+        print(f"[{modo}] {workers} workers x {checkouts} checkouts em {duracao:.2f}s ({relatorio['checkouts_por_s']:.1f}/s)", file=saida)
+        print(f"  sucesso={r['sucesso']} sem_estoque={r['sem_estoque']} conflito_esgotado={r['conflito_esgotado']} "
+              f"tentativas_cas={relatorio['tentativas_cas']} conflitos_cas={relatorio['conflitos_cas']}", file=saida)
+        for tipo in ('quente', 'frio'):
+            lat = relatorio[f'latencia_{tipo}']
+            print(f"  SKUs {tipo:<6} n={lat['repeticoes']:<5} p50={lat['p50_ms']:8.2f} ms  p95={lat['p95_ms']:8.2f} ms  máx={lat['max_ms']:8.2f} ms", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+        for erro in relatorio['erros']:
+            print(f"  erro: {erro}", file=saida)
+    return relatorio
+
+
+def _limite_seguranca() -> int:
+    from repositories import settings_repository
+    return settings_repository.obter_configuracoes().regra_estoque.limite_seguranca
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Contenção de baixas de estoque em poucos SKUs quentes.")
+    parser.add_argument('--workers', type=int, default=WORKERS_PADRAO)
+    parser.add_argument('--checkouts', type=int, default=CHECKOUTS_PADRAO, help="Checkouts por worker")
+    parser.add_argument('--skus-quentes', type=int, default=SKUS_QUENTES_PADRAO)
+    parser.add_argument('--estoque-quente', type=int, default=ESTOQUE_QUENTE_PADRAO)
+    parser.add_argument('--fracao-quente', type=float, default=FRACAO_QUENTE_PADRAO)
+    parser.add_argument('--modo', choices=MODOS, default='otimista',
+                        help="otimista: validação + compare-and-swap; reservas: reserva no carrinho convertida na baixa")
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.workers, args.checkouts, args.skus_quentes, args.estoque_quente,
+                         args.fracao_quente, args.modo, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from models.vendas import Carrinho
+import repositories.dados as dados_loja
+import repositories.cliente_repository as cliente_repository
+import repositories.produto_repository as produto_repository
+import services.carrinho_service as carrinho_service
+from services.pedido_service import PedidoService
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, resumir
+
+# Latência do checkout com gravação síncrona x escrita adiada (write-behind).
+# Cada checkout adiciona itens ao carrinho (reserva), finaliza a compra com cartão
+# (baixa de estoque + pedido) e mede o tempo até a confirmação, com uma pausa entre os
+# checkouts (o cliente seguinte chegando). Na escrita adiada, a gravação do loja.json fica
+# com a thread de fundo, que disputa o GIL com os checkouts; ao final, a descarga de saída
+# é medida e o arquivo relido do disco precisa conter todos os pedidos confirmados.
+
+CLIENTES_PADRAO = 1000
+PRODUTOS_PADRAO = 2000
+PEDIDOS_PADRAO = 5000
+CHECKOUTS_PADRAO = 40
+PAUSA_PADRAO_MS = 50.0
+MODOS = ('sincrona', 'adiada', 'adiada-sem-fsync')
+
+
+def _checkouts(quantidade: int, pausa_ms: float, semente: int) -> List[float]:
+    rng = random.Random(semente)
+    clientes = [c for c in cliente_repository.carregar_todos() if c.enderecos]
+    skus = [p['sku'] for p in produto_repository.carregar_todos_produtos_raw()
+            if p.get('tipo') == 'ProdutoFisico' and p.get('is_ativo', True) and p.get('estoque', 0) > 50]
+    latencias = []
+    for _ in range(quantidade):
+        inicio = time.perf_counter()
+        carrinho = Carrinho()
+        carrinho.cliente = rng.choice(clientes)
+        for sku in rng.sample(skus, rng.randint(1, 2)):
+            carrinho_service.adicionar_item_ao_carrinho(carrinho, sku, 1)
+        frete = carrinho_service.calcular_frete(carrinho, carrinho.cliente.enderecos[0].cep)
+        PedidoService.finalizar_compra(carrinho, frete, 'cartao', {'bandeira': 'VISA'})
+        latencias.append(time.perf_counter() - inicio)
+        time.sleep(pausa_ms / 1000)
+    return latencias
+
+
+def executar_modo(
+    modo: str,
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    checkouts: int = CHECKOUTS_PADRAO,
+    pausa_ms: float = PAUSA_PADRAO_MS,
+    semente: int = 42
+) -> Dict[str, Any]:
+    with pasta_dados_temporaria('loja-escrita-adiada-'):
+        dados_loja.salvar_dados_loja(gerar_loja(clientes, produtos, pedidos, semente))
+        pedidos_iniciais = len(dados_loja.carregar_dados_loja()['pedidos'])
+        if modo != 'sincrona':
+            dados_loja.ativar_escrita_adiada(duravel=(modo == 'adiada'))
+
+        inicio = time.perf_counter()
+        latencias = _checkouts(checkouts, pausa_ms, semente)
+        duracao = time.perf_counter() - inicio
+
+        estatisticas = dados_loja.estatisticas_escrita_adiada()
+        inicio_saida = time.perf_counter()
+        dados_loja.desativar_escrita_adiada()
+        descarga_final_ms = (time.perf_counter() - inicio_saida) * 1000
+
+        # Relê do disco: o que foi confirmado precisa ter sido gravado
+        dados_loja.invalidar_cache()
+        pedidos_gravados = len(dados_loja.carregar_dados_loja()['pedidos'])
+
+    return {
+        'modo': modo,
+        'checkouts': checkouts,
+        'pausa_ms': pausa_ms,
+        'duracao_s': duracao,
+        'latencia': resumir(latencias),
+        'descarga_final_ms': descarga_final_ms,
+        'descargas': estatisticas.get('descargas', 0),
+        'alteracoes_por_descarga': estatisticas.get('alteracoes_por_descarga', 0.0),
+        'descarga_media_ms': estatisticas.get('media_ms', 0.0),
+        'fila_max': estatisticas.get('fila_max', 0),
+        'pedidos_gravados_ok': pedidos_gravados == pedidos_iniciais + checkouts,
+    }
+
+
+def executar(
+    modos: List[str] = MODOS,
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    checkouts: int = CHECKOUTS_PADRAO,
+    pausa_ms: float = PAUSA_PADRAO_MS,
+    saida=None
+) -> Dict[str, Any]:
+    resultados = []
+    for modo in modos:
+        resultado = executar_modo(modo, clientes, produtos, pedidos, checkouts, pausa_ms)
+        resultados.append(resultado)
+        if saida:
+            lat = resultado['latencia']
+            print(f"[{modo:<16}] {checkouts} checkouts em {resultado['duracao_s']:.2f}s  "
+                  f"p50={lat['p50_ms']:8.2f} ms  p95={lat['p95_ms']:8.2f} ms  máx={lat['max_ms']:8.2f} ms", file=saida)
+            if modo != 'sincrona':
+                print(f"  {resultado['descargas']} descarga(s), {resultado['alteracoes_por_descarga']:.1f} alterações/descarga, "
+                      f"média {resultado['descarga_media_ms']:.1f} ms, fila máx. {resultado['fila_max']}, "
+                      f"descarga final {resultado['descarga_final_ms']:.1f} ms", file=saida)
+            print(f"  {'OK  ' if resultado['pedidos_gravados_ok'] else 'FALHA'} pedidos confirmados gravados no disco", file=saida)
+    return {
+        'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos,
+        'resultados': resultados,
+        'sucesso': all(r['pedidos_gravados_ok'] for r in resultados),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Latência do checkout com gravação síncrona x escrita adiada.")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS_PADRAO)
+    parser.add_argument('--checkouts', type=int, default=CHECKOUTS_PADRAO)
+    parser.add_argument('--pausa-ms', type=float, default=PAUSA_PADRAO_MS, help="Pausa entre checkouts")
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.modos, args.clientes, args.produtos, args.pedidos, args.checkouts, args.pausa_ms, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from models.entidades import Produto, ProdutoFisico
+import repositories.dados as dados_loja
+import repositories.produto_repository as produto_repository
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria
+
+# Teste de estresse da camada de concorrência (repositories/concorrencia.py + dados.py).
+#
+# Sobre uma loja sintética, roda ao mesmo tempo:
+#   - escritores que inserem produtos novos (produto_repository.salvar);
+#   - escritores que incrementam o estoque de um mesmo produto (ler-alterar-gravar
+#     dentro de dados_loja.escrita());
+#   - leitores que buscam produtos e contam o catálogo sem parar.
+# Ao final confere que nenhuma atualização se perdeu, que os leitores nunca viram o
+# catálogo encolher nem um arquivo inválido e que o loja.json em disco bate com a memória.
+
+ESCRITORES_PADRAO = 4
+INSERCOES_PADRAO = 25
+INCREMENTOS_PADRAO = 25
+LEITORES_PADRAO = 4
+SKU_CONTADOR = 'SKU-ESTRESSE'
+
+
+def _executar_threads(alvos: List[Callable[[], None]]) -> List[BaseException]:
+    erros: List[BaseException] = []
+    trava = threading.Lock()
+
+    def envolver(alvo):
+        def executar():
+            try:
+                alvo()
+            except BaseException as e:
+                with trava:
+                    erros.append(e)
+        return executar
+
+    threads = [threading.Thread(target=envolver(alvo)) for alvo in alvos]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return erros
+
+
+def executar(
+    escritores: int = ESCRITORES_PADRAO,
+    insercoes: int = INSERCOES_PADRAO,
+    incrementos: int = INCREMENTOS_PADRAO,
+    leitores: int = LEITORES_PADRAO,
+    saida=None
+) -> Dict[str, Any]:
+    with pasta_dados_temporaria('loja-estresse-'):
+        dados_loja.salvar_dados_loja(gerar_loja(200, 500, 0))
+        produto_repository.salvar(ProdutoFisico(SKU_CONTADOR, "Contador de estresse", "Testes", 1.0, 0, 0.1))
+        produtos_iniciais = len(produto_repository.carregar_todos_produtos_raw())
+
+        fim_escritas = threading.Event()
+        leituras = [0] * leitores
+        regressoes = [0] * leitores
+
+        def inserir(indice: int):
+            def alvo():
+                for i in range(insercoes):
+                    produto_repository.salvar(Produto(f"SKU-T{indice:02d}-{i:05d}", f"Produto {indice}/{i}", "Testes", 10.0, 5))
+            return alvo
+
+        def incrementar():
+            for _ in range(incrementos):
+                with dados_loja.escrita():
+                    produto = produto_repository.buscar_por_sku(SKU_CONTADOR)
+                    produto.ajustar_estoque(1)
+                    produto_repository.salvar(produto)
+
+        def ler(indice: int):
+            def alvo():
+                anterior = 0
+                while not fim_escritas.is_set():
+                    total = len(produto_repository.carregar_todos_produtos_raw())
+                    if total < anterior:
+                        regressoes[indice] += 1
+                    anterior = total
+                    produto_repository.buscar_por_sku(SKU_CONTADOR)
+                    leituras[indice] += 1
+            return alvo
+
+        inicio = time.perf_counter()
+        threads_leitura = [threading.Thread(target=ler(i)) for i in range(leitores)]
+        for t in threads_leitura:
+            t.start()
+        erros = _executar_threads([inserir(i) for i in range(escritores)] + [incrementar] * escritores)
+        fim_escritas.set()
+        for t in threads_leitura:
+            t.join()
+        duracao = time.perf_counter() - inicio
+
+        # Confere em memória e relendo o arquivo do disco
+        esperado_produtos = produtos_iniciais + escritores * insercoes
+        esperado_estoque = escritores * incrementos
+        memoria = produto_repository.carregar_todos_produtos_raw()
+        # Sem o cache, a leitura volta ao disco (em qualquer formato e disposição da loja)
+        dados_loja.invalidar_cache()
+        disco = dados_loja.carregar_dados_loja(('produtos',))['produtos']
+        estoque_contador = next(p['estoque'] for p in disco if p['sku'] == SKU_CONTADOR)
+
+        verificacoes = {
+            'sem_erros': not erros,
+            'nenhuma_insercao_perdida': len(disco) == esperado_produtos,
+            'nenhum_incremento_perdido': estoque_contador == esperado_estoque,
+            'leitores_sem_regressao': sum(regressoes) == 0,
+            'disco_igual_memoria': disco == memoria,
+        }
+
+    resultado = {
+        'escritores': escritores, 'insercoes_por_escritor': insercoes,
+        'incrementos_por_escritor': incrementos, 'leitores': leitores,
+        'duracao_s': duracao,
+        'escritas': escritores * (insercoes + incrementos),
+        'leituras': sum(leituras),
+        'produtos': {'esperado': esperado_produtos, 'obtido': len(disco)},
+        'estoque_contador': {'esperado': esperado_estoque, 'obtido': estoque_contador},
+        'erros': [f"{e.__class__.__name__}: {e}" for e in erros[:10]],
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+    if saida:
+        print(f"{resultado['escritas']} escrita(s) e {resultado['leituras']} leitura(s) em {duracao:.2f}s", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+        for erro in resultado['erros']:
+            print(f"  erro: {erro}", file=saida)
+    return resultado
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Estresse multi-thread dos repositórios (nenhuma atualização pode se perder).")
+    parser.add_argument('--escritores', type=int, default=ESCRITORES_PADRAO)
+    parser.add_argument('--insercoes', type=int, default=INSERCOES_PADRAO, help="Produtos novos por escritor")
+    parser.add_argument('--incrementos', type=int, default=INCREMENTOS_PADRAO, help="Incrementos de estoque por escritor")
+    parser.add_argument('--leitores', type=int, default=LEITORES_PADRAO)
+    args = parser.parse_args(argumentos)
+
+    resultado = executar(args.escritores, args.insercoes, args.incrementos, args.leitores, saida=sys.stdout)
+    sys.exit(0 if resultado['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional
+import repositories.dados as dados_loja
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, medir, tamanho_arquivo_loja
+
+# Formato do arquivo da loja: loja.json (indentado) x loja.bin (repositories/formato_binario.py).
+# Para cada formato mede o tamanho do arquivo, a carga a frio (leitura + decodificação do
+# arquivo inteiro, sem cache nem snapshot) e a gravação completa (como a de cada alteração
+# síncrona). Confere que a loja convertida volta idêntica nos dois sentidos.
+
+CLIENTES_PADRAO = 5000
+PRODUTOS_PADRAO = 5000
+PEDIDOS_PADRAO = 50000
+REPETICOES = 5
+
+
+def _medir_formato(dados: Dict[str, Any], repeticoes: int) -> Dict[str, Any]:
+    def carga_fria(_):
+        dados_loja.invalidar_cache()
+        dados_loja.carregar_dados_loja()
+
+    return {
+        'arquivo': dados_loja.caminho_loja(),
+        'bytes': tamanho_arquivo_loja(),
+        'carga_fria': medir(carga_fria, repeticoes),
+        'gravacao': medir(lambda _: dados_loja.salvar_dados_loja(dados), repeticoes),
+    }
+
+
+def executar(
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    repeticoes: int = REPETICOES,
+    saida=None
+) -> Dict[str, Any]:
+    with pasta_dados_temporaria('loja-formato-'):
+        dados_loja.salvar_dados_loja(gerar_loja(clientes, produtos, pedidos))
+        dados_loja.invalidar_cache()
+        original = dados_loja.carregar_dados_loja()
+
+        resultados = {'json': _medir_formato(original, repeticoes)}
+        conversao_binario = dados_loja.converter_formato('binario')
+        dados_loja.invalidar_cache()
+        igual_binario = dados_loja.carregar_dados_loja() == original
+        resultados['binario'] = _medir_formato(original, repeticoes)
+        conversao_json = dados_loja.converter_formato('json')
+        dados_loja.invalidar_cache()
+        igual_json = dados_loja.carregar_dados_loja() == original
+
+    verificacoes = {
+        'binario_igual_ao_json': igual_binario,
+        'json_reconvertido_igual': igual_json,
+    }
+    base, binario = resultados['json'], resultados['binario']
+    relatorio = {
+        'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos,
+        'formatos': resultados,
+        'conversao_para_binario_s': conversao_binario['duracao_s'],
+        'conversao_para_json_s': conversao_json['duracao_s'],
+        'reducao_tamanho': base['bytes'] / binario['bytes'] if binario['bytes'] else 0.0,
+        'aceleracao_carga': base['carga_fria']['p50_ms'] / binario['carga_fria']['p50_ms'] if binario['carga_fria']['p50_ms'] else 0.0,
+        'aceleracao_gravacao': base['gravacao']['p50_ms'] / binario['gravacao']['p50_ms'] if binario['gravacao']['p50_ms'] else 0.0,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+    if saida:
+        print(f"# {clientes} clientes / {produtos} produtos / {pedidos} pedidos", file=saida)
+        print(f"{'FORMATO':<8} {'TAMANHO (MB)':>13} {'CARGA p50 (ms)':>15} {'GRAVAÇÃO p50 (ms)':>18}", file=saida)
+        for formato, r in resultados.items():
+            print(f"{formato:<8} {r['bytes'] / 1e6:>13.1f} {r['carga_fria']['p50_ms']:>15.1f} {r['gravacao']['p50_ms']:>18.1f}", file=saida)
+        print(f"binário: {relatorio['reducao_tamanho']:.1f}x menor, carga {relatorio['aceleracao_carga']:.2f}x, "
+              f"gravação {relatorio['aceleracao_gravacao']:.2f}x em relação ao JSON", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+    return relatorio
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Tamanho, carga e gravação da loja em JSON x formato binário.")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.clientes, args.produtos, args.pedidos, args.repeticoes, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from models.entidades import Cliente, Endereco, Produto, ProdutoFisico
+from models.vendas import Carrinho, Pedido
+from models.transacoes import PagamentoCartao, PagamentoBoleto
+import repositories.dados as dados_loja
+import services.carrinho_service as carrinho_service
+
+# Distribuições usadas pelo gerador (pesos relativos)
+
+CATEGORIAS = [
+    ('Livros', 25), ('Eletrônicos', 20), ('Casa', 15), ('Moda', 15),
+    ('Esportes', 10), ('Brinquedos', 8), ('Cursos', 7),
+]
+UFS = [
+    ('SP', 30), ('RJ', 12), ('MG', 11), ('BA', 7), ('PR', 6), ('RS', 6),
+    ('PE', 5), ('CE', 5), ('SC', 4), ('GO', 4), ('DF', 3), ('AM', 2),
+]
+CIDADES_POR_UF = {
+    'SP': ['São Paulo', 'Campinas', 'Santos'], 'RJ': ['Rio de Janeiro', 'Niterói'],
+    'MG': ['Belo Horizonte', 'Uberlândia'], 'BA': ['Salvador'], 'PR': ['Curitiba', 'Londrina'],
+    'RS': ['Porto Alegre'], 'PE': ['Recife'], 'CE': ['Fortaleza', 'Barro'], 'SC': ['Florianópolis'],
+    'GO': ['Goiânia'], 'DF': ['Brasília'], 'AM': ['Manaus'],
+}
+LOGRADOUROS = ['Rua das Flores', 'Av. Brasil', 'Rua XV de Novembro', 'Av. Paulista', 'Rua São João', 'Praça da Sé']
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Isabela', 'João', 'Larissa', 'Marcos']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Santos', 'Pereira', 'Lima', 'Costa', 'Almeida', 'Ferreira', 'Rocha']
+
+# Cartão: Master Card falha na simulação do PedidoService, o que gera pedidos CANCELADOS.
+BANDEIRAS = [('VISA', 45), ('Master Card', 25), ('ELO', 20), ('AMEX', 10)]
+METODOS_PAGAMENTO = [('cartao', 70), ('boleto', 30)]
+CUPONS = [(None, 80), ('PRIMEIRA10', 15), ('FRETEZERO', 5)]
+ESTADOS_APROVADOS = [('PAGO', 20), ('SEPARACAO', 15), ('ENVIADO', 25), ('ENTREGUE', 40)]
+
+PERCENTUAL_FISICOS = 0.6
+PERCENTUAL_INATIVOS = 0.05
+JANELA_PEDIDOS_DIAS = 730
+
+
+def _escolher(rng: random.Random, opcoes):
+    valores, pesos = zip(*opcoes)
+    return rng.choices(valores, weights=pesos, k=1)[0]
+
+
+def gerar_produtos(rng: random.Random, quantidade: int) -> List[Produto]:
+    """Gera produtos mistos (Produto/ProdutoFisico) com preços log-normais."""
+    produtos = []
+    for i in range(quantidade):
+        sku = f"SKU{i + 1:07d}"
+        categoria = _escolher(rng, CATEGORIAS)
+        nome = f"{categoria} Item {i + 1}"
+        preco = round(min(5000.0, max(1.0, rng.lognormvariate(4.0, 1.0))), 2)
+        estoque = rng.randint(0, 500)
+        ativo = rng.random() >= PERCENTUAL_INATIVOS
+
+        if rng.random() < PERCENTUAL_FISICOS:
+            peso = round(rng.uniform(0.05, 25.0), 2)
+            produtos.append(ProdutoFisico(sku, nome, categoria, preco, estoque, peso, ativo))
+        else:
+            produtos.append(Produto(sku, nome, categoria, preco, estoque, ativo))
+    return produtos
+
+
+def gerar_clientes(rng: random.Random, quantidade: int, agora: datetime) -> List[Cliente]:
+    """Gera clientes com 0 a 3 endereços (a maioria com pelo menos um)."""
+    clientes = []
+    for i in range(quantidade):
+        cpf = f"{i + 1:011d}"
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+        email = f"cliente{i + 1}@exemplo.com"
+        data_cadastro = agora - timedelta(days=rng.randint(0, 3 * 365), seconds=rng.randint(0, 86399))
+
+        enderecos = []
+        for _ in range(_escolher(rng, [(0, 5), (1, 65), (2, 22), (3, 8)])):
+            uf = _escolher(rng, UFS)
+            enderecos.append(Endereco(
+                cep=f"{rng.randint(1000000, 99999999):08d}",
+                logradouro=rng.choice(LOGRADOUROS),
+                numero=str(rng.randint(1, 9999)),
+                cidade=rng.choice(CIDADES_POR_UF[uf]),
+                uf=uf,
+                complemento=rng.choice([None, None, None, 'Apto 12', 'Casa 2', 'Bloco B'])
+            ))
+        clientes.append(Cliente(cpf, nome, email, data_cadastro, enderecos))
+    return clientes
+
+
+def gerar_pedidos(
+    rng: random.Random,
+    quantidade: int,
+    clientes: List[Cliente],
+    produtos: List[Produto],
+    agora: datetime
+) -> List[Pedido]:
+    """
+    Gera pedidos com 1 a 5 itens, popularidade de produtos em cauda longa (Zipf),
+    cupons, pagamentos por cartão/boleto e estados coerentes com o pagamento.
+    As datas são crescentes e únicas por segundo, garantindo códigos distintos.
+    """
+    ativos = [p for p in produtos if p.is_ativo]
+    compradores = [c for c in clientes if c.enderecos]
+    if quantidade and (not ativos or not compradores):
+        raise ValueError("É preciso ao menos um produto ativo e um cliente com endereço para gerar pedidos.")
+
+    pesos_popularidade = [1.0 / (posicao + 1) for posicao in range(len(ativos))]
+    inicio = agora - timedelta(days=JANELA_PEDIDOS_DIAS)
+    passo_s = max(1, int(JANELA_PEDIDOS_DIAS * 86400 / max(quantidade, 1)))
+
+    pedidos = []
+    for i in range(quantidade):
+        cliente = rng.choice(compradores)
+        carrinho = Carrinho(cliente=cliente)
+        for _ in range(_escolher(rng, [(1, 45), (2, 25), (3, 15), (4, 10), (5, 5)])):
+            produto = rng.choices(ativos, weights=pesos_popularidade, k=1)[0]
+            carrinho.adicionar_item(produto, _escolher(rng, [(1, 70), (2, 20), (3, 10)]))
+
+        frete = carrinho_service.calcular_frete(carrinho, cliente.enderecos[0].cep)
+        codigo_cupom = _escolher(rng, CUPONS)
+        cupom = carrinho_service.buscar_cupom(codigo_cupom) if codigo_cupom else None
+
+        data_criacao = inicio + timedelta(seconds=i * passo_s + rng.randint(0, passo_s - 1))
+        codigo = f"P-{data_criacao.strftime('%Y%m%d%H%M%S')}-{i % 10000:04d}"
+        pedido = Pedido(cliente, carrinho, frete, cupom, codigo_pedido=codigo)
+        pedido._data_criacao = data_criacao
+
+        if _escolher(rng, METODOS_PAGAMENTO) == 'cartao':
+            bandeira = _escolher(rng, BANDEIRAS)
+            aprovado = bandeira != 'Master Card'
+            pedido.pagamento = PagamentoCartao(
+                pedido.total, "APROVADO" if aprovado else "FALHOU", bandeira,
+                data_pagamento=data_criacao if aprovado else None
+            )
+            pedido._estado = _escolher(rng, ESTADOS_APROVADOS) if aprovado else "CANCELADO"
+        else:
+            pedido.pagamento = PagamentoBoleto(
+                pedido.total, "PENDENTE", f"34191.09003 {i:011d}",
+                data_vencimento=data_criacao + timedelta(days=3)
+            )
+            # Mesmo estado que o PedidoService grava para boletos
+            pedido._estado = "PENDENTE"
+
+        pedidos.append(pedido)
+    return pedidos
+
+
+def gerar_loja(clientes: int, produtos: int, pedidos: int, semente: int = 42) -> Dict[str, Any]:
+    """
+    Gera, de forma determinística para a mesma semente, o conteúdo completo de um
+    loja.json com N clientes, M produtos e K pedidos.
+    """
+    rng = random.Random(semente)
+    # Data de referência fixa: a mesma semente produz exatamente o mesmo arquivo
+    agora = datetime(2025, 12, 31, 12, 0, 0)
+
+    lista_produtos = gerar_produtos(rng, produtos)
+    lista_clientes = gerar_clientes(rng, clientes, agora)
+    lista_pedidos = gerar_pedidos(rng, pedidos, lista_clientes, lista_produtos, agora)
+
+    return {
+        'clientes': [c.to_dict() for c in lista_clientes],
+        'produtos': [p.to_dict() for p in lista_produtos],
+        'pedidos': [p.to_dict() for p in lista_pedidos],
+        'cupons': [],
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Gera uma loja sintética determinística (loja.json).")
+    parser.add_argument('--clientes', type=int, default=1000)
+    parser.add_argument('--produtos', type=int, default=2000)
+    parser.add_argument('--pedidos', type=int, default=5000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--pasta', required=True, help="Pasta de destino (o loja.json é criado/substituído nela)")
+    args = parser.parse_args(argumentos)
+
+    dados_loja.definir_pasta_dados(args.pasta)
+    dados_loja.salvar_dados_loja(gerar_loja(args.clientes, args.produtos, args.pedidos, args.semente))
+    print(f"✅ Loja gerada em {dados_loja._get_file_path()}")
+
+
+if __name__ == '__main__':
+    main()
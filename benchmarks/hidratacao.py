@@ -0,0 +1,141 @@
+import argparse
+import copy
+import hashlib
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+import repositories.dados as dados_loja
+import repositories.produto_repository as produto_repository
+import repositories.cliente_repository as cliente_repository
+import repositories.pedido_repository as pedido_repository
+from repositories import hidratacao
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, tamanho_arquivo_loja
+
+# Hidratação pelos construtores (com validação) x pelos codecs do caminho confiável
+# (repositories/hidratacao.py), sobre a mesma loja em cache:
+#   - produtos e clientes: carregar_todos() de cada repositório;
+#   - pedidos: buscar_por_codigos() dos primeiros N pedidos (cada um ainda busca o
+#     cliente e os produtos pelos repositórios, nos dois caminhos);
+#   - conferência: custo de conferir_loja(), pago uma vez para liberar o caminho confiável.
+# Confere que os dois caminhos montam os mesmos objetos (pelo to_dict) e que a
+# conferência recusa uma loja com um registro fora do padrão (CEP inválido).
+
+CLIENTES_PADRAO = 5000
+PRODUTOS_PADRAO = 5000
+PEDIDOS_PADRAO = 50000
+# Cada pedido relê cliente e produtos por busca linear: só os primeiros N entram
+PEDIDOS_HIDRATADOS_PADRAO = 1000
+REPETICOES_PADRAO = 3
+
+
+def _resumo(objetos: List[Any]) -> str:
+    resumo = hashlib.sha256()
+    for o in objetos:
+        resumo.update(json.dumps(o.to_dict(), sort_keys=True, default=str).encode())
+    return resumo.hexdigest()
+
+
+def _melhor_tempo(operacao: Callable[[], List[Any]], repeticoes: int):
+    """Menor duração entre as repetições e o resultado da última."""
+    melhor, resultado = float('inf'), []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = operacao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def _medir_caminho(codigos: List[str], repeticoes: int) -> Dict[str, Any]:
+    operacoes = {
+        'produtos': produto_repository.carregar_todos,
+        'clientes': cliente_repository.carregar_todos,
+        'pedidos': lambda: list(pedido_repository.buscar_por_codigos(codigos).values()),
+    }
+    tempos, resumos = {}, {}
+    for nome, operacao in operacoes.items():
+        tempos[nome], objetos = _melhor_tempo(operacao, repeticoes)
+        resumos[nome] = _resumo(objetos)
+    return {'tempos_s': tempos, 'resumos': resumos}
+
+
+def _recusa_registro_fora_do_padrao() -> bool:
+    """Um CEP inválido gravado na loja conferida: a conferência acusa e tira a marca."""
+    clientes = copy.deepcopy(dados_loja.carregar_dados_loja(('clientes',))['clientes'])
+    clientes[0]['enderecos'][0]['cep'] = 'CEP-INVALIDO'
+    dados_loja.salvar_dados_loja({'clientes': clientes})
+    resultado = hidratacao.conferir_loja()
+    return (resultado['total_erros'] == 1 and resultado['versao'] is None
+            and not dados_loja.esquema_confiavel(dados_loja.carregar_dados_loja()))
+
+
+def executar(
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    pedidos_hidratados: int = PEDIDOS_HIDRATADOS_PADRAO,
+    repeticoes: int = REPETICOES_PADRAO,
+    saida=None
+) -> Dict[str, Any]:
+    with pasta_dados_temporaria('loja-hidratacao-'):
+        # A loja gerada não traz a marca do esquema: começa pelo caminho com validação
+        dados_loja.salvar_dados_loja(gerar_loja(clientes, produtos, pedidos))
+        tamanho = tamanho_arquivo_loja()
+        codigos = [p['codigo_pedido'] for p in pedido_repository.carregar_todos_pedidos_raw()[:pedidos_hidratados]]
+
+        validado = _medir_caminho(codigos, repeticoes)
+        inicio = time.perf_counter()
+        conferencia = hidratacao.conferir_loja()
+        conferencia_s = time.perf_counter() - inicio
+        confiavel = _medir_caminho(codigos, repeticoes)
+        recusa = _recusa_registro_fora_do_padrao()
+
+    caminhos = {'validado': validado, 'confiavel': confiavel}
+    verificacoes = {
+        'conferencia_sem_erros': conferencia['total_erros'] == 0 and conferencia['versao'] == dados_loja.VERSAO_ESQUEMA,
+        'objetos_iguais': validado['resumos'] == confiavel['resumos'],
+        'recusa_registro_fora_do_padrao': recusa,
+    }
+    if saida:
+        print(f"# {clientes} clientes / {produtos} produtos / {pedidos} pedidos ({tamanho / 1e6:.1f} MB), "
+              f"{len(codigos)} pedidos hidratados, melhor de {repeticoes}", file=saida)
+        print(f"{'CAMINHO':<10} {'PRODUTOS (ms)':>14} {'CLIENTES (ms)':>14} {'PEDIDOS (ms)':>13}", file=saida)
+        for nome, c in caminhos.items():
+            t = c['tempos_s']
+            print(f"{nome:<10} {t['produtos'] * 1000:>14.1f} {t['clientes'] * 1000:>14.1f} {t['pedidos'] * 1000:>13.1f}", file=saida)
+        print(f"  conferência: {sum(conferencia['registros'].values())} registros em {conferencia_s:.2f}s", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+
+    for c in caminhos.values():
+        c.pop('resumos')
+    return {
+        'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos, 'pedidos_hidratados': len(codigos),
+        'bytes': tamanho,
+        'caminhos': caminhos,
+        'conferencia_s': conferencia_s,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Hidratação pelos construtores x pelo caminho confiável (codecs) depois da conferência da loja.")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS_PADRAO)
+    parser.add_argument('--pedidos-hidratados', type=int, default=PEDIDOS_HIDRATADOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES_PADRAO)
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.clientes, args.produtos, args.pedidos, args.pedidos_hidratados, args.repeticoes, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
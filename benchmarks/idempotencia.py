@@ -0,0 +1,202 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from models.vendas import Carrinho
+import repositories.dados as dados_loja
+import repositories.cliente_repository as cliente_repository
+import repositories.pedido_repository as pedido_repository
+import repositories.produto_repository as produto_repository
+from repositories import idempotencia_repository
+import services.carrinho_service as carrinho_service
+import services.idempotencia_service as idempotencia_service
+from services.idempotencia_service import IdempotenciaService
+from services.pedido_service import PedidoService
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, resumir
+
+# Checkout idempotente (services/idempotencia_service.py):
+#   - duplicatas simultâneas: cada chave é enviada por várias threads ao mesmo tempo; só
+#     uma executa o checkout, as outras esperam por ela e recebem o mesmo Pedido;
+#   - repetições: cada chave é repetida depois de concluída; mede a latência da primeira
+#     execução x da repetição (que não toca no estoque nem nos arquivos);
+#   - reinício: um serviço novo (memória vazia) recupera as chaves do disco;
+#   - queda: a chave é gravada e o checkout cai antes de gravar o pedido; a repetição
+#     refaz o checkout com o mesmo código de pedido.
+# Confere que há um pedido por chave, que a baixa de estoque é a soma dos itens uma vez
+# por chave e que nenhuma repetição gravou nada.
+
+CHAVES_PADRAO = 200
+DUPLICATAS_PADRAO = 4
+REPETICOES_PADRAO = 5
+ESTOQUE = 10 ** 6
+
+
+def _estoques() -> Dict[str, int]:
+    return {p['sku']: p.get('estoque', 0) for p in produto_repository.carregar_todos_produtos_raw()}
+
+
+def _carrinho(rng: random.Random, clientes, skus) -> Carrinho:
+    carrinho = Carrinho()
+    carrinho.cliente = rng.choice(clientes)
+    for sku in rng.sample(skus, rng.randint(1, 3)):
+        carrinho_service.adicionar_item_ao_carrinho(carrinho, sku, rng.randint(1, 2))
+    return carrinho
+
+
+def _checkout(carrinho: Carrinho, chave: str):
+    frete = carrinho_service.calcular_frete(carrinho, carrinho.cliente.enderecos[0].cep)
+    return PedidoService.finalizar_compra(carrinho, frete, 'cartao', {'bandeira': 'VISA'}, chave_idempotencia=chave)
+
+
+def executar(
+    chaves: int = CHAVES_PADRAO,
+    duplicatas: int = DUPLICATAS_PADRAO,
+    repeticoes: int = REPETICOES_PADRAO,
+    semente: int = 42,
+    saida=None
+) -> Dict[str, Any]:
+    rng = random.Random(semente)
+    servico_original = idempotencia_service.idempotencia
+    with pasta_dados_temporaria('loja-idempotencia-'):
+        loja = gerar_loja(200, 200, 0, semente)
+        for produto in loja['produtos']:
+            produto['estoque'] = ESTOQUE
+        dados_loja.salvar_dados_loja(loja)
+        clientes = [c for c in cliente_repository.carregar_todos() if c.enderecos]
+        skus = [p['sku'] for p in produto_repository.carregar_todos_produtos_raw()
+                if p.get('tipo') == 'ProdutoFisico' and p.get('is_ativo', True)]
+        servico = IdempotenciaService(capacidade=chaves * 2)
+        idempotencia_service.idempotencia = servico
+        try:
+            antes = _estoques()
+
+            # --- Duplicatas simultâneas (cada thread com o seu carrinho, mesma chave) ---
+            por_chave: Dict[str, List[Any]] = {}
+            primeiras: List[float] = []
+            trava = threading.Lock()
+            carrinhos = {f"k{i:06d}": [_carrinho(rng, clientes, skus) for _ in range(duplicatas)] for i in range(chaves)}
+
+            def enviar(chave: str, carrinho: Carrinho):
+                inicio = time.perf_counter()
+                pedido = _checkout(carrinho, chave)
+                duracao = time.perf_counter() - inicio
+                with trava:
+                    por_chave.setdefault(chave, []).append(pedido)
+                    primeiras.append(duracao)
+
+            for chave, lista in carrinhos.items():
+                threads = [threading.Thread(target=enviar, args=(chave, c)) for c in lista]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+            # Carrinhos que não executaram o checkout (coalescidos) soltam as suas reservas
+            for lista in carrinhos.values():
+                for carrinho in lista:
+                    carrinho_service.descartar_carrinho(carrinho)
+            pedidos_gravados = len(dados_loja.carregar_dados_loja()['pedidos'])
+
+            # --- Repetições depois de concluído ---
+            vazio = Carrinho()
+            repetidas: List[float] = []
+            mesmo_pedido = all(len({id(p) for p in lista}) == 1 for lista in por_chave.values())
+            for _ in range(repeticoes):
+                for chave, lista in por_chave.items():
+                    inicio = time.perf_counter()
+                    pedido = PedidoService.finalizar_compra(vazio, None, 'cartao', {}, chave_idempotencia=chave)
+                    repetidas.append(time.perf_counter() - inicio)
+                    mesmo_pedido = mesmo_pedido and pedido is lista[0]
+            sem_gravacao = len(dados_loja.carregar_dados_loja()['pedidos']) == pedidos_gravados
+            depois = _estoques()
+            estatisticas = servico.estatisticas()
+
+            # --- Reinício: serviço novo, memória vazia ---
+            reiniciado = IdempotenciaService(capacidade=chaves * 2)
+            idempotencia_service.idempotencia = reiniciado
+            inicio = time.perf_counter()
+            recuperados = {chave: PedidoService.finalizar_compra(vazio, None, 'cartao', {}, chave_idempotencia=chave)
+                           for chave in por_chave}
+            recuperacao_ms = (time.perf_counter() - inicio) * 1000 / max(1, len(recuperados))
+            recuperados_iguais = all(recuperados[c].codigo_pedido == lista[0].codigo_pedido for c, lista in por_chave.items())
+
+            # --- Queda entre a gravação da chave e a do pedido ---
+            carrinho = _carrinho(rng, clientes, skus)
+            frete = carrinho_service.calcular_frete(carrinho, carrinho.cliente.enderecos[0].cep)
+            codigo_interrompido = []
+
+            def cair(codigo, registrar):
+                pedido = PedidoService._preparar_checkout(carrinho, frete, 'cartao', None, codigo)
+                registrar(pedido.codigo_pedido)
+                codigo_interrompido.append(pedido.codigo_pedido)
+                raise RuntimeError("queda simulada")
+
+            try:
+                reiniciado.executar('queda', cair)
+            except RuntimeError:
+                pass
+            refeito = _checkout(carrinho, 'queda')
+            queda_ok = (refeito.codigo_pedido == codigo_interrompido[0]
+                        and refeito.codigo_pedido in pedido_repository.buscar_por_codigos([refeito.codigo_pedido]))
+        finally:
+            idempotencia_service.idempotencia = servico_original
+            idempotencia_repository.fechar()
+
+    vendido: Dict[str, int] = {}
+    for lista in por_chave.values():
+        pedido = lista[0]
+        if pedido.estado == 'PAGO':
+            for item in pedido.carrinho.itens:
+                vendido[item.produto.sku] = vendido.get(item.produto.sku, 0) + item.quantidade
+    baixado = {sku: antes[sku] - depois.get(sku, 0) for sku in antes if antes[sku] != depois.get(sku, 0)}
+
+    verificacoes = {
+        'um_pedido_por_chave': pedidos_gravados == chaves and all(len(l) == duplicatas for l in por_chave.values()),
+        'mesmo_pedido_nas_repeticoes': mesmo_pedido,
+        'baixa_uma_vez_por_chave': baixado == vendido,
+        'repeticoes_sem_gravacao': sem_gravacao,
+        'recuperado_apos_reinicio': recuperados_iguais,
+        'queda_refeita_com_mesmo_codigo': queda_ok,
+    }
+    primeira = resumir(primeiras)
+    repetida = resumir(repetidas)
+    if saida:
+        print(f"# {chaves} chaves, {duplicatas} envios simultâneos por chave, {repeticoes} repetições depois de concluídas", file=saida)
+        print(f"{'ENVIO':<22} {'QTD':>6} {'P50 ms':>9} {'P95 ms':>9}", file=saida)
+        print(f"{'simultâneo (1ª vez)':<22} {primeira['repeticoes']:>6} {primeira['p50_ms']:>9.3f} {primeira['p95_ms']:>9.3f}", file=saida)
+        print(f"{'repetição':<22} {repetida['repeticoes']:>6} {repetida['p50_ms']:>9.4f} {repetida['p95_ms']:>9.4f}", file=saida)
+        print(f"reinício: {recuperacao_ms:.2f} ms/chave recuperada do disco; "
+              f"executados {estatisticas['executados']}, coalescidos {estatisticas['coalescidos']}, repetidos {estatisticas['repetidos']}", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+
+    return {
+        'chaves': chaves, 'duplicatas': duplicatas, 'repeticoes': repeticoes,
+        'latencia': {'primeira': primeira, 'repeticao': repetida},
+        'recuperacao_ms_por_chave': recuperacao_ms,
+        'estatisticas': estatisticas,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Checkout idempotente: duplicatas simultâneas, repetições, reinício e queda no meio.")
+    parser.add_argument('--chaves', type=int, default=CHAVES_PADRAO)
+    parser.add_argument('--duplicatas', type=int, default=DUPLICATAS_PADRAO, help="Envios simultâneos por chave")
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES_PADRAO, help="Repetições de cada chave depois de concluída")
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.chaves, args.duplicatas, args.repeticoes, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import repositories.dados as dados_loja
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, resumir, tamanho_arquivo_loja
+
+# Mede o tempo de inicialização do app.py em um processo novo:
+#   - até o menu principal aparecer;
+#   - até a primeira linha da listagem de produtos (opção 1 do menu).
+# Cada cenário roda com e sem o início rápido (snapshot binário ao lado do loja.json).
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARCA_MENU = '0. Sair'
+MARCA_LISTAGEM = '[SKU'
+
+# Padrão: 500 mil registros. Os pedidos ficam de fora porque o gerador sorteia produtos
+# por popularidade (custo proporcional ao catálogo por item) e a listagem não os usa.
+CLIENTES_PADRAO = 150000
+PRODUTOS_PADRAO = 350000
+REPETICOES_PADRAO = 3
+
+
+def _medir_processo(pasta: str, rapido: bool, ate_listagem: bool) -> Dict[str, float]:
+    """Inicia o app.py e devolve os instantes (s) em que o menu e a listagem apareceram."""
+    ambiente = dict(os.environ, LOJA_DATA_DIR=pasta, PYTHONUNBUFFERED='1')
+    comando = [sys.executable, os.path.join(RAIZ_PROJETO, 'app.py')]
+    if rapido:
+        comando.append('--rapido')
+
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        comando, cwd=RAIZ_PROJETO, env=ambiente, text=True, encoding='utf-8',
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    tempos = {}
+    try:
+        for linha in processo.stdout:
+            if 'menu_s' not in tempos and linha.startswith(MARCA_MENU):
+                tempos['menu_s'] = time.perf_counter() - inicio
+                if not ate_listagem:
+                    break
+                processo.stdin.write('1\n')
+                processo.stdin.flush()
+            elif 'menu_s' in tempos and linha.startswith(MARCA_LISTAGEM):
+                tempos['listagem_s'] = time.perf_counter() - inicio
+                break
+    finally:
+        processo.kill()
+        processo.wait()
+    return tempos
+
+
+def executar(
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    repeticoes: int = REPETICOES_PADRAO,
+    saida=None
+) -> Dict[str, Any]:
+    resultados: List[Dict[str, Any]] = []
+
+    with pasta_dados_temporaria('loja-inicio-') as pasta:
+        dados_loja.salvar_dados_loja(gerar_loja(clientes, produtos, 0))
+        tamanho = tamanho_arquivo_loja()
+        if saida:
+            print(f"# {clientes} clientes / {produtos} produtos ({tamanho / 1e6:.1f} MB)", file=saida)
+
+        caminho_snapshot = dados_loja._get_file_path(dados_loja.SNAPSHOT_FILE)
+        cenarios = [
+            ('json', False, False),
+            # Primeira execução rápida: decodifica o JSON e grava o snapshot
+            ('rapido_sem_snapshot', True, True),
+            ('rapido_com_snapshot', True, False),
+        ]
+        for nome, rapido, apagar_snapshot in cenarios:
+            menus, listagens = [], []
+            for _ in range(repeticoes):
+                if apagar_snapshot and os.path.exists(caminho_snapshot):
+                    os.remove(caminho_snapshot)
+                tempos = _medir_processo(pasta, rapido, ate_listagem=True)
+                menus.append(tempos['menu_s'])
+                listagens.append(tempos['listagem_s'])
+            resultado = {'cenario': nome, 'menu': resumir(menus), 'primeira_listagem': resumir(listagens)}
+            resultados.append(resultado)
+            if saida:
+                print(f"  {nome:<22} menu p50={resultado['menu']['p50_ms']:9.1f} ms  "
+                      f"primeira listagem p50={resultado['primeira_listagem']['p50_ms']:9.1f} ms", file=saida)
+
+        tamanho_snapshot = os.path.getsize(caminho_snapshot) if os.path.exists(caminho_snapshot) else 0
+
+    return {
+        'meta': {
+            'clientes': clientes, 'produtos': produtos, 'repeticoes': repeticoes,
+            'tamanho_json_bytes': tamanho, 'tamanho_snapshot_bytes': tamanho_snapshot,
+            'python': sys.version.split()[0],
+        },
+        'resultados': resultados,
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Tempo de inicialização do app.py (menu e primeira listagem).")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES_PADRAO)
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.clientes, args.produtos, args.repeticoes, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+        print(f"\n✅ Resultados gravados em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
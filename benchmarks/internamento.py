@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+import repositories.dados as dados_loja
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, tamanho_arquivo_loja
+
+# Memória da loja com e sem o internamento (repositories/internamento.py), cada medida
+# num processo novo com LOJA_INTERNAMENTO=0/1:
+#   - loja: bytes alocados (tracemalloc) pela loja em cache depois de carregar o loja.json;
+#   - objetos: bytes alocados para hidratar todos os produtos e clientes e os primeiros
+#     N pedidos (mantidos em listas, como numa tela que exibe tudo);
+#   - rss: memória residente do processo ao final.
+# Os tempos de carga e hidratação vêm de uma segunda execução, sem tracemalloc.
+# Confere que os objetos hidratados são iguais (pelo to_dict) com e sem internamento.
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLIENTES_PADRAO = 5000
+PRODUTOS_PADRAO = 5000
+PEDIDOS_PADRAO = 50000
+# Hidratar um pedido relê cliente e produtos (alguns ms cada): só os primeiros N entram
+PEDIDOS_HIDRATADOS_PADRAO = 5000
+
+# Executado no processo filho: imprime uma linha JSON com o resultado
+_SCRIPT_FILHO = """
+import gc, hashlib, json, sys, time, tracemalloc
+import repositories.dados as dados_loja
+import repositories.produto_repository as produto_repository
+import repositories.cliente_repository as cliente_repository
+import repositories.pedido_repository as pedido_repository
+from repositories import internamento
+medir_memoria, pedidos_hidratados = sys.argv[1] == 'memoria', int(sys.argv[2])
+if medir_memoria:
+    tracemalloc.start()
+inicio = time.perf_counter()
+dados_loja.carregar_dados_loja()
+carga_s = time.perf_counter() - inicio
+gc.collect()
+loja_bytes = tracemalloc.get_traced_memory()[0] if medir_memoria else 0
+inicio = time.perf_counter()
+objetos = produto_repository.carregar_todos() + cliente_repository.carregar_todos()
+objetos += [pedido_repository._deserializar_pedido(p)
+            for p in pedido_repository.carregar_todos_pedidos_raw()[:pedidos_hidratados]]
+hidratacao_s = time.perf_counter() - inicio
+gc.collect()
+objetos_bytes = tracemalloc.get_traced_memory()[0] - loja_bytes if medir_memoria else 0
+with open('/proc/self/status') as f:
+    rss_kb = next(int(l.split()[1]) for l in f if l.startswith('VmRSS:'))
+resumo = hashlib.sha256()
+for o in objetos:
+    resumo.update(json.dumps(o.to_dict(), sort_keys=True, default=str).encode())
+print(json.dumps({
+    'carga_s': carga_s, 'hidratacao_s': hidratacao_s, 'loja_mb': loja_bytes / 1e6,
+    'objetos_mb': objetos_bytes / 1e6, 'rss_mb': rss_kb / 1024, 'objetos': len(objetos),
+    'resumo': resumo.hexdigest(), 'pools': internamento.estatisticas(),
+}))
+"""
+
+MODOS = {'sem': '0', 'com': '1'}
+
+
+def _rodar(pasta: str, modo: str, medida: str, pedidos_hidratados: int) -> Dict[str, Any]:
+    ambiente = dict(os.environ, LOJA_DATA_DIR=pasta, LOJA_INTERNAMENTO=MODOS[modo])
+    saida = subprocess.run(
+        [sys.executable, '-c', _SCRIPT_FILHO, medida, str(pedidos_hidratados)], cwd=RAIZ_PROJETO, env=ambiente,
+        capture_output=True, text=True, encoding='utf-8', check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def executar(
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    pedidos_hidratados: int = PEDIDOS_HIDRATADOS_PADRAO,
+    saida=None
+) -> Dict[str, Any]:
+    resultados: Dict[str, Dict[str, Any]] = {}
+    with pasta_dados_temporaria('loja-internamento-') as pasta:
+        dados_loja.salvar_dados_loja(gerar_loja(clientes, produtos, pedidos))
+        tamanho = tamanho_arquivo_loja()
+        for modo in MODOS:
+            memoria = _rodar(pasta, modo, 'memoria', pedidos_hidratados)
+            tempo = _rodar(pasta, modo, 'tempo', pedidos_hidratados)
+            resultados[modo] = {
+                'loja_mb': memoria['loja_mb'], 'objetos_mb': memoria['objetos_mb'], 'rss_mb': tempo['rss_mb'],
+                'carga_s': tempo['carga_s'], 'hidratacao_s': tempo['hidratacao_s'], 'objetos': tempo['objetos'],
+                'pools': tempo['pools'], 'resumo': tempo['resumo'],
+            }
+
+    verificacoes = {'objetos_iguais': resultados['sem']['resumo'] == resultados['com']['resumo']}
+    if saida:
+        print(f"# {clientes} clientes / {produtos} produtos / {pedidos} pedidos ({tamanho / 1e6:.1f} MB), "
+              f"{resultados['com']['objetos']} objetos hidratados", file=saida)
+        print(f"{'INTERNAMENTO':<13} {'LOJA (MB)':>10} {'OBJETOS (MB)':>13} {'RSS (MB)':>9} {'CARGA (s)':>10} {'HIDRAT. (s)':>12}", file=saida)
+        for modo, r in resultados.items():
+            print(f"{modo:<13} {r['loja_mb']:>10.1f} {r['objetos_mb']:>13.1f} {r['rss_mb']:>9.1f} "
+                  f"{r['carga_s']:>10.2f} {r['hidratacao_s']:>12.2f}", file=saida)
+        for classe, p in resultados['com']['pools'].items():
+            print(f"  pool {classe:<9} {p['vivos']:>7} vivos  {p['reaproveitados']:>8} reaproveitados  {p['criados']:>7} criados", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+
+    for r in resultados.values():
+        r.pop('resumo')
+    return {
+        'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos, 'pedidos_hidratados': pedidos_hidratados,
+        'bytes': tamanho,
+        'modos': resultados,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Memória da loja e dos objetos hidratados com e sem internamento de textos e objetos de valor.")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS_PADRAO)
+    parser.add_argument('--pedidos-hidratados', type=int, default=PEDIDOS_HIDRATADOS_PADRAO)
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.clientes, args.produtos, args.pedidos, args.pedidos_hidratados, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+import repositories.dados as dados_loja
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, tamanho_arquivo_loja
+
+# Relatório de faturamento (RelatorioService.relatorio_ocupacao_por_periodo) sobre um
+# histórico grande, cada cenário num processo novo para medir o pico de memória (VmHWM):
+#   - carga_completa: a loja inteira é decodificada antes (como fazem as telas de cadastro);
+#   - incremental: o relatório lê os pedidos direto do arquivo (repositories/leitura_incremental.py);
+#   - primeiros_10: percorre só os 10 primeiros pedidos e para.
+# Roda com loja.json e com loja.bin e confere que os relatórios são iguais.
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLIENTES_PADRAO = 5000
+PRODUTOS_PADRAO = 5000
+PEDIDOS_PADRAO = 50000
+
+# Executado no processo filho: imprime uma linha JSON com o resultado
+_SCRIPT_FILHO = """
+import json, resource, sys, time
+import repositories.dados as dados_loja
+import repositories.pedido_repository as pedido_repository
+from services.relatorio_service import RelatorioService
+cenario = sys.argv[1]
+inicio = time.perf_counter()
+if cenario == 'primeiros_10':
+    resultado = []
+    for pedido in pedido_repository.iterar_pedidos_ativos_raw():
+        resultado.append(pedido['codigo_pedido'])
+        if len(resultado) == 10:
+            break
+else:
+    if cenario == 'carga_completa':
+        dados_loja.carregar_dados_loja()
+    resultado = RelatorioService.relatorio_ocupacao_por_periodo('mes')
+duracao = time.perf_counter() - inicio
+# VmHWM é o pico deste processo; ru_maxrss herda o do pai (fork) através do exec
+try:
+    with open('/proc/self/status') as f:
+        pico_kb = next(int(l.split()[1]) for l in f if l.startswith('VmHWM:'))
+except (OSError, StopIteration):
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'duracao_s': duracao, 'pico_mb': pico_kb / 1024, 'resultado': resultado}))
+"""
+
+CENARIOS = ['carga_completa', 'incremental', 'primeiros_10']
+
+
+def _rodar_cenario(pasta: str, cenario: str) -> Dict[str, Any]:
+    ambiente = dict(os.environ, LOJA_DATA_DIR=pasta)
+    saida = subprocess.run(
+        [sys.executable, '-c', _SCRIPT_FILHO, cenario], cwd=RAIZ_PROJETO, env=ambiente,
+        capture_output=True, text=True, encoding='utf-8', check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def executar(
+    clientes: int = CLIENTES_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    pedidos: int = PEDIDOS_PADRAO,
+    saida=None
+) -> Dict[str, Any]:
+    resultados: Dict[str, Dict[str, Any]] = {}
+    with pasta_dados_temporaria('loja-incremental-') as pasta:
+        dados_loja.salvar_dados_loja(gerar_loja(clientes, produtos, pedidos))
+        if saida:
+            print(f"# {clientes} clientes / {produtos} produtos / {pedidos} pedidos", file=saida)
+            print(f"{'FORMATO':<8} {'CENÁRIO':<15} {'TEMPO (ms)':>11} {'PICO RSS (MB)':>14}", file=saida)
+        for formato in ('json', 'binario'):
+            if formato != dados_loja.formato_atual():
+                dados_loja.converter_formato(formato)
+            tamanho = tamanho_arquivo_loja()
+            resultados[formato] = {'bytes': tamanho}
+            for cenario in CENARIOS:
+                r = _rodar_cenario(pasta, cenario)
+                resultados[formato][cenario] = r
+                if saida:
+                    print(f"{formato:<8} {cenario:<15} {r['duracao_s'] * 1000:>11.1f} {r['pico_mb']:>14.1f}", file=saida)
+
+    verificacoes = {
+        f'{formato}_incremental_igual_a_carga_completa':
+            r['incremental']['resultado'] == r['carga_completa']['resultado']
+        for formato, r in resultados.items()
+    }
+    verificacoes['binario_igual_ao_json'] = resultados['binario']['incremental']['resultado'] == resultados['json']['incremental']['resultado']
+    if saida:
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+
+    for r in resultados.values():
+        for cenario in CENARIOS:
+            r[cenario].pop('resultado')
+    return {
+        'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos,
+        'formatos': resultados,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Pico de memória e tempo do relatório de faturamento: carga completa x leitura incremental.")
+    parser.add_argument('--clientes', type=int, default=CLIENTES_PADRAO)
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS_PADRAO)
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.clientes, args.produtos, args.pedidos, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
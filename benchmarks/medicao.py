@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import repositories.dados as dados_loja
+
+
+def percentil(ordenados: List[float], fracao: float) -> float:
+    """Percentil por posição mais próxima sobre uma lista já ordenada."""
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, int(round(fracao * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def resumir(amostras_s: List[float]) -> Dict[str, Any]:
+    """Resume uma lista de durações (em segundos) em estatísticas em milissegundos."""
+    ordenadas = sorted(s * 1000 for s in amostras_s)
+    return {
+        'repeticoes': len(ordenadas),
+        'total_s': sum(amostras_s),
+        'media_ms': sum(ordenadas) / len(ordenadas) if ordenadas else 0.0,
+        'min_ms': ordenadas[0] if ordenadas else 0.0,
+        'p50_ms': percentil(ordenadas, 0.50),
+        'p95_ms': percentil(ordenadas, 0.95),
+        'max_ms': ordenadas[-1] if ordenadas else 0.0,
+    }
+
+
+def medir(
+    operacao: Callable[[int], Any],
+    repeticoes: int,
+    orcamento_s: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Executa `operacao(i)` até `repeticoes` vezes e devolve as estatísticas de latência.
+    Com `orcamento_s`, interrompe quando o tempo acumulado passa do orçamento
+    (sempre executa pelo menos uma vez), evitando que operações lentas em escalas
+    grandes dominem a duração da suíte.
+    """
+    amostras = []
+    acumulado = 0.0
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        operacao(i)
+        duracao = time.perf_counter() - inicio
+        amostras.append(duracao)
+        acumulado += duracao
+        if orcamento_s is not None and acumulado >= orcamento_s:
+            break
+    return resumir(amostras)
+
+
+@contextmanager
+def pasta_dados_temporaria(prefixo: str = 'loja-bench-'):
+    """Aponta a persistência para uma pasta temporária, descartada ao final."""
+    pasta = tempfile.mkdtemp(prefix=prefixo)
+    anterior = dados_loja._pasta_dados
+    dados_loja.definir_pasta_dados(pasta)
+    try:
+        yield pasta
+    finally:
+        dados_loja.definir_pasta_dados(anterior)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def tamanho_arquivo_loja() -> int:
+    return dados_loja.tamanho_loja()
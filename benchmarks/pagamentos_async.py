@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from models.vendas import Carrinho
+import repositories.dados as dados_loja
+import repositories.cliente_repository as cliente_repository
+import repositories.produto_repository as produto_repository
+import services.carrinho_service as carrinho_service
+from services.pagamento_service import APROVADO, GatewaySimulado, ProcessadorPagamentos
+from services.pedido_service import PedidoService
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, resumir
+
+# Checkouts com cartão pelo pipeline assíncrono de pagamentos (PedidoService.
+# finalizar_compra_async) contra o gateway simulado, com latência log-normal, recusas,
+# erros transitórios e respostas que nunca chegam. Para cada limite de concorrência, os
+# carrinhos são montados antes (com as reservas) e todos os checkouts são disparados
+# juntos; mede a vazão, a latência (p50/p95) de cada checkout e as repetições e tempos
+# esgotados do processador. Confere que:
+#   - todo pedido termina PAGO ou CANCELADO;
+#   - a baixa de estoque é exatamente a soma dos itens dos pedidos PAGO;
+#   - os pedidos PAGO são exatamente as cobranças aprovadas no gateway (nenhuma cobrança
+#     sem pedido, nenhum pedido sem cobrança; uma cobrança por chave).
+
+CHECKOUTS_PADRAO = 200
+CONCORRENCIAS_PADRAO = '1,16,64'
+LATENCIA_MEDIANA_S = 0.1
+LATENCIA_SIGMA = 0.5
+TAXA_ERRO = 0.05
+TAXA_SEM_RESPOSTA = 0.02
+RECUSA_PADRAO = 0.05
+TIMEOUT_S = 1.0
+TENTATIVAS = 3
+ESTOQUE = 10 ** 6
+
+
+def _montar_carrinhos(quantidade: int, rng: random.Random) -> List[Carrinho]:
+    clientes = [c for c in cliente_repository.carregar_todos() if c.enderecos]
+    skus = [p['sku'] for p in produto_repository.carregar_todos_produtos_raw()
+            if p.get('tipo') == 'ProdutoFisico' and p.get('is_ativo', True)]
+    carrinhos = []
+    for _ in range(quantidade):
+        carrinho = Carrinho()
+        carrinho.cliente = rng.choice(clientes)
+        for sku in rng.sample(skus, rng.randint(1, 3)):
+            carrinho_service.adicionar_item_ao_carrinho(carrinho, sku, rng.randint(1, 2))
+        carrinhos.append(carrinho)
+    return carrinhos
+
+
+def _estoques() -> Dict[str, int]:
+    return {p['sku']: p.get('estoque', 0) for p in produto_repository.carregar_todos_produtos_raw()}
+
+
+async def _disparar(carrinhos: List[Carrinho], processador: ProcessadorPagamentos, rng: random.Random):
+    async def checkout(carrinho: Carrinho):
+        inicio = time.perf_counter()
+        frete = carrinho_service.calcular_frete(carrinho, carrinho.cliente.enderecos[0].cep)
+        bandeira = rng.choice(('VISA', 'ELO', 'AMEX'))
+        pedido = await PedidoService.finalizar_compra_async(carrinho, frete, 'cartao', {'bandeira': bandeira}, processador=processador)
+        return pedido, time.perf_counter() - inicio
+    return await asyncio.gather(*(checkout(c) for c in carrinhos))
+
+
+def executar_concorrencia(concorrencia: int, checkouts: int = CHECKOUTS_PADRAO, semente: int = 42) -> Dict[str, Any]:
+    rng = random.Random(semente)
+    with pasta_dados_temporaria('loja-pagamentos-'):
+        loja = gerar_loja(200, 200, 0, semente)
+        for produto in loja['produtos']:
+            produto['estoque'] = ESTOQUE
+        dados_loja.salvar_dados_loja(loja)
+        carrinhos = _montar_carrinhos(checkouts, rng)
+        antes = _estoques()
+
+        gateway = GatewaySimulado(
+            latencia_mediana_s=LATENCIA_MEDIANA_S, latencia_sigma=LATENCIA_SIGMA,
+            taxa_erro=TAXA_ERRO, taxa_sem_resposta=TAXA_SEM_RESPOSTA,
+            recusa_por_bandeira={}, recusa_padrao=RECUSA_PADRAO, semente=semente
+        )
+        processador = ProcessadorPagamentos(gateway, concorrencia=concorrencia, timeout_s=TIMEOUT_S,
+                                            tentativas=TENTATIVAS, semente=semente)
+        inicio = time.perf_counter()
+        resultados = asyncio.run(_disparar(carrinhos, processador, rng))
+        duracao = time.perf_counter() - inicio
+        depois = _estoques()
+
+    pedidos = [pedido for pedido, _ in resultados]
+    estados: Dict[str, int] = {}
+    for pedido in pedidos:
+        estados[pedido.estado] = estados.get(pedido.estado, 0) + 1
+    vendido: Dict[str, int] = {}
+    for pedido in pedidos:
+        if pedido.estado == 'PAGO':
+            for item in pedido.carrinho.itens:
+                vendido[item.produto.sku] = vendido.get(item.produto.sku, 0) + item.quantidade
+    baixado = {sku: antes[sku] - depois.get(sku, 0) for sku in antes if antes[sku] != depois.get(sku, 0)}
+    aprovadas = {chave for chave, resultado in gateway.cobrancas().items() if resultado == APROVADO}
+    pagos = {pedido.codigo_pedido for pedido in pedidos if pedido.estado == 'PAGO'}
+    estatisticas_gateway = gateway.estatisticas()
+
+    verificacoes = {
+        'pedidos_finalizados': set(estados) <= {'PAGO', 'CANCELADO'} and len(pedidos) == checkouts,
+        'baixa_igual_ao_vendido': baixado == vendido,
+        'cobrancas_iguais_aos_pagos': aprovadas == pagos,
+    }
+    return {
+        'concorrencia': concorrencia,
+        'checkouts': checkouts,
+        'duracao_s': duracao,
+        'checkouts_por_s': checkouts / duracao,
+        'latencia': resumir([latencia for _, latencia in resultados]),
+        'estados': estados,
+        'processador': processador.estatisticas(),
+        'gateway': estatisticas_gateway,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+
+def executar(concorrencias: List[int], checkouts: int = CHECKOUTS_PADRAO, semente: int = 42, saida=None) -> Dict[str, Any]:
+    rodadas = []
+    if saida:
+        print(f"# {checkouts} checkouts com cartão; gateway: latência mediana {LATENCIA_MEDIANA_S * 1000:.0f} ms, "
+              f"erro {TAXA_ERRO:.0%}, sem resposta {TAXA_SEM_RESPOSTA:.0%}, recusa {RECUSA_PADRAO:.0%}; "
+              f"timeout {TIMEOUT_S}s, {TENTATIVAS} tentativas", file=saida)
+        print(f"{'CONC':>5} {'CHK/S':>8} {'P50 ms':>8} {'P95 ms':>8} {'PAGOS':>6} {'CANC':>5} {'REPET':>6} {'TEMPO':>6} {'ESGOT':>6}  VERIFICAÇÕES", file=saida)
+    for concorrencia in concorrencias:
+        r = executar_concorrencia(concorrencia, checkouts, semente)
+        rodadas.append(r)
+        if saida:
+            p = r['processador']
+            falhas = [nome for nome, ok in r['verificacoes'].items() if not ok]
+            print(f"{concorrencia:>5} {r['checkouts_por_s']:>8.1f} {r['latencia']['p50_ms']:>8.1f} {r['latencia']['p95_ms']:>8.1f} "
+                  f"{r['estados'].get('PAGO', 0):>6} {r['estados'].get('CANCELADO', 0):>5} {p['repeticoes']:>6} "
+                  f"{p['tempo_esgotado']:>6} {p['esgotadas']:>6}  {'OK' if not falhas else 'FALHA: ' + ', '.join(falhas)}", file=saida)
+    return {
+        'checkouts': checkouts,
+        'rodadas': rodadas,
+        'verificacoes': {f"concorrencia_{r['concorrencia']}": r['sucesso'] for r in rodadas},
+        'sucesso': all(r['sucesso'] for r in rodadas),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Checkouts com cartão pelo pipeline assíncrono de pagamentos: vazão e latência por limite de concorrência.")
+    parser.add_argument('--checkouts', type=int, default=CHECKOUTS_PADRAO)
+    parser.add_argument('--concorrencias', default=CONCORRENCIAS_PADRAO, help="Limites de autorizações simultâneas, separados por vírgula")
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    concorrencias = [int(c) for c in args.concorrencias.split(',') if c.strip()]
+    relatorio = executar(concorrencias, args.checkouts, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import repositories.dados as dados_loja
+import repositories.produto_repository as produto_repository
+from repositories import carrinho_repository
+from services.sessao_service import SessaoService
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import pasta_dados_temporaria, resumir
+
+# Armazenamento de carrinhos por sessão (services/sessao_service.py) com muito mais
+# sessões do que cabem na memória:
+#   - criação: abre N sessões com 1 a 3 itens cada (a partir da capacidade, cada sessão
+#     nova despeja a menos usada para o disco); mede a vazão e o RSS ao longo da carga,
+#     que deve parar de crescer quando a memória enche;
+#   - acessos: latência (p50/p95) de acessos aleatórios, a maioria às sessões recentes
+#     (na memória) e o restante a sessões antigas (lidas do disco);
+#   - restauração: sessões frias uma a uma x em lote (obter_varios);
+#   - vencimento: com o relógio adiantado além do prazo, expirar() esvazia memória e disco.
+# Confere que os carrinhos lidos do disco têm o mesmo conteúdo (to_dict) de quando foram
+# montados e que a memória nunca passa da capacidade.
+
+SESSOES_PADRAO = 100000
+CAPACIDADE_PADRAO = 5000
+ACESSOS_PADRAO = 20000
+FRACAO_QUENTE_PADRAO = 0.9
+LOTE_RESTAURACAO_PADRAO = 1000
+PRODUTOS_PADRAO = 2000
+AMOSTRA_CONFERENCIA = 2000
+TTL_S = 3600.0
+
+
+class _Relogio:
+    """Relógio controlado pelo benchmark (para adiantar até o vencimento sem esperar)."""
+
+    def __init__(self):
+        self.agora = time.time()
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+def _rss_mb() -> float:
+    with open('/proc/self/status') as f:
+        return next(int(l.split()[1]) for l in f if l.startswith('VmRSS:')) / 1024
+
+
+def executar(
+    sessoes: int = SESSOES_PADRAO,
+    capacidade: int = CAPACIDADE_PADRAO,
+    acessos: int = ACESSOS_PADRAO,
+    fracao_quente: float = FRACAO_QUENTE_PADRAO,
+    lote_restauracao: int = LOTE_RESTAURACAO_PADRAO,
+    produtos: int = PRODUTOS_PADRAO,
+    semente: int = 42,
+    saida=None
+) -> Dict[str, Any]:
+    rng = random.Random(semente)
+    relogio = _Relogio()
+    with pasta_dados_temporaria('loja-sessoes-'):
+        dados_loja.salvar_dados_loja(gerar_loja(100, produtos, 0))
+        catalogo = [p for p in produto_repository.carregar_todos() if p.is_ativo]
+        servico = SessaoService(capacidade=capacidade, ttl_s=TTL_S, relogio=relogio)
+        ids = [f"s{i:09d}" for i in range(sessoes)]
+        esperados: Dict[str, Dict[str, Any]] = {}
+        amostra = set(rng.sample(ids, min(AMOSTRA_CONFERENCIA, sessoes)))
+
+        # --- Criação ---
+        rss_inicial = _rss_mb()
+        pontos_rss = []
+        maximo_memoria = 0
+        inicio = time.perf_counter()
+        for i, id_sessao in enumerate(ids):
+            carrinho = servico.obter(id_sessao)
+            for produto in rng.sample(catalogo, rng.randint(1, 3)):
+                carrinho.adicionar_item(produto, rng.randint(1, 5))
+            servico.salvar(carrinho)
+            if id_sessao in amostra:
+                esperados[id_sessao] = carrinho.to_dict()
+            maximo_memoria = max(maximo_memoria, len(servico._quentes))
+            if (i + 1) % max(1, sessoes // 10) == 0:
+                pontos_rss.append(round(_rss_mb() - rss_inicial, 1))
+        criacao_s = time.perf_counter() - inicio
+
+        # --- Acessos (a maioria às sessões recentes) ---
+        recentes = ids[-max(1, capacidade // 2):]
+        latencias: Dict[str, List[float]] = {'memoria': [], 'disco': []}
+        for _ in range(acessos):
+            id_sessao = rng.choice(recentes) if rng.random() < fracao_quente else rng.choice(ids)
+            tipo = 'memoria' if id_sessao in servico._quentes else 'disco'
+            inicio = time.perf_counter()
+            servico.obter(id_sessao)
+            latencias[tipo].append(time.perf_counter() - inicio)
+
+        # --- Restauração: uma a uma x em lote ---
+        frias = [i for i in rng.sample(ids, min(sessoes, lote_restauracao * 4)) if i not in servico._quentes]
+        individuais, em_lote = frias[:lote_restauracao // 10 or 1], frias[lote_restauracao // 10 or 1:][:lote_restauracao]
+        inicio = time.perf_counter()
+        for id_sessao in individuais:
+            servico.obter(id_sessao)
+        individual_ms = (time.perf_counter() - inicio) * 1000 / max(1, len(individuais))
+        inicio = time.perf_counter()
+        servico.obter_varios(em_lote)
+        lote_ms = (time.perf_counter() - inicio) * 1000 / max(1, len(em_lote))
+
+        # --- Conferência do conteúdo (a amostra passa pelo disco) ---
+        servico.gravar_todos()
+        conferidos = SessaoService(capacidade=capacidade, ttl_s=TTL_S, relogio=relogio).obter_varios(sorted(esperados))
+        iguais = all(conferidos[i].to_dict() == esperado for i, esperado in esperados.items())
+        estatisticas = servico.estatisticas()
+
+        # --- Vencimento ---
+        relogio.agora += TTL_S + 1
+        inicio = time.perf_counter()
+        expirados = servico.expirar()
+        expiracao_s = time.perf_counter() - inicio
+        restantes = {'em_memoria': len(servico._quentes), 'no_disco': carrinho_repository.contar()}
+        carrinho_repository.fechar()
+
+    verificacoes = {
+        'conteudo_restaurado_igual': iguais,
+        'memoria_dentro_da_capacidade': maximo_memoria <= capacidade,
+        'vencidos_descartados': restantes == {'em_memoria': 0, 'no_disco': 0},
+    }
+    latencia = {tipo: resumir(amostras) for tipo, amostras in latencias.items()}
+    if saida:
+        print(f"# {sessoes} sessões, capacidade {capacidade} na memória, {acessos} acessos "
+              f"({fracao_quente:.0%} às recentes), {len(catalogo)} produtos", file=saida)
+        print(f"criação: {sessoes / criacao_s:,.0f} sessões/s; RSS acima do inicial a cada 10%: {pontos_rss} MB", file=saida)
+        print(f"disco: {estatisticas['no_disco']} carrinhos, {estatisticas['bytes_disco'] / 1e6:.1f} MB "
+              f"({estatisticas['bytes_disco'] / max(1, estatisticas['no_disco']):.0f} bytes/carrinho)", file=saida)
+        print(f"{'ACESSO':<8} {'QTD':>7} {'P50 ms':>8} {'P95 ms':>8}", file=saida)
+        for tipo, r in latencia.items():
+            print(f"{tipo:<8} {r['repeticoes']:>7} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f}", file=saida)
+        print(f"restauração do disco: {individual_ms:.2f} ms/sessão uma a uma x {lote_ms:.3f} ms/sessão em lote de {len(em_lote)}", file=saida)
+        print(f"vencimento: {expirados} sessões descartadas em {expiracao_s:.2f}s", file=saida)
+        for nome, ok in verificacoes.items():
+            print(f"  {'OK  ' if ok else 'FALHA'} {nome}", file=saida)
+
+    return {
+        'sessoes': sessoes, 'capacidade': capacidade, 'acessos': acessos, 'fracao_quente': fracao_quente,
+        'criacao_sessoes_por_s': sessoes / criacao_s,
+        'rss_acima_do_inicial_mb': pontos_rss,
+        'latencia': latencia,
+        'restauracao_ms_por_sessao': {'individual': individual_ms, 'lote': lote_ms, 'tamanho_lote': len(em_lote)},
+        'expiracao_s': expiracao_s,
+        'estatisticas': estatisticas,
+        'verificacoes': verificacoes,
+        'sucesso': all(verificacoes.values()),
+    }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Carrinhos por sessão com LRU na memória e o restante no disco: vazão, latência, memória e vencimento.")
+    parser.add_argument('--sessoes', type=int, default=SESSOES_PADRAO)
+    parser.add_argument('--capacidade', type=int, default=CAPACIDADE_PADRAO)
+    parser.add_argument('--acessos', type=int, default=ACESSOS_PADRAO)
+    parser.add_argument('--fracao-quente', type=float, default=FRACAO_QUENTE_PADRAO)
+    parser.add_argument('--lote', type=int, default=LOTE_RESTAURACAO_PADRAO, help="Sessões frias restauradas de uma vez")
+    parser.add_argument('--produtos', type=int, default=PRODUTOS_PADRAO)
+    parser.add_argument('--saida', help="Arquivo JSON de resultados (opcional)")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar(args.sessoes, args.capacidade, args.acessos, args.fracao_quente, args.lote, args.produtos, saida=sys.stdout)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    sys.exit(0 if relatorio['sucesso'] else 1)
+
+
+if __name__ == '__main__':
+    main()
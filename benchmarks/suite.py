@@ -0,0 +1,189 @@
+import argparse
+import json
+import platform
+import random
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from models.vendas import Carrinho
+import repositories.dados as dados_loja
+import repositories.produto_repository as produto_repository
+import repositories.cliente_repository as cliente_repository
+import repositories.pedido_repository as pedido_repository
+import services.carrinho_service as carrinho_service
+from services.pedido_service import PedidoService
+from services.relatorio_service import RelatorioService
+from benchmarks.gerador_dados import gerar_loja
+from benchmarks.medicao import medir, pasta_dados_temporaria, tamanho_arquivo_loja
+
+# Pontos de escala padrão: (clientes, produtos, pedidos)
+ESCALAS_PADRAO = [(100, 200, 500), (1000, 2000, 5000), (5000, 10000, 20000)]
+
+REPETICOES_BUSCA = 200
+REPETICOES_CARGA = 20
+REPETICOES_CHECKOUT = 50
+REPETICOES_RELATORIO = 10
+
+# Tempo máximo (s) gasto em cada operação por ponto de escala
+ORCAMENTO_PADRAO_S = 10.0
+
+# Operações que hidratam todos os pedidos fazem uma leitura do arquivo por cliente e por
+# item de cada pedido (custo quadrático). Acima deste número de pedidos elas são puladas,
+# pois uma única execução já levaria minutos.
+LIMITE_PEDIDOS_HIDRATACAO = 1000
+OPERACOES_HIDRATACAO_TOTAL = ['pedido_repository.carregar_todos', 'RelatorioService.relatorio_pedidos']
+
+
+def _operacoes(loja: Dict[str, Any], rng: random.Random) -> List[Tuple[str, int, Callable[[int], Any]]]:
+    """Monta a lista (nome, repetições, operação) a partir dos dados gerados."""
+    skus = [p['sku'] for p in loja['produtos']]
+    cpfs = [c['cpf'] for c in loja['clientes']]
+    codigos = [p['codigo_pedido'] for p in loja['pedidos']]
+
+    # Amostras sorteadas antes da medição para não cronometrar o sorteio
+    skus_busca = [rng.choice(skus) for _ in range(REPETICOES_BUSCA)]
+    cpfs_busca = [rng.choice(cpfs) for _ in range(REPETICOES_BUSCA)]
+    codigos_busca = [rng.choice(codigos) for _ in range(REPETICOES_BUSCA)] if codigos else []
+
+    operacoes = [
+        ('produto_repository.buscar_por_sku', REPETICOES_BUSCA,
+         lambda i: produto_repository.buscar_por_sku(skus_busca[i])),
+        ('cliente_repository.buscar_por_cpf', REPETICOES_BUSCA,
+         lambda i: cliente_repository.buscar_por_cpf(cpfs_busca[i])),
+        ('produto_repository.carregar_todos', REPETICOES_CARGA,
+         lambda i: produto_repository.carregar_todos()),
+        ('cliente_repository.carregar_todos', REPETICOES_CARGA,
+         lambda i: cliente_repository.carregar_todos()),
+    ]
+    if codigos_busca:
+        operacoes += [
+            ('pedido_repository.buscar_por_codigo', REPETICOES_BUSCA,
+             lambda i: pedido_repository.buscar_por_codigo(codigos_busca[i])),
+            ('pedido_repository.carregar_todos', REPETICOES_CARGA,
+             lambda i: pedido_repository.carregar_todos()),
+        ]
+
+    operacoes += [
+        ('RelatorioService.relatorio_ocupacao_por_periodo[dia]', REPETICOES_RELATORIO,
+         lambda i: RelatorioService.relatorio_ocupacao_por_periodo('dia')),
+        ('RelatorioService.relatorio_ocupacao_por_periodo[mes]', REPETICOES_RELATORIO,
+         lambda i: RelatorioService.relatorio_ocupacao_por_periodo('mes')),
+        ('RelatorioService.relatorio_clientes', REPETICOES_RELATORIO,
+         lambda i: RelatorioService.relatorio_clientes()),
+        ('RelatorioService.relatorio_produtos', REPETICOES_RELATORIO,
+         lambda i: RelatorioService.relatorio_produtos()),
+        ('RelatorioService.relatorio_pedidos', REPETICOES_RELATORIO,
+         lambda i: RelatorioService.relatorio_pedidos()),
+    ]
+
+    checkout = _preparar_checkout(loja, rng)
+    if checkout:
+        operacoes.append(('PedidoService.finalizar_compra', REPETICOES_CHECKOUT, checkout))
+    return operacoes
+
+
+def _preparar_checkout(loja: Dict[str, Any], rng: random.Random) -> Optional[Callable[[int], Any]]:
+    """
+    Prepara carrinhos com produtos físicos de estoque folgado (acima do limite de
+    segurança mesmo após todas as repetições) e clientes com endereço.
+    Cada chamada grava de verdade um pedido e a baixa de estoque.
+    """
+    folga = 5 + REPETICOES_CHECKOUT * 2
+    candidatos = [p['sku'] for p in loja['produtos']
+                  if p.get('tipo') == 'ProdutoFisico' and p['is_ativo'] and p['estoque'] > folga]
+    cpfs = [c['cpf'] for c in loja['clientes'] if c['enderecos']]
+    if not candidatos or not cpfs:
+        return None
+
+    produtos = {sku: produto_repository.buscar_por_sku(sku) for sku in rng.sample(candidatos, min(20, len(candidatos)))}
+    cliente = cliente_repository.buscar_por_cpf(rng.choice(cpfs))
+    skus = list(produtos)
+
+    def finalizar(i: int):
+        carrinho = Carrinho(cliente=cliente)
+        carrinho.adicionar_item(produtos[skus[i % len(skus)]], 1)
+        frete = carrinho_service.calcular_frete(carrinho, cliente.enderecos[0].cep)
+        return PedidoService.finalizar_compra(carrinho, frete, 'cartao', {'bandeira': 'VISA'})
+
+    return finalizar
+
+
+def executar_suite(
+    escalas: List[Tuple[int, int, int]],
+    semente: int = 42,
+    orcamento_s: float = ORCAMENTO_PADRAO_S,
+    limite_hidratacao: int = LIMITE_PEDIDOS_HIDRATACAO,
+    saida=None
+) -> Dict[str, Any]:
+    """Gera uma loja por ponto de escala e mede cada operação sobre ela."""
+    resultados = []
+
+    for clientes, produtos, pedidos in escalas:
+        with pasta_dados_temporaria():
+            loja = gerar_loja(clientes, produtos, pedidos, semente)
+            dados_loja.salvar_dados_loja(loja)
+            escala = {
+                'clientes': clientes, 'produtos': produtos, 'pedidos': pedidos,
+                'tamanho_arquivo_bytes': tamanho_arquivo_loja(),
+            }
+            if saida:
+                print(f"\n# Escala {clientes} clientes / {produtos} produtos / {pedidos} pedidos "
+                      f"({escala['tamanho_arquivo_bytes'] / 1e6:.1f} MB)", file=saida)
+
+            rng = random.Random(semente)
+            for nome, repeticoes, operacao in _operacoes(loja, rng):
+                if nome in OPERACOES_HIDRATACAO_TOTAL and pedidos > limite_hidratacao:
+                    resultados.append({'escala': escala, 'operacao': nome, 'ignorada': True,
+                                       'motivo': f"mais de {limite_hidratacao} pedidos"})
+                    if saida:
+                        print(f"  {nome:<55} ignorada (mais de {limite_hidratacao} pedidos)", file=saida)
+                    continue
+
+                estatisticas = medir(operacao, repeticoes, orcamento_s)
+                resultados.append({'escala': escala, 'operacao': nome, **estatisticas})
+                if saida:
+                    print(f"  {nome:<55} n={estatisticas['repeticoes']:<4} "
+                          f"média={estatisticas['media_ms']:10.3f} ms  p95={estatisticas['p95_ms']:10.3f} ms", file=saida)
+
+    return {
+        'meta': {
+            'data_execucao': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'plataforma': platform.platform(),
+            'semente': semente,
+            'orcamento_por_operacao_s': orcamento_s,
+            'limite_pedidos_hidratacao': limite_hidratacao,
+        },
+        'resultados': resultados,
+    }
+
+
+def _ler_escalas(texto: str) -> List[Tuple[int, int, int]]:
+    """Converte 'c:p:k,c:p:k' em lista de escalas."""
+    escalas = []
+    for parte in texto.split(','):
+        clientes, produtos, pedidos = (int(x) for x in parte.split(':'))
+        escalas.append((clientes, produtos, pedidos))
+    return escalas
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos repositórios e serviços em várias escalas.")
+    parser.add_argument('--escalas', type=_ler_escalas, default=ESCALAS_PADRAO,
+                        help="Lista clientes:produtos:pedidos separada por vírgulas (ex.: 100:200:500,1000:2000:5000)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--orcamento', type=float, default=ORCAMENTO_PADRAO_S,
+                        help="Tempo máximo (s) por operação em cada escala")
+    parser.add_argument('--limite-hidratacao', type=int, default=LIMITE_PEDIDOS_HIDRATACAO,
+                        help="Máximo de pedidos para medir operações que hidratam todos os pedidos")
+    parser.add_argument('--saida', default='bench_resultados.json', help="Arquivo JSON de resultados")
+    args = parser.parse_args(argumentos)
+
+    relatorio = executar_suite(args.escalas, args.semente, args.orcamento, args.limite_hidratacao, saida=sys.stdout)
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=4, ensure_ascii=False)
+    print(f"\n✅ Resultados gravados em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -91,7 +91,7 @@ class Cliente:
 
 
 class Produto:
-    def __init__(self, sku: str, nome: str, categoria: str, preco_unitario: float, estoque: int = 0, is_ativo: bool = True):
+    def __init__(self, sku: str, nome: str, categoria: str, preco_unitario: float, estoque: int = 0, is_ativo: bool = True, versao: int = 0):
         if not sku or not nome or preco_unitario <= 0:
             raise ValorInvalidoError("SKU, nome e preço unitário válido são obrigatórios para o Produto.")
         
@@ -101,6 +101,9 @@ class Produto:
         self._preco_unitario = preco_unitario
         self._estoque = estoque
         self._is_ativo = is_ativo
+        # Versão do registro no repositório (incrementada a cada gravação); usada no
+        # controle otimista de concorrência das baixas de estoque
+        self._versao = versao
 
     @property
     def sku(self) -> str: return self._sku
@@ -128,6 +131,15 @@ class Produto:
         novo_estoque = self._estoque + quantidade
         self.estoque = novo_estoque # Usa o setter para validação de valor < 0
 
+    @property
+    def versao(self) -> int: return self._versao
+
+    @versao.setter
+    def versao(self, nova_versao: int):
+        if nova_versao < 0:
+            raise ValorInvalidoError("Versão do produto não pode ser negativa.")
+        self._versao = nova_versao
+
     def to_dict(self):
         return {
             'sku': self.sku,
@@ -136,13 +148,14 @@ class Produto:
             'preco_unitario': self.preco_unitario,
             'estoque': self.estoque,
             'is_ativo': self.is_ativo,
-            'tipo': self.__class__.__name__ # Adiciona o tipo para desserialização
+            'tipo': self.__class__.__name__, # Adiciona o tipo para desserialização
+            'versao': self.versao
         }
 
 
 class ProdutoFisico(Produto):
-    def __init__(self, sku: str, nome: str, categoria: str, preco_unitario: float, estoque: int, peso: float, is_ativo: bool = True):
-        super().__init__(sku, nome, categoria, preco_unitario, estoque, is_ativo)
+    def __init__(self, sku: str, nome: str, categoria: str, preco_unitario: float, estoque: int, peso: float, is_ativo: bool = True, versao: int = 0):
+        super().__init__(sku, nome, categoria, preco_unitario, estoque, is_ativo, versao)
         if peso <= 0:
             raise ValorInvalidoError("Produto Físico deve ter peso positivo.")
         self._peso = peso
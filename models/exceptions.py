@@ -12,4 +12,20 @@ class DocumentoInvalidoError(ECommerceBaseError):
 
 class EntidadeNaoEncontradaError(ECommerceBaseError):
     """Exceção levantada quando uma entidade não é encontrada no repositório."""
+    pass
+
+class PersistenciaError(ECommerceBaseError):
+    """Exceção levantada quando não é possível ler ou gravar os arquivos de dados."""
+    pass
+
+class ConfiguracaoInvalidaError(ECommerceBaseError):
+    """Exceção levantada quando o settings.json não pode ser lido ou tem valores inválidos."""
+    pass
+
+class ConflitoVersaoError(ECommerceBaseError):
+    """Exceção levantada quando um registro foi alterado por outra operação desde que foi lido (controle otimista)."""
+    pass
+
+class GatewayIndisponivelError(ECommerceBaseError):
+    """Exceção levantada quando o gateway de pagamento falha de forma transitória (a autorização pode ser repetida)."""
     pass
\ No newline at end of file
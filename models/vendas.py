@@ -1,3 +1,5 @@
+import threading
+import uuid
 from datetime import datetime
 from typing import List, Optional, Union
 from models.entidades import Produto, Cliente, ProdutoFisico
@@ -41,6 +43,15 @@ class Carrinho:
     def __init__(self, cliente: Optional[Cliente] = None, itens: Optional[List[ItemCarrinho]] = None):
         self._cliente = cliente
         self._itens = itens or []
+        # Identifica o carrinho nas reservas de estoque (services/reserva_service.py);
+        # gerado só no primeiro uso, para não pesar na hidratação dos pedidos salvos
+        self._id_sessao = None
+
+    @property
+    def id_sessao(self) -> str:
+        if self._id_sessao is None:
+            self._id_sessao = uuid.uuid4().hex
+        return self._id_sessao
 
     @property
     def cliente(self) -> Optional[Cliente]: return self._cliente
@@ -107,7 +118,24 @@ class Carrinho:
 
 class Pedido:
     # Estados possíveis para o pedido (usado em PedidoService)
-    ESTADOS_VALIDOS = ["NOVO", "AGUARDANDO_PAGAMENTO", "PAGO", "SEPARACAO", "ENVIADO", "ENTREGUE", "CANCELADO"]
+    ESTADOS_VALIDOS = ["NOVO", "AGUARDANDO_PAGAMENTO", "PENDENTE", "PAGO", "SEPARACAO", "ENVIADO", "ENTREGUE", "CANCELADO"]
+    # Grafo de transições: estado atual -> estados seguintes permitidos
+    # (PENDENTE é o boleto emitido aguardando pagamento, gravado pelo PedidoService)
+    TRANSICOES = {
+        "NOVO": {"AGUARDANDO_PAGAMENTO", "PENDENTE", "PAGO", "CANCELADO"},
+        "AGUARDANDO_PAGAMENTO": {"PENDENTE", "PAGO", "CANCELADO"},
+        "PENDENTE": {"PAGO", "CANCELADO"},
+        "PAGO": {"SEPARACAO", "CANCELADO"},
+        "SEPARACAO": {"ENVIADO", "CANCELADO"},
+        "ENVIADO": {"ENTREGUE"},
+        "ENTREGUE": set(),
+        "CANCELADO": set(),
+    }
+    # Estados em que o estoque dos itens já foi baixado (o cancelamento o devolve)
+    ESTADOS_COM_ESTOQUE_BAIXADO = {"PENDENTE", "PAGO", "SEPARACAO"}
+    # Último milissegundo usado em um código (ver _gerar_codigo)
+    _trava_codigo = threading.Lock()
+    _ultimo_ms_codigo = 0
     
     def __init__(self, cliente: Cliente, carrinho: Carrinho, frete: Frete, cupom: Optional[Cupom] = None, codigo_pedido: Optional[str] = None):
         
@@ -130,8 +158,14 @@ class Pedido:
         
     def _gerar_codigo(self) -> str:
         """Gera um código de pedido simples, baseado em data e um hash."""
-        # Código simples: P-YYYYMMDDHHMMSS-RANDOM5
-        return "P-" + datetime.now().strftime("%Y%m%d%H%M%S") + "-" + str(math.floor(datetime.now().timestamp() * 1000) % 10000)
+        # Código simples: P-YYYYMMDDHHMMSS-RANDOM5. O milissegundo nunca se repete no processo:
+        # pedidos criados no mesmo milissegundo (ex.: com a escrita adiada) usam os seguintes,
+        # para que um pedido não sobrescreva o outro ao ser salvo.
+        with Pedido._trava_codigo:
+            ms = max(math.floor(datetime.now().timestamp() * 1000), Pedido._ultimo_ms_codigo + 1)
+            Pedido._ultimo_ms_codigo = ms
+        instante = datetime.fromtimestamp(ms / 1000)
+        return "P-" + instante.strftime("%Y%m%d%H%M%S") + "-" + str(ms % 10000)
 
     def _calcular_subtotal(self) -> float:
         """Calcula o subtotal dos itens (valor antes de frete/desconto)."""
@@ -182,10 +216,20 @@ class Pedido:
     def pagamento(self, pagamento: Pagamento):
          self._pagamento = pagamento
 
+    @classmethod
+    def validar_transicao(cls, estado_atual: str, novo_estado: str):
+        """Levanta ValorInvalidoError se o estado não existir ou a transição não constar do grafo."""
+        if novo_estado not in cls.ESTADOS_VALIDOS:
+            raise ValorInvalidoError(f"Estado '{novo_estado}' inválido.")
+        if novo_estado == estado_atual:
+            raise ValorInvalidoError(f"O pedido já está em {novo_estado}.")
+        if novo_estado not in cls.TRANSICOES.get(estado_atual, set()):
+            permitidos = ', '.join(e for e in cls.ESTADOS_VALIDOS if e in cls.TRANSICOES.get(estado_atual, set())) or 'nenhum'
+            raise ValorInvalidoError(f"Transição {estado_atual} -> {novo_estado} não permitida (permitidos: {permitidos}).")
+
     @estado.setter
     def estado(self, novo_estado: str):
-        if novo_estado not in self.ESTADOS_VALIDOS:
-            raise ValorInvalidoError(f"Estado '{novo_estado}' inválido.")
+        self.validar_transicao(self._estado, novo_estado)
         self._estado = novo_estado
         
     def to_dict(self):
@@ -0,0 +1,217 @@
+import functools
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from monitoramento import rastreamento
+
+# Instrumentação opcional dos repositórios e serviços.
+#
+# Quando desativada (padrão), cada função decorada custa apenas um teste de uma
+# variável global antes de chamar a função original. Quando ativada, registra por
+# função: chamadas, erros, tempo total, percentis de latência, bytes lidos/gravados
+# e quantidade de parses de JSON. O I/O é atribuído a todas as funções instrumentadas
+# que estão na pilha da thread no momento (métricas inclusivas): um buscar_por_sku
+# "lê" os bytes que o seu _carregar_dados leu.
+#
+# Com o rastreamento ligado, cada função decorada chamada dentro de um trace também
+# vira um span filho (ver monitoramento/rastreamento.py).
+
+# Máximo de amostras de latência guardadas por função (reservoir sampling)
+MAX_AMOSTRAS = 10000
+
+_ativo = False
+_trava = threading.Lock()
+_estatisticas: Dict[str, '_Estatistica'] = {}
+_local = threading.local()
+_rng = random.Random(0)
+
+
+class _Estatistica:
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.amostras: List[float] = []
+        self.bytes_lidos = 0
+        self.bytes_gravados = 0
+        self.parses_json = 0
+
+    def registrar_duracao(self, duracao: float):
+        self.chamadas += 1
+        self.total_s += duracao
+        if duracao > self.max_s:
+            self.max_s = duracao
+        if len(self.amostras) < MAX_AMOSTRAS:
+            self.amostras.append(duracao)
+        else:
+            posicao = _rng.randrange(self.chamadas)
+            if posicao < MAX_AMOSTRAS:
+                self.amostras[posicao] = duracao
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordenadas = sorted(self.amostras)
+        return {
+            'chamadas': self.chamadas,
+            'erros': self.erros,
+            'total_ms': self.total_s * 1000,
+            'media_ms': (self.total_s / self.chamadas) * 1000 if self.chamadas else 0.0,
+            'p50_ms': _percentil(ordenadas, 0.50) * 1000,
+            'p90_ms': _percentil(ordenadas, 0.90) * 1000,
+            'p99_ms': _percentil(ordenadas, 0.99) * 1000,
+            'max_ms': self.max_s * 1000,
+            'bytes_lidos': self.bytes_lidos,
+            'bytes_gravados': self.bytes_gravados,
+            'parses_json': self.parses_json,
+        }
+
+
+def _percentil(ordenados: List[float], fracao: float) -> float:
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, int(round(fracao * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def _pilha() -> List[str]:
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+def _estatistica(nome: str) -> _Estatistica:
+    estatistica = _estatisticas.get(nome)
+    if estatistica is None:
+        estatistica = _estatisticas.setdefault(nome, _Estatistica())
+    return estatistica
+
+
+# --- Controle ---
+
+def ativar():
+    global _ativo
+    _ativo = True
+
+def desativar():
+    global _ativo
+    _ativo = False
+
+def esta_ativo() -> bool:
+    return _ativo
+
+def limpar():
+    """Descarta as estatísticas acumuladas."""
+    with _trava:
+        _estatisticas.clear()
+
+
+# --- Coleta ---
+
+def instrumentar(nome: Optional[str] = None) -> Callable:
+    """
+    Decorador que mede a função quando a instrumentação está ativa.
+    O nome padrão é '<módulo>.<função>' para funções de módulo (ex.: 'produto_repository.buscar_por_sku')
+    e '<Classe>.<método>' para métodos (ex.: 'PedidoService.finalizar_compra').
+    Em métodos estáticos, deve ficar abaixo do @staticmethod.
+    """
+    def decorador(func: Callable) -> Callable:
+        rotulo = nome
+        if rotulo is None:
+            if '.' in func.__qualname__:
+                rotulo = func.__qualname__
+            else:
+                rotulo = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def medido(*args, **kwargs):
+            if not _ativo:
+                if not rastreamento._ativo:
+                    return func(*args, **kwargs)
+                with rastreamento.span(rotulo, 'funcao'):
+                    return func(*args, **kwargs)
+
+            with rastreamento.span(rotulo, 'funcao'):
+                return _executar_medindo(rotulo, func, args, kwargs)
+
+        medido.rotulo_instrumentacao = rotulo
+        return medido
+    return decorador
+
+
+def _executar_medindo(rotulo: str, func: Callable, args, kwargs):
+    pilha = _pilha()
+    pilha.append(rotulo)
+    inicio = time.perf_counter()
+    falhou = False
+    try:
+        return func(*args, **kwargs)
+    except BaseException:
+        falhou = True
+        raise
+    finally:
+        duracao = time.perf_counter() - inicio
+        pilha.pop()
+        with _trava:
+            estatistica = _estatistica(rotulo)
+            estatistica.registrar_duracao(duracao)
+            if falhou:
+                estatistica.erros += 1
+
+
+def registrar_leitura(num_bytes: int, parse_json: bool = True):
+    """Atribui uma leitura de arquivo a todas as funções instrumentadas em execução."""
+    if not _ativo:
+        return
+    with _trava:
+        for rotulo in set(_pilha()):
+            estatistica = _estatistica(rotulo)
+            estatistica.bytes_lidos += num_bytes
+            if parse_json:
+                estatistica.parses_json += 1
+
+
+def registrar_escrita(num_bytes: int):
+    """Atribui uma gravação de arquivo a todas as funções instrumentadas em execução."""
+    if not _ativo:
+        return
+    with _trava:
+        for rotulo in set(_pilha()):
+            _estatistica(rotulo).bytes_gravados += num_bytes
+
+
+# --- Consulta ---
+
+def obter_estatisticas() -> Dict[str, Dict[str, Any]]:
+    """Retorna as estatísticas por função, ordenadas pelo tempo total (maior primeiro)."""
+    with _trava:
+        itens = [(nome, e.to_dict()) for nome, e in _estatisticas.items()]
+    itens.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+    return dict(itens)
+
+
+def salvar_json(caminho: str):
+    """Grava as estatísticas agregadas em um arquivo JSON."""
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'ativo': _ativo, 'funcoes': obter_estatisticas()}, f, indent=4, ensure_ascii=False)
+
+
+def formatar_relatorio() -> str:
+    estatisticas = obter_estatisticas()
+    if not estatisticas:
+        return "Nenhuma métrica coletada (ative a instrumentação e execute alguma operação)."
+
+    output = f"{'FUNÇÃO':<48} {'CHAMADAS':>8} {'TOTAL ms':>11} {'MÉDIA':>9} {'P50':>9} {'P90':>9} {'P99':>9} {'LIDO KB':>10} {'GRAV. KB':>10} {'PARSES':>7}\n"
+    for nome, e in estatisticas.items():
+        output += (
+            f"{nome:<48} {e['chamadas']:>8} {e['total_ms']:>11.2f} {e['media_ms']:>9.3f} {e['p50_ms']:>9.3f} "
+            f"{e['p90_ms']:>9.3f} {e['p99_ms']:>9.3f} {e['bytes_lidos'] / 1024:>10.1f} "
+            f"{e['bytes_gravados'] / 1024:>10.1f} {e['parses_json']:>7}\n"
+        )
+    return output
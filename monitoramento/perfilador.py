@@ -0,0 +1,253 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Perfilador por amostragem, opcional e ligável em tempo de execução.
+#
+# Uma thread de fundo acorda `frequencia_hz` vezes por segundo, lê a pilha de todas as
+# outras threads (sys._current_frames) e conta cada pilha. Ao parar, grava o resultado
+# no formato "collapsed stacks" (uma linha "thread;func1;func2;... contagem"), lido por
+# flamegraph.pl, speedscope, inferno etc. Diferente da instrumentação, enxerga o tempo
+# dentro das funções não decoradas (re.sub, json.encoder, _deserializar_pedido...).
+#
+# As amostras são de tempo de parede: uma thread parada em input() também aparece.
+# Sem o perfilador ligado não há custo algum; ligado, o custo é o da thread de amostragem
+# (medido em `custo_s` no resumo).
+
+FREQUENCIA_PADRAO_HZ = 100
+DURACAO_SINAL_PADRAO_S = 60.0
+
+# Os decoradores de instrumentação/rastreamento envolvem quase toda função dos repositórios
+# e serviços; seus frames são omitidos para que as pilhas mostrem apenas o código da loja.
+MODULOS_OMITIDOS = {'monitoramento.instrumentacao', 'monitoramento.rastreamento'}
+
+_ativo = False
+_trava = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_parar = threading.Event()
+_contagens: Counter = Counter()
+_config: Dict[str, Any] = {}
+_ultimo_resumo: Optional[Dict[str, Any]] = None
+
+
+def _rotulo(frame, incluir_linhas: bool) -> str:
+    modulo = frame.f_globals.get('__name__', '?')
+    rotulo = f"{modulo}.{frame.f_code.co_qualname}"
+    if incluir_linhas:
+        rotulo += f":{frame.f_lineno}"
+    return rotulo
+
+
+def _colapsar(frame, nome_thread: str, incluir_linhas: bool) -> str:
+    """Converte a pilha (do frame mais interno para fora) em 'thread;raiz;...;folha'."""
+    quadros: List[str] = []
+    while frame is not None:
+        if frame.f_globals.get('__name__') not in MODULOS_OMITIDOS:
+            quadros.append(_rotulo(frame, incluir_linhas))
+        frame = frame.f_back
+    quadros.append(nome_thread)
+    quadros.reverse()
+    return ';'.join(q.replace(';', ':').replace(' ', '_') for q in quadros)
+
+
+def _amostrar(intervalo_s: float, prazo: Optional[float], incluir_linhas: bool):
+    propria = threading.get_ident()
+    custo_s = 0.0
+    amostras = 0
+    proxima = time.perf_counter()
+    try:
+        while True:
+            proxima += intervalo_s
+            espera = proxima - time.perf_counter()
+            if _parar.wait(espera if espera > 0 else 0):
+                break
+            agora = time.perf_counter()
+            if prazo is not None and agora >= prazo:
+                break
+            if espera < 0:
+                # Atrasou (GIL ocupado): não tenta compensar as amostras perdidas
+                proxima = agora
+
+            nomes = {t.ident: t.name for t in threading.enumerate()}
+            quadros = sys._current_frames()
+            pilhas = [
+                _colapsar(frame, nomes.get(ident, f"thread-{ident}"), incluir_linhas)
+                for ident, frame in quadros.items() if ident != propria
+            ]
+            # Não segura referências aos frames das outras threads entre amostras
+            del quadros
+            with _trava:
+                _contagens.update(pilhas)
+            amostras += 1
+            custo_s += time.perf_counter() - agora
+    finally:
+        _finalizar(amostras, custo_s)
+
+
+def _finalizar(amostras: int, custo_s: float):
+    """Grava o arquivo collapsed e marca o perfilador como parado (roda na thread de amostragem)."""
+    global _ativo, _ultimo_resumo
+    with _trava:
+        contagens = dict(_contagens)
+        config = dict(_config)
+    duracao_s = time.perf_counter() - config['inicio']
+    resumo = {
+        'arquivo': config['caminho'],
+        'frequencia_hz': config['frequencia_hz'],
+        'amostras': amostras,
+        'pilhas_distintas': len(contagens),
+        'duracao_s': duracao_s,
+        'custo_s': custo_s,
+        'erro': None,
+    }
+    try:
+        salvar_colapsado(config['caminho'], contagens)
+    except OSError as e:
+        resumo['erro'] = str(e)
+    with _trava:
+        _ultimo_resumo = resumo
+        _ativo = False
+
+
+# --- Controle ---
+
+def iniciar(
+    caminho: str = 'perfil.collapsed',
+    frequencia_hz: float = FREQUENCIA_PADRAO_HZ,
+    duracao_s: Optional[float] = None,
+    incluir_linhas: bool = False
+) -> bool:
+    """
+    Começa a amostrar todas as threads. Com `duracao_s`, para sozinho e grava o arquivo
+    ao fim do prazo. Retorna False se já houver uma coleta em andamento.
+    """
+    global _ativo, _thread
+    if frequencia_hz <= 0:
+        raise ValueError("A frequência de amostragem deve ser positiva.")
+    with _trava:
+        if _ativo:
+            return False
+        _ativo = True
+        _contagens.clear()
+        _parar.clear()
+        inicio = time.perf_counter()
+        _config.clear()
+        _config.update({'caminho': caminho, 'frequencia_hz': frequencia_hz, 'inicio': inicio})
+
+    prazo = inicio + duracao_s if duracao_s else None
+    _thread = threading.Thread(
+        target=_amostrar, args=(1.0 / frequencia_hz, prazo, incluir_linhas),
+        name='perfilador-amostragem', daemon=True
+    )
+    _thread.start()
+    return True
+
+
+def parar() -> Optional[Dict[str, Any]]:
+    """Interrompe a coleta, espera a gravação do arquivo e devolve o resumo (None se não estava ativo)."""
+    thread = _thread
+    if thread is None:
+        return None
+    _parar.set()
+    if thread is not threading.current_thread():
+        thread.join()
+    return _ultimo_resumo
+
+
+def esta_ativo() -> bool:
+    return _ativo
+
+
+def ultimo_resumo() -> Optional[Dict[str, Any]]:
+    return _ultimo_resumo
+
+
+def instalar_sinal(
+    pasta: str = '.',
+    duracao_s: float = DURACAO_SINAL_PADRAO_S,
+    frequencia_hz: float = FREQUENCIA_PADRAO_HZ
+) -> bool:
+    """
+    Liga o perfilador por SIGUSR1 em um processo já em execução (kill -USR1 <pid>):
+    o primeiro sinal coleta por `duracao_s` segundos em perfil-<pid>-<data>.collapsed;
+    um novo sinal durante a coleta encerra antes do prazo. Só funciona na thread
+    principal e em sistemas com SIGUSR1 (retorna False nos demais).
+    """
+    sinal = getattr(signal, 'SIGUSR1', None)
+    if sinal is None or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def alternar(_signum, _frame):
+        if _ativo:
+            _parar.set()
+            return
+        nome = f"perfil-{os.getpid()}-{datetime.now().strftime('%Y%m%d%H%M%S')}.collapsed"
+        iniciar(os.path.join(pasta, nome), frequencia_hz, duracao_s)
+
+    signal.signal(sinal, alternar)
+    return True
+
+
+# --- Saída ---
+
+def salvar_colapsado(caminho: str, contagens: Dict[str, int]):
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for pilha, contagem in sorted(contagens.items(), key=lambda item: item[1], reverse=True):
+            f.write(f"{pilha} {contagem}\n")
+
+
+def ler_colapsado(caminho: str) -> Dict[str, int]:
+    contagens: Dict[str, int] = {}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            pilha, _, contagem = linha.rstrip('\n').rpartition(' ')
+            if pilha:
+                contagens[pilha] = contagens.get(pilha, 0) + int(contagem)
+    return contagens
+
+
+def funcoes_mais_amostradas(contagens: Dict[str, int], limite: int = 20) -> Tuple[int, List[Tuple[str, int, int]]]:
+    """
+    Retorna (total de amostras, [(função, amostras próprias, amostras inclusivas)]),
+    ordenado pelas amostras próprias (a função estava no topo da pilha).
+    """
+    proprias: Counter = Counter()
+    inclusivas: Counter = Counter()
+    total = 0
+    for pilha, contagem in contagens.items():
+        quadros = pilha.split(';')[1:] # O primeiro elemento é o nome da thread
+        total += contagem
+        if quadros:
+            proprias[quadros[-1]] += contagem
+        for quadro in set(quadros):
+            inclusivas[quadro] += contagem
+    funcoes = [(nome, n, inclusivas[nome]) for nome, n in proprias.most_common(limite)]
+    return total, funcoes
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Leitura dos perfis por amostragem (collapsed stacks).")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    topo = subparsers.add_parser('topo', help="Funções com mais amostras (próprias e inclusivas)")
+    topo.add_argument('arquivo')
+    topo.add_argument('--limite', type=int, default=20)
+    args = parser.parse_args(argumentos)
+
+    total, funcoes = funcoes_mais_amostradas(ler_colapsado(args.arquivo), args.limite)
+    print(f"{total} amostra(s)")
+    print(f"{'FUNÇÃO':<70} {'PRÓPRIAS':>9} {'%':>6} {'INCLUSIVAS':>11} {'%':>6}")
+    for nome, proprias, inclusivas in funcoes:
+        print(f"{nome:<70} {proprias:>9} {proprias * 100 / total:>6.1f} {inclusivas:>11} {inclusivas * 100 / total:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+# Rastreamento (tracing) opcional por operação, exportado em JSONL.
+#
+# Cada linha do arquivo é um evento "complete" (ph = "X") no formato Chrome Trace
+# Event: name, cat, ph, ts e dur em microssegundos, pid, tid e args (com trace_id,
+# span_id e parent_id). `converter_para_chrome` junta as linhas em um JSON que o
+# chrome://tracing ou o Perfetto abrem diretamente.
+#
+# Um trace começa em uma função decorada com @rastrear (ex.: o checkout). Dentro
+# dele, blocos `with span(...)` e as funções com @instrumentar viram spans filhos;
+# fora de um trace, span() não registra nada.
+
+_ativo = False
+_trava = threading.Lock()
+_arquivo = None
+_caminho: Optional[str] = None
+_local = threading.local()
+
+# Converte perf_counter (monotônico, alta resolução) em microssegundos desde a época
+_BASE_EPOCA_US = time.time_ns() / 1000 - time.perf_counter_ns() / 1000
+
+
+def _agora_us() -> float:
+    return _BASE_EPOCA_US + time.perf_counter_ns() / 1000
+
+
+class Span:
+    def __init__(self, nome: str, categoria: str, trace_id: str, parent_id: Optional[str], atributos: Dict[str, Any]):
+        self.nome = nome
+        self.categoria = categoria
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.atributos = atributos
+        self.inicio_us = 0.0
+
+    def definir_atributo(self, chave: str, valor: Any):
+        self.atributos[chave] = valor
+
+    def __enter__(self):
+        _pilha().append(self)
+        self.inicio_us = _agora_us()
+        return self
+
+    def __exit__(self, tipo_erro, erro, tb):
+        duracao_us = _agora_us() - self.inicio_us
+        pilha = _pilha()
+        pilha.pop()
+        if tipo_erro is not None:
+            self.atributos['erro'] = f"{tipo_erro.__name__}: {erro}"
+        _registrar(self, duracao_us, finaliza_trace=not pilha)
+        return False
+
+
+class _SpanNulo:
+    """Usado quando o rastreamento está desligado ou não há trace em andamento."""
+
+    def definir_atributo(self, chave: str, valor: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_erro, erro, tb):
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+def _pilha() -> List[Span]:
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+def _registrar(span: Span, duracao_us: float, finaliza_trace: bool):
+    evento = {
+        'name': span.nome,
+        'cat': span.categoria,
+        'ph': 'X',
+        'ts': round(span.inicio_us, 3),
+        'dur': round(duracao_us, 3),
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': {
+            'trace_id': span.trace_id,
+            'span_id': span.span_id,
+            'parent_id': span.parent_id,
+            **span.atributos,
+        },
+    }
+    linha = json.dumps(evento, ensure_ascii=False, default=str) + '\n'
+    with _trava:
+        if _arquivo is None:
+            return
+        _arquivo.write(linha)
+        if finaliza_trace:
+            _arquivo.flush()
+
+
+# --- Controle ---
+
+def ativar(caminho: str = 'traces.jsonl'):
+    """Liga o rastreamento, acrescentando os eventos ao arquivo JSONL informado."""
+    global _ativo, _arquivo, _caminho
+    with _trava:
+        if _arquivo is not None:
+            _arquivo.close()
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        _arquivo = open(caminho, 'a', encoding='utf-8')
+        _caminho = caminho
+        _ativo = True
+
+
+def desativar():
+    global _ativo, _arquivo
+    with _trava:
+        _ativo = False
+        if _arquivo is not None:
+            _arquivo.close()
+            _arquivo = None
+
+
+def esta_ativo() -> bool:
+    return _ativo
+
+
+def caminho_saida() -> Optional[str]:
+    return _caminho
+
+
+# --- Criação de spans ---
+
+def span(nome: str, categoria: str = 'etapa', **atributos):
+    """Span filho do trace em andamento na thread (sem trace, não registra nada)."""
+    if not _ativo:
+        return _SPAN_NULO
+    pilha = _pilha()
+    if not pilha:
+        return _SPAN_NULO
+    pai = pilha[-1]
+    return Span(nome, categoria, pai.trace_id, pai.span_id, atributos)
+
+
+def trace(nome: str, categoria: str = 'trace', **atributos):
+    """Abre um trace novo (ou um span filho, se já houver um trace na thread)."""
+    if not _ativo:
+        return _SPAN_NULO
+    pilha = _pilha()
+    if pilha:
+        pai = pilha[-1]
+        return Span(nome, categoria, pai.trace_id, pai.span_id, atributos)
+    return Span(nome, categoria, uuid.uuid4().hex, None, atributos)
+
+
+def rastrear(nome: Optional[str] = None) -> Callable:
+    """Decorador: cada chamada da função abre um trace (ou span filho). Em métodos estáticos, fica abaixo do @staticmethod."""
+    def decorador(func: Callable) -> Callable:
+        rotulo = nome or func.__qualname__
+
+        @functools.wraps(func)
+        def rastreado(*args, **kwargs):
+            if not _ativo:
+                return func(*args, **kwargs)
+            with trace(rotulo):
+                return func(*args, **kwargs)
+        return rastreado
+    return decorador
+
+
+def anotar_trace(**atributos):
+    """Acrescenta atributos ao span raiz do trace em andamento (ex.: código do pedido)."""
+    if not _ativo:
+        return
+    pilha = _pilha()
+    if pilha:
+        pilha[0].atributos.update(atributos)
+
+
+def trace_id_atual() -> Optional[str]:
+    pilha = _pilha() if _ativo else None
+    return pilha[0].trace_id if pilha else None
+
+
+# --- Leitura dos traces exportados ---
+
+def ler_eventos(caminho: str) -> List[Dict[str, Any]]:
+    eventos = []
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                eventos.append(json.loads(linha))
+    return eventos
+
+
+def converter_para_chrome(caminho_jsonl: str, caminho_json: str) -> int:
+    """Gera um arquivo {"traceEvents": [...]} para chrome://tracing / Perfetto."""
+    eventos = ler_eventos(caminho_jsonl)
+    with open(caminho_json, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    return len(eventos)
+
+
+def resumir(caminho_jsonl: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Para cada tipo de trace raiz, soma a duração dos spans filhos diretos (as etapas)
+    e calcula a fração do tempo total que cada etapa representa.
+    """
+    eventos = ler_eventos(caminho_jsonl)
+    raizes = {e['args']['span_id']: e for e in eventos if e['args'].get('parent_id') is None}
+
+    por_raiz: Dict[str, Dict[str, Any]] = {}
+    for raiz in raizes.values():
+        resumo = por_raiz.setdefault(raiz['name'], {'traces': 0, 'total_ms': 0.0, 'etapas': defaultdict(float)})
+        resumo['traces'] += 1
+        resumo['total_ms'] += raiz['dur'] / 1000
+
+    for evento in eventos:
+        raiz = raizes.get(evento['args'].get('parent_id'))
+        if raiz:
+            por_raiz[raiz['name']]['etapas'][evento['name']] += evento['dur'] / 1000
+
+    for resumo in por_raiz.values():
+        total = resumo['total_ms'] or 1.0
+        resumo['etapas'] = {
+            nome: {'total_ms': ms, 'fracao': ms / total}
+            for nome, ms in sorted(resumo['etapas'].items(), key=lambda item: item[1], reverse=True)
+        }
+    return por_raiz
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Ferramentas para os traces exportados em JSONL.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    converter = subparsers.add_parser('converter', help="Converte o JSONL para o formato do chrome://tracing")
+    converter.add_argument('jsonl')
+    converter.add_argument('saida')
+
+    resumo = subparsers.add_parser('resumo', help="Mostra a fração do tempo gasta em cada etapa")
+    resumo.add_argument('jsonl')
+
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'converter':
+        total = converter_para_chrome(args.jsonl, args.saida)
+        print(f"✅ {total} evento(s) gravados em {args.saida}")
+        return
+
+    for nome, dados in resumir(args.jsonl).items():
+        media = dados['total_ms'] / dados['traces']
+        print(f"\n--- {nome}: {dados['traces']} trace(s), média {media:.3f} ms ---")
+        for etapa, valores in dados['etapas'].items():
+            print(f"  {etapa:<40} {valores['total_ms']:>12.3f} ms  {valores['fracao'] * 100:6.1f}%")
+
+
+if __name__ == '__main__':
+    main()
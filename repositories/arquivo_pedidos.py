@@ -0,0 +1,269 @@
+import bisect
+import gzip
+import json
+import lzma
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple
+from models.exceptions import PersistenciaError, ValorInvalidoError
+import repositories.dados as dados_loja
+from monitoramento import instrumentacao
+from monitoramento.instrumentacao import instrumentar
+
+# Arquivo frio de pedidos (data/arquivo/).
+#
+# Pedidos antigos em estado final saem do loja.json e vão para segmentos mensais
+# imutáveis, comprimidos (gzip ou lzma), com um pedido JSON por linha em ordem de código:
+#   pedidos-AAAA-MM-NNN.ndjson.gz|.xz   os registros
+#   pedidos-AAAA-MM-NNN.indice.json     os códigos em ordem (posição = linha no segmento)
+#   manifesto.json                      um resumo por segmento: intervalo de datas e de
+#                                       códigos, quantidade e faturamento por dia
+# O manifesto basta para decidir quais segmentos uma consulta precisa abrir: buscas por
+# código olham só os segmentos cujo intervalo de códigos comporta o prefixo (o código
+# começa pela data de criação), consultas por período só os que cruzam o período, e o
+# faturamento de segmentos inteiros dentro do período sai do resumo sem descomprimir nada.
+# Um mesmo mês pode ter vários segmentos (um por execução do arquivamento).
+
+PASTA_ARQUIVO = 'arquivo'
+MANIFESTO_FILE = 'manifesto.json'
+MANIFESTO_VERSAO = 1
+COMPRESSOES = {
+    'gzip': ('.ndjson.gz', gzip.open),
+    'lzma': ('.ndjson.xz', lzma.open),
+}
+
+# Manifesto lido por último: ((caminho, mtime_ns, tamanho), manifesto)
+_cache_manifesto: Optional[Tuple[Tuple[str, int, int], Dict[str, Any]]] = None
+# Índices já lidos, pelo caminho (segmentos nunca mudam depois de gravados)
+_cache_indices: Dict[str, List[str]] = {}
+# Uma gravação de segmentos por vez (o manifesto é ler-alterar-gravar)
+_trava_gravacao = threading.Lock()
+
+def _pasta() -> str:
+    return dados_loja._get_file_path(PASTA_ARQUIVO)
+
+def _manifesto_vazio() -> Dict[str, Any]:
+    return {'versao': MANIFESTO_VERSAO, 'segmentos': []}
+
+def data_do_registro(dados_pedido: Dict[str, Any]) -> Optional[datetime]:
+    """Data de criação de um pedido bruto (None se ausente ou inválida)."""
+    try:
+        return datetime.fromisoformat(dados_pedido['data_criacao'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def no_periodo(data: datetime, inicio: Optional[datetime], fim: Optional[datetime]) -> bool:
+    """Período semiaberto [inicio, fim); None não limita aquele lado."""
+    return (inicio is None or data >= inicio) and (fim is None or data < fim)
+
+# Manifesto e índices
+
+@instrumentar()
+def carregar_manifesto() -> Dict[str, Any]:
+    """Lê o manifesto do arquivo (vazio se ainda não houver arquivo). Não deve ser alterado."""
+    global _cache_manifesto
+    caminho = os.path.join(_pasta(), MANIFESTO_FILE)
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return _manifesto_vazio()
+    except OSError as e:
+        raise PersistenciaError(f"Erro ao carregar {MANIFESTO_FILE}: {e}")
+
+    assinatura = (caminho, info.st_mtime_ns, info.st_size)
+    cache = _cache_manifesto
+    if cache is not None and cache[0] == assinatura:
+        return cache[1]
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise PersistenciaError(f"Erro ao carregar {MANIFESTO_FILE}: {e}")
+    if manifesto.get('versao') != MANIFESTO_VERSAO:
+        raise PersistenciaError(f"Versão do {MANIFESTO_FILE} não suportada: {manifesto.get('versao')}.")
+    _cache_manifesto = (assinatura, manifesto)
+    return manifesto
+
+def _carregar_indice(segmento: Dict[str, Any]) -> List[str]:
+    caminho = os.path.join(_pasta(), segmento['indice'])
+    codigos = _cache_indices.get(caminho)
+    if codigos is None:
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                codigos = json.load(f)['codigos']
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            raise PersistenciaError(f"Erro ao carregar o índice {segmento['indice']}: {e}")
+        _cache_indices[caminho] = codigos
+    return codigos
+
+def segmentos(inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Segmentos com algum pedido no período [inicio, fim), pelo manifesto."""
+    selecionados = []
+    for segmento in carregar_manifesto()['segmentos']:
+        if fim is not None and datetime.fromisoformat(segmento['data_min']) >= fim:
+            continue
+        if inicio is not None and datetime.fromisoformat(segmento['data_max']) < inicio:
+            continue
+        selecionados.append(segmento)
+    return selecionados
+
+def contido_no_periodo(segmento: Dict[str, Any], inicio: Optional[datetime], fim: Optional[datetime]) -> bool:
+    """True se todos os pedidos do segmento estão no período (o resumo vale inteiro)."""
+    return (no_periodo(datetime.fromisoformat(segmento['data_min']), inicio, fim)
+            and no_periodo(datetime.fromisoformat(segmento['data_max']), inicio, fim))
+
+def _segmentos_por_prefixo(prefixo: str) -> List[Dict[str, Any]]:
+    """Segmentos cujo intervalo de códigos pode conter um código que começa com `prefixo`."""
+    tamanho = len(prefixo)
+    return [
+        s for s in carregar_manifesto()['segmentos']
+        if s['codigo_min'][:tamanho] <= prefixo <= s['codigo_max'][:tamanho]
+    ]
+
+# Leitura
+
+def ler_segmento(segmento: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Percorre os pedidos brutos de um segmento, descomprimindo aos poucos."""
+    caminho = os.path.join(_pasta(), segmento['arquivo'])
+    abrir = COMPRESSOES[segmento['compressao']][1]
+    lidos = 0
+    try:
+        with abrir(caminho, 'rt', encoding='utf-8') as f:
+            for linha in f:
+                lidos += len(linha)
+                yield json.loads(linha)
+    except (OSError, EOFError, lzma.LZMAError, json.JSONDecodeError) as e:
+        raise PersistenciaError(f"Erro ao ler o segmento {segmento['arquivo']}: {e}")
+    if instrumentacao.esta_ativo():
+        instrumentacao.registrar_leitura(lidos, parse_json=False)
+
+@instrumentar()
+def buscar_raw_por_codigo(codigo: str) -> Optional[Dict[str, Any]]:
+    """
+    Pedido arquivado pelo código (completo ou prefixo), como dicionário bruto. Abre só
+    os segmentos cujo índice tem o código; None se nenhum tiver.
+    """
+    for segmento in _segmentos_por_prefixo(codigo):
+        codigos = _carregar_indice(segmento)
+        posicao = bisect.bisect_left(codigos, codigo)
+        if posicao < len(codigos) and codigos[posicao].startswith(codigo):
+            for linha, registro in enumerate(ler_segmento(segmento)):
+                if linha == posicao:
+                    return registro
+    return None
+
+def contem(codigo: str) -> bool:
+    """True se o código exato já está em algum segmento."""
+    for segmento in _segmentos_por_prefixo(codigo):
+        codigos = _carregar_indice(segmento)
+        posicao = bisect.bisect_left(codigos, codigo)
+        if posicao < len(codigos) and codigos[posicao] == codigo:
+            return True
+    return False
+
+def iterar_raw(inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """Pedidos arquivados no período [inicio, fim), abrindo só os segmentos que o cruzam."""
+    for segmento in segmentos(inicio, fim):
+        if contido_no_periodo(segmento, inicio, fim):
+            yield from ler_segmento(segmento)
+            continue
+        for registro in ler_segmento(segmento):
+            data = data_do_registro(registro)
+            if data is not None and no_periodo(data, inicio, fim):
+                yield registro
+
+# Gravação
+
+def _resumo(mes: str, arquivo: str, indice: str, compressao: str, registros: List[Dict[str, Any]]) -> Dict[str, Any]:
+    datas = [data_do_registro(r) for r in registros]
+    faturamento_por_dia: Dict[str, float] = {}
+    for registro, data in zip(registros, datas):
+        if 'total' in registro:
+            dia = data.strftime('%Y-%m-%d')
+            faturamento_por_dia[dia] = faturamento_por_dia.get(dia, 0.0) + registro['total']
+    return {
+        'mes': mes,
+        'arquivo': arquivo,
+        'indice': indice,
+        'compressao': compressao,
+        'quantidade': len(registros),
+        'data_min': min(datas).isoformat(),
+        'data_max': max(datas).isoformat(),
+        'codigo_min': registros[0]['codigo_pedido'],
+        'codigo_max': registros[-1]['codigo_pedido'],
+        'faturamento_por_dia': dict(sorted(faturamento_por_dia.items())),
+        'criado_em': datetime.now().isoformat(),
+    }
+
+def _gravar_segmento(caminho: str, compressao: str, registros: List[Dict[str, Any]]) -> int:
+    def escrever(f):
+        if compressao == 'gzip':
+            comprimido = gzip.GzipFile(fileobj=f, mode='wb', mtime=0)
+        else:
+            comprimido = lzma.LZMAFile(f, 'wb')
+        with comprimido:
+            for registro in registros:
+                comprimido.write(json.dumps(registro, ensure_ascii=False).encode('utf-8'))
+                comprimido.write(b'\n')
+
+    info = dados_loja._gravar_atomicamente(caminho, escrever, 'wb')
+    if instrumentacao.esta_ativo():
+        instrumentacao.registrar_escrita(info.st_size)
+    return info.st_size
+
+@instrumentar()
+def gravar_segmentos(registros: Iterable[Dict[str, Any]], compressao: str = 'gzip') -> List[Dict[str, Any]]:
+    """
+    Grava os pedidos brutos em novos segmentos, um por mês de criação, e os registra no
+    manifesto (gravado por último: um segmento fora do manifesto é ignorado pelas leituras).
+    Pedidos sem data de criação válida são recusados. Retorna os resumos dos segmentos novos.
+    """
+    global _cache_manifesto
+    if compressao not in COMPRESSOES:
+        raise ValorInvalidoError(f"Compressão '{compressao}' inválida (use {', '.join(COMPRESSOES)}).")
+    por_mes: Dict[str, List[Dict[str, Any]]] = {}
+    for registro in registros:
+        data = data_do_registro(registro)
+        if data is None:
+            raise ValorInvalidoError(f"Pedido {registro.get('codigo_pedido')} sem data de criação válida.")
+        por_mes.setdefault(data.strftime('%Y-%m'), []).append(registro)
+    if not por_mes:
+        return []
+
+    with _trava_gravacao:
+        manifesto = carregar_manifesto()
+        existentes = {s['arquivo'] for s in manifesto['segmentos']}
+        novos = []
+        for mes, registros_mes in sorted(por_mes.items()):
+            registros_mes.sort(key=lambda r: r['codigo_pedido'])
+            numero = 1
+            while any(arquivo.startswith(f"pedidos-{mes}-{numero:03d}.") for arquivo in existentes):
+                numero += 1
+            base = f"pedidos-{mes}-{numero:03d}"
+            arquivo = base + COMPRESSOES[compressao][0]
+            indice = base + '.indice.json'
+            existentes.add(arquivo)
+
+            resumo = _resumo(mes, arquivo, indice, compressao, registros_mes)
+            codigos = [r['codigo_pedido'] for r in registros_mes]
+            try:
+                resumo['bytes'] = _gravar_segmento(os.path.join(_pasta(), arquivo), compressao, registros_mes)
+                dados_loja._gravar_atomicamente(
+                    os.path.join(_pasta(), indice), lambda f: json.dump({'codigos': codigos}, f), 'w'
+                )
+            except OSError as e:
+                raise PersistenciaError(f"Erro ao gravar o segmento {arquivo}: {e}")
+            novos.append(resumo)
+
+        novo_manifesto = {'versao': MANIFESTO_VERSAO, 'segmentos': manifesto['segmentos'] + novos}
+        novo_manifesto['segmentos'].sort(key=lambda s: s['arquivo'])
+        try:
+            dados_loja._gravar_atomicamente(
+                os.path.join(_pasta(), MANIFESTO_FILE),
+                lambda f: json.dump(novo_manifesto, f, indent=4, ensure_ascii=False), 'w'
+            )
+        except OSError as e:
+            raise PersistenciaError(f"Erro ao salvar {MANIFESTO_FILE}: {e}")
+        _cache_manifesto = None
+    return novos
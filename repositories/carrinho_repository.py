@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import repositories.dados as dados_loja
+from monitoramento.instrumentacao import instrumentar
+
+# Carrinhos frios das sessões (services/sessao_service.py), fora da memória.
+#
+# Um arquivo SQLite na pasta de dados com uma linha por sessão: o id da sessão (chave
+# primária, tabela WITHOUT ROWID), o instante de vencimento (epoch, com índice para a
+# varredura) e o Carrinho.to_dict em JSON compacto. Milhões de carrinhos parados custam
+# algumas centenas de bytes cada no disco e nada na memória; cada leitura ou gravação
+# toca só as linhas pedidas. O modo WAL deixa leitores e o gravador em paralelo.
+#
+# Os carrinhos não fazem parte da loja: não entram nas transações de dados.py nem no
+# loja.json, e um carrinho perdido não afeta pedidos nem estoque.
+
+CARRINHOS_FILE = 'carrinhos.sqlite3'
+# Máximo de variáveis por comando (limite padrão do SQLite é 999 em versões antigas)
+_LOTE_SQL = 500
+
+_ESQUEMA = (
+    "CREATE TABLE IF NOT EXISTS carrinhos ("
+    " id_sessao TEXT PRIMARY KEY, expira_em REAL NOT NULL, carrinho TEXT NOT NULL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS carrinhos_expira_em ON carrinhos (expira_em)",
+)
+
+_trava = threading.Lock()
+# caminho do arquivo -> conexão (compartilhada entre threads; o uso é serializado pela _trava)
+_conexoes: Dict[str, sqlite3.Connection] = {}
+
+
+def caminho_carrinhos() -> str:
+    return dados_loja._get_file_path(CARRINHOS_FILE)
+
+
+def _conexao() -> sqlite3.Connection:
+    """Conexão com o arquivo da pasta de dados atual (criado na primeira vez). Chamada com a _trava."""
+    caminho = caminho_carrinhos()
+    conexao = _conexoes.get(caminho)
+    if conexao is None:
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        for comando in _ESQUEMA:
+            conexao.execute(comando)
+        _conexoes[caminho] = conexao
+    return conexao
+
+
+def _em_lotes(valores: List[Any]) -> Iterable[List[Any]]:
+    for inicio in range(0, len(valores), _LOTE_SQL):
+        yield valores[inicio:inicio + _LOTE_SQL]
+
+
+def _codificar(registro: Dict[str, Any]) -> str:
+    return json.dumps(registro, separators=(',', ':'), ensure_ascii=False)
+
+
+@instrumentar()
+def gravar(carrinhos: Iterable[Tuple[str, Dict[str, Any], float]]) -> int:
+    """
+    Grava (ou substitui) os carrinhos (id_sessao, Carrinho.to_dict(), vence_em) em uma
+    única transação. Retorna a quantidade gravada.
+    """
+    linhas = [(id_sessao, expira_em, _codificar(registro)) for id_sessao, registro, expira_em in carrinhos]
+    if not linhas:
+        return 0
+    with _trava:
+        conexao = _conexao()
+        with conexao:
+            conexao.execute("BEGIN")
+            conexao.executemany(
+                "INSERT OR REPLACE INTO carrinhos (id_sessao, expira_em, carrinho) VALUES (?, ?, ?)", linhas
+            )
+    return len(linhas)
+
+
+@instrumentar()
+def carregar(ids_sessao: Iterable[str], agora: float) -> Dict[str, Tuple[Dict[str, Any], float]]:
+    """
+    Carrinhos gravados e ainda não vencidos em `agora`: id_sessao -> (registro, vence_em).
+    Registros ilegíveis são ignorados (como carrinhos ausentes).
+    """
+    ids = list(dict.fromkeys(ids_sessao))
+    encontrados: Dict[str, Tuple[Dict[str, Any], float]] = {}
+    if not ids:
+        return encontrados
+    with _trava:
+        conexao = _conexao()
+        for lote in _em_lotes(ids):
+            marcadores = ','.join('?' * len(lote))
+            linhas = conexao.execute(
+                f"SELECT id_sessao, expira_em, carrinho FROM carrinhos WHERE id_sessao IN ({marcadores}) AND expira_em > ?",
+                (*lote, agora)
+            ).fetchall()
+            for id_sessao, expira_em, texto in linhas:
+                try:
+                    encontrados[id_sessao] = (json.loads(texto), expira_em)
+                except ValueError:
+                    continue
+    return encontrados
+
+
+@instrumentar()
+def remover(ids_sessao: Iterable[str]) -> int:
+    """Apaga os carrinhos das sessões informadas. Retorna quantos existiam."""
+    ids = list(dict.fromkeys(ids_sessao))
+    if not ids:
+        return 0
+    removidos = 0
+    with _trava:
+        conexao = _conexao()
+        with conexao:
+            conexao.execute("BEGIN")
+            for lote in _em_lotes(ids):
+                marcadores = ','.join('?' * len(lote))
+                removidos += conexao.execute(f"DELETE FROM carrinhos WHERE id_sessao IN ({marcadores})", lote).rowcount
+    return removidos
+
+
+@instrumentar()
+def remover_vencidos(agora: float, limite: Optional[int] = None) -> int:
+    """
+    Apaga os carrinhos vencidos até `agora` (no máximo `limite` por chamada, para não
+    segurar o arquivo por muito tempo). Retorna quantos foram apagados.
+    """
+    with _trava:
+        conexao = _conexao()
+        with conexao:
+            conexao.execute("BEGIN")
+            if limite is None:
+                return conexao.execute("DELETE FROM carrinhos WHERE expira_em <= ?", (agora,)).rowcount
+            return conexao.execute(
+                "DELETE FROM carrinhos WHERE id_sessao IN "
+                "(SELECT id_sessao FROM carrinhos WHERE expira_em <= ? ORDER BY expira_em LIMIT ?)",
+                (agora, limite)
+            ).rowcount
+
+
+def contar() -> int:
+    """Quantidade de carrinhos gravados (inclusive os vencidos ainda não varridos)."""
+    with _trava:
+        return _conexao().execute("SELECT COUNT(*) FROM carrinhos").fetchone()[0]
+
+
+def tamanho() -> int:
+    """Bytes ocupados no disco (arquivo principal + WAL)."""
+    caminho = caminho_carrinhos()
+    return sum(os.path.getsize(c) for c in (caminho, caminho + '-wal') if os.path.exists(c))
+
+
+def fechar():
+    """Fecha as conexões abertas (ex.: antes de apagar uma pasta de dados temporária)."""
+    with _trava:
+        for conexao in _conexoes.values():
+            conexao.close()
+        _conexoes.clear()
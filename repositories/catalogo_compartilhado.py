@@ -0,0 +1,324 @@
+import argparse
+import math
+import struct
+import sys
+import time
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Iterator, List, Optional
+from models.entidades import Produto, ProdutoFisico
+from models.exceptions import EntidadeNaoEncontradaError, PersistenciaError
+
+# Catálogo de produtos somente leitura em memória compartilhada, para vários processos
+# worker não manterem cada um a sua cópia decodificada do catálogo.
+#
+# Dois segmentos (multiprocessing.shared_memory):
+#   <nome>_ctl      controle: geração atual e nome do segmento de dados (seqlock)
+#   <nome>_g<N>     dados da geração N, em layout fixo:
+#       cabeçalho (64 bytes)
+#       registros de 64 bytes por produto (offsets das strings, preço, peso, estoque, versão, flags)
+#       índice hash por SKU: tabela de int32 (endereçamento aberto, crc32 do SKU), -1 = vazio
+#       strings UTF-8 concatenadas (SKU, nome, categoria)
+#
+# O publicador grava uma geração nova inteira, troca o controle e remove a anterior;
+# os workers mapeiam o segmento sem cópia e só montam Produto/ProdutoFisico quando pedem.
+# Quem já está mapeado continua lendo a geração antiga até chamar atualizar().
+# O estoque é uma foto do momento da publicação: serve para exibição, não para baixa
+# (a baixa continua passando pelo produto_repository, com controle de versão).
+
+NOME_PADRAO = 'loja_catalogo'
+MAGIC_DADOS = b'CATALOGO'
+MAGIC_CONTROLE = b'CATCTRL1'
+VERSAO_FORMATO = 1
+
+_CABECALHO = struct.Struct('<8sIII4xQQQQ')   # magic, versão, quantidade, buckets, geração, off_índice, off_strings, tamanho_strings
+_TAMANHO_CABECALHO = 64
+_REGISTRO = struct.Struct('<IIIIIIddqqB7x')  # sku, nome, categoria (offset, tamanho), preço, peso, estoque, versão, flags
+_CONTROLE = struct.Struct('<8sQQ64s')       # magic, sequência (ímpar = publicação em andamento), geração, nome dos dados
+
+_FLAG_ATIVO = 1
+_FLAG_FISICO = 2
+_VAZIO = -1
+
+
+def _hash_sku(sku: bytes) -> int:
+    # hash() do Python muda a cada processo; crc32 é igual em todos os workers
+    return zlib.crc32(sku)
+
+
+def _anexar(nome: str) -> shared_memory.SharedMemory:
+    """
+    Mapeia um segmento existente. No Python 3.11 o resource_tracker registra também os
+    segmentos apenas anexados e os remove quando o processo termina; o registro é
+    desfeito para que a saída de um worker não apague o catálogo dos demais.
+    """
+    segmento = shared_memory.SharedMemory(name=nome)
+    resource_tracker.unregister(segmento._name, 'shared_memory')
+    return segmento
+
+
+def _criar(nome: str, tamanho: int) -> shared_memory.SharedMemory:
+    """Cria um segmento que sobrevive ao processo publicador (removido por remover_catalogo)."""
+    segmento = shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+    resource_tracker.unregister(segmento._name, 'shared_memory')
+    return segmento
+
+
+def _remover(nome: str):
+    try:
+        # Anexado com registro no resource_tracker: o próprio unlink() desfaz o registro
+        segmento = shared_memory.SharedMemory(name=nome)
+    except FileNotFoundError:
+        return
+    segmento.close()
+    segmento.unlink()
+
+
+def _serializar(produtos: List[Dict[str, Any]], geracao: int) -> bytes:
+    """Monta o conteúdo completo de uma geração do catálogo."""
+    quantidade = len(produtos)
+    buckets = 1 << max(4, math.ceil(math.log2(max(quantidade, 1) * 2)))
+    off_indice = _TAMANHO_CABECALHO + quantidade * _REGISTRO.size
+    off_strings = off_indice + buckets * 4
+
+    registros = bytearray(quantidade * _REGISTRO.size)
+    indice = [_VAZIO] * buckets
+    strings = bytearray()
+    mascara = buckets - 1
+
+    def guardar(texto: str):
+        codificado = texto.encode('utf-8')
+        posicao = len(strings)
+        strings.extend(codificado)
+        return posicao, len(codificado)
+
+    for i, p in enumerate(produtos):
+        sku = str(p['sku'])
+        off_sku, tam_sku = guardar(sku)
+        off_nome, tam_nome = guardar(p.get('nome', ''))
+        off_cat, tam_cat = guardar(p.get('categoria', ''))
+        fisico = p.get('tipo') == 'ProdutoFisico' and 'peso' in p
+        flags = (_FLAG_ATIVO if p.get('is_ativo', True) else 0) | (_FLAG_FISICO if fisico else 0)
+        _REGISTRO.pack_into(
+            registros, i * _REGISTRO.size,
+            off_sku, tam_sku, off_nome, tam_nome, off_cat, tam_cat,
+            float(p['preco_unitario']), float(p['peso']) if fisico else 0.0,
+            int(p.get('estoque', 0)), int(p.get('versao', 0)), flags
+        )
+
+        posicao = _hash_sku(sku.encode('utf-8')) & mascara
+        while indice[posicao] != _VAZIO:
+            posicao = (posicao + 1) & mascara
+        indice[posicao] = i
+
+    cabecalho = bytearray(_TAMANHO_CABECALHO)
+    _CABECALHO.pack_into(cabecalho, 0, MAGIC_DADOS, VERSAO_FORMATO, quantidade, buckets, geracao, off_indice, off_strings, len(strings))
+    return bytes(cabecalho) + bytes(registros) + struct.pack(f'<{buckets}i', *indice) + bytes(strings)
+
+
+def _ler_controle(controle: shared_memory.SharedMemory):
+    """Lê (geração, nome dos dados) de forma consistente (seqlock: repete se houver publicação no meio)."""
+    while True:
+        magic, seq_antes, geracao, nome = _CONTROLE.unpack_from(controle.buf, 0)
+        if magic != MAGIC_CONTROLE:
+            raise PersistenciaError("Segmento de controle do catálogo inválido.")
+        if seq_antes % 2 == 0:
+            _, seq_depois, _, _ = _CONTROLE.unpack_from(controle.buf, 0)
+            if seq_depois == seq_antes:
+                return geracao, nome.rstrip(b'\0').decode('ascii')
+        time.sleep(0)
+
+
+def publicar_catalogo(produtos: Optional[List[Dict[str, Any]]] = None, nome: str = NOME_PADRAO) -> int:
+    """
+    Publica uma nova geração do catálogo (por padrão, os produtos atuais do repositório)
+    e remove a anterior. Retorna o número da nova geração.
+    """
+    if produtos is None:
+        import repositories.produto_repository as produto_repository
+        produtos = produto_repository.carregar_todos_produtos_raw()
+
+    try:
+        controle = _anexar(f"{nome}_ctl")
+        geracao_atual, nome_atual = _ler_controle(controle)
+        seq = _CONTROLE.unpack_from(controle.buf, 0)[1]
+    except FileNotFoundError:
+        controle = _criar(f"{nome}_ctl", _CONTROLE.size)
+        geracao_atual, nome_atual, seq = 0, None, 0
+
+    geracao = geracao_atual + 1
+    conteudo = _serializar(produtos, geracao)
+    nome_dados = f"{nome}_g{geracao}"
+    dados = _criar(nome_dados, len(conteudo))
+    dados.buf[:len(conteudo)] = conteudo
+    dados.close()
+
+    # Seqlock: sequência ímpar durante a troca, par quando o controle está consistente
+    _CONTROLE.pack_into(controle.buf, 0, MAGIC_CONTROLE, seq + 1, geracao_atual, (nome_atual or '').encode('ascii'))
+    _CONTROLE.pack_into(controle.buf, 0, MAGIC_CONTROLE, seq + 1, geracao, nome_dados.encode('ascii'))
+    _CONTROLE.pack_into(controle.buf, 0, MAGIC_CONTROLE, seq + 2, geracao, nome_dados.encode('ascii'))
+    controle.close()
+
+    if nome_atual:
+        # Workers que já mapearam a geração anterior continuam com ela até atualizar()
+        _remover(nome_atual)
+    return geracao
+
+
+def remover_catalogo(nome: str = NOME_PADRAO):
+    """Remove o segmento de controle e a geração atual do catálogo."""
+    try:
+        controle = _anexar(f"{nome}_ctl")
+    except FileNotFoundError:
+        return
+    _, nome_dados = _ler_controle(controle)
+    controle.close()
+    _remover(nome_dados)
+    _remover(f"{nome}_ctl")
+
+
+class CatalogoCompartilhado:
+    """Visão somente leitura, sem cópia, do catálogo publicado em memória compartilhada."""
+
+    def __init__(self, nome: str = NOME_PADRAO):
+        self._nome = nome
+        try:
+            self._controle = _anexar(f"{nome}_ctl")
+        except FileNotFoundError:
+            raise EntidadeNaoEncontradaError(f"Catálogo compartilhado '{nome}' não foi publicado.")
+        self._dados: Optional[shared_memory.SharedMemory] = None
+        self._geracao = 0
+        self.atualizar()
+
+    @property
+    def geracao(self) -> int: return self._geracao
+
+    def __len__(self) -> int: return self._quantidade
+
+    def atualizar(self) -> bool:
+        """Passa para a geração publicada mais recente, se houver uma nova. Retorna True se trocou."""
+        while True:
+            geracao, nome_dados = _ler_controle(self._controle)
+            if geracao == self._geracao:
+                return False
+            try:
+                dados = _anexar(nome_dados)
+            except FileNotFoundError:
+                # Uma geração ainda mais nova foi publicada entre a leitura e o mapeamento
+                continue
+            self._mapear(dados)
+            return True
+
+    def _mapear(self, dados: shared_memory.SharedMemory):
+        magic, versao, quantidade, buckets, geracao, off_indice, off_strings, tamanho_strings = _CABECALHO.unpack_from(dados.buf, 0)
+        if magic != MAGIC_DADOS or versao != VERSAO_FORMATO:
+            dados.close()
+            raise PersistenciaError("Segmento de dados do catálogo em formato desconhecido.")
+        self._soltar_mapeamento()
+        self._dados = dados
+        self._buf = dados.buf
+        self._quantidade = quantidade
+        self._mascara = buckets - 1
+        self._indice = self._buf[off_indice:off_indice + buckets * 4].cast('i')
+        self._strings = self._buf[off_strings:off_strings + tamanho_strings]
+        self._geracao = geracao
+
+    def _soltar_mapeamento(self):
+        if self._dados is None:
+            return
+        # Views sobre o buffer precisam ser liberadas antes de fechar o segmento
+        self._indice.release()
+        self._strings.release()
+        self._buf = None
+        self._dados.close()
+        self._dados = None
+
+    def fechar(self):
+        self._soltar_mapeamento()
+        self._controle.close()
+        self._controle = None
+
+    def __del__(self):
+        # Sem isto, o SharedMemory tentaria fechar o mapeamento com as views ainda exportadas
+        if getattr(self, '_controle', None) is not None:
+            self.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    def _texto(self, offset: int, tamanho: int) -> str:
+        return str(self._strings[offset:offset + tamanho], 'utf-8')
+
+    def _posicao(self, sku: str) -> int:
+        chave = sku.strip().upper().encode('utf-8')
+        posicao = _hash_sku(chave) & self._mascara
+        while True:
+            i = self._indice[posicao]
+            if i == _VAZIO:
+                return _VAZIO
+            off_sku, tam_sku = struct.unpack_from('<II', self._buf, _TAMANHO_CABECALHO + i * _REGISTRO.size)
+            if self._strings[off_sku:off_sku + tam_sku] == chave:
+                return i
+            posicao = (posicao + 1) & self._mascara
+
+    def _produto(self, i: int) -> Produto:
+        (off_sku, tam_sku, off_nome, tam_nome, off_cat, tam_cat,
+         preco, peso, estoque, versao, flags) = _REGISTRO.unpack_from(self._buf, _TAMANHO_CABECALHO + i * _REGISTRO.size)
+        sku = self._texto(off_sku, tam_sku)
+        nome = self._texto(off_nome, tam_nome)
+        categoria = self._texto(off_cat, tam_cat)
+        ativo = bool(flags & _FLAG_ATIVO)
+        if flags & _FLAG_FISICO:
+            return ProdutoFisico(sku, nome, categoria, preco, estoque, peso, ativo, versao)
+        return Produto(sku, nome, categoria, preco, estoque, ativo, versao)
+
+    def contem(self, sku: str) -> bool:
+        return self._posicao(sku) != _VAZIO
+
+    def buscar_por_sku(self, sku: str) -> Optional[Produto]:
+        """Monta o Produto/ProdutoFisico do SKU (None se não estiver no catálogo)."""
+        i = self._posicao(sku)
+        return None if i == _VAZIO else self._produto(i)
+
+    def __iter__(self) -> Iterator[Produto]:
+        for i in range(self._quantidade):
+            yield self._produto(i)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Catálogo de produtos em memória compartilhada.")
+    parser.add_argument('--nome', default=NOME_PADRAO, help="Prefixo dos segmentos de memória compartilhada")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('publicar', help="Publica os produtos atuais do loja.json como nova geração")
+    subparsers.add_parser('info', help="Mostra a geração e o tamanho do catálogo publicado")
+    buscar = subparsers.add_parser('buscar', help="Busca um SKU no catálogo publicado")
+    buscar.add_argument('sku')
+    subparsers.add_parser('remover', help="Remove o catálogo da memória compartilhada")
+    args = parser.parse_args(argumentos)
+
+    try:
+        if args.comando == 'publicar':
+            inicio = time.perf_counter()
+            geracao = publicar_catalogo(nome=args.nome)
+            print(f"✅ Catálogo publicado (geração {geracao}) em {time.perf_counter() - inicio:.2f}s.")
+        elif args.comando == 'remover':
+            remover_catalogo(args.nome)
+            print("✅ Catálogo removido.")
+        else:
+            with CatalogoCompartilhado(args.nome) as catalogo:
+                if args.comando == 'info':
+                    print(f"Geração {catalogo.geracao}: {len(catalogo)} produto(s), {catalogo._dados.size / 1e6:.1f} MB.")
+                else:
+                    produto = catalogo.buscar_por_sku(args.sku)
+                    print(produto.to_dict() if produto else f"⚠️ SKU {args.sku} não está no catálogo.")
+    except (EntidadeNaoEncontradaError, PersistenciaError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -1,71 +1,60 @@
-import json
-import os
 import re
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator
 from models.entidades import Cliente, Endereco
 from models.exceptions import EntidadeNaoEncontradaError, DocumentoInvalidoError
 from datetime import datetime
+import repositories.dados as dados_loja
+from repositories import eventos, hidratacao, internamento
+from monitoramento.instrumentacao import instrumentar
 
-# Constantes e Funções Auxiliares de Gerenciamento de Arquivo
-
-NOME_ARQUIVO = 'loja.json'
-
-def _get_file_path() -> str:
-    """Gera o caminho completo para o arquivo loja.json na pasta data/."""
-    # Assume que repositories/ está um nível acima de data/
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_dir, 'data', NOME_ARQUIVO)
+# Funções Auxiliares de Gerenciamento de Arquivo (o I/O fica centralizado em dados.py)
 
+@instrumentar()
 def _carregar_dados() -> Dict[str, Any]:
-    """Carrega todo o conteúdo do arquivo loja.json."""
-    caminho = _get_file_path()
-    
-    # Estrutura base para inicialização
-    estrutura_base = {
-        'clientes': [], 
-        'produtos': [], 
-        'pedidos': [],
-        'cupons': [] # Incluído para compatibilidade
-    }
-    
-    if not os.path.exists(caminho):
-        # Cria o arquivo com a estrutura base se não existir
-        os.makedirs(os.path.dirname(caminho), exist_ok=True)
-        with open(caminho, 'w', encoding='utf-8') as f:
-            json.dump(estrutura_base, f, indent=4, ensure_ascii=False)
-        return estrutura_base
-        
-    try:
-        with open(caminho, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        # Em caso de erro, retorna a estrutura base e tenta salvar o arquivo novamente
-        print(f"⚠️ Aviso: Arquivo {NOME_ARQUIVO} corrompido ou vazio. Recriando...")
-        _salvar_dados(estrutura_base)
-        return estrutura_base
+    """Carrega os clientes da loja (na loja dividida por coleção, só os arquivos deles)."""
+    return dados_loja.carregar_dados_loja(('clientes',))
 
+@instrumentar()
 def _salvar_dados(dados: Dict[str, Any]):
-    """Salva todo o conteúdo no arquivo loja.json."""
-    caminho = _get_file_path()
-    os.makedirs(os.path.dirname(caminho), exist_ok=True) # Garante que a pasta existe
-    with open(caminho, 'w', encoding='utf-8') as f:
-        json.dump(dados, f, indent=4, ensure_ascii=False)
+    """Salva o conteúdo lido por _carregar_dados (as demais coleções ficam como estão)."""
+    dados_loja.salvar_dados_loja(dados)
+
+def _evento_salvo(cpf_limpo: str, novo: bool) -> eventos.EventoAlteracao:
+    return eventos.EventoAlteracao(eventos.CLIENTE_SALVO, cpf_limpo, detalhes={'novo': novo})
 
 # Funções de Desserialização
 
-def _deserializar_cliente(dados_cliente: Dict[str, Any]) -> Cliente:
-    """Converte um dicionário de dados em um objeto Cliente."""
+def _novo_endereco(end_data: Dict[str, Any]) -> Endereco:
+    endereco = Endereco(
+        cep=end_data['cep'],
+        logradouro=end_data['logradouro'],
+        numero=end_data['numero'],
+        cidade=internamento.texto(end_data['cidade']),
+        uf=end_data['uf'],
+        complemento=end_data.get('complemento')
+    )
+    endereco._uf = internamento.texto(endereco._uf)
+    return endereco
+
+def _deserializar_cliente(dados_cliente: Dict[str, Any], confiavel: bool = False) -> Cliente:
+    """
+    Converte um dicionário de dados em um objeto Cliente.
+    `confiavel`: o registro vem de uma loja conferida (hidratacao.conferir_loja) e é
+    montado pelo codec, sem repetir a validação do CPF e dos CEPs.
+    """
     
     enderecos = []
+    novo_endereco = hidratacao.codec(Endereco) if confiavel else _novo_endereco
     for end_data in dados_cliente.get('enderecos', []):
-        enderecos.append(Endereco(
-            cep=end_data['cep'],
-            logradouro=end_data['logradouro'],
-            numero=end_data['numero'],
-            cidade=end_data['cidade'],
-            uf=end_data['uf'],
-            complemento=end_data.get('complemento')
-        ))
+        # Endereco é imutável: o mesmo endereço é compartilhado entre os Clientes
+        # hidratados (ex.: um por pedido do cliente), ver repositories/internamento.py.
+        # Os dois caminhos têm entradas separadas: um endereço validado nunca é trocado
+        # por um montado pelo codec (nem o contrário, o que esconderia a conferência).
+        chave = (confiavel, end_data['cep'], end_data['logradouro'], end_data['numero'],
+                 end_data['cidade'], end_data['uf'], end_data.get('complemento'))
+        enderecos.append(internamento.compartilhado(Endereco, chave, lambda: novo_endereco(end_data)))
+    if confiavel:
+        return hidratacao.codec(Cliente)(dados_cliente, enderecos)
         
     data_cadastro = datetime.fromisoformat(dados_cliente['data_cadastro']) \
         if dados_cliente.get('data_cadastro') else None
@@ -80,12 +69,14 @@ def _deserializar_cliente(dados_cliente: Dict[str, Any]) -> Cliente:
 
 # Funções de Repositório
 
+@instrumentar()
+@dados_loja.em_escrita
 def salvar(cliente: Cliente):
     """
     Salva ou atualiza um cliente. Se o cliente já existir (pelo CPF), 
     ele é substituído. Caso contrário, é adicionado.
     """
-    dados = _carregar_dados()
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
     
     # Limpa CPF para comparação
     cpf_limpo = re.sub(r'\D', '', cliente.cpf)
@@ -93,17 +84,56 @@ def salvar(cliente: Cliente):
     lista_clientes = dados.get('clientes', [])
     
     # Procura o índice do cliente
+    novo = False
     try:
         idx = next(i for i, c in enumerate(lista_clientes) if re.sub(r'\D', '', c['cpf']) == cpf_limpo)
         # Cliente encontrado: Substitui o registro existente
         lista_clientes[idx] = cliente.to_dict()
     except StopIteration:
         # Cliente não encontrado: Adiciona novo registro
+        novo = True
         lista_clientes.append(cliente.to_dict())
         
     dados['clientes'] = lista_clientes
     _salvar_dados(dados)
+    if eventos.feed.ativo():
+        eventos.feed.publicar([_evento_salvo(cpf_limpo, novo)])
+
+@instrumentar()
+@dados_loja.em_escrita
+def salvar_em_lote(clientes: Iterable[Cliente]) -> int:
+    """
+    Salva ou atualiza vários clientes com uma única leitura e uma única escrita
+    do arquivo. Retorna a quantidade de clientes gravados.
+    """
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
+    
+    lista_clientes = dados.get('clientes', [])
+    
+    # Índice CPF limpo -> posição, montado uma vez para o lote inteiro
+    indice = {re.sub(r'\D', '', c['cpf']): i for i, c in enumerate(lista_clientes)}
+    
+    total = 0
+    anunciar = eventos.feed.ativo()
+    alteracoes = []
+    for cliente in clientes:
+        cpf_limpo = re.sub(r'\D', '', cliente.cpf)
+        idx = indice.get(cpf_limpo)
+        if idx is None:
+            indice[cpf_limpo] = len(lista_clientes)
+            lista_clientes.append(cliente.to_dict())
+        else:
+            lista_clientes[idx] = cliente.to_dict()
+        if anunciar:
+            alteracoes.append(_evento_salvo(cpf_limpo, idx is None))
+        total += 1
+        
+    dados['clientes'] = lista_clientes
+    _salvar_dados(dados)
+    eventos.feed.publicar(alteracoes)
+    return total
 
+@instrumentar()
 def buscar_por_cpf(cpf: str) -> Optional[Cliente]:
     """Busca um cliente pelo CPF (ignorando formatação)."""
     
@@ -115,11 +145,50 @@ def buscar_por_cpf(cpf: str) -> Optional[Cliente]:
     
     for c in dados.get('clientes', []):
         if re.sub(r'\D', '', c['cpf']) == cpf_limpo:
-            return _deserializar_cliente(c)
+            return _deserializar_cliente(c, dados_loja.esquema_confiavel(dados))
             
     return None
 
+@instrumentar()
+def buscar_por_cpfs(cpfs: Iterable[str]) -> Dict[str, Cliente]:
+    """
+    Busca vários clientes pelo CPF em uma única passada pela lista. Retorna CPF (como
+    informado) -> Cliente; CPFs inválidos ou não encontrados ficam de fora.
+    """
+    procurados: Dict[str, List[str]] = {}
+    for cpf in cpfs:
+        if Cliente.validar_cpf(cpf):
+            procurados.setdefault(re.sub(r'\D', '', cpf), []).append(cpf)
+    dados = _carregar_dados()
+    confiavel = dados_loja.esquema_confiavel(dados)
+    encontrados: Dict[str, Cliente] = {}
+    restantes = len(procurados)
+    for c in dados.get('clientes', []):
+        if not restantes:
+            break
+        informados = procurados.get(re.sub(r'\D', '', c['cpf']))
+        if informados and informados[0] not in encontrados:
+            cliente = _deserializar_cliente(c, confiavel)
+            encontrados.update((cpf, cliente) for cpf in informados)
+            restantes -= 1
+    return encontrados
+
+@instrumentar()
 def carregar_todos() -> List[Cliente]:
     """Retorna a lista completa de todos os clientes."""
     dados = _carregar_dados()
-    return [_deserializar_cliente(c) for c in dados.get('clientes', [])]
\ No newline at end of file
+    confiavel = dados_loja.esquema_confiavel(dados)
+    return [_deserializar_cliente(c, confiavel) for c in dados.get('clientes', [])]
+
+@instrumentar()
+def carregar_todos_clientes_raw() -> List[Dict[str, Any]]:
+    """Retorna a lista de clientes como dicionários brutos (para exportação)."""
+    dados = _carregar_dados()
+    return dados.get('clientes', [])
+
+def iterar_clientes_raw() -> Iterator[Dict[str, Any]]:
+    """
+    Clientes brutos, um a um: da loja em memória se ela já estiver carregada, senão lidos
+    aos poucos do arquivo (sem carregar as outras coleções nem a lista inteira).
+    """
+    return dados_loja.iterar_colecao('clientes')
\ No newline at end of file
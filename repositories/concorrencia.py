@@ -0,0 +1,100 @@
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+class TravaLeituraEscrita:
+    """
+    Trava leitores-escritor: vários leitores ao mesmo tempo, um escritor por vez e
+    exclusivo. Escritores aguardando têm preferência sobre novos leitores (evita que um
+    fluxo contínuo de buscas atrase as gravações indefinidamente).
+
+    É reentrante por thread: quem tem a escrita pode ler e escrever de novo, e um leitor
+    pode voltar a ler mesmo com um escritor aguardando. Promover leitura para escrita
+    não é permitido (dois leitores promovendo ao mesmo tempo travariam um ao outro).
+    """
+
+    def __init__(self):
+        self._condicao = threading.Condition(threading.Lock())
+        self._leitores = 0
+        self._escritor = None
+        self._profundidade_escrita = 0
+        self._escritores_aguardando = 0
+        self._local = threading.local()
+
+    def _leituras_da_thread(self) -> int:
+        return getattr(self._local, 'leituras', 0)
+
+    def adquirir_leitura(self):
+        eu = threading.get_ident()
+        with self._condicao:
+            if self._escritor == eu:
+                # Leitura dentro da própria escrita: não conta como leitor
+                self._local.leituras_na_escrita = getattr(self._local, 'leituras_na_escrita', 0) + 1
+                return
+            if self._leituras_da_thread() == 0:
+                while self._escritor is not None or self._escritores_aguardando:
+                    self._condicao.wait()
+            self._local.leituras = self._leituras_da_thread() + 1
+            self._leitores += 1
+
+    def liberar_leitura(self):
+        with self._condicao:
+            if getattr(self._local, 'leituras_na_escrita', 0):
+                self._local.leituras_na_escrita -= 1
+                return
+            self._local.leituras -= 1
+            self._leitores -= 1
+            if self._leitores == 0:
+                self._condicao.notify_all()
+
+    def adquirir_escrita(self):
+        eu = threading.get_ident()
+        with self._condicao:
+            if self._escritor == eu:
+                self._profundidade_escrita += 1
+                return
+            if self._leituras_da_thread():
+                raise RuntimeError("Não é possível obter a escrita enquanto a mesma thread mantém uma leitura.")
+            self._escritores_aguardando += 1
+            try:
+                while self._escritor is not None or self._leitores:
+                    self._condicao.wait()
+            finally:
+                self._escritores_aguardando -= 1
+            self._escritor = eu
+            self._profundidade_escrita = 1
+
+    def liberar_escrita(self):
+        with self._condicao:
+            self._profundidade_escrita -= 1
+            if self._profundidade_escrita == 0:
+                self._escritor = None
+                self._condicao.notify_all()
+
+    def escrita_pela_thread_atual(self) -> bool:
+        return self._escritor == threading.get_ident()
+
+    @contextmanager
+    def leitura(self):
+        self.adquirir_leitura()
+        try:
+            yield
+        finally:
+            self.liberar_leitura()
+
+    @contextmanager
+    def escrita(self):
+        self.adquirir_escrita()
+        try:
+            yield
+        finally:
+            self.liberar_escrita()
+
+    def em_escrita(self, func: Callable) -> Callable:
+        """Decorador: executa a função inteira (ler, alterar, gravar) com a escrita adquirida."""
+        @functools.wraps(func)
+        def protegida(*args, **kwargs):
+            with self.escrita():
+                return func(*args, **kwargs)
+        return protegida
\ No newline at end of file
@@ -1,42 +1,1229 @@
+import atexit
+import gc
+import hashlib
+import hmac
 import json
+import operator
 import os
-from models.exceptions import PersistenciaError
-from typing import Dict, Any
+import pickle
+import re
+import secrets
+import shutil
+import stat
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from models.exceptions import PersistenciaError, ValorInvalidoError
+from monitoramento import instrumentacao
+from repositories import formato_binario, internamento, leitura_incremental
+from repositories.concorrencia import TravaLeituraEscrita
+from typing import BinaryIO, Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
 
 DATA_FOLDER = 'data'
 LOJA_FILE = 'loja.json'
+LOJA_BIN_FILE = 'loja.bin'
+SNAPSHOT_FILE = 'loja.snapshot'
+FORMATOS = {'json': LOJA_FILE, 'binario': LOJA_BIN_FILE}
+COLECOES = ('clientes', 'produtos', 'pedidos', 'cupons')
+
+# Versão do esquema dos registros, guardada na loja sob a chave ESQUEMA (no manifesto, na
+# loja dividida) depois que todos eles passaram pelos construtores com validação: lojas
+# novas já nascem marcadas, as demais com repositories/hidratacao.conferir_loja(). Com a
+# marca em dia, os repositórios hidratam os registros sem revalidar (hidratacao.py). Mude
+# a versão ao mudar os atributos de alguma entidade (e os codecs em hidratacao.py).
+ESQUEMA = 'esquema'
+VERSAO_ESQUEMA = 1
+
+# Pasta de dados alternativa (ex.: benchmarks com lojas sintéticas).
+# None = pasta data/ na raiz do projeto. Também pode ser definida pela variável LOJA_DATA_DIR.
+_pasta_dados: Optional[str] = os.environ.get('LOJA_DATA_DIR') or None
+
+# Formato do arquivo da loja: loja.json (JSON indentado) ou loja.bin (repositories/
+# formato_binario.py). Vale o que existir na pasta (o mais novo, se os dois existirem), e
+# o conteúdo é reconhecido pelo cabeçalho na leitura. Lojas novas usam LOJA_FORMATO
+# (json, o padrão, ou binario); converter_formato() troca uma loja de um para o outro.
+# `_arquivo_loja` guarda o arquivo escolhido para a pasta atual: (loja.json da pasta, escolhido).
+_formato_novo: str = os.environ.get('LOJA_FORMATO', 'json')
+_arquivo_loja: Optional[Tuple[str, str]] = None
+
+# Disposição da loja no disco (ver "Loja dividida por coleção" no fim do arquivo):
+#   - 'arquivo': tudo em um único loja.json/loja.bin;
+#   - 'colecoes': a pasta loja/, com um arquivo por coleção (os pedidos, um por mês de
+#     criação) e um manifesto que diz quais arquivos formam a loja. Cada repositório lê e
+#     grava só os arquivos da sua coleção.
+# Vale a pasta, se ela tiver manifesto; lojas novas usam LOJA_LAYOUT (arquivo, o padrão, ou
+# colecoes); converter_layout() migra uma loja de uma disposição para a outra.
+# `_layout` guarda a disposição escolhida para a pasta atual: (manifesto da pasta, disposição).
+PASTA_COLECOES = 'loja'
+MANIFESTO_FILE = 'manifesto.json'
+LAYOUTS = ('arquivo', 'colecoes')
+_layout_novo: str = os.environ.get('LOJA_LAYOUT', 'arquivo')
+_layout: Optional[Tuple[str, str]] = None
+
+# Início rápido: além do loja.json, mantém um snapshot binário (pickle) dos dados já
+# decodificados ao lado dele, lido com uma única leitura na próxima execução.
+# Desligado por padrão; também pode ser ligado pela variável LOJA_INICIO_RAPIDO=1.
+_inicio_rapido: bool = os.environ.get('LOJA_INICIO_RAPIDO', '') not in ('', '0')
+
+# Cabeçalho do snapshot: marca, versão do formato e a assinatura (mtime_ns, tamanho)
+# do loja.json de onde os dados vieram. Qualquer alteração no JSON invalida o snapshot.
+SNAPSHOT_MAGIC = b'LOJASNAP'
+SNAPSHOT_VERSAO = 2
+_CABECALHO_SNAPSHOT = struct.Struct('<8sIqq')
+# O snapshot é um pickle em uma pasta gravável: depois do cabeçalho vem um HMAC-SHA256
+# (cabeçalho + pickle) e só um snapshot com a etiqueta certa é desserializado. A chave
+# fica fora da pasta de dados (quem só consegue gravar na pasta não consegue forjá-la):
+# LOJA_SNAPSHOT_CHAVE, ou um arquivo criado na primeira gravação (LOJA_SNAPSHOT_CHAVE_ARQUIVO,
+# padrão ~/.config/loja/snapshot.chave, permissão 0600). Sem chave, o atalho fica desligado.
+_TAMANHO_ETIQUETA = hashlib.sha256().digest_size
+_ARQUIVO_CHAVE_SNAPSHOT_PADRAO = os.path.join('~', '.config', 'loja', 'snapshot.chave')
+_chave_snapshot: Optional[bytes] = None
+
+# gc.freeze só na primeira decodificação do processo (a carga da inicialização)
+_congelado = False
+
+# Última versão lida/gravada do loja.json neste processo, para não decodificar de novo
+# um arquivo que não mudou: ((caminho, mtime_ns, tamanho), dados). Fica em uma única
+# tupla para que a troca seja atômica entre threads. Os dados em cache são compartilhados
+# e nunca alterados no lugar: quem vai alterar usa copia_para_alteracao().
+_cache: Optional[Tuple[Tuple[str, int, int], Dict[str, Any]]] = None
+
+# Loja dividida: manifesto em uso ((caminho, mtime_ns, tamanho), conteúdo), o conteúdo de
+# cada arquivo de coleção já lido ou gravado (um arquivo nunca muda depois de gravado: cada
+# gravação cria arquivos com nome novo) e cada coleção montada, pelos arquivos que a formam.
+_cache_manifesto: Optional[Tuple[Tuple[str, int, int], Dict[str, Any]]] = None
+_cache_particoes: Dict[str, Any] = {}
+_cache_colecoes: Dict[str, Tuple[Tuple[str, ...], Any]] = {}
+
+# Concorrência: leituras em paralelo, escritas (ler-alterar-gravar) serializadas.
+# Os repositórios envolvem cada alteração com @dados_loja.em_escrita.
+_trava_loja = TravaLeituraEscrita()
+leitura = _trava_loja.leitura
+escrita = _trava_loja.escrita
+em_escrita = _trava_loja.em_escrita
+
+# Transação (ver transacao()): conteúdo salvo pelos repositórios e ainda não gravado.
+# Só a thread dona da trava de escrita chega a estes valores enquanto a transação dura.
+_em_transacao = False
+# Coleções salvas na transação (só as que foram salvas; as demais continuam como no disco)
+_pendente: Optional[Dict[str, Any]] = None
+# Ações adiadas para o fim da transação (ver apos_confirmacao())
+_ao_confirmar: List[Callable[[], None]] = []
+
+# Escrita adiada (write-behind, ver ativar_escrita_adiada()): salvar_dados_loja só troca
+# o conteúdo em memória e retorna; uma thread de fundo grava o loja.json quando passa o
+# intervalo ou quando se acumulam alterações demais, juntando todas elas em uma gravação.
+# `_adiado` são as coleções salvas e ainda não gravadas (vistas por todas as leituras).
+# Desligada por padrão; também pode ser ligada pela variável LOJA_ESCRITA_ADIADA=1
+# (LOJA_ESCRITA_ADIADA_FSYNC=0 dispensa o fsync de cada descarga).
+INTERVALO_ADIADO_PADRAO_S = 1.0
+MAX_ALTERACOES_ADIADAS_PADRAO = 50
+_adiado: Optional[Dict[str, Any]] = None
+_descarregador: Optional['_Descarregador'] = None
+_escrita_adiada_pela_env: bool = os.environ.get('LOJA_ESCRITA_ADIADA', '') not in ('', '0')
+
+def definir_pasta_dados(pasta: Optional[str]):
+    """Redireciona a persistência para outra pasta (None volta para data/)."""
+    global _pasta_dados
+    # Alterações adiadas pertencem à pasta atual: grava antes de trocar
+    descarregar()
+    _pasta_dados = pasta
+    invalidar_cache()
+    _esquecer_arquivo_loja()
+
+def definir_inicio_rapido(ativo: bool):
+    """Liga/desliga o uso do snapshot binário ao lado do loja.json."""
+    global _inicio_rapido
+    _inicio_rapido = ativo
+
+def inicio_rapido_ativo() -> bool:
+    return _inicio_rapido
+
+def invalidar_cache():
+    """Descarta os dados mantidos em memória (a próxima leitura volta ao disco)."""
+    global _cache, _cache_manifesto, _cache_particoes, _cache_colecoes
+    _cache = None
+    _cache_manifesto = None
+    _cache_particoes = {}
+    _cache_colecoes = {}
 
 def _get_file_path(nome_arquivo: str = LOJA_FILE) -> str:
     """Gera o caminho completo para o arquivo JSON na pasta data/."""
+    if _pasta_dados:
+        return os.path.join(_pasta_dados, nome_arquivo)
     # Navega para o root (dois níveis acima)
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_dir, DATA_FOLDER, nome_arquivo)
 
-def carregar_dados_loja() -> Dict[str, Any]:
-    """Lê o conteúdo do arquivo loja.json, garantindo a estrutura base."""
-    caminho = _get_file_path(LOJA_FILE)
-    
-    estrutura_base = {"clientes": [], "produtos": [], "pedidos": [], "cupons": []}
+def caminho_loja() -> str:
+    """
+    Arquivo da loja na pasta de dados: loja.bin ou loja.json (ver converter_formato) ou,
+    na loja dividida por coleção, o manifesto.
+    """
+    if layout_atual() == 'colecoes':
+        return _caminho_manifesto()
+    return _caminho_arquivo_unico()
+
+def _caminho_arquivo_unico() -> str:
+    global _arquivo_loja
+    caminho_json = _get_file_path(LOJA_FILE)
+    escolhido = _arquivo_loja
+    if escolhido is not None and escolhido[0] == caminho_json:
+        return escolhido[1]
+
+    candidatos = []
+    for caminho in (caminho_json, _get_file_path(LOJA_BIN_FILE)):
+        try:
+            candidatos.append((os.stat(caminho).st_mtime_ns, caminho))
+        except OSError:
+            pass
+    if candidatos:
+        caminho = max(candidatos)[1]
+    else:
+        caminho = _get_file_path(FORMATOS.get(_formato_novo, LOJA_FILE))
+    _arquivo_loja = (caminho_json, caminho)
+    return caminho
+
+def _esquecer_arquivo_loja():
+    global _arquivo_loja, _layout
+    _arquivo_loja = None
+    _layout = None
+
+def formato_atual() -> str:
+    """'binario' ou 'json', pelo arquivo da loja em uso."""
+    if layout_atual() == 'colecoes':
+        manifesto = _ler_manifesto()
+        if manifesto is not None:
+            return manifesto['formato']
+        return _formato_novo if _formato_novo in FORMATOS else 'json'
+    return 'binario' if _caminho_arquivo_unico().endswith(LOJA_BIN_FILE) else 'json'
+
+def layout_atual() -> str:
+    """'colecoes' (pasta loja/ com manifesto) ou 'arquivo' (loja.json/loja.bin)."""
+    global _layout
+    manifesto = _caminho_manifesto()
+    escolhido = _layout
+    if escolhido is not None and escolhido[0] == manifesto:
+        return escolhido[1]
+
+    if os.path.exists(manifesto):
+        layout = 'colecoes'
+    elif any(os.path.exists(_get_file_path(nome)) for nome in FORMATOS.values()):
+        layout = 'arquivo'
+    else:
+        layout = 'colecoes' if _layout_novo == 'colecoes' else 'arquivo'
+    _layout = (manifesto, layout)
+    return layout
+
+def tamanho_loja() -> int:
+    """Bytes da loja no disco: o arquivo único ou o manifesto mais os arquivos das coleções."""
+    if layout_atual() != 'colecoes':
+        caminho = _caminho_arquivo_unico()
+        return os.path.getsize(caminho) if os.path.exists(caminho) else 0
+    pasta = os.path.dirname(_caminho_manifesto())
+    total = 0
+    try:
+        nomes = os.listdir(pasta)
+    except FileNotFoundError:
+        return 0
+    for nome in nomes:
+        if not nome.startswith('.'):
+            try:
+                total += os.path.getsize(os.path.join(pasta, nome))
+            except OSError:
+                pass
+    return total
+
+def _estrutura_base() -> Dict[str, Any]:
+    return {nome: [] for nome in COLECOES}
+
+def esquema_confiavel(dados: Dict[str, Any]) -> bool:
+    """Se `dados` (lidos com carregar_dados_loja) vêm de uma loja conferida com a versão atual do esquema."""
+    return dados.get(ESQUEMA) == VERSAO_ESQUEMA
+
+def _assinatura(caminho: str, info: os.stat_result) -> Tuple[str, int, int]:
+    return (caminho, info.st_mtime_ns, info.st_size)
+
+def _guardar_em_cache(assinatura: Tuple[str, int, int], dados: Dict[str, Any]):
+    global _cache
+    _cache = (assinatura, dados)
+
+def copia_para_alteracao(dados: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cópia rasa para um ciclo ler-alterar-gravar: as listas de cada coleção são novas, os
+    registros continuam compartilhados (devem ser substituídos, não alterados no lugar).
+    Assim quem já leu os dados em cache nunca os vê mudar.
+    """
+    return {chave: list(valor) if isinstance(valor, list) else valor for chave, valor in dados.items()}
+
+@contextmanager
+def _decodificacao_sem_gc():
+    """
+    Decodificar a loja cria milhões de dicts/listas sem nenhum ciclo; com o coletor ligado,
+    cada geração cheia varre o que já foi criado. Pausa o GC durante a decodificação e, na
+    primeira carga do processo, congela (gc.freeze) os objetos carregados para que as coletas
+    seguintes não os revisitem. Objetos congelados continuam sendo liberados normalmente por
+    contagem de referências, mas nunca pelo coletor: congelar a cada releitura deixaria fora
+    da coleta, para sempre, tudo o que existisse no momento (inclusive lixo com ciclos).
+    """
+    global _congelado
+    estava_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+        if not _congelado:
+            _congelado = True
+            gc.freeze()
+    finally:
+        if estava_ativo:
+            gc.enable()
+
+@contextmanager
+def transacao():
+    """
+    Agrupa várias alterações dos repositórios (ex.: pedidos e estoque) em uma única
+    gravação do loja.json, com a trava de escrita do começo ao fim. Dentro do bloco,
+    salvar_dados_loja só guarda o novo conteúdo em memória, e as leituras desta thread
+    já o enxergam; ao sair, o arquivo é gravado uma vez. Se o bloco levantar exceção,
+    nada é gravado. Transações aninhadas fazem parte da mais externa.
+    """
+    global _em_transacao, _pendente
+    with escrita():
+        if _em_transacao:
+            yield
+            return
+        _em_transacao = True
+        try:
+            yield
+            pendente = _pendente
+            acoes = list(_ao_confirmar)
+        finally:
+            _em_transacao = False
+            _pendente = None
+            _ao_confirmar.clear()
+        if pendente is not None:
+            salvar_dados_loja(pendente)
+        for acao in acoes:
+            acao()
+
+def apos_confirmacao(acao: Callable[[], None]):
+    """
+    Executa `acao` quando a alteração em andamento estiver confirmada: na hora, fora de
+    transação; ao final da transação (depois da gravação), dentro de uma. Se a transação
+    for desfeita, a ação é descartada. Usada para anunciar alterações (repositories/eventos.py).
+    """
+    if _em_transacao and _trava_loja.escrita_pela_thread_atual():
+        _ao_confirmar.append(acao)
+    else:
+        acao()
+
+def carregar_dados_loja(colecoes: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Lê o conteúdo do arquivo loja.json, garantindo a estrutura base.
+    Cria o arquivo se ele não existir e o recria se estiver vazio ou corrompido.
+    Se o arquivo não mudou desde a última leitura/escrita deste processo, devolve os
+    dados já decodificados; no início rápido, tenta antes o snapshot binário.
+    `colecoes` (ex.: ('clientes',)) restringe a leitura às coleções que o chamador usa: na
+    loja dividida por coleção, só os arquivos delas são lidos e só elas vêm no dicionário;
+    no arquivo único, a loja inteira é lida de qualquer forma.
+    Os dados devolvidos são compartilhados: para alterá-los, use copia_para_alteracao().
+    """
+    colecoes = tuple(colecoes) if colecoes is not None else None
+    with leitura():
+        dados = _ler_loja(colecoes)
+    if dados is not None:
+        return dados
+
+    # Arquivo ausente, vazio ou corrompido: recria com a estrutura base (só um escritor)
+    with escrita():
+        dados = _ler_loja(colecoes)
+        if dados is None:
+            # Uma loja vazia não tem registro a conferir: já nasce no esquema atual
+            dados = {**_estrutura_base(), ESQUEMA: VERSAO_ESQUEMA}
+            salvar_dados_loja(dados)
+        return dados
+
+def _alteracoes_em_memoria() -> Optional[Dict[str, Any]]:
+    """Coleções salvas e ainda não gravadas: as da transação por cima das adiadas."""
+    pendente, adiado = _pendente, _adiado
+    if adiado is None:
+        return pendente
+    if pendente is None:
+        return adiado
+    return {**adiado, **pendente}
+
+def _ler_loja(colecoes: Optional[Tuple[str, ...]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Conteúdo mais novo da loja: as alterações ainda não gravadas por cima do disco (ou do
+    cache/snapshot). None se a loja não existir ou o arquivo estiver inválido.
+    """
+    em_memoria = _alteracoes_em_memoria()
+    if em_memoria is not None and all(nome in em_memoria for nome in colecoes or COLECOES):
+        return em_memoria
+    dados = _ler_disco(colecoes)
+    if em_memoria is None:
+        return dados
+    return {**(dados if dados is not None else _estrutura_base()), **em_memoria}
+
+def _ler_disco(colecoes: Optional[Tuple[str, ...]] = None) -> Optional[Dict[str, Any]]:
+    for _ in range(2):
+        layout = layout_atual()
+        dados = _ler_colecoes(colecoes) if layout == 'colecoes' else _ler_arquivo_unico()
+        if dados is not None:
+            return dados
+        # Loja migrada por outro processo? Procura de novo qual disposição vale
+        _esquecer_arquivo_loja()
+        if layout_atual() == layout:
+            return None
+    return None
+
+def _ler_arquivo_unico() -> Optional[Dict[str, Any]]:
+    """Lê o loja.json/loja.bin (ou o cache/snapshot). None se o arquivo não existir ou estiver inválido."""
+    caminho = _caminho_arquivo_unico()
     
-    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
-        return estrutura_base
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        # Convertida por outro processo? Procura de novo qual arquivo existe
+        _esquecer_arquivo_loja()
+        caminho = _caminho_arquivo_unico()
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise PersistenciaError(f"Erro ao carregar dados de {os.path.basename(caminho)}: {e}")
+    except OSError as e:
+        raise PersistenciaError(f"Erro ao carregar dados de {os.path.basename(caminho)}: {e}")
+
+    assinatura = _assinatura(caminho, info)
+    cache = _cache
+    if cache is not None and cache[0] == assinatura:
+        return cache[1]
+
+    if _inicio_rapido:
+        dados = _ler_snapshot(assinatura)
+        if dados is not None:
+            _guardar_em_cache(assinatura, dados)
+            return dados
     
     try:
-        with open(caminho, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
-            return {**estrutura_base, **dados}
+        with open(caminho, 'rb') as f, _decodificacao_sem_gc():
+            # O formato é reconhecido pelo conteúdo, não pelo nome do arquivo
+            binario = formato_binario.eh_binario(f.read(len(formato_binario.MAGIC)))
+            f.seek(0)
+            if binario:
+                dados = formato_binario.decodificar(f.read())
+            else:
+                # O JSON cria um texto novo por ocorrência (o binário já os compartilha)
+                dados = internamento.internar_loja(json.load(f))
+            info = os.fstat(f.fileno())
+            if instrumentacao.esta_ativo():
+                instrumentacao.registrar_leitura(info.st_size, parse_json=not binario)
     except json.JSONDecodeError:
-        raise PersistenciaError(f"Erro: O arquivo {LOJA_FILE} está corrompido.")
-    except Exception as e:
-        raise PersistenciaError(f"Erro ao carregar dados de {LOJA_FILE}: {e}")
+        # Em caso de erro, a estrutura base é gravada novamente por carregar_dados_loja
+        print(f"⚠️ Aviso: Arquivo {os.path.basename(caminho)} corrompido ou vazio. Recriando...")
+        return None
+    except formato_binario.FormatoBinarioInvalido as e:
+        # Um loja.bin ilegível (ex.: de uma versão mais nova do formato) não é recriado vazio
+        raise PersistenciaError(f"Erro ao carregar dados de {os.path.basename(caminho)}: {e}")
+    except OSError as e:
+        raise PersistenciaError(f"Erro ao carregar dados de {os.path.basename(caminho)}: {e}")
+
+    dados = {**_estrutura_base(), **dados}
+    assinatura = _assinatura(caminho, info)
+    _guardar_em_cache(assinatura, dados)
+    if _inicio_rapido:
+        _gravar_snapshot(assinatura, dados)
+    return dados
+
+def _colecao_em_memoria(nome: str) -> Optional[Any]:
+    """A coleção mais nova, se já estiver em memória (alteração pendente/adiada ou cache em dia)."""
+    em_memoria = _alteracoes_em_memoria()
+    if em_memoria is not None and nome in em_memoria:
+        return em_memoria[nome]
+    if layout_atual() == 'colecoes':
+        cache = _cache_colecoes.get(nome)
+        manifesto = _ler_manifesto() if cache is not None else None
+        return cache[1] if manifesto is not None and cache[0] == _arquivos_da_colecao(manifesto, nome) else None
+    cache = _cache
+    if cache is None:
+        return None
+    caminho = _caminho_arquivo_unico()
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return cache[1].get(nome, []) if cache[0] == _assinatura(caminho, info) else None
+
+def iterar_colecao(nome: str) -> Iterator[Dict[str, Any]]:
+    """
+    Registros de uma coleção um a um, sem carregar a loja inteira: da memória, se ela já
+    estiver carregada (ou houver alterações ainda não gravadas); senão, direto do arquivo,
+    com memória limitada (repositories/leitura_incremental.py). Nada fica em cache, e os
+    registros não devem ser alterados.
+    """
+    with leitura():
+        registros = _colecao_em_memoria(nome)
+    if registros is not None:
+        yield from registros
+        return
+    if layout_atual() == 'colecoes':
+        yield from _iterar_colecao_dividida(nome)
+        return
+    caminho = _caminho_arquivo_unico()
+    try:
+        yield from leitura_incremental.iterar_colecao(caminho, nome)
+    except FileNotFoundError:
+        return
+    except ValueError as e:
+        raise PersistenciaError(f"Erro ao ler {nome} de {os.path.basename(caminho)}: {e}")
 
 def salvar_dados_loja(dados: Dict[str, Any]):
-    """Salva o dicionário completo de dados no arquivo loja.json."""
-    caminho = _get_file_path(LOJA_FILE)
+    """
+    Salva o dicionário de dados no arquivo loja.json. O conteúdo é gravado em um
+    arquivo temporário na mesma pasta e trocado de uma vez (os.replace): leitores veem o
+    arquivo antigo ou o novo, nunca um arquivo pela metade.
+    Coleções ausentes de `dados` (ex.: lidas com carregar_dados_loja(colecoes=...)) ficam
+    como estão. Na loja dividida, só os arquivos das coleções que mudaram são regravados.
+    Com a escrita adiada, só troca o conteúdo em memória; a gravação fica para a thread de fundo.
+    """
+    global _pendente, _adiado
+    if _descarregador is None and _escrita_adiada_pela_env:
+        ativar_escrita_adiada(duravel=os.environ.get('LOJA_ESCRITA_ADIADA_FSYNC', '') != '0')
     
+    with escrita():
+        if _em_transacao:
+            _pendente = dados if _pendente is None else {**_pendente, **dados}
+            return
+        descarregador = _descarregador
+        if descarregador is not None:
+            _adiado = dados if _adiado is None else {**_adiado, **dados}
+            descarregador.notificar_alteracao()
+            return
+        # Gravação síncrona depois de desligar a escrita adiada: leva junto qualquer resto adiado
+        _gravar(dados if _adiado is None else {**_adiado, **dados})
+        _adiado = None
+
+def _gravar(dados: Dict[str, Any], sincronizar: bool = True):
+    """Grava as coleções de `dados` na disposição atual da loja (as ausentes ficam como estão)."""
+    if layout_atual() == 'colecoes':
+        _gravar_colecoes(dados, sincronizar)
+        return
+    if not all(nome in dados for nome in COLECOES):
+        dados = {**(_ler_arquivo_unico() or _estrutura_base()), **dados}
+    _gravar_loja(dados, sincronizar)
+
+def _gravar_loja(dados: Dict[str, Any], sincronizar: bool = True, caminho: Optional[str] = None):
+    """Grava o arquivo da loja (no formato dele) de forma atômica e passa a usar os dados gravados como cache."""
+    caminho = caminho or _caminho_arquivo_unico()
+    try:
+        if caminho.endswith(LOJA_BIN_FILE):
+            info = _gravar_atomicamente(caminho, lambda f: formato_binario.gravar(f, dados), 'wb', sincronizar)
+        else:
+            info = _gravar_atomicamente(
+                caminho, lambda f: json.dump(dados, f, indent=4, ensure_ascii=False), 'w', sincronizar
+            )
+        if instrumentacao.esta_ativo():
+            instrumentacao.registrar_escrita(info.st_size)
+    except (OSError, TypeError) as e:
+        raise PersistenciaError(f"Erro ao salvar dados em {os.path.basename(caminho)}: {e}")
+
+    assinatura = _assinatura(caminho, info)
+    _guardar_em_cache(assinatura, dados)
+    if _inicio_rapido:
+        _gravar_snapshot(assinatura, dados)
+
+def _gravar_atomicamente(caminho: str, escrever, modo: str, sincronizar: bool = True) -> os.stat_result:
+    """
+    Escreve em um temporário ao lado do destino, força o disco (fsync) e troca os arquivos.
+    Com sincronizar=False, não há fsync: a troca continua atômica, mas uma queda do sistema
+    pode perder a última gravação.
+    """
+    diretorio = os.path.dirname(caminho)
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(prefix='.' + os.path.basename(caminho) + '.', suffix='.tmp', dir=diretorio)
+    try:
+        # mkstemp cria com permissão 0600; mantém a do arquivo atual (ou a usual 0644)
+        try:
+            os.chmod(temporario, stat.S_IMODE(os.stat(caminho).st_mode))
+        except FileNotFoundError:
+            os.chmod(temporario, 0o644)
+        with os.fdopen(descritor, modo, encoding=None if 'b' in modo else 'utf-8') as f:
+            escrever(f)
+            f.flush()
+            if sincronizar:
+                os.fsync(f.fileno())
+            # A troca preserva mtime e tamanho: esta é a assinatura do arquivo final
+            info = os.fstat(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    return info
+
+def converter_formato(formato: str) -> Dict[str, Any]:
+    """
+    Regrava a loja no formato pedido ('json' ou 'binario') e apaga o arquivo do formato
+    anterior. Se a conversão for interrompida entre os dois passos, o arquivo novo (o mais
+    recente) é o que passa a valer. Na loja dividida, regrava os arquivos de todas as
+    coleções e troca o manifesto. Retorna os arquivos e tamanhos antes e depois.
+    """
+    if formato not in FORMATOS:
+        raise ValorInvalidoError(f"Formato desconhecido: {formato}. Use: {', '.join(FORMATOS)}.")
+    # O que estiver adiado vai para o arquivo atual antes da troca
+    descarregar()
+    descarregador = _descarregador
+    with descarregador._trava_gravacao if descarregador is not None else nullcontext(), escrita():
+        dados = carregar_dados_loja()
+        if layout_atual() == 'colecoes':
+            anterior = formato_atual()
+            bytes_antes = tamanho_loja()
+            inicio = time.perf_counter()
+            if anterior != formato:
+                _gravar_colecoes(dados, formato=formato, regravar=True)
+            return {
+                'formato': formato,
+                'origem': os.path.dirname(_caminho_manifesto()) + f' ({anterior})',
+                'destino': os.path.dirname(_caminho_manifesto()) + f' ({formato})',
+                'convertido': anterior != formato,
+                'bytes_antes': bytes_antes,
+                'bytes_depois': tamanho_loja(),
+                'duracao_s': time.perf_counter() - inicio,
+            }
+        origem = _caminho_arquivo_unico()
+        destino = _get_file_path(FORMATOS[formato])
+        bytes_antes = os.path.getsize(origem) if os.path.exists(origem) else 0
+        inicio = time.perf_counter()
+        if origem != destino:
+            _gravar_loja(dados, caminho=destino)
+            _esquecer_arquivo_loja()
+            try:
+                os.remove(origem)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                raise PersistenciaError(f"Loja gravada em {os.path.basename(destino)}, mas não foi possível apagar {os.path.basename(origem)}: {e}")
+        return {
+            'formato': formato,
+            'origem': origem,
+            'destino': destino,
+            'convertido': origem != destino,
+            'bytes_antes': bytes_antes,
+            'bytes_depois': os.path.getsize(destino),
+            'duracao_s': time.perf_counter() - inicio,
+        }
+
+# Loja dividida por coleção
+#
+# A pasta loja/ tem um arquivo por coleção ({"clientes": [...]}, no formato da loja) e,
+# para os pedidos, um por mês de criação (pedidos-2024-03.*). Um arquivo nunca é regravado
+# no lugar: cada gravação cria arquivos novos (com a geração no nome) só para as coleções e
+# meses que mudaram e depois troca o manifesto (os.replace), que lista os arquivos em uso.
+# A troca do manifesto é o ponto de confirmação: coleções salvas juntas (ex.: estoque e
+# pedido no checkout, dentro de transacao()) aparecem todas ou nenhuma, e uma gravação
+# interrompida antes dela só deixa arquivos órfãos, apagados na gravação seguinte. Os
+# arquivos que saem do manifesto são apagados depois da troca; quem estava para abri-los
+# relê o manifesto. Como no arquivo único, um processo grava a pasta por vez.
+
+MANIFESTO_VERSAO = 1
+# Coleções divididas por mês -> campo com a data ISO do registro
+COLECOES_POR_MES = {'pedidos': 'data_criacao'}
+SEM_DATA = 'sem-data'
+_MES = re.compile(r'\d{4}-\d{2}')
+# Releituras do manifesto quando um arquivo dele some no meio da leitura
+_TENTATIVAS_LEITURA = 5
+
+
+def _caminho_manifesto() -> str:
+    return _get_file_path(os.path.join(PASTA_COLECOES, MANIFESTO_FILE))
+
+def _guardar_manifesto(assinatura: Tuple[str, int, int], manifesto: Dict[str, Any]):
+    """Passa a usar `manifesto` e esquece o conteúdo dos arquivos que saíram dele."""
+    global _cache_manifesto, _cache_particoes
+    pasta = os.path.dirname(assinatura[0])
+    em_uso = {os.path.join(pasta, arquivo) for particoes in manifesto['colecoes'].values() for arquivo in particoes.values()}
+    _cache_particoes = {caminho: valor for caminho, valor in _cache_particoes.items() if caminho in em_uso}
+    _cache_manifesto = (assinatura, manifesto)
+
+def _ler_manifesto() -> Optional[Dict[str, Any]]:
+    """Manifesto da loja dividida (do cache, se o arquivo não mudou). None se não existir."""
+    caminho = _caminho_manifesto()
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        raise PersistenciaError(f"Erro ao carregar {MANIFESTO_FILE}: {e}")
+    cache = _cache_manifesto
+    if cache is not None and cache[0] == _assinatura(caminho, info):
+        return cache[1]
+
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+            info = os.fstat(f.fileno())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        raise PersistenciaError(f"Erro ao carregar {MANIFESTO_FILE}: {e}")
+    if not isinstance(manifesto, dict) or manifesto.get('versao') != MANIFESTO_VERSAO:
+        raise PersistenciaError(f"{MANIFESTO_FILE} de uma versão desconhecida da loja dividida.")
+    _guardar_manifesto(_assinatura(caminho, info), manifesto)
+    return manifesto
+
+def particoes_da_loja() -> Dict[str, List[str]]:
+    """Coleção -> partições em uso na loja dividida (ex.: os meses dos pedidos); vazio no arquivo único."""
+    manifesto = _ler_manifesto() if layout_atual() == 'colecoes' else None
+    if manifesto is None:
+        return {}
+    return {nome: sorted(particoes) for nome, particoes in manifesto['colecoes'].items()}
+
+def _arquivos_da_colecao(manifesto: Dict[str, Any], nome: str) -> Tuple[str, ...]:
+    """Caminhos dos arquivos de uma coleção, em ordem de partição (mês)."""
+    pasta = os.path.dirname(_caminho_manifesto())
+    particoes = manifesto['colecoes'].get(nome, {})
+    return tuple(os.path.join(pasta, particoes[particao]) for particao in sorted(particoes))
+
+def _ler_particao(caminho: str, nome: str) -> Any:
+    """Conteúdo de um arquivo de coleção. FileNotFoundError se ele já tiver sido substituído."""
+    valor = _cache_particoes.get(caminho)
+    if valor is not None:
+        return valor
+    try:
+        with open(caminho, 'rb') as f, _decodificacao_sem_gc():
+            binario = formato_binario.eh_binario(f.read(len(formato_binario.MAGIC)))
+            f.seek(0)
+            if binario:
+                conteudo = formato_binario.decodificar(f.read())
+            else:
+                conteudo = internamento.internar_loja(json.load(f))
+            if instrumentacao.esta_ativo():
+                instrumentacao.registrar_leitura(os.fstat(f.fileno()).st_size, parse_json=not binario)
+    except FileNotFoundError:
+        raise
+    except (OSError, ValueError) as e:
+        raise PersistenciaError(f"Erro ao carregar {nome} de {os.path.basename(caminho)}: {e}")
+    if not isinstance(conteudo, dict):
+        raise PersistenciaError(f"Erro ao carregar {nome} de {os.path.basename(caminho)}: conteúdo inválido.")
+    valor = conteudo.get(nome, [])
+    _cache_particoes[caminho] = valor
+    return valor
+
+def _ler_colecao(manifesto: Dict[str, Any], nome: str) -> Any:
+    arquivos = _arquivos_da_colecao(manifesto, nome)
+    cache = _cache_colecoes.get(nome)
+    if cache is not None and cache[0] == arquivos:
+        return cache[1]
+    partes = [_ler_particao(caminho, nome) for caminho in arquivos]
+    valor = partes[0] if len(partes) == 1 else [registro for parte in partes for registro in parte]
+    _cache_colecoes[nome] = (arquivos, valor)
+    return valor
+
+def _ler_colecoes(colecoes: Optional[Tuple[str, ...]] = None) -> Optional[Dict[str, Any]]:
+    """Coleções pedidas (None = todas) da loja dividida. None se não houver manifesto."""
+    for _ in range(_TENTATIVAS_LEITURA):
+        manifesto = _ler_manifesto()
+        if manifesto is None:
+            return None
+        nomes = colecoes or tuple(dict.fromkeys((*COLECOES, *manifesto['colecoes'])))
+        try:
+            dados = {nome: _ler_colecao(manifesto, nome) for nome in nomes}
+        except FileNotFoundError:
+            # Arquivo substituído por uma gravação entre a leitura do manifesto e a dele
+            continue
+        if ESQUEMA in manifesto:
+            dados[ESQUEMA] = manifesto[ESQUEMA]
+        return dados
+    raise PersistenciaError(f"Arquivo ausente na loja em {PASTA_COLECOES}/ (listado no {MANIFESTO_FILE}).")
+
+def _abrir_arquivos_colecao(nome: str) -> List[BinaryIO]:
+    """Abre todos os arquivos de uma coleção de uma vez (abertos, continuam legíveis se forem apagados)."""
+    for _ in range(_TENTATIVAS_LEITURA):
+        manifesto = _ler_manifesto()
+        if manifesto is None:
+            return []
+        abertos: List[BinaryIO] = []
+        try:
+            for caminho in _arquivos_da_colecao(manifesto, nome):
+                abertos.append(open(caminho, 'rb'))
+            return abertos
+        except OSError as e:
+            for f in abertos:
+                f.close()
+            if not isinstance(e, FileNotFoundError):
+                raise PersistenciaError(f"Erro ao ler {nome} de {PASTA_COLECOES}/: {e}")
+    raise PersistenciaError(f"Arquivo ausente na loja em {PASTA_COLECOES}/ (listado no {MANIFESTO_FILE}).")
+
+def _iterar_colecao_dividida(nome: str) -> Iterator[Any]:
+    abertos = _abrir_arquivos_colecao(nome)
     try:
-        os.makedirs(os.path.dirname(caminho), exist_ok=True)
-        with open(caminho, 'w', encoding='utf-8') as f:
-            json.dump(dados, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        raise PersistenciaError(f"Erro ao salvar dados em {LOJA_FILE}: {e}")
\ No newline at end of file
+        for f in abertos:
+            try:
+                yield from leitura_incremental.iterar_arquivo(f, nome)
+            except ValueError as e:
+                raise PersistenciaError(f"Erro ao ler {nome} de {os.path.basename(f.name)}: {e}")
+    finally:
+        for f in abertos:
+            f.close()
+
+def _particionar(nome: str, valor: Any) -> Dict[str, Any]:
+    """Partição -> registros: os pedidos por mês de criação ('2024-03'), as demais coleções em uma só ('')."""
+    campo = COLECOES_POR_MES.get(nome)
+    if not isinstance(valor, list):
+        return {'': valor}
+    if campo is None:
+        return {'': valor} if valor else {}
+
+    particoes: Dict[str, List[Any]] = {}
+    meses: Dict[Optional[str], str] = {}
+    for registro in valor:
+        data = registro.get(campo)
+        prefixo = data[:7] if isinstance(data, str) else None
+        mes = meses.get(prefixo)
+        if mes is None:
+            mes = meses[prefixo] = prefixo if prefixo and _MES.fullmatch(prefixo) else SEM_DATA
+        lista = particoes.get(mes)
+        if lista is None:
+            particoes[mes] = [registro]
+        else:
+            lista.append(registro)
+    return particoes
+
+def _mesmos_registros(anterior: Any, registros: Any) -> bool:
+    """Mesmos objetos na mesma ordem (registros são substituídos, nunca alterados no lugar)."""
+    if anterior is registros:
+        return True
+    if not isinstance(anterior, list) or not isinstance(registros, list) or len(anterior) != len(registros):
+        return False
+    return all(map(operator.is_, anterior, registros))
+
+def _gravar_particao(caminho: str, conteudo: Dict[str, Any], formato: str, sincronizar: bool):
+    if formato == 'binario':
+        info = _gravar_atomicamente(caminho, lambda f: formato_binario.gravar(f, conteudo), 'wb', sincronizar)
+    else:
+        info = _gravar_atomicamente(
+            caminho, lambda f: json.dump(conteudo, f, indent=4, ensure_ascii=False), 'w', sincronizar
+        )
+    if instrumentacao.esta_ativo():
+        instrumentacao.registrar_escrita(info.st_size)
+
+def _gravar_colecoes(
+    dados: Dict[str, Any],
+    sincronizar: bool = True,
+    formato: Optional[str] = None,
+    regravar: bool = False
+):
+    """
+    Grava as coleções de `dados` na loja dividida: só as partições (coleção ou mês dos
+    pedidos) cujos registros mudaram ganham arquivo novo; depois troca o manifesto e apaga
+    os arquivos que saíram dele. `formato` muda o formato dos arquivos; `regravar` grava todos.
+    A versão do esquema (chave ESQUEMA) vai no próprio manifesto.
+    """
+    caminho_manifesto = _caminho_manifesto()
+    pasta = os.path.dirname(caminho_manifesto)
+    anterior = _ler_manifesto() or {
+        'versao': MANIFESTO_VERSAO, 'geracao': 0,
+        'formato': _formato_novo if _formato_novo in FORMATOS else 'json', 'colecoes': {},
+    }
+    formato = formato or anterior['formato']
+    geracao = anterior['geracao'] + 1
+    extensao = os.path.splitext(FORMATOS[formato])[1]
+    colecoes = dict(anterior['colecoes'])
+    novos: Dict[str, Any] = {}
+
+    esquema = dados.get(ESQUEMA, anterior.get(ESQUEMA))
+
+    try:
+        for nome, valor in dados.items():
+            if nome == ESQUEMA:
+                continue
+            antes = anterior['colecoes'].get(nome, {})
+            depois = {}
+            for particao, registros in _particionar(nome, valor).items():
+                arquivo = antes.get(particao)
+                if (arquivo is not None and not regravar
+                        and _mesmos_registros(_cache_particoes.get(os.path.join(pasta, arquivo)), registros)):
+                    depois[particao] = arquivo
+                    continue
+                arquivo = f"{nome}-{particao}" if particao else nome
+                arquivo = f"{arquivo}.{geracao:06d}{extensao}"
+                caminho = os.path.join(pasta, arquivo)
+                _gravar_particao(caminho, {nome: registros}, formato, sincronizar)
+                novos[caminho] = registros
+                depois[particao] = arquivo
+            colecoes[nome] = depois
+
+        if (not novos and colecoes == anterior['colecoes'] and formato == anterior['formato']
+                and esquema == anterior.get(ESQUEMA)):
+            return
+        manifesto = {'versao': MANIFESTO_VERSAO, 'geracao': geracao, 'formato': formato, 'colecoes': colecoes}
+        if esquema is not None:
+            manifesto[ESQUEMA] = esquema
+        info = _gravar_atomicamente(
+            caminho_manifesto, lambda f: json.dump(manifesto, f, indent=4, ensure_ascii=False), 'w', sincronizar
+        )
+    except (OSError, TypeError) as e:
+        raise PersistenciaError(f"Erro ao salvar dados em {PASTA_COLECOES}/: {e}")
+
+    _guardar_manifesto(_assinatura(caminho_manifesto, info), manifesto)
+    _cache_particoes.update(novos)
+    for nome, valor in dados.items():
+        if nome != ESQUEMA:
+            _cache_colecoes[nome] = (_arquivos_da_colecao(manifesto, nome), valor)
+    _remover_nao_referenciados(pasta, manifesto)
+
+def _remover_nao_referenciados(pasta: str, manifesto: Dict[str, Any]):
+    """Apaga da pasta os arquivos fora do manifesto (substituídos ou de gravações interrompidas)."""
+    em_uso = {arquivo for particoes in manifesto['colecoes'].values() for arquivo in particoes.values()}
+    em_uso.add(MANIFESTO_FILE)
+    try:
+        nomes = os.listdir(pasta)
+    except OSError:
+        return
+    for nome in nomes:
+        # Começando com '.': temporário de uma gravação em andamento (_gravar_atomicamente)
+        if nome.startswith('.') or nome in em_uso:
+            continue
+        try:
+            os.remove(os.path.join(pasta, nome))
+        except OSError:
+            pass
+
+def _remover_se_existir(caminho: str):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+def converter_layout(layout: str) -> Dict[str, Any]:
+    """
+    Migra a loja entre o arquivo único ('arquivo') e a pasta dividida por coleção
+    ('colecoes'), no mesmo formato. A migração se confirma em um passo só: para 'colecoes',
+    a gravação do manifesto (depois dos arquivos das coleções); para 'arquivo', a remoção
+    do manifesto (depois do loja.json/loja.bin gravado). Interrompida antes disso, a loja
+    continua na disposição anterior, e o que sobrou da outra é apagado na próxima conversão.
+    Retorna as disposições, os tamanhos antes e depois e as partições por coleção.
+    """
+    global _cache, _cache_manifesto, _cache_particoes, _cache_colecoes
+    if layout not in LAYOUTS:
+        raise ValorInvalidoError(f"Disposição desconhecida: {layout}. Use: {', '.join(LAYOUTS)}.")
+    # O que estiver adiado vai para a disposição atual antes da troca
+    descarregar()
+    descarregador = _descarregador
+    with descarregador._trava_gravacao if descarregador is not None else nullcontext(), escrita():
+        dados = carregar_dados_loja()
+        origem = layout_atual()
+        formato = formato_atual()
+        bytes_antes = tamanho_loja()
+        inicio = time.perf_counter()
+        try:
+            if layout == 'colecoes':
+                if origem != layout:
+                    _gravar_colecoes(dados, formato=formato, regravar=True)
+                for nome in (*FORMATOS.values(), SNAPSHOT_FILE):
+                    _remover_se_existir(_get_file_path(nome))
+                _cache = None
+            else:
+                if origem != layout:
+                    destino = _get_file_path(FORMATOS[formato])
+                    _gravar_loja(dados, caminho=destino)
+                    for nome in FORMATOS.values():
+                        if _get_file_path(nome) != destino:
+                            _remover_se_existir(_get_file_path(nome))
+                _remover_se_existir(_caminho_manifesto())
+                shutil.rmtree(os.path.dirname(_caminho_manifesto()), ignore_errors=True)
+                _cache_manifesto = None
+                _cache_particoes = {}
+                _cache_colecoes = {}
+        except OSError as e:
+            raise PersistenciaError(f"Erro ao migrar a loja para '{layout}': {e}")
+        _esquecer_arquivo_loja()
+        return {
+            'layout': layout,
+            'origem': origem,
+            'convertido': origem != layout,
+            'formato': formato,
+            'bytes_antes': bytes_antes,
+            'bytes_depois': tamanho_loja(),
+            'particoes': particoes_da_loja(),
+            'duracao_s': time.perf_counter() - inicio,
+        }
+
+# Snapshot binário (início rápido)
+
+def _obter_chave_snapshot(criar: bool) -> Optional[bytes]:
+    """Chave do HMAC do snapshot (ver SNAPSHOT_VERSAO); com `criar`, gera o arquivo da chave se faltar."""
+    global _chave_snapshot
+    if _chave_snapshot is not None:
+        return _chave_snapshot
+    chave_env = os.environ.get('LOJA_SNAPSHOT_CHAVE')
+    if chave_env:
+        _chave_snapshot = chave_env.encode('utf-8')
+        return _chave_snapshot
+    caminho = os.path.expanduser(os.environ.get('LOJA_SNAPSHOT_CHAVE_ARQUIVO', _ARQUIVO_CHAVE_SNAPSHOT_PADRAO))
+    try:
+        with open(caminho, 'rb') as f:
+            chave = f.read()
+    except FileNotFoundError:
+        if not criar:
+            return None
+        chave = secrets.token_bytes(32)
+        try:
+            os.makedirs(os.path.dirname(caminho) or '.', mode=0o700, exist_ok=True)
+            descritor = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(descritor, 'wb') as f:
+                f.write(chave)
+        except FileExistsError:
+            # Outro processo criou a chave ao mesmo tempo: vale a dele
+            return _obter_chave_snapshot(criar=False)
+        except OSError as e:
+            print(f"⚠️ Aviso: não foi possível criar a chave do snapshot ({caminho}): {e}")
+            return None
+    except OSError:
+        return None
+    if len(chave) < 16:
+        return None
+    _chave_snapshot = chave
+    return chave
+
+def _etiqueta_snapshot(chave: bytes, cabecalho, corpo) -> bytes:
+    etiqueta = hmac.new(chave, cabecalho, hashlib.sha256)
+    etiqueta.update(corpo)
+    return etiqueta.digest()
+
+def _ler_snapshot(assinatura: Tuple[str, int, int]) -> Optional[Dict[str, Any]]:
+    """
+    Lê o snapshot com uma única leitura; None se não existir, for de outra versão, estiver
+    desatualizado ou a etiqueta HMAC não conferir (o pickle só é aberto depois da conferência).
+    """
+    chave = _obter_chave_snapshot(criar=False)
+    if chave is None:
+        return None
+    try:
+        with open(_get_file_path(SNAPSHOT_FILE), 'rb') as f:
+            conteudo = f.read()
+    except OSError:
+        return None
+
+    inicio_corpo = _CABECALHO_SNAPSHOT.size + _TAMANHO_ETIQUETA
+    if len(conteudo) < inicio_corpo:
+        return None
+    magic, versao, mtime_ns, tamanho = _CABECALHO_SNAPSHOT.unpack_from(conteudo)
+    if magic != SNAPSHOT_MAGIC or versao != SNAPSHOT_VERSAO or (mtime_ns, tamanho) != assinatura[1:]:
+        return None
+    visao = memoryview(conteudo)
+    etiqueta = _etiqueta_snapshot(chave, visao[:_CABECALHO_SNAPSHOT.size], visao[inicio_corpo:])
+    if not hmac.compare_digest(etiqueta, visao[_CABECALHO_SNAPSHOT.size:inicio_corpo]):
+        return None
+
+    try:
+        with _decodificacao_sem_gc():
+            dados = pickle.loads(visao[inicio_corpo:])
+    except Exception:
+        # Snapshot truncado/corrompido: o loja.json continua sendo a fonte da verdade
+        return None
+    if instrumentacao.esta_ativo():
+        # Snapshot em pickle: não conta como parse de JSON
+        instrumentacao.registrar_leitura(len(conteudo), parse_json=False)
+    return dados
+
+def _gravar_snapshot(assinatura: Tuple[str, int, int], dados: Dict[str, Any]):
+    """Grava o snapshot em arquivo temporário e o troca de uma vez; falhas apenas desativam o atalho."""
+    chave = _obter_chave_snapshot(criar=True)
+    if chave is None:
+        return
+    caminho = _get_file_path(SNAPSHOT_FILE)
+    cabecalho = _CABECALHO_SNAPSHOT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSAO, assinatura[1], assinatura[2])
+    corpo = pickle.dumps(dados, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def escrever(f):
+        f.write(cabecalho)
+        f.write(_etiqueta_snapshot(chave, cabecalho, corpo))
+        f.write(corpo)
+
+    try:
+        info = _gravar_atomicamente(caminho, escrever, 'wb')
+        if instrumentacao.esta_ativo():
+            instrumentacao.registrar_escrita(info.st_size)
+    except OSError as e:
+        print(f"⚠️ Aviso: não foi possível gravar o snapshot {SNAPSHOT_FILE}: {e}")
+
+# Escrita adiada (write-behind)
+
+class _Descarregador:
+    """Thread de fundo que grava o loja.json adiado por tempo ou por quantidade de alterações."""
+
+    def __init__(self, intervalo_s: float, max_alteracoes: int, duravel: bool):
+        self.intervalo_s = intervalo_s
+        self.max_alteracoes = max_alteracoes
+        self.duravel = duravel
+        self._condicao = threading.Condition()
+        # Uma descarga por vez (a da thread, a de descarregar() ou a final)
+        self._trava_gravacao = threading.Lock()
+        self._alteracoes = 0
+        self._primeira_alteracao: Optional[float] = None
+        self._em_gravacao = 0
+        self._parar = False
+        self._estatisticas = {
+            'descargas': 0, 'alteracoes_gravadas': 0, 'falhas': 0, 'fila_max': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'ultima_ms': 0.0,
+        }
+        self._thread = threading.Thread(target=self._executar, name='escrita-adiada', daemon=True)
+        self._thread.start()
+
+    def notificar_alteracao(self):
+        """Conta uma alteração confirmada e ainda não gravada (chamada com a trava de escrita)."""
+        with self._condicao:
+            self._alteracoes += 1
+            if self._alteracoes > self._estatisticas['fila_max']:
+                self._estatisticas['fila_max'] = self._alteracoes
+            if self._primeira_alteracao is None:
+                self._primeira_alteracao = time.monotonic()
+                self._condicao.notify()
+            elif self._alteracoes >= self.max_alteracoes:
+                self._condicao.notify()
+
+    @instrumentacao.instrumentar('dados.descarregar_adiado')
+    def descarregar(self) -> bool:
+        """Grava agora o conteúdo adiado, se houver. Não deve ser chamada com a trava de escrita."""
+        global _adiado
+        with self._trava_gravacao, escrita():
+            with self._condicao:
+                dados = _adiado
+                alteracoes = self._alteracoes
+                self._alteracoes = 0
+                self._primeira_alteracao = None
+                if dados is None:
+                    return False
+                self._em_gravacao = alteracoes
+
+            # A gravação fica dentro da trava de escrita: _gravar troca os caches de leitura
+            # (loja, partições, coleções, manifesto) e, na loja dividida, tira a geração e os
+            # arquivos a apagar do manifesto atual, que outra escrita não pode mudar no meio
+            inicio = time.perf_counter()
+            try:
+                _gravar(dados, self.duravel)
+            except PersistenciaError:
+                with self._condicao:
+                    self._alteracoes += alteracoes
+                    self._primeira_alteracao = time.monotonic()
+                    self._em_gravacao = 0
+                    self._estatisticas['falhas'] += 1
+                raise
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            _adiado = None
+
+            with self._condicao:
+                self._em_gravacao = 0
+                estatisticas = self._estatisticas
+                estatisticas['descargas'] += 1
+                estatisticas['alteracoes_gravadas'] += alteracoes
+                estatisticas['total_ms'] += duracao_ms
+                estatisticas['ultima_ms'] = duracao_ms
+                if duracao_ms > estatisticas['max_ms']:
+                    estatisticas['max_ms'] = duracao_ms
+            return True
+
+    def parar(self):
+        """Encerra a thread (que faz uma última descarga antes de sair)."""
+        with self._condicao:
+            self._parar = True
+            self._condicao.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._condicao:
+            estatisticas = dict(self._estatisticas)
+            estatisticas['fila'] = self._alteracoes
+            estatisticas['em_gravacao'] = self._em_gravacao
+            estatisticas['idade_fila_ms'] = (
+                (time.monotonic() - self._primeira_alteracao) * 1000 if self._primeira_alteracao is not None else 0.0
+            )
+        descargas = estatisticas['descargas']
+        estatisticas['media_ms'] = estatisticas['total_ms'] / descargas if descargas else 0.0
+        estatisticas['alteracoes_por_descarga'] = estatisticas['alteracoes_gravadas'] / descargas if descargas else 0.0
+        estatisticas.update(intervalo_s=self.intervalo_s, max_alteracoes=self.max_alteracoes, duravel=self.duravel)
+        return estatisticas
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                while not self._parar and self._alteracoes < self.max_alteracoes:
+                    if self._primeira_alteracao is None:
+                        self._condicao.wait()
+                        continue
+                    restante = self._primeira_alteracao + self.intervalo_s - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicao.wait(restante)
+                parar = self._parar
+            try:
+                self.descarregar()
+            except PersistenciaError as e:
+                # O conteúdo continua adiado (e visível); tenta de novo depois do intervalo
+                print(f"⚠️ Aviso: falha na gravação adiada da loja: {e}")
+                if not parar:
+                    with self._condicao:
+                        self._condicao.wait_for(lambda: self._parar, timeout=self.intervalo_s)
+            if parar:
+                return
+
+
+def ativar_escrita_adiada(
+    intervalo_s: float = INTERVALO_ADIADO_PADRAO_S,
+    max_alteracoes: int = MAX_ALTERACOES_ADIADAS_PADRAO,
+    duravel: bool = True
+) -> bool:
+    """
+    Liga a escrita adiada: cada salvar_dados_loja passa a valer em memória na hora, e uma
+    thread de fundo grava o loja.json `intervalo_s` depois da primeira alteração pendente
+    ou assim que houver `max_alteracoes` pendentes, o que vier antes, juntando todas em
+    uma gravação. Com duravel=True, cada descarga faz fsync; sem ele, é mais barata, mas
+    uma queda do sistema pode perder a última descarga. Alterações confirmadas e ainda não
+    descarregadas se perdem se o processo morrer; a saída normal do interpretador descarrega.
+    Retorna False se já estiver ativa.
+    """
+    global _descarregador
+    with escrita():
+        if _descarregador is not None:
+            return False
+        _descarregador = _Descarregador(intervalo_s, max_alteracoes, duravel)
+    atexit.register(desativar_escrita_adiada)
+    return True
+
+def desativar_escrita_adiada():
+    """Grava o que estiver adiado e volta às gravações síncronas."""
+    global _descarregador, _adiado
+    descarregador = _descarregador
+    if descarregador is None:
+        return
+    descarregador.parar()
+    with descarregador._trava_gravacao, escrita():
+        if _descarregador is descarregador:
+            _descarregador = None
+        if _adiado is not None:
+            _gravar(_adiado, descarregador.duravel)
+            _adiado = None
+    atexit.unregister(desativar_escrita_adiada)
+
+def escrita_adiada_ativa() -> bool:
+    return _descarregador is not None
+
+def descarregar() -> bool:
+    """Grava imediatamente as alterações adiadas. Retorna False se não havia nada a gravar."""
+    descarregador = _descarregador
+    if descarregador is None:
+        return False
+    return descarregador.descarregar()
+
+def estatisticas_escrita_adiada() -> Dict[str, Any]:
+    """Fila (alterações confirmadas e não gravadas) e latência das descargas; vazio se desligada."""
+    descarregador = _descarregador
+    return descarregador.estatisticas() if descarregador is not None else {}
@@ -0,0 +1,467 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import repositories.dados as dados_loja
+from repositories import settings_repository
+
+# Feed de alterações (change data capture) dos repositórios.
+#
+# Cada gravação confirmada de produto, cliente ou pedido, cada ajuste de estoque e cada
+# mudança de estado de pedido vira um EventoAlteracao (tipo, chave do registro, instante
+# e, nos produtos, a versão antes/depois), numerado em sequência. Os eventos de uma transação
+# (dados_loja.transacao) só saem quando ela é gravada; se ela for desfeita, não saem.
+# Com a escrita adiada, saem quando a alteração é confirmada em memória.
+#
+# Formas de consumo:
+#   - feed.assinar(callback): chamado na thread que alterou, ainda com a trava de escrita
+#     (deve ser rápido e não pode alterar os repositórios);
+#   - feed.assinar_asyncio(tamanho_max): fila asyncio limitada no loop de quem assinou;
+#     se o consumidor atrasar, os eventos mais antigos são descartados (e contados), e a
+#     lacuna na sequência indica o que reler do log;
+#   - o log data/alteracoes.log (um evento JSON por linha, só acrescentado), que outros
+#     processos leem a partir de um offset em bytes com ler_log()/seguir() ou
+#     `python -m repositories.eventos seguir --offset N`.
+# O log é dividido em segmentos: quando o ativo passaria de `eventos.tamanho_segmento_bytes`,
+# ele é fechado como alteracoes.<offset inicial>.log e um novo começa; só os
+# `eventos.segmentos_retidos` fechados mais novos ficam. O offset é global (conta os bytes
+# desde o começo do log, atravessando os segmentos), então continua valendo depois da
+# troca; quem ficar para trás dos segmentos apagados recomeça no mais antigo que restou
+# (a lacuna na sequência mostra o que se perdeu).
+# O log pode ser desligado com LOJA_LOG_ALTERACOES=0; sem log e sem assinantes, os
+# repositórios nem montam os eventos.
+
+LOG_FILE = 'alteracoes.log'
+# Dígitos do offset inicial no nome dos segmentos fechados (ordem alfabética = ordem do log)
+DIGITOS_SEGMENTO = 16
+TAMANHO_FILA_PADRAO = 1000
+
+PRODUTO_SALVO = 'produto.salvo'
+ESTOQUE_AJUSTADO = 'estoque.ajustado'
+CLIENTE_SALVO = 'cliente.salvo'
+PEDIDO_SALVO = 'pedido.salvo'
+PEDIDO_ESTADO = 'pedido.estado'
+PEDIDO_REMOVIDO = 'pedido.removido'
+COLECOES = {
+    PRODUTO_SALVO: 'produtos',
+    ESTOQUE_AJUSTADO: 'produtos',
+    CLIENTE_SALVO: 'clientes',
+    PEDIDO_SALVO: 'pedidos',
+    PEDIDO_ESTADO: 'pedidos',
+    PEDIDO_REMOVIDO: 'pedidos',
+}
+
+
+class EventoAlteracao:
+    """
+    Uma alteração confirmada em um registro. As versões são as do campo 'versao' dos
+    produtos (versao_anterior é None para produtos novos). Clientes e pedidos não têm
+    versão: os eventos deles ficam sem as duas, também no log. `detalhes` traz o que mudou
+    (ex.: estado anterior/novo).
+    """
+
+    __slots__ = ('tipo', 'chave', 'versao_anterior', 'versao_nova', 'detalhes', 'instante', 'sequencia')
+
+    def __init__(
+        self,
+        tipo: str,
+        chave: str,
+        versao_anterior: Optional[int] = None,
+        versao_nova: Optional[int] = None,
+        detalhes: Optional[Dict[str, Any]] = None,
+        instante: Optional[datetime] = None,
+        sequencia: Optional[int] = None
+    ):
+        self.tipo = tipo
+        self.chave = chave
+        self.versao_anterior = versao_anterior
+        self.versao_nova = versao_nova
+        self.detalhes = detalhes or {}
+        self.instante = instante or datetime.now()
+        self.sequencia = sequencia
+
+    @property
+    def colecao(self) -> str:
+        return COLECOES.get(self.tipo, '')
+
+    def to_dict(self) -> Dict[str, Any]:
+        dados = {'seq': self.sequencia, 'tipo': self.tipo, 'chave': self.chave}
+        # Só registros versionados (produtos) levam as versões
+        if self.versao_nova is not None:
+            dados['versao_anterior'] = self.versao_anterior
+            dados['versao_nova'] = self.versao_nova
+        dados['instante'] = self.instante.isoformat()
+        dados['detalhes'] = self.detalhes
+        return dados
+
+    @classmethod
+    def de_dict(cls, dados: Dict[str, Any]) -> 'EventoAlteracao':
+        return cls(
+            dados['tipo'], dados['chave'], dados.get('versao_anterior'), dados.get('versao_nova'),
+            dados.get('detalhes'), datetime.fromisoformat(dados['instante']), dados.get('seq')
+        )
+
+    def __str__(self):
+        versoes = f" v{self.versao_anterior}->v{self.versao_nova}" if self.versao_nova is not None else ""
+        detalhes = " ".join(f"{k}={v}" for k, v in self.detalhes.items())
+        return f"#{self.sequencia} {self.instante:%Y-%m-%d %H:%M:%S} {self.tipo} {self.chave}{versoes} {detalhes}".rstrip()
+
+
+class _Assinatura:
+    def __init__(self, feed: 'FeedAlteracoes', tipos: Optional[Iterable[str]]):
+        self._feed = feed
+        self.tipos = frozenset(tipos) if tipos else None
+        self.entregues = 0
+
+    def aceita(self, evento: EventoAlteracao) -> bool:
+        return self.tipos is None or evento.tipo in self.tipos
+
+    def cancelar(self):
+        self._feed._remover(self)
+
+    def entregar(self, eventos: List[EventoAlteracao]):
+        raise NotImplementedError
+
+
+class AssinaturaCallback(_Assinatura):
+    """Entrega cada evento a uma função, na thread que fez a alteração."""
+
+    def __init__(self, feed: 'FeedAlteracoes', callback: Callable[[EventoAlteracao], None], tipos: Optional[Iterable[str]]):
+        super().__init__(feed, tipos)
+        self._callback = callback
+        self.erros = 0
+
+    def entregar(self, eventos: List[EventoAlteracao]):
+        for evento in eventos:
+            try:
+                self._callback(evento)
+                self.entregues += 1
+            except Exception:
+                # Um assinante com defeito não desfaz nem atrasa a alteração já gravada
+                self.erros += 1
+
+
+class AssinaturaAsyncio(_Assinatura):
+    """
+    Fila asyncio limitada no loop de quem assinou; iterável com `async for`. Cheia, a fila
+    descarta o evento mais antigo (contado em `perdidos`) em vez de travar quem altera.
+    """
+
+    def __init__(self, feed: 'FeedAlteracoes', tamanho_max: int, tipos: Optional[Iterable[str]]):
+        super().__init__(feed, tipos)
+        self._loop = asyncio.get_running_loop()
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=tamanho_max)
+        self.perdidos = 0
+
+    def entregar(self, eventos: List[EventoAlteracao]):
+        try:
+            self._loop.call_soon_threadsafe(self._enfileirar, eventos)
+        except RuntimeError:
+            # Loop encerrado: a assinatura não tem mais quem a consuma
+            self.cancelar()
+
+    def _enfileirar(self, eventos: List[EventoAlteracao]):
+        for evento in eventos:
+            if self.fila.full():
+                self.fila.get_nowait()
+                self.perdidos += 1
+            self.fila.put_nowait(evento)
+            self.entregues += 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> EventoAlteracao:
+        return await self.fila.get()
+
+
+class FeedAlteracoes:
+    """Numera, grava no log e distribui aos assinantes os eventos de alteração."""
+
+    def __init__(self, gravar_log: bool = True):
+        self._trava = threading.Lock()
+        self._assinaturas: List[_Assinatura] = []
+        self._gravar_log = gravar_log
+        # Última sequência por caminho de log (a pasta de dados pode mudar)
+        self._sequencias: Dict[str, int] = {}
+        self._arquivo_log = None
+        self._caminho_log: Optional[str] = None
+        self._estatisticas = Counter()
+
+    # --- Configuração e assinaturas ---
+
+    def definir_log(self, ativo: bool):
+        with self._trava:
+            self._gravar_log = ativo
+            self._fechar_log()
+
+    def ativo(self) -> bool:
+        """True se algum evento publicado agora teria destino (log ou assinante)."""
+        return self._gravar_log or bool(self._assinaturas)
+
+    def assinar(self, callback: Callable[[EventoAlteracao], None], tipos: Optional[Iterable[str]] = None) -> AssinaturaCallback:
+        assinatura = AssinaturaCallback(self, callback, tipos)
+        with self._trava:
+            self._assinaturas.append(assinatura)
+        return assinatura
+
+    def assinar_asyncio(self, tamanho_max: int = TAMANHO_FILA_PADRAO, tipos: Optional[Iterable[str]] = None) -> AssinaturaAsyncio:
+        """Deve ser chamada de dentro do loop asyncio que vai consumir a fila."""
+        assinatura = AssinaturaAsyncio(self, tamanho_max, tipos)
+        with self._trava:
+            self._assinaturas.append(assinatura)
+        return assinatura
+
+    def _remover(self, assinatura: _Assinatura):
+        with self._trava:
+            if assinatura in self._assinaturas:
+                self._assinaturas.remove(assinatura)
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._trava:
+            estatisticas = dict(self._estatisticas)
+            estatisticas['assinantes'] = len(self._assinaturas)
+        return estatisticas
+
+    # --- Publicação ---
+
+    def publicar(self, eventos: List[EventoAlteracao]):
+        """Anuncia os eventos quando a alteração for confirmada (ver dados_loja.apos_confirmacao)."""
+        if eventos:
+            dados_loja.apos_confirmacao(lambda: self._emitir(eventos))
+
+    def _emitir(self, eventos: List[EventoAlteracao]):
+        with self._trava:
+            caminho = dados_loja._get_file_path(LOG_FILE)
+            sequencia = self._ultima_sequencia(caminho)
+            for evento in eventos:
+                sequencia += 1
+                evento.sequencia = sequencia
+            self._sequencias[caminho] = sequencia
+            self._estatisticas['eventos'] += len(eventos)
+            if self._gravar_log:
+                self._anexar_ao_log(caminho, eventos)
+            assinaturas = list(self._assinaturas)
+
+        for assinatura in assinaturas:
+            aceitos = eventos if assinatura.tipos is None else [e for e in eventos if assinatura.aceita(e)]
+            if aceitos:
+                assinatura.entregar(aceitos)
+
+    def _ultima_sequencia(self, caminho: str) -> int:
+        sequencia = self._sequencias.get(caminho)
+        if sequencia is None:
+            ultimo = _ultimo_evento_do_log(caminho)
+            sequencia = ultimo.sequencia if ultimo else 0
+        return sequencia
+
+    def _anexar_ao_log(self, caminho: str, eventos: List[EventoAlteracao]):
+        linhas = ''.join(json.dumps(e.to_dict(), ensure_ascii=False) + '\n' for e in eventos).encode('utf-8')
+        try:
+            if self._caminho_log != caminho:
+                self._abrir_log(caminho)
+            regras = settings_repository.obter_configuracoes().eventos
+            tamanho = self._arquivo_log.tell()
+            if tamanho and tamanho + len(linhas) > regras.tamanho_segmento_bytes:
+                self._rotacionar(caminho, regras.segmentos_retidos)
+            self._arquivo_log.write(linhas)
+            # Visível para quem acompanha o log em outro processo
+            self._arquivo_log.flush()
+        except OSError as e:
+            # A alteração já está gravada: a falha no log não a desfaz
+            self._estatisticas['falhas_log'] += 1
+            self._fechar_log()
+            print(f"⚠️ Aviso: não foi possível gravar em {LOG_FILE}: {e}")
+
+    def _abrir_log(self, caminho: str):
+        self._fechar_log()
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self._arquivo_log = open(caminho, 'ab')
+        self._caminho_log = caminho
+
+    def _rotacionar(self, caminho: str, retidos: int):
+        """Fecha o log ativo como segmento, começa um novo e apaga os segmentos além de `retidos`."""
+        base = _inicio_do_ativo(_segmentos(caminho))
+        self._fechar_log()
+        os.replace(caminho, _caminho_segmento(caminho, base))
+        for _, antigo in _segmentos(caminho)[:-retidos]:
+            try:
+                os.remove(antigo)
+            except OSError:
+                pass
+        self._estatisticas['segmentos_fechados'] += 1
+        self._abrir_log(caminho)
+
+    def _fechar_log(self):
+        if self._arquivo_log is not None:
+            try:
+                self._arquivo_log.close()
+            except OSError:
+                pass
+        self._arquivo_log = None
+        self._caminho_log = None
+
+
+# --- Leitura do log (também por outros processos) ---
+
+def _caminho_segmento(caminho: str, inicio: int) -> str:
+    raiz, extensao = os.path.splitext(caminho)
+    return f"{raiz}.{inicio:0{DIGITOS_SEGMENTO}d}{extensao}"
+
+def _segmentos(caminho: str) -> List[Tuple[int, str]]:
+    """Segmentos fechados do log: (offset global do primeiro byte, caminho), do mais antigo ao mais novo."""
+    pasta, nome = os.path.split(caminho)
+    raiz, extensao = os.path.splitext(nome)
+    try:
+        nomes = os.listdir(pasta or '.')
+    except FileNotFoundError:
+        return []
+    segmentos = []
+    for arquivo in nomes:
+        meio = arquivo[len(raiz) + 1:len(arquivo) - len(extensao)]
+        if (arquivo.startswith(raiz + '.') and arquivo.endswith(extensao)
+                and len(meio) == DIGITOS_SEGMENTO and meio.isdigit()):
+            segmentos.append((int(meio), os.path.join(pasta, arquivo)))
+    return sorted(segmentos)
+
+def _inicio_do_ativo(segmentos: List[Tuple[int, str]]) -> int:
+    """Offset global do primeiro byte do log ativo: o fim do segmento fechado mais novo."""
+    if not segmentos:
+        return 0
+    inicio, caminho = segmentos[-1]
+    return inicio + os.path.getsize(caminho)
+
+def _fim_do_log(caminho: str) -> int:
+    """Offset global do fim do log (onde o próximo evento vai começar)."""
+    inicio = _inicio_do_ativo(_segmentos(caminho))
+    try:
+        return inicio + os.path.getsize(caminho)
+    except OSError:
+        return inicio
+
+def _ultimo_evento_do_log(caminho: str) -> Optional[EventoAlteracao]:
+    """Último evento completo do log: do ativo ou, se ele estiver vazio, do segmento mais novo."""
+    for arquivo in [caminho] + [c for _, c in reversed(_segmentos(caminho))]:
+        evento = _ultimo_evento_do_arquivo(arquivo)
+        if evento is not None:
+            return evento
+    return None
+
+def _ultimo_evento_do_arquivo(caminho: str) -> Optional[EventoAlteracao]:
+    """Último evento completo de um arquivo do log, lendo só o final dele."""
+    try:
+        with open(caminho, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            tamanho = f.tell()
+            bloco = 4096
+            while True:
+                inicio = max(0, tamanho - bloco)
+                f.seek(inicio)
+                final = f.read(tamanho - inicio)
+                linhas = final.split(b'\n')
+                # A última posição é o resto depois do último '\n' (linha incompleta ou vazio)
+                completas = [l for l in linhas[1 if inicio > 0 else 0:-1] if l.strip()]
+                if completas:
+                    return EventoAlteracao.de_dict(json.loads(completas[-1]))
+                if inicio == 0:
+                    return None
+                bloco *= 4
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError):
+        return None
+
+def caminho_log() -> str:
+    return dados_loja._get_file_path(LOG_FILE)
+
+def ler_log(offset: int = 0, caminho: Optional[str] = None) -> Iterator[Tuple[EventoAlteracao, int]]:
+    """
+    Eventos do log a partir do byte (global) `offset`, passando pelos segmentos fechados e
+    pelo ativo, cada um com o offset da linha seguinte (guarde-o para retomar dali). Uma
+    linha ainda incompleta fica para a próxima leitura. Um offset anterior ao segmento mais
+    antigo que restou recomeça nele.
+    """
+    caminho = caminho or caminho_log()
+    while True:
+        segmentos = _segmentos(caminho)
+        partes = segmentos + [(_inicio_do_ativo(segmentos), caminho)]
+        offset = max(offset, partes[0][0])
+        trocado = False
+        for i, (inicio, arquivo) in enumerate(partes):
+            fim = partes[i + 1][0] if i + 1 < len(partes) else None
+            if fim is not None and offset >= fim:
+                continue
+            try:
+                f = open(arquivo, 'rb')
+            except FileNotFoundError:
+                # Segmento apagado pela retenção depois da listagem: lista de novo. O ativo
+                # ausente (ainda não criado, ou no meio da troca) conta como vazio
+                trocado = fim is not None
+                break
+            with f:
+                # O ativo virou segmento entre a listagem e a abertura: lista de novo
+                if fim is None and _inicio_do_ativo(_segmentos(caminho)) != inicio:
+                    trocado = True
+                    break
+                f.seek(offset - inicio)
+                for linha in f:
+                    if not linha.endswith(b'\n'):
+                        if fim is None:
+                            return
+                        # Final truncado de um segmento fechado: segue para o próximo
+                        offset = fim
+                        break
+                    offset += len(linha)
+                    yield EventoAlteracao.de_dict(json.loads(linha)), offset
+        if not trocado:
+            return
+
+def seguir(
+    offset: int = 0,
+    intervalo_s: float = 0.5,
+    caminho: Optional[str] = None,
+    parar: Optional[threading.Event] = None
+) -> Iterator[Tuple[EventoAlteracao, int]]:
+    """Como ler_log, mas continua esperando novos eventos (até `parar` ser sinalizado)."""
+    caminho = caminho or caminho_log()
+    parar = parar or threading.Event()
+    while not parar.is_set():
+        for evento, offset in ler_log(offset, caminho):
+            yield evento, offset
+        if _fim_do_log(caminho) < offset:
+            # Log recriado (ex.: apagado à mão): recomeça do início
+            offset = 0
+            continue
+        parar.wait(intervalo_s)
+
+
+# Instância usada pelos repositórios
+feed = FeedAlteracoes(gravar_log=os.environ.get('LOJA_LOG_ALTERACOES', '') != '0')
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Lê o log de alterações dos repositórios.")
+    parser.add_argument('acao', choices=['ler', 'seguir'])
+    parser.add_argument('--offset', type=int, default=0, help="Byte do log onde começar (o último offset lido)")
+    parser.add_argument('--tipos', nargs='+', choices=sorted(COLECOES), help="Só estes tipos de evento")
+    parser.add_argument('--log', help=f"Caminho do log (padrão: {LOG_FILE} na pasta de dados)")
+    args = parser.parse_args(argumentos)
+
+    leitura = ler_log(args.offset, args.log) if args.acao == 'ler' else seguir(args.offset, caminho=args.log)
+    offset = args.offset
+    try:
+        for evento, offset in leitura:
+            if not args.tipos or evento.tipo in args.tipos:
+                print(f"{offset:>10}  {evento}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    print(f"Próximo offset: {offset}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+import json
+import math
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Tuple
+
+# Formato binário compacto da loja (loja.bin), alternativo ao loja.json indentado.
+#
+# O conteúdo é o mesmo dicionário do loja.json, sem repetir o que o JSON repete:
+#   - cada objeto aponta para uma "forma" compartilhada (as chaves, em ordem, e o tipo de
+#     cada valor), então 'codigo_pedido', 'preco_unitario' etc. aparecem uma vez no arquivo;
+#   - todo texto vai para uma tabela única e é referenciado pelo índice (categorias, UFs,
+#     cidades, estados e bandeiras ficam uma vez no arquivo e viram o mesmo objeto str na
+#     leitura);
+#   - datas ISO (datetime.isoformat(), sem fuso) viram inteiros (microssegundos desde 1970);
+#   - inteiros de 32 bits ficam direto no fluxo de tokens; reais e inteiros maiores, em tabelas.
+# Arquivo: cabeçalho (MAGIC, versão) seguido de seções (tipo de 4 bytes + tamanho):
+#   STRS  textos: quantidade, tamanho de cada um (em caracteres) e o texto UTF-8 concatenado
+#   FORM  formas, em JSON: [[[chave, tipo], ...], ...]
+#   REAL  reais (float64)          DATA  datas (int64, microssegundos desde 1970)
+#   GRND  inteiros fora de 32 bits, em JSON
+#   COLE  uma coleção (lista do nível de cima): nome, quantidade de registros, tamanho de
+#         cada registro (em tokens) e os tokens (int32) — cada registro pode ser pulado ou
+#         lido sozinho
+#   VALR  um valor do nível de cima que não é lista: nome e tokens
+# Na leitura, cada forma vira uma função compilada que monta o dicionário direto dos
+# tokens, sem testar o tipo de cada valor. Números em little-endian.
+
+MAGIC = b'LOJABIN\x00'
+VERSAO = 1
+_CABECALHO = struct.Struct('<8sHH')
+_SECAO = struct.Struct('<4sQ')
+_U32 = struct.Struct('<I')
+
+# Tipos dos valores (nas formas e antes de cada item de lista)
+NULO, FALSO, VERDADEIRO, INTEIRO, REAL, TEXTO, DATA, GRANDE, OBJETO, LISTA = range(10)
+
+_EPOCA = datetime(1970, 1, 1)
+_MICROSSEGUNDO = timedelta(microseconds=1)
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+_INVERTER_BYTES = sys.byteorder != 'little'
+
+
+class FormatoBinarioInvalido(ValueError):
+    """Conteúdo que não é um loja.bin válido (truncado, corrompido ou de versão desconhecida)."""
+
+
+def eh_binario(inicio: bytes) -> bool:
+    """True se os primeiros bytes de um arquivo são de um loja.bin."""
+    return inicio[:len(MAGIC)] == MAGIC
+
+
+def _para_bytes(valores: array) -> bytes:
+    if _INVERTER_BYTES:
+        valores = array(valores.typecode, valores)
+        valores.byteswap()
+    return valores.tobytes()
+
+def _de_bytes(tipo: str, conteudo) -> array:
+    valores = array(tipo)
+    if len(conteudo) % valores.itemsize:
+        raise FormatoBinarioInvalido("Tabela numérica com tamanho inválido.")
+    valores.frombytes(conteudo)
+    if _INVERTER_BYTES:
+        valores.byteswap()
+    return valores
+
+
+# --- Gravação ---
+
+class _Codificador:
+    """Acumula as tabelas compartilhadas enquanto converte os valores em tokens."""
+
+    def __init__(self):
+        self.textos: Dict[str, int] = {}
+        self.formas: Dict[Tuple[Tuple[str, int], ...], int] = {}
+        self.reais: Dict[Any, int] = {}
+        self.datas: Dict[str, int] = {}
+        self.grandes: List[int] = []
+
+    def tipo(self, valor: Any) -> int:
+        if valor is None:
+            return NULO
+        if valor is True:
+            return VERDADEIRO
+        if valor is False:
+            return FALSO
+        classe = type(valor)
+        if classe is str:
+            # Só vira data o que volta idêntico pelo isoformat() (o formato gravado pelos modelos)
+            if len(valor) in (19, 26) and valor[10] == 'T':
+                try:
+                    data = datetime.fromisoformat(valor)
+                except ValueError:
+                    return TEXTO
+                if data.tzinfo is None and data.isoformat() == valor:
+                    return DATA
+            return TEXTO
+        if classe is int:
+            return INTEIRO if _INT32_MIN <= valor <= _INT32_MAX else GRANDE
+        if classe is float:
+            return REAL
+        if classe is dict:
+            return OBJETO
+        if classe is list or classe is tuple:
+            return LISTA
+        raise TypeError(f"Valor não suportado no formato binário: {classe.__name__}")
+
+    def _indice(self, tabela: Dict[Any, int], chave: Any) -> int:
+        indice = tabela.get(chave)
+        if indice is None:
+            indice = tabela[chave] = len(tabela)
+        return indice
+
+    def valor(self, valor: Any, tipo: int, tokens: array):
+        """Acrescenta aos tokens o conteúdo de um valor cujo tipo já está registrado (na forma ou no item)."""
+        if tipo <= VERDADEIRO:
+            return
+        if tipo == TEXTO:
+            tokens.append(self._indice(self.textos, valor))
+        elif tipo == INTEIRO:
+            tokens.append(valor)
+        elif tipo == REAL:
+            # 0.0 e -0.0 são iguais como chave de dicionário, mas não no arquivo
+            chave = valor if valor != 0.0 else (valor, math.copysign(1.0, valor))
+            tokens.append(self._indice(self.reais, chave))
+        elif tipo == DATA:
+            tokens.append(self._indice(self.datas, valor))
+        elif tipo == OBJETO:
+            forma = tuple((chave, self.tipo(v)) for chave, v in valor.items())
+            for chave, _ in forma:
+                if type(chave) is not str:
+                    raise TypeError("Chaves de objeto precisam ser textos no formato binário.")
+            tokens.append(self._indice(self.formas, forma))
+            for (_, tipo_item), item in zip(forma, valor.values()):
+                self.valor(item, tipo_item, tokens)
+        elif tipo == LISTA:
+            tokens.append(len(valor))
+            for item in valor:
+                self.item(item, tokens)
+        else:
+            self.grandes.append(valor)
+            tokens.append(len(self.grandes) - 1)
+
+    def item(self, valor: Any, tokens: array):
+        """Valor com o tipo à frente (itens de lista, registros e valores do nível de cima)."""
+        tipo = self.tipo(valor)
+        tokens.append(tipo)
+        self.valor(valor, tipo, tokens)
+
+    def secao_textos(self) -> bytes:
+        textos = list(self.textos)
+        tamanhos = array('I', map(len, textos))
+        return _U32.pack(len(textos)) + _para_bytes(tamanhos) + ''.join(textos).encode('utf-8', 'surrogatepass')
+
+    def secao_formas(self) -> bytes:
+        return json.dumps([list(map(list, forma)) for forma in self.formas], ensure_ascii=False).encode('utf-8')
+
+    def secao_reais(self) -> bytes:
+        return _para_bytes(array('d', (chave if type(chave) is float else chave[0] for chave in self.reais)))
+
+    def secao_datas(self) -> bytes:
+        return _para_bytes(array('q', ((datetime.fromisoformat(d) - _EPOCA) // _MICROSSEGUNDO for d in self.datas)))
+
+
+def _nome(nome: str) -> bytes:
+    codificado = nome.encode('utf-8')
+    return _U32.pack(len(codificado)) + codificado
+
+def _escrever_secao(f: BinaryIO, tipo: bytes, *partes: bytes):
+    f.write(_SECAO.pack(tipo, sum(len(p) for p in partes)))
+    for parte in partes:
+        f.write(parte)
+
+def gravar(f: BinaryIO, dados: Dict[str, Any]):
+    """Grava o dicionário da loja no formato binário em um arquivo aberto em modo 'wb'."""
+    codificador = _Codificador()
+    colecoes = []
+    valores = []
+    for nome, conteudo in dados.items():
+        tokens = array('i')
+        if isinstance(conteudo, list):
+            tamanhos = array('I')
+            for registro in conteudo:
+                antes = len(tokens)
+                codificador.item(registro, tokens)
+                tamanhos.append(len(tokens) - antes)
+            colecoes.append((nome, tamanhos, tokens))
+        else:
+            codificador.item(conteudo, tokens)
+            valores.append((nome, tokens))
+
+    f.write(_CABECALHO.pack(MAGIC, VERSAO, 0))
+    _escrever_secao(f, b'STRS', codificador.secao_textos())
+    _escrever_secao(f, b'FORM', codificador.secao_formas())
+    _escrever_secao(f, b'REAL', codificador.secao_reais())
+    _escrever_secao(f, b'DATA', codificador.secao_datas())
+    _escrever_secao(f, b'GRND', json.dumps(codificador.grandes).encode('ascii'))
+    for nome, tamanhos, tokens in colecoes:
+        _escrever_secao(f, b'COLE', _nome(nome), _U32.pack(len(tamanhos)), _para_bytes(tamanhos), _para_bytes(tokens))
+    for nome, tokens in valores:
+        _escrever_secao(f, b'VALR', _nome(nome), _para_bytes(tokens))
+
+
+# --- Leitura ---
+
+def _indice_secoes(conteudo) -> Iterator[Tuple[bytes, int, int]]:
+    """(tipo, início, tamanho) de cada seção, lendo só os cabeçalhos (serve para bytes e mmap)."""
+    total = len(conteudo)
+    if total < _CABECALHO.size:
+        raise FormatoBinarioInvalido("Arquivo binário truncado.")
+    magic, versao, _ = _CABECALHO.unpack_from(conteudo)
+    if magic != MAGIC:
+        raise FormatoBinarioInvalido("Não é um arquivo loja.bin.")
+    if versao != VERSAO:
+        raise FormatoBinarioInvalido(f"Versão {versao} do formato binário não suportada (esperada {VERSAO}).")
+    posicao = _CABECALHO.size
+    while posicao < total:
+        if posicao + _SECAO.size > total:
+            raise FormatoBinarioInvalido("Arquivo binário truncado.")
+        tipo, tamanho = _SECAO.unpack_from(conteudo, posicao)
+        posicao += _SECAO.size
+        if posicao + tamanho > total:
+            raise FormatoBinarioInvalido("Arquivo binário truncado.")
+        yield tipo, posicao, tamanho
+        posicao += tamanho
+
+def _secoes(conteudo) -> Iterator[Tuple[bytes, memoryview]]:
+    visao = memoryview(conteudo)
+    for tipo, inicio, tamanho in _indice_secoes(conteudo):
+        yield tipo, visao[inicio:inicio + tamanho]
+
+def _ler_nome(secao: memoryview) -> Tuple[str, memoryview]:
+    (tamanho,) = _U32.unpack_from(secao)
+    fim = _U32.size + tamanho
+    return bytes(secao[_U32.size:fim]).decode('utf-8'), secao[fim:]
+
+def _ler_textos(secao: memoryview) -> List[str]:
+    (quantidade,) = _U32.unpack_from(secao)
+    fim_tamanhos = _U32.size + 4 * quantidade
+    tamanhos = _de_bytes('I', secao[_U32.size:fim_tamanhos])
+    texto = bytes(secao[fim_tamanhos:]).decode('utf-8', 'surrogatepass')
+    textos = []
+    inicio = 0
+    for tamanho in tamanhos:
+        textos.append(texto[inicio:inicio + tamanho])
+        inicio += tamanho
+    return textos
+
+
+def _datas_iso(micros: array) -> List[str]:
+    """Converte de volta para isoformat(), reaproveitando o texto dos dias e horários já vistos."""
+    dias: Dict[int, str] = {}
+    horarios: Dict[int, str] = {}
+    datas = []
+    for valor in micros:
+        segundos, fracao = divmod(valor, 1_000_000)
+        dia, segundo_do_dia = divmod(segundos, 86400)
+        texto_dia = dias.get(dia)
+        if texto_dia is None:
+            texto_dia = dias[dia] = (_EPOCA + timedelta(days=dia)).date().isoformat() + 'T'
+        horario = horarios.get(segundo_do_dia)
+        if horario is None:
+            horas, resto = divmod(segundo_do_dia, 3600)
+            horario = horarios[segundo_do_dia] = f'{horas:02d}:{resto // 60:02d}:{resto % 60:02d}'
+        datas.append(texto_dia + horario + (f'.{fracao:06d}' if fracao else ''))
+    return datas
+
+
+class _Decodificador:
+    """Tabelas compartilhadas e as funções de montagem compiladas para cada forma."""
+
+    def __init__(self, tabelas: Dict[bytes, memoryview]):
+        try:
+            textos = _ler_textos(tabelas[b'STRS'])
+            formas = json.loads(bytes(tabelas[b'FORM']))
+            reais = _de_bytes('d', tabelas[b'REAL']).tolist()
+            datas = _datas_iso(_de_bytes('q', tabelas[b'DATA']))
+            grandes = json.loads(bytes(tabelas[b'GRND']))
+        except KeyError as e:
+            raise FormatoBinarioInvalido(f"Seção {e.args[0]!r} ausente.") from e
+
+        self._global: Dict[str, Any] = {
+            'prox': None, 'textos': textos, 'reais': reais, 'datas': datas, 'grandes': grandes,
+            'FORMAS': [], 'ITEM': None,
+        }
+        expressoes = {
+            NULO: 'None', FALSO: 'False', VERDADEIRO: 'True', INTEIRO: 'prox()',
+            REAL: 'reais[prox()]', TEXTO: 'textos[prox()]', DATA: 'datas[prox()]',
+            GRANDE: 'grandes[prox()]', OBJETO: 'FORMAS[prox()]()',
+            LISTA: '[ITEM[prox()]() for _ in range(prox())]',
+        }
+        self._global['ITEM'] = [self._compilar(f'lambda: {expressoes[tipo]}') for tipo in range(len(expressoes))]
+        for forma in formas:
+            campos = []
+            for chave, tipo in forma:
+                if tipo not in expressoes:
+                    raise FormatoBinarioInvalido(f"Tipo de valor desconhecido: {tipo}.")
+                campos.append(f'{str(chave)!r}: {expressoes[tipo]}')
+            self._global['FORMAS'].append(self._compilar(f'lambda: {{{", ".join(campos)}}}'))
+
+    def _compilar(self, codigo: str) -> Callable[[], Any]:
+        return eval(compile(codigo, '<formato_binario>', 'eval'), self._global)
+
+    def lista(self, tokens: array, quantidade: int) -> List[Any]:
+        """Monta os `quantidade` registros (ou valores) seguidos nos tokens."""
+        self._global['prox'] = proximo = iter(tokens.tolist()).__next__
+        item = self._global['ITEM']
+        return [item[proximo()]() for _ in range(quantidade)]
+
+
+def _ler_colecao(secao: memoryview) -> Tuple[str, int, memoryview]:
+    nome, resto = _ler_nome(secao)
+    (quantidade,) = _U32.unpack_from(resto)
+    fim_tamanhos = _U32.size + 4 * quantidade
+    return nome, quantidade, resto[fim_tamanhos:]
+
+def decodificar(conteudo) -> Dict[str, Any]:
+    """Lê um loja.bin inteiro (bytes, mmap ou memoryview) e devolve o dicionário da loja."""
+    tabelas: Dict[bytes, memoryview] = {}
+    colecoes: List[Tuple[str, int, memoryview]] = []
+    valores: List[Tuple[str, memoryview]] = []
+    for tipo, secao in _secoes(conteudo):
+        if tipo == b'COLE':
+            colecoes.append(_ler_colecao(secao))
+        elif tipo == b'VALR':
+            valores.append(_ler_nome(secao))
+        else:
+            tabelas[tipo] = secao
+
+    decodificador = _Decodificador(tabelas)
+    dados: Dict[str, Any] = {}
+    try:
+        for nome, quantidade, tokens in colecoes:
+            dados[nome] = decodificador.lista(_de_bytes('i', tokens), quantidade)
+        for nome, tokens in valores:
+            dados[nome] = decodificador.lista(_de_bytes('i', tokens), 1)[0]
+    except (StopIteration, IndexError) as e:
+        raise FormatoBinarioInvalido("Tokens inconsistentes com as tabelas do arquivo.") from e
+    return dados
+
+def iterar_colecao(conteudo, nome: str, registros_por_bloco: int = 4096) -> Iterator[Any]:
+    """
+    Registros de uma coleção, um a um, sem montar as outras nem a coleção inteira.
+    `conteudo` pode ser um mmap: só as tabelas compartilhadas (proporcionais aos textos e
+    datas distintos) e um bloco de `registros_por_bloco` registros por vez são copiados.
+    """
+    tabelas: Dict[bytes, bytes] = {}
+    secao_colecao = None
+    for tipo, inicio, tamanho in _indice_secoes(conteudo):
+        if tipo == b'COLE':
+            if secao_colecao is None:
+                (tamanho_nome,) = _U32.unpack_from(conteudo, inicio)
+                if conteudo[inicio + _U32.size:inicio + _U32.size + tamanho_nome] == nome.encode('utf-8'):
+                    secao_colecao = inicio + _U32.size + tamanho_nome
+        elif tipo != b'VALR':
+            tabelas[tipo] = conteudo[inicio:inicio + tamanho]
+    if secao_colecao is None:
+        return
+
+    decodificador = _Decodificador(tabelas)
+    (quantidade,) = _U32.unpack_from(conteudo, secao_colecao)
+    inicio_tamanhos = secao_colecao + _U32.size
+    inicio_tokens = inicio_tamanhos + 4 * quantidade
+    for primeiro in range(0, quantidade, registros_por_bloco):
+        no_bloco = min(registros_por_bloco, quantidade - primeiro)
+        tamanhos = _de_bytes('I', conteudo[inicio_tamanhos + 4 * primeiro:inicio_tamanhos + 4 * (primeiro + no_bloco)])
+        fim_tokens = inicio_tokens + 4 * sum(tamanhos)
+        try:
+            registros = decodificador.lista(_de_bytes('i', conteudo[inicio_tokens:fim_tokens]), no_bloco)
+        except (StopIteration, IndexError) as e:
+            raise FormatoBinarioInvalido("Tokens inconsistentes com as tabelas do arquivo.") from e
+        inicio_tokens = fim_tokens
+        yield from registros
@@ -0,0 +1,243 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from models.entidades import Cliente, Endereco, Produto, ProdutoFisico
+from models.transacoes import Cupom, Frete, Pagamento, PagamentoBoleto, PagamentoCartao
+from models.vendas import Carrinho, ItemCarrinho, Pedido
+from models.exceptions import DocumentoInvalidoError, ValorInvalidoError
+import repositories.dados as dados_loja
+from repositories import internamento
+
+# Hidratação pelo caminho confiável.
+#
+# Os registros da loja são gravados a partir de objetos que já passaram pelos construtores
+# (to_dict). Relê-los pelos construtores repete a validação (regex do CEP no Endereco,
+# re.sub do CPF no Cliente) e, no Pedido, recalcula totais que a desserialização
+# sobrescreve logo em seguida. Aqui cada classe tem um codec: uma função gerada uma vez por
+# versão do esquema (dados.VERSAO_ESQUEMA), que cria a instância sem __init__ e atribui os
+# atributos direto do registro, sem regex e sem recálculo.
+#
+# O caminho confiável só é usado com registros de uma loja marcada com a versão atual do
+# esquema (dados.esquema_confiavel), marca que conferir_loja() só grava depois de passar
+# todos os registros pelos construtores e comparar o resultado com o do codec. Entrada
+# externa (importação, cadastro pelo CLI) continua pelos construtores.
+
+# classe -> (parâmetros além do registro `d`, [(atributo, expressão)]). As expressões
+# reproduzem o que o construtor + desserializador fazem com um registro válido.
+_DATA_PAGAMENTO = "data(d.get('data_pagamento')) or (agora() if d['status'] == 'APROVADO' else None)"
+_CAMPOS_PRODUTO = [
+    ('_sku', "d['sku']"),
+    ('_nome', "d['nome']"),
+    ('_categoria', "texto(d['categoria'])"),
+    ('_preco_unitario', "d['preco_unitario']"),
+    ('_estoque', "d.get('estoque', 0)"),
+    ('_is_ativo', "d.get('is_ativo', True)"),
+    ('_versao', "d.get('versao', 0)"),
+]
+_ESQUEMAS: Dict[type, Tuple[Tuple[str, ...], List[Tuple[str, str]]]] = {
+    Produto: ((), _CAMPOS_PRODUTO),
+    ProdutoFisico: ((), _CAMPOS_PRODUTO + [('_peso', "d['peso']")]),
+    Endereco: ((), [
+        ('_cep', "d['cep']"),
+        ('_logradouro', "d['logradouro']"),
+        ('_numero', "d['numero']"),
+        ('_cidade', "texto(d['cidade'])"),
+        ('_uf', "texto(d['uf'])"),
+        ('_complemento', "d.get('complemento')"),
+    ]),
+    Cliente: (('enderecos',), [
+        ('_cpf', "d['cpf']"),
+        ('_nome', "d['nome']"),
+        ('_email', "d['email']"),
+        ('_data_cadastro', "data(d.get('data_cadastro')) or agora()"),
+        ('_enderecos', "enderecos"),
+    ]),
+    Frete: ((), [
+        ('_cep_origem', "texto(d['cep_origem'])"),
+        ('_cep_destino', "texto(d['cep_destino'])"),
+        ('_valor', "d['valor']"),
+        ('_prazo_dias', "d['prazo_dias']"),
+    ]),
+    Cupom: ((), [
+        ('_codigo', "texto(d['codigo'])"),
+        ('_valor', "d['valor']"),
+        ('_is_percentual', "d['is_percentual']"),
+        ('_validade', "data(d.get('validade'))"),
+    ]),
+    Pagamento: ((), [
+        ('_valor', "d['valor']"),
+        ('_status', "texto(d['status'])"),
+        ('_data_pagamento', _DATA_PAGAMENTO),
+    ]),
+    PagamentoCartao: ((), [
+        ('_valor', "d['valor']"),
+        ('_status', "texto(d['status'])"),
+        ('_data_pagamento', _DATA_PAGAMENTO),
+        ('_bandeira', "texto(d.get('bandeira', 'DESCONHECIDA'))"),
+    ]),
+    # O construtor do boleto sempre o cria PENDENTE, sem data de pagamento
+    PagamentoBoleto: ((), [
+        ('_valor', "d['valor']"),
+        ('_status', "'PENDENTE'"),
+        ('_data_pagamento', "None"),
+        ('_codigo_barras', "d['codigo_barras']"),
+        ('_data_vencimento', "datetime.fromisoformat(d['data_vencimento'])"),
+    ]),
+    ItemCarrinho: (('produto',), [
+        ('_produto', "produto"),
+        ('_quantidade', "d['quantidade']"),
+        ('_preco_unitario', "d['preco_unitario']"),
+    ]),
+    Carrinho: (('itens', 'cliente'), [
+        ('_cliente', "cliente"),
+        ('_itens', "itens"),
+        ('_id_sessao', "None"),
+    ]),
+    Pedido: (('cliente', 'carrinho', 'frete', 'cupom', 'pagamento'), [
+        ('_codigo_pedido', "d['codigo_pedido']"),
+        ('_cliente', "cliente"),
+        ('_data_criacao', "datetime.fromisoformat(d['data_criacao'])"),
+        ('_carrinho', "carrinho"),
+        ('_frete', "frete"),
+        ('_cupom', "cupom"),
+        ('_estado', "texto(d['estado'])"),
+        ('_pagamento', "pagamento"),
+        ('_subtotal', "d['subtotal']"),
+        ('_desconto', "d['desconto']"),
+        ('_total', "d['total']"),
+    ]),
+}
+
+# (classe, versão do esquema) -> codec compilado
+_codecs: Dict[Tuple[type, int], Callable[..., Any]] = {}
+
+
+def _data(texto: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(texto) if texto else None
+
+
+def _compilar(classe: type) -> Callable[..., Any]:
+    extras, campos = _ESQUEMAS[classe]
+    nome = f'hidratar_{classe.__name__}'
+    linhas = [f"def {nome}(d{''.join(', ' + extra for extra in extras)}):", "    o = novo(CLASSE)"]
+    linhas += [f"    o.{atributo} = {expressao}" for atributo, expressao in campos]
+    linhas.append("    return o")
+    escopo: Dict[str, Any] = {
+        'novo': object.__new__, 'CLASSE': classe, 'datetime': datetime,
+        'data': _data, 'agora': datetime.now, 'texto': internamento.texto,
+    }
+    exec(compile('\n'.join(linhas), f'<hidratacao {classe.__name__}>', 'exec'), escopo)
+    return escopo[nome]
+
+
+def codec(classe: type) -> Callable[..., Any]:
+    """
+    Função que monta uma instância de `classe` a partir de um registro já conferido, sem
+    passar pelo construtor: codec(Produto)(registro), codec(Cliente)(registro, enderecos), ...
+    (os objetos aninhados são montados antes e passados pelos parâmetros extras).
+    """
+    chave = (classe, dados_loja.VERSAO_ESQUEMA)
+    funcao = _codecs.get(chave)
+    if funcao is None:
+        funcao = _codecs[chave] = _compilar(classe)
+    return funcao
+
+
+# --- Conferência da loja ---
+
+# Datas que o construtor preenche com "agora" (ex.: data_cadastro ausente) saem
+# diferentes nos dois caminhos por alguns microssegundos
+_TOLERANCIA_AGORA = timedelta(seconds=1)
+_ERROS_DE_REGISTRO = (ValorInvalidoError, DocumentoInvalidoError, KeyError, TypeError, ValueError, AttributeError)
+
+
+def _equivalentes(a: Any, b: Any) -> bool:
+    """Mesmo tipo e mesmos atributos, comparando objetos aninhados da mesma forma."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, datetime):
+        return abs(a - b) <= _TOLERANCIA_AGORA
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(_equivalentes, a, b))
+    if hasattr(a, '__dict__'):
+        atributos_a, atributos_b = vars(a), vars(b)
+        return (atributos_a.keys() == atributos_b.keys()
+                and all(_equivalentes(valor, atributos_b[chave]) for chave, valor in atributos_a.items()))
+    return a == b
+
+
+def _exigir_equivalentes(validado: Any, confiavel: Any):
+    if not _equivalentes(validado, confiavel):
+        raise ValorInvalidoError(f"o caminho confiável não reproduz o construtor de {type(validado).__name__} (registro fora do padrão do to_dict).")
+
+
+def _conferir_pedido(registro: Dict[str, Any]):
+    """
+    Confere as partes do pedido que têm validação (frete, cupom, pagamento, itens) e o
+    que o caminho confiável lê direto (datas, estado, totais). Cliente e produtos são
+    referências, conferidos nas próprias coleções.
+    """
+    import repositories.pedido_repository as pedido_repository
+    if not registro['cliente_cpf'] or registro['estado'] not in Pedido.ESTADOS_VALIDOS:
+        raise ValorInvalidoError(f"cliente ou estado inválido ({registro.get('estado')!r}).")
+    datetime.fromisoformat(registro['data_criacao'])
+    for campo in ('subtotal', 'desconto', 'total'):
+        if not isinstance(registro[campo], (int, float)):
+            raise ValorInvalidoError(f"{campo} não numérico.")
+    for item in registro['carrinho']['itens']:
+        if item['quantidade'] <= 0 or not item['produto_sku'] or not isinstance(item['preco_unitario'], (int, float)):
+            raise ValorInvalidoError("item com quantidade, SKU ou preço inválido.")
+    partes = [('frete', pedido_repository._deserializar_frete)]
+    if registro.get('cupom'):
+        partes.append(('cupom', pedido_repository._deserializar_cupom))
+    if registro.get('pagamento'):
+        partes.append(('pagamento', pedido_repository._deserializar_pagamento))
+    for campo, deserializar in partes:
+        _exigir_equivalentes(deserializar(registro[campo]), deserializar(registro[campo], confiavel=True))
+
+
+def conferir_loja(limite_erros: int = 20) -> Dict[str, Any]:
+    """
+    Passa todos os registros da loja pelos construtores (com validação) e confere que os
+    codecs montam os mesmos objetos. Se tudo conferir, marca a loja com a versão atual do
+    esquema (liberando o caminho confiável); senão, tira a marca. Retorna a contagem de
+    registros por coleção, os primeiros `limite_erros` problemas e a versão gravada.
+    """
+    import repositories.produto_repository as produto_repository
+    import repositories.cliente_repository as cliente_repository
+
+    def conferir_produto(registro):
+        _exigir_equivalentes(produto_repository._deserializar_produto(registro),
+                             produto_repository._deserializar_produto(registro, confiavel=True))
+
+    def conferir_cliente(registro):
+        _exigir_equivalentes(cliente_repository._deserializar_cliente(registro),
+                             cliente_repository._deserializar_cliente(registro, confiavel=True))
+
+    conferencias = (('produtos', conferir_produto), ('clientes', conferir_cliente), ('pedidos', _conferir_pedido))
+    registros: Dict[str, int] = {}
+    erros: List[str] = []
+    total_erros = 0
+    # Com a trava de escrita, a marca vale exatamente para o conteúdo conferido
+    with dados_loja.escrita():
+        dados = dados_loja.carregar_dados_loja()
+        for nome, conferir in conferencias:
+            lista = dados.get(nome, [])
+            registros[nome] = len(lista)
+            for posicao, registro in enumerate(lista):
+                try:
+                    conferir(registro)
+                except _ERROS_DE_REGISTRO as e:
+                    total_erros += 1
+                    if len(erros) < limite_erros:
+                        erros.append(f"{nome}[{posicao}]: {e.__class__.__name__}: {e}")
+        versao = dados_loja.VERSAO_ESQUEMA if total_erros == 0 else None
+        anterior = dados.get(dados_loja.ESQUEMA)
+        if anterior != versao:
+            dados_loja.salvar_dados_loja({dados_loja.ESQUEMA: versao})
+    return {
+        'registros': registros,
+        'total_erros': total_erros,
+        'erros': erros,
+        'versao_anterior': anterior,
+        'versao': versao,
+    }
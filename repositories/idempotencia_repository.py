@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+import repositories.dados as dados_loja
+from monitoramento.instrumentacao import instrumentar
+
+# Chaves de idempotência do checkout (services/idempotencia_service.py), fora da memória.
+#
+# Um arquivo SQLite na pasta de dados com uma linha por chave: a chave (chave primária,
+# tabela WITHOUT ROWID), o código do pedido que ela gerou e o instante de vencimento
+# (epoch, com índice para a varredura). A linha é gravada antes do pagamento, com o código
+# do pedido já definido; o pedido gravado na loja é o que diz se o checkout terminou.
+# Assim não é preciso gravar a chave e o pedido na mesma transação: se o processo cair
+# entre os dois, a repetição encontra a chave sem pedido e refaz o checkout com o mesmo
+# código (e a mesma chave de cobrança no gateway).
+#
+# As chaves não fazem parte da loja: não entram nas transações de dados.py nem no loja.json.
+
+IDEMPOTENCIA_FILE = 'idempotencia.sqlite3'
+
+_ESQUEMA = (
+    "CREATE TABLE IF NOT EXISTS chaves ("
+    " chave TEXT PRIMARY KEY, codigo_pedido TEXT NOT NULL, expira_em REAL NOT NULL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS chaves_expira_em ON chaves (expira_em)",
+)
+
+_trava = threading.Lock()
+# caminho do arquivo -> conexão (compartilhada entre threads; o uso é serializado pela _trava)
+_conexoes: Dict[str, sqlite3.Connection] = {}
+
+
+def caminho_idempotencia() -> str:
+    return dados_loja._get_file_path(IDEMPOTENCIA_FILE)
+
+
+def _conexao() -> sqlite3.Connection:
+    """Conexão com o arquivo da pasta de dados atual (criado na primeira vez). Chamada com a _trava."""
+    caminho = caminho_idempotencia()
+    conexao = _conexoes.get(caminho)
+    if conexao is None:
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        for comando in _ESQUEMA:
+            conexao.execute(comando)
+        _conexoes[caminho] = conexao
+    return conexao
+
+
+@instrumentar()
+def registrar(chave: str, codigo_pedido: str, expira_em: float):
+    """Associa a chave ao código do pedido que o checkout vai gravar (substitui um registro anterior)."""
+    with _trava:
+        _conexao().execute(
+            "INSERT OR REPLACE INTO chaves (chave, codigo_pedido, expira_em) VALUES (?, ?, ?)",
+            (chave, codigo_pedido, expira_em)
+        )
+
+
+@instrumentar()
+def buscar(chave: str, agora: float) -> Optional[Tuple[str, float]]:
+    """(código do pedido, vence_em) da chave, se ela existir e não tiver vencido em `agora`."""
+    with _trava:
+        linha = _conexao().execute(
+            "SELECT codigo_pedido, expira_em FROM chaves WHERE chave = ? AND expira_em > ?", (chave, agora)
+        ).fetchone()
+    return (linha[0], linha[1]) if linha else None
+
+
+@instrumentar()
+def remover_vencidos(agora: float, limite: Optional[int] = None) -> int:
+    """
+    Apaga as chaves vencidas até `agora` (no máximo `limite` por chamada, para não
+    segurar o arquivo por muito tempo). Retorna quantas foram apagadas.
+    """
+    with _trava:
+        conexao = _conexao()
+        with conexao:
+            conexao.execute("BEGIN")
+            if limite is None:
+                return conexao.execute("DELETE FROM chaves WHERE expira_em <= ?", (agora,)).rowcount
+            return conexao.execute(
+                "DELETE FROM chaves WHERE chave IN "
+                "(SELECT chave FROM chaves WHERE expira_em <= ? ORDER BY expira_em LIMIT ?)",
+                (agora, limite)
+            ).rowcount
+
+
+def contar() -> int:
+    """Quantidade de chaves gravadas (inclusive as vencidas ainda não varridas)."""
+    with _trava:
+        return _conexao().execute("SELECT COUNT(*) FROM chaves").fetchone()[0]
+
+
+def fechar():
+    """Fecha as conexões abertas (ex.: antes de apagar uma pasta de dados temporária)."""
+    with _trava:
+        for conexao in _conexoes.values():
+            conexao.close()
+        _conexoes.clear()
@@ -0,0 +1,179 @@
+import os
+import sys
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, List, Tuple, TypeVar
+
+# Flyweight para os valores que se repetem em milhares de registros.
+#
+# Textos de vocabulário pequeno (categoria, cidade, UF, bandeira, CEP de origem, código
+# de cupom, estados, tipos, e os CPFs/SKUs citados pelos pedidos) passam por sys.intern:
+# fica uma única cópia de cada texto, liberada quando ninguém mais a usa. (str não aceita
+# referência fraca; a tabela do sys.intern já é esse pool fraco, mantido pelo interpretador.)
+#
+# Os objetos de valor imutáveis que se repetem (Endereco, Cupom) ficam em pools
+# WeakValueDictionary, um por classe, indexados pelos campos: dois pedidos com o mesmo
+# cupom apontam para o mesmo Cupom, que sai do pool quando o último pedido que o usa é
+# descartado. Cada entrada custa mais ou menos um objeto, então só vale para valores com
+# muitas repetições (o Frete, com destino e valor quase únicos por pedido, fica de fora).
+#
+# O JSON decodifica um texto novo para cada ocorrência; internar_loja troca esses textos
+# pelas cópias únicas logo depois da leitura (o formato binário já compartilha os textos
+# pela tabela STRS). LOJA_INTERNAMENTO=0 desliga tudo (ex.: para comparar no benchmark).
+
+T = TypeVar('T')
+
+_ativo: bool = os.environ.get('LOJA_INTERNAMENTO', '') != '0'
+_trava = threading.Lock()
+# classe -> (pool, [reaproveitados, criados])
+_pools: Dict[type, Tuple['weakref.WeakValueDictionary[Hashable, Any]', List[int]]] = {}
+_intern = sys.intern
+
+
+def ativar():
+    global _ativo
+    _ativo = True
+
+
+def desativar():
+    """Desliga o internamento (os pools são esvaziados)."""
+    global _ativo
+    _ativo = False
+    limpar()
+
+
+def esta_ativo() -> bool:
+    return _ativo
+
+
+def limpar():
+    """Esvazia os pools e zera os contadores (os objetos já entregues continuam valendo)."""
+    with _trava:
+        _pools.clear()
+
+
+def texto(valor: T) -> T:
+    """Devolve a cópia única do texto (outros valores, como None, passam direto)."""
+    if _ativo and type(valor) is str:
+        return _intern(valor)
+    return valor
+
+
+def compartilhado(classe: type, chave: Hashable, criar: Callable[[], T]) -> T:
+    """
+    Devolve a instância viva de `classe` com a `chave` informada (os campos que a
+    definem), criando-a com `criar()` se não houver. Só para classes imutáveis: quem
+    recebe o objeto não pode alterá-lo, pois ele é compartilhado.
+    """
+    if not _ativo:
+        return criar()
+    entrada = _pools.get(classe)
+    if entrada is None:
+        with _trava:
+            entrada = _pools.setdefault(classe, (weakref.WeakValueDictionary(), [0, 0]))
+    pool, contador = entrada
+    objeto = pool.get(chave)
+    if objeto is not None:
+        contador[0] += 1
+        return objeto
+    contador[1] += 1
+    return pool.setdefault(chave, criar())
+
+
+def estatisticas() -> Dict[str, Dict[str, int]]:
+    """Por classe: instâncias vivas no pool, reaproveitadas e criadas."""
+    with _trava:
+        return {
+            classe.__name__: {'vivos': len(pool), 'reaproveitados': c[0], 'criados': c[1]}
+            for classe, (pool, c) in _pools.items()
+        }
+
+
+# --- Registros brutos (logo depois do json.load) ---
+
+def _internar_campos(registro: Dict[str, Any], campos):
+    for campo in campos:
+        valor = registro.get(campo)
+        if type(valor) is str:
+            registro[campo] = _intern(valor)
+
+
+def _internar_produtos(produtos: List[Dict[str, Any]]):
+    for p in produtos:
+        _internar_campos(p, ('categoria', 'tipo'))
+
+
+def _internar_clientes(clientes: List[Dict[str, Any]]):
+    for c in clientes:
+        for e in c.get('enderecos') or ():
+            _internar_campos(e, ('cep', 'logradouro', 'cidade', 'uf', 'complemento'))
+
+
+def _internar_cupons(cupons: List[Dict[str, Any]]):
+    for c in cupons:
+        _internar_campos(c, ('codigo', 'validade'))
+
+
+def _internar_pedidos(pedidos: List[Dict[str, Any]]):
+    # Caminho direto para registros no formato do Pedido.to_dict (a coleção que domina o
+    # tempo); qualquer desvio (campo ausente, None) cai no caminho campo a campo.
+    intern = _intern
+    for p in pedidos:
+        try:
+            p['cliente_cpf'] = intern(p['cliente_cpf'])
+            p['estado'] = intern(p['estado'])
+            carrinho = p['carrinho']
+            carrinho['cliente_cpf'] = intern(carrinho['cliente_cpf'])
+            for item in carrinho['itens']:
+                item['produto_sku'] = intern(item['produto_sku'])
+            frete = p['frete']
+            frete['cep_origem'] = intern(frete['cep_origem'])
+            frete['cep_destino'] = intern(frete['cep_destino'])
+            if p['cupom']:
+                _internar_campos(p['cupom'], ('codigo', 'validade'))
+            pagamento = p['pagamento']
+            if pagamento:
+                pagamento['status'] = intern(pagamento['status'])
+                pagamento['tipo'] = intern(pagamento['tipo'])
+                if 'bandeira' in pagamento:
+                    pagamento['bandeira'] = intern(pagamento['bandeira'])
+        except (KeyError, TypeError):
+            _internar_pedido(p)
+
+
+def _internar_pedido(p: Dict[str, Any]):
+    if isinstance(p, dict):
+        _internar_campos(p, ('cliente_cpf', 'estado'))
+        carrinho = p.get('carrinho')
+        if carrinho:
+            _internar_campos(carrinho, ('cliente_cpf',))
+            for item in carrinho.get('itens') or ():
+                _internar_campos(item, ('produto_sku',))
+        if p.get('frete'):
+            _internar_campos(p['frete'], ('cep_origem', 'cep_destino'))
+        if p.get('cupom'):
+            _internar_campos(p['cupom'], ('codigo', 'validade'))
+        if p.get('pagamento'):
+            _internar_campos(p['pagamento'], ('status', 'tipo', 'bandeira'))
+
+
+_POR_COLECAO = {
+    'produtos': _internar_produtos,
+    'clientes': _internar_clientes,
+    'cupons': _internar_cupons,
+    'pedidos': _internar_pedidos,
+}
+
+
+def internar_loja(dados: Any) -> Any:
+    """
+    Troca, no lugar, os textos repetidos das coleções conhecidas pelas cópias únicas.
+    Chamada com o conteúdo recém-decodificado de um arquivo JSON da loja (ainda não
+    compartilhado com ninguém). Devolve o próprio `dados`.
+    """
+    if _ativo and isinstance(dados, dict):
+        for nome, internar in _POR_COLECAO.items():
+            registros = dados.get(nome)
+            if isinstance(registros, list):
+                internar(registros)
+    return dados
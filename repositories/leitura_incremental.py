@@ -0,0 +1,113 @@
+import codecs
+import json
+import mmap
+import re
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+from repositories import formato_binario
+
+# Leitura incremental de uma coleção direto do arquivo da loja, sem decodificá-lo inteiro.
+#
+# O arquivo é mapeado na memória (mmap) e os registros da coleção saem um a um: a memória
+# usada fica limitada a um bloco de texto (TAMANHO_BLOCO) mais o maior registro, não ao
+# tamanho do arquivo, e quem para de iterar no meio não paga pelo resto. Serve para
+# relatórios sobre históricos maiores que a RAM.
+#   - loja.json: a coleção é localizada pela chave do nível de cima (no arquivo indentado
+#     gravado pelo dados.py, com um único find; em JSON compacto, percorrendo só textos e
+#     colchetes) e cada elemento do array é decodificado com JSONDecoder.raw_decode;
+#   - loja.bin: ver formato_binario.iterar_colecao.
+# O mapeamento aponta para o arquivo aberto: uma gravação que o substitua (os.replace) ou
+# apague durante a leitura não afeta quem já está lendo.
+
+TAMANHO_BLOCO = 1 << 20
+
+# Textos JSON (com escapes) e colchetes/chaves: o que importa para saber a profundidade
+_TOKEN_ESTRUTURA = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+_DOIS_PONTOS_LISTA = re.compile(rb'\s*:\s*\[')
+_SEPARADORES = re.compile(r'[\s,]*')
+_ESPACOS = re.compile(r'\s*')
+
+
+def _localizar_lista_json(conteudo, nome: str) -> Optional[int]:
+    """Posição logo depois do '[' da lista `nome` no objeto do nível de cima (None se não houver)."""
+    chave = json.dumps(nome, ensure_ascii=False).encode('utf-8')
+    # Arquivo gravado com indent=4: só as chaves do nível de cima começam a linha com 4 espaços
+    # (textos JSON não têm quebras de linha literais)
+    marca = b'\n    ' + chave + b': ['
+    posicao = conteudo.find(marca)
+    if posicao >= 0:
+        return posicao + len(marca)
+
+    profundidade = 0
+    for token in _TOKEN_ESTRUTURA.finditer(conteudo):
+        inicio = token.group()[:1]
+        if inicio == b'"':
+            if profundidade == 1 and token.group() == chave:
+                seguinte = _DOIS_PONTOS_LISTA.match(conteudo, token.end())
+                if seguinte:
+                    return seguinte.end()
+        elif inicio in b'[{':
+            profundidade += 1
+        else:
+            profundidade -= 1
+    return None
+
+def _iterar_lista_json(conteudo, inicio: int, tamanho_bloco: int) -> Iterator[Any]:
+    """Elementos do array JSON que começa em `inicio`, decodificando o texto aos blocos."""
+    decodificador = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    texto = ''
+    posicao = 0
+    lido = inicio
+    total = len(conteudo)
+
+    while True:
+        posicao = _SEPARADORES.match(texto, posicao).end()
+        completo = lido >= total
+        if posicao < len(texto):
+            if texto[posicao] == ']':
+                return
+            try:
+                registro, fim = decodificador.raw_decode(texto, posicao)
+            except json.JSONDecodeError:
+                if completo:
+                    raise
+                registro, fim = None, -1
+            # Um elemento no fim do bloco pode estar cortado ou decodificar pela metade (um
+            # número como "-0." vira -0): só vale seguido de ',' ou ']' já lidos
+            if fim >= 0:
+                seguinte = _ESPACOS.match(texto, fim).end()
+                if seguinte < len(texto) and texto[seguinte] in ',]':
+                    yield registro
+                    posicao = fim
+                    continue
+                if completo:
+                    raise json.JSONDecodeError("Esperado ',' ou ']'", texto, seguinte)
+        elif completo:
+            raise json.JSONDecodeError("Lista não terminada", texto, posicao)
+
+        bloco = conteudo[lido:lido + tamanho_bloco]
+        lido += len(bloco)
+        texto = texto[posicao:] + utf8.decode(bloco, final=lido >= total)
+        posicao = 0
+
+def iterar_colecao(caminho: str, nome: str, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[Dict[str, Any]]:
+    """
+    Registros da coleção `nome` (ex.: 'pedidos') do arquivo da loja em `caminho`, um a um.
+    Reconhece loja.json e loja.bin pelo conteúdo. Levanta ValueError se o arquivo for inválido.
+    """
+    with open(caminho, 'rb') as f:
+        yield from iterar_arquivo(f, nome, tamanho_bloco)
+
+def iterar_arquivo(f: BinaryIO, nome: str, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[Dict[str, Any]]:
+    """Como iterar_colecao, sobre um arquivo já aberto em modo binário (que continua aberto)."""
+    if not f.seek(0, 2):
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as conteudo:
+        if hasattr(conteudo, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            conteudo.madvise(mmap.MADV_SEQUENTIAL)
+        if formato_binario.eh_binario(conteudo[:len(formato_binario.MAGIC)]):
+            yield from formato_binario.iterar_colecao(conteudo, nome)
+            return
+        inicio = _localizar_lista_json(conteudo, nome)
+        if inicio is not None:
+            yield from _iterar_lista_json(conteudo, inicio, tamanho_bloco)
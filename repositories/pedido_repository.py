@@ -1,43 +1,37 @@
-import json
-import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple
 from datetime import datetime
 from models.vendas import Pedido, Carrinho, ItemCarrinho
 from models.entidades import Cliente, Produto, ProdutoFisico, Endereco
 from models.transacoes import Frete, Cupom, Pagamento, PagamentoCartao, PagamentoBoleto
 from models.exceptions import EntidadeNaoEncontradaError
+import repositories.dados as dados_loja
+from repositories import arquivo_pedidos, eventos, hidratacao, internamento
+from monitoramento.instrumentacao import instrumentar
 
-# Constantes e Funções Auxiliares (Duplicação intencional)
-
-NOME_ARQUIVO = 'loja.json'
-
-def _get_file_path() -> str:
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_dir, 'data', NOME_ARQUIVO)
+# Funções Auxiliares de Gerenciamento de Arquivo (o I/O fica centralizado em dados.py)
 
+@instrumentar()
 def _carregar_dados() -> Dict[str, Any]:
-    caminho = _get_file_path()
-    estrutura_base = {'clientes': [], 'produtos': [], 'pedidos': [], 'cupons': []}
-    
-    if not os.path.exists(caminho):
-        os.makedirs(os.path.dirname(caminho), exist_ok=True)
-        with open(caminho, 'w', encoding='utf-8') as f:
-            json.dump(estrutura_base, f, indent=4, ensure_ascii=False)
-        return estrutura_base
-        
-    try:
-        with open(caminho, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        print(f"⚠️ Aviso: Arquivo {NOME_ARQUIVO} corrompido ou vazio. Recriando...")
-        _salvar_dados(estrutura_base)
-        return estrutura_base
+    """Carrega os pedidos ativos da loja (na loja dividida por coleção, só os arquivos deles)."""
+    return dados_loja.carregar_dados_loja(('pedidos',))
 
+@instrumentar()
 def _salvar_dados(dados: Dict[str, Any]):
-    caminho = _get_file_path()
-    os.makedirs(os.path.dirname(caminho), exist_ok=True)
-    with open(caminho, 'w', encoding='utf-8') as f:
-        json.dump(dados, f, indent=4, ensure_ascii=False)
+    """Salva o conteúdo lido por _carregar_dados (as demais coleções ficam como estão)."""
+    dados_loja.salvar_dados_loja(dados)
+
+def _eventos_salvo(anterior: Optional[Dict[str, Any]], registro: Dict[str, Any]) -> List[eventos.EventoAlteracao]:
+    """PEDIDO_SALVO e, se o estado mudou, também PEDIDO_ESTADO."""
+    codigo, estado = registro['codigo_pedido'], registro.get('estado')
+    lista = [eventos.EventoAlteracao(eventos.PEDIDO_SALVO, codigo, detalhes={'novo': anterior is None, 'estado': estado})]
+    if anterior is not None and anterior.get('estado') != estado:
+        lista.append(_evento_estado(codigo, anterior.get('estado'), estado))
+    return lista
+
+def _evento_estado(codigo: str, estado_anterior: Optional[str], estado_novo: Optional[str]) -> eventos.EventoAlteracao:
+    return eventos.EventoAlteracao(
+        eventos.PEDIDO_ESTADO, codigo, detalhes={'estado_anterior': estado_anterior, 'estado_novo': estado_novo}
+    )
 
 # Funções de Desserialização
 # Nota: Essas funções dependem dos repositórios de Entidades estarem carregados (simulação simples)
@@ -61,56 +55,76 @@ def _deserializar_produto_from_item(dados_item: Dict[str, Any]) -> Produto:
         is_ativo=False
     )
 
-def _deserializar_item_carrinho(dados_item: Dict[str, Any]) -> ItemCarrinho:
+def _deserializar_item_carrinho(dados_item: Dict[str, Any], confiavel: bool = False) -> ItemCarrinho:
     """Converte dados de ItemCarrinho em objeto."""
     produto = _deserializar_produto_from_item(dados_item)
+    if confiavel:
+        return hidratacao.codec(ItemCarrinho)(dados_item, produto)
     item = ItemCarrinho(produto=produto, quantidade=dados_item['quantidade'])
     # Garante que o preço unitário do item seja o preço no momento da compra, 
     # ignorando o preço atualizado do produto no repositório.
     item._preco_unitario = dados_item['preco_unitario'] 
     return item
 
-def _deserializar_carrinho(dados_carrinho: Dict[str, Any]) -> Carrinho:
+def _deserializar_carrinho(dados_carrinho: Dict[str, Any], confiavel: bool = False, cliente: Optional[Cliente] = None) -> Carrinho:
     """Converte dados de Carrinho em objeto (usado no Pedido)."""
     
-    itens = [_deserializar_item_carrinho(i) for i in dados_carrinho.get('itens', [])]
+    itens = [_deserializar_item_carrinho(i, confiavel) for i in dados_carrinho.get('itens', [])]
+    if confiavel:
+        return hidratacao.codec(Carrinho)(dados_carrinho, itens, cliente)
     
     carrinho = Carrinho(itens=itens) 
     return carrinho
 
-def _deserializar_frete(dados_frete: Dict[str, Any]) -> Frete:
+def _deserializar_frete(dados_frete: Dict[str, Any], confiavel: bool = False) -> Frete:
     """Converte dados de Frete em objeto."""
+    # O Frete em si não vai para um pool: destino e valor quase nunca se repetem entre
+    # pedidos, e a entrada no pool custaria mais que o objeto (só os CEPs são internados)
+    if confiavel:
+        return hidratacao.codec(Frete)(dados_frete)
     return Frete(
-        cep_origem=dados_frete['cep_origem'],
-        cep_destino=dados_frete['cep_destino'],
+        cep_origem=internamento.texto(dados_frete['cep_origem']),
+        cep_destino=internamento.texto(dados_frete['cep_destino']),
         valor=dados_frete['valor'],
         prazo_dias=dados_frete['prazo_dias']
     )
     
-def _deserializar_cupom(dados_cupom: Dict[str, Any]) -> Cupom:
-    """Converte dados de Cupom em objeto."""
+def _deserializar_cupom(dados_cupom: Dict[str, Any], confiavel: bool = False) -> Cupom:
+    """Converte dados de Cupom em objeto (compartilhado entre pedidos com o mesmo cupom)."""
+    # Entradas separadas por caminho, como os endereços em cliente_repository
+    chave = (confiavel, dados_cupom['codigo'], dados_cupom['valor'], dados_cupom['is_percentual'], dados_cupom.get('validade'))
+    novo_cupom = hidratacao.codec(Cupom) if confiavel else _novo_cupom
+    return internamento.compartilhado(Cupom, chave, lambda: novo_cupom(dados_cupom))
+
+def _novo_cupom(dados_cupom: Dict[str, Any]) -> Cupom:
     validade = datetime.fromisoformat(dados_cupom['validade']) if dados_cupom.get('validade') else None
-    return Cupom(
+    cupom = Cupom(
         codigo=dados_cupom['codigo'],
         valor=dados_cupom['valor'],
         is_percentual=dados_cupom['is_percentual'],
         validade=validade
     )
+    cupom._codigo = internamento.texto(cupom._codigo)
+    return cupom
     
-def _deserializar_pagamento(dados_pagamento: Dict[str, Any]) -> Pagamento:
+_PAGAMENTOS = {'PagamentoCartao': PagamentoCartao, 'PagamentoBoleto': PagamentoBoleto}
+
+def _deserializar_pagamento(dados_pagamento: Dict[str, Any], confiavel: bool = False) -> Pagamento:
     """Converte dados de Pagamento (e subclasses) em objeto."""
     tipo = dados_pagamento.get('tipo', 'Pagamento')
+    if confiavel:
+        return hidratacao.codec(_PAGAMENTOS.get(tipo, Pagamento))(dados_pagamento)
     
     # Campos base
     valor = dados_pagamento['valor']
-    status = dados_pagamento['status']
+    status = internamento.texto(dados_pagamento['status'])
     data_pagamento = datetime.fromisoformat(dados_pagamento['data_pagamento']) \
         if dados_pagamento.get('data_pagamento') else None
 
     if tipo == 'PagamentoCartao':
         return PagamentoCartao(
             valor=valor, status=status, data_pagamento=data_pagamento,
-            bandeira=dados_pagamento.get('bandeira', 'DESCONHECIDA')
+            bandeira=internamento.texto(dados_pagamento.get('bandeira', 'DESCONHECIDA'))
         )
     elif tipo == 'PagamentoBoleto':
         return PagamentoBoleto(
@@ -121,8 +135,12 @@ def _deserializar_pagamento(dados_pagamento: Dict[str, Any]) -> Pagamento:
     else:
         return Pagamento(valor=valor, status=status, data_pagamento=data_pagamento)
 
-def _deserializar_pedido(dados_pedido: Dict[str, Any]) -> Pedido:
-    """Converte um dicionário de dados em um objeto Pedido."""
+def _deserializar_pedido(dados_pedido: Dict[str, Any], confiavel: bool = False) -> Pedido:
+    """
+    Converte um dicionário de dados em um objeto Pedido.
+    `confiavel`: o registro vem de uma loja conferida (hidratacao.conferir_loja) e é
+    montado pelos codecs, sem recalcular os totais que seriam sobrescritos em seguida.
+    """
     
     import repositories.cliente_repository as cliente_repository
     
@@ -132,6 +150,17 @@ def _deserializar_pedido(dados_pedido: Dict[str, Any]) -> Pedido:
         # Cria um cliente placeholder se o original foi deletado
         cliente = Cliente(cpf=dados_pedido['cliente_cpf'], nome="Cliente Deletado", email="N/A") 
     
+    if confiavel:
+        codec = hidratacao.codec
+        cupom, pagamento = dados_pedido.get('cupom'), dados_pedido.get('pagamento')
+        return codec(Pedido)(
+            dados_pedido, cliente,
+            _deserializar_carrinho(dados_pedido['carrinho'], True, cliente),
+            codec(Frete)(dados_pedido['frete']),
+            _deserializar_cupom(cupom, True) if cupom else None,
+            _deserializar_pagamento(pagamento, True) if pagamento else None
+        )
+    
     # Requisito 2: Carrinho (desserializado como referência)
     carrinho = _deserializar_carrinho(dados_pedido['carrinho'])
     carrinho.cliente = cliente # Associa o cliente ao carrinho 
@@ -152,7 +181,7 @@ def _deserializar_pedido(dados_pedido: Dict[str, Any]) -> Pedido:
     )
     
     # Injeta o estado e os valores calculados no momento da compra
-    pedido._estado = dados_pedido['estado']
+    pedido._estado = internamento.texto(dados_pedido['estado'])
     pedido._total = dados_pedido['total']
     pedido._subtotal = dados_pedido['subtotal']
     pedido._desconto = dados_pedido['desconto']
@@ -164,45 +193,217 @@ def _deserializar_pedido(dados_pedido: Dict[str, Any]) -> Pedido:
 
     return pedido
 
+def _localizar(lista_pedidos: List[Dict[str, Any]], codigos: Iterable[str], posicoes: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    Posição de cada código (exato) na lista de pedidos. Usa as posições já conhecidas
+    (os pedidos só são acrescentados ou substituídos no lugar, então a posição não muda)
+    e só percorre a lista se alguma delas não conferir.
+    """
+    posicoes = posicoes or {}
+    encontrados: Dict[str, int] = {}
+    faltantes = set()
+    for codigo in codigos:
+        idx = posicoes.get(codigo)
+        if idx is not None and idx < len(lista_pedidos) and lista_pedidos[idx]['codigo_pedido'] == codigo:
+            encontrados[codigo] = idx
+        else:
+            faltantes.add(codigo)
+    if faltantes:
+        for i, p in enumerate(lista_pedidos):
+            if p['codigo_pedido'] in faltantes:
+                encontrados[p['codigo_pedido']] = i
+    return encontrados
+
 # Funções de Repositório
 
-def salvar(pedido: Pedido):
-    """Salva ou atualiza um pedido."""
-    dados = _carregar_dados()
+@instrumentar()
+@dados_loja.em_escrita
+def salvar(pedido: Pedido) -> int:
+    """Salva ou atualiza um pedido. Retorna a posição do registro no arquivo."""
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
     
     lista_pedidos = dados.get('pedidos', [])
     
     # Procura o índice do pedido pelo código
+    registro = pedido.to_dict()
+    anterior = None
     try:
         idx = next(i for i, p in enumerate(lista_pedidos) if p['codigo_pedido'] == pedido.codigo_pedido)
         # Pedido encontrado: Substitui o registro existente
-        lista_pedidos[idx] = pedido.to_dict()
+        anterior = lista_pedidos[idx]
+        lista_pedidos[idx] = registro
     except StopIteration:
         # Pedido não encontrado: Adiciona novo registro
-        lista_pedidos.append(pedido.to_dict())
+        idx = len(lista_pedidos)
+        lista_pedidos.append(registro)
         
     dados['pedidos'] = lista_pedidos
     _salvar_dados(dados)
+    if eventos.feed.ativo():
+        eventos.feed.publicar(_eventos_salvo(anterior, registro))
+    return idx
 
+@instrumentar()
+@dados_loja.em_escrita
+def salvar_em_lote(pedidos: Iterable[Pedido], posicoes: Optional[Dict[str, int]] = None) -> int:
+    """
+    Salva ou atualiza vários pedidos com uma única escrita do arquivo. `posicoes`
+    (código -> posição, ex.: devolvida por salvar) evita percorrer a lista inteira.
+    Retorna a quantidade de pedidos gravados.
+    """
+    pedidos = list(pedidos)
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
+    lista_pedidos = dados.get('pedidos', [])
+    encontrados = _localizar(lista_pedidos, (p.codigo_pedido for p in pedidos), posicoes)
+
+    anunciar = eventos.feed.ativo()
+    alteracoes = []
+    for pedido in pedidos:
+        idx = encontrados.get(pedido.codigo_pedido)
+        registro = pedido.to_dict()
+        if idx is None:
+            anterior = None
+            lista_pedidos.append(registro)
+        else:
+            anterior = lista_pedidos[idx]
+            lista_pedidos[idx] = registro
+        if anunciar:
+            alteracoes.extend(_eventos_salvo(anterior, registro))
+
+    dados['pedidos'] = lista_pedidos
+    _salvar_dados(dados)
+    eventos.feed.publicar(alteracoes)
+    return len(pedidos)
 
+
+@instrumentar()
 def buscar_por_codigo(codigo: str) -> Optional[Pedido]:
-    """Busca um pedido pelo código (completo ou prefixo)."""
+    """Busca um pedido pelo código (completo ou prefixo), nos ativos e depois no arquivo."""
     codigo = codigo.strip().upper()
     dados = _carregar_dados()
     
     for p in dados.get('pedidos', []):
         # Busca por código exato OU por prefixo
         if p['codigo_pedido'] == codigo or p['codigo_pedido'].startswith(codigo):
-            return _deserializar_pedido(p)
+            return _deserializar_pedido(p, dados_loja.esquema_confiavel(dados))
             
-    return None
+    # Pedidos antigos arquivados: só os segmentos que podem ter o código são abertos
+    # (o arquivo não passa pela conferência, então segue pelo caminho com validação)
+    arquivado = arquivo_pedidos.buscar_raw_por_codigo(codigo)
+    return _deserializar_pedido(arquivado) if arquivado else None
+
+@instrumentar()
+@dados_loja.em_escrita
+def atualizar_estados(novos_estados: Dict[str, str], posicoes: Optional[Dict[str, int]] = None) -> int:
+    """
+    Grava o novo estado de vários pedidos (código -> estado) em uma única escrita, sem
+    hidratá-los. As regras de transição ficam com o PedidoService. Retorna a quantidade alterada.
+    """
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
+    lista_pedidos = dados.get('pedidos', [])
+    encontrados = _localizar(lista_pedidos, novos_estados.keys(), posicoes)
+
+    faltantes = novos_estados.keys() - encontrados.keys()
+    if faltantes:
+        raise EntidadeNaoEncontradaError(f"Pedido(s) não encontrado(s): {', '.join(sorted(faltantes))}.")
+
+    alteracoes = []
+    for codigo, estado in novos_estados.items():
+        idx = encontrados[codigo]
+        registro = dict(lista_pedidos[idx])
+        alteracoes.append(_evento_estado(codigo, registro.get('estado'), estado))
+        registro['estado'] = estado
+        lista_pedidos[idx] = registro
+
+    dados['pedidos'] = lista_pedidos
+    _salvar_dados(dados)
+    eventos.feed.publicar(alteracoes)
+    return len(novos_estados)
+
+@instrumentar()
+def carregar_raw_por_codigos(codigos: Iterable[str], posicoes: Optional[Dict[str, int]] = None) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    """
+    Registros brutos (sem hidratação) de vários pedidos pelo código exato, com a posição
+    de cada um no arquivo: código -> (posição, registro). Os registros não devem ser alterados.
+    """
+    lista_pedidos = _carregar_dados().get('pedidos', [])
+    encontrados = _localizar(lista_pedidos, codigos, posicoes)
+    return {codigo: (idx, lista_pedidos[idx]) for codigo, idx in encontrados.items()}
 
+@instrumentar()
+def buscar_por_codigos(codigos: Iterable[str], posicoes: Optional[Dict[str, int]] = None) -> Dict[str, Pedido]:
+    """
+    Busca vários pedidos pelo código exato, hidratando apenas os encontrados.
+    `posicoes` (código -> posição) evita percorrer a lista inteira.
+    """
+    dados = _carregar_dados()
+    lista_pedidos = dados.get('pedidos', [])
+    encontrados = _localizar(lista_pedidos, codigos, posicoes)
+    confiavel = dados_loja.esquema_confiavel(dados)
+    return {codigo: _deserializar_pedido(lista_pedidos[idx], confiavel) for codigo, idx in encontrados.items()}
+
+@instrumentar()
 def carregar_todos() -> List[Pedido]:
     """Retorna a lista completa de todos os pedidos."""
     dados = _carregar_dados()
-    return [_deserializar_pedido(p) for p in dados.get('pedidos', [])]
+    confiavel = dados_loja.esquema_confiavel(dados)
+    return [_deserializar_pedido(p, confiavel) for p in dados.get('pedidos', [])]
 
+@instrumentar()
 def carregar_todos_pedidos_raw() -> List[Dict[str, Any]]:
-    """Retorna a lista de pedidos como dicionários brutos (para relatórios rápidos)."""
+    """
+    Retorna a lista de pedidos ativos (os do loja.json) como dicionários brutos, carregando
+    a loja inteira (fica em cache). Para só percorrer os pedidos, iterar_pedidos_ativos_raw
+    usa memória limitada. Pedidos arquivados ficam de fora: ver iterar_pedidos_raw.
+    """
     dados = _carregar_dados()
-    return dados.get('pedidos', [])
\ No newline at end of file
+    return dados.get('pedidos', [])
+
+def iterar_pedidos_ativos_raw() -> Iterator[Dict[str, Any]]:
+    """
+    Pedidos ativos brutos, um a um: da loja em memória se ela já estiver carregada, senão
+    lidos aos poucos do arquivo (sem carregar clientes e produtos nem a lista inteira).
+    Parar de iterar no meio não lê o resto.
+    """
+    return dados_loja.iterar_colecao('pedidos')
+
+def iterar_pedidos_raw(inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Pedidos brutos criados no período [inicio, fim) (None = sem limite), ativos e arquivados.
+    Só os segmentos do arquivo que cruzam o período são lidos.
+    """
+    for p in iterar_pedidos_ativos_raw():
+        if inicio is None and fim is None:
+            yield p
+            continue
+        data = arquivo_pedidos.data_do_registro(p)
+        if data is not None and arquivo_pedidos.no_periodo(data, inicio, fim):
+            yield p
+    yield from arquivo_pedidos.iterar_raw(inicio, fim)
+
+@instrumentar()
+def carregar_por_periodo(inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> List[Pedido]:
+    """Pedidos (ativos e arquivados) criados no período [inicio, fim), hidratados."""
+    return [_deserializar_pedido(p) for p in iterar_pedidos_raw(inicio, fim)]
+
+@instrumentar()
+@dados_loja.em_escrita
+def remover_por_codigos(codigos: Iterable[str]) -> int:
+    """
+    Retira do loja.json os pedidos com os códigos (exatos) informados, em uma única escrita
+    (usado pelo arquivamento). Retorna quantos foram removidos.
+    """
+    codigos = set(codigos)
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
+    lista_pedidos = dados.get('pedidos', [])
+    restantes = [p for p in lista_pedidos if p['codigo_pedido'] not in codigos]
+    removidos = len(lista_pedidos) - len(restantes)
+    if removidos:
+        dados['pedidos'] = restantes
+        _salvar_dados(dados)
+        if eventos.feed.ativo():
+            eventos.feed.publicar([
+                eventos.EventoAlteracao(eventos.PEDIDO_REMOVIDO, p['codigo_pedido'], detalhes={'estado': p.get('estado')})
+                for p in lista_pedidos if p['codigo_pedido'] in codigos
+            ])
+    return removidos
\ No newline at end of file
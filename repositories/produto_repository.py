@@ -1,104 +1,248 @@
-import json
-import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple
 from models.entidades import Produto, ProdutoFisico
-from models.exceptions import EntidadeNaoEncontradaError
+from models.exceptions import EntidadeNaoEncontradaError, ValorInvalidoError, ConflitoVersaoError
+import repositories.dados as dados_loja
+from repositories import eventos, hidratacao, internamento
+from monitoramento.instrumentacao import instrumentar
 
-# Constantes e Funções Auxiliares de Gerenciamento de Arquivo
-
-NOME_ARQUIVO = 'loja.json'
-
-def _get_file_path() -> str:
-    """Gera o caminho completo para o arquivo loja.json na pasta data/."""
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_dir, 'data', NOME_ARQUIVO)
+# Funções Auxiliares de Gerenciamento de Arquivo (o I/O fica centralizado em dados.py)
 
+@instrumentar()
 def _carregar_dados() -> Dict[str, Any]:
-    """Carrega todo o conteúdo do arquivo loja.json."""
-    caminho = _get_file_path()
-    
-    # Estrutura base para inicialização
-    estrutura_base = {
-        'clientes': [], 
-        'produtos': [], 
-        'pedidos': [],
-        'cupons': [] # Incluído para compatibilidade
-    }
-    
-    if not os.path.exists(caminho):
-        os.makedirs(os.path.dirname(caminho), exist_ok=True)
-        with open(caminho, 'w', encoding='utf-8') as f:
-            json.dump(estrutura_base, f, indent=4, ensure_ascii=False)
-        return estrutura_base
-        
-    try:
-        with open(caminho, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        # Em caso de erro, retorna a estrutura base e tenta salvar o arquivo novamente
-        print(f"⚠️ Aviso: Arquivo {NOME_ARQUIVO} corrompido ou vazio. Recriando...")
-        _salvar_dados(estrutura_base)
-        return estrutura_base
+    """Carrega os produtos da loja (na loja dividida por coleção, só os arquivos deles)."""
+    return dados_loja.carregar_dados_loja(('produtos',))
 
+@instrumentar()
 def _salvar_dados(dados: Dict[str, Any]):
-    """Salva todo o conteúdo no arquivo loja.json."""
-    caminho = _get_file_path()
-    os.makedirs(os.path.dirname(caminho), exist_ok=True)
-    with open(caminho, 'w', encoding='utf-8') as f:
-        json.dump(dados, f, indent=4, ensure_ascii=False)
+    """Salva o conteúdo lido por _carregar_dados (as demais coleções ficam como estão)."""
+    dados_loja.salvar_dados_loja(dados)
 
 # Funções de Desserialização
 
-def _deserializar_produto(dados_produto: Dict[str, Any]) -> Produto:
-    """Converte um dicionário de dados em um objeto Produto ou ProdutoFisico."""
+def _deserializar_produto(dados_produto: Dict[str, Any], confiavel: bool = False) -> Produto:
+    """
+    Converte um dicionário de dados em um objeto Produto ou ProdutoFisico.
+    `confiavel`: o registro vem de uma loja conferida (hidratacao.conferir_loja) e é
+    montado pelo codec, sem repetir a validação do construtor.
+    """
     
     # Usa o campo 'tipo' para determinar a classe correta
     tipo = dados_produto.get('tipo', 'Produto')
+    fisico = tipo == 'ProdutoFisico' and 'peso' in dados_produto
+    if confiavel:
+        return hidratacao.codec(ProdutoFisico if fisico else Produto)(dados_produto)
+    categoria = internamento.texto(dados_produto['categoria'])
     
-    if tipo == 'ProdutoFisico' and 'peso' in dados_produto:
+    if fisico:
         return ProdutoFisico(
             sku=dados_produto['sku'],
             nome=dados_produto['nome'],
-            categoria=dados_produto['categoria'],
+            categoria=categoria,
             preco_unitario=dados_produto['preco_unitario'],
             estoque=dados_produto.get('estoque', 0),
             peso=dados_produto['peso'],
-            is_ativo=dados_produto.get('is_ativo', True)
+            is_ativo=dados_produto.get('is_ativo', True),
+            versao=dados_produto.get('versao', 0)
         )
     else:
         # Produto ou Produto Digital
         return Produto(
             sku=dados_produto['sku'],
             nome=dados_produto['nome'],
-            categoria=dados_produto['categoria'],
+            categoria=categoria,
             preco_unitario=dados_produto['preco_unitario'],
             estoque=dados_produto.get('estoque', 0),
-            is_ativo=dados_produto.get('is_ativo', True)
+            is_ativo=dados_produto.get('is_ativo', True),
+            versao=dados_produto.get('versao', 0)
         )
 
+def _registro_versionado(produto: Produto, anterior: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Serializa o produto com a versão seguinte à do registro gravado e atualiza o objeto."""
+    registro = produto.to_dict()
+    registro['versao'] = (anterior.get('versao', 0) + 1) if anterior else produto.versao
+    produto.versao = registro['versao']
+    return registro
+
+def _conferir_versoes(produtos: Iterable[Produto], registros: Dict[str, Dict[str, Any]]):
+    """
+    Controle otimista na gravação do produto inteiro: quem altera um produto já gravado
+    precisa ter lido a versão que está no arquivo. Senão (cópia desatualizada, ex.: o
+    estoque foi baixado por um checkout depois da leitura), levanta ConflitoVersaoError
+    sem gravar nada, em vez de sobrescrever a outra alteração.
+    """
+    conflitos = [
+        produto.sku for produto in produtos
+        if produto.sku in registros and registros[produto.sku].get('versao', 0) != produto.versao
+    ]
+    if conflitos:
+        raise ConflitoVersaoError(f"Produto(s) alterado(s) por outra operação desde a leitura: {', '.join(conflitos)}.")
+
+def _evento_salvo(anterior: Optional[Dict[str, Any]], registro: Dict[str, Any]) -> eventos.EventoAlteracao:
+    return eventos.EventoAlteracao(
+        eventos.PRODUTO_SALVO, registro['sku'],
+        anterior.get('versao', 0) if anterior else None, registro['versao'],
+        {'novo': anterior is None}
+    )
+
+def _evento_estoque(anterior: Dict[str, Any], registro: Dict[str, Any]) -> eventos.EventoAlteracao:
+    return eventos.EventoAlteracao(
+        eventos.ESTOQUE_AJUSTADO, registro['sku'], anterior.get('versao', 0), registro['versao'],
+        {'estoque_anterior': anterior.get('estoque', 0), 'estoque_novo': registro['estoque']}
+    )
+
 # Funções de Repositório
 
+@instrumentar()
+@dados_loja.em_escrita
 def salvar(produto: Produto):
     """
     Salva ou atualiza um produto. Se o produto já existir (pelo SKU), 
     ele é substituído. Caso contrário, é adicionado.
+    Levanta ConflitoVersaoError se o produto gravado mudou desde a leitura (produto.versao).
     """
-    dados = _carregar_dados()
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
     
     lista_produtos = dados.get('produtos', [])
     
     # Procura o índice do produto pelo SKU
+    anterior = None
     try:
         idx = next(i for i, p in enumerate(lista_produtos) if p['sku'] == produto.sku)
         # Produto encontrado: Substitui o registro existente
-        lista_produtos[idx] = produto.to_dict()
+        anterior = lista_produtos[idx]
+        _conferir_versoes((produto,), {produto.sku: anterior})
+        registro = lista_produtos[idx] = _registro_versionado(produto, anterior)
     except StopIteration:
         # Produto não encontrado: Adiciona novo registro
-        lista_produtos.append(produto.to_dict())
+        registro = _registro_versionado(produto, None)
+        lista_produtos.append(registro)
         
     dados['produtos'] = lista_produtos
     _salvar_dados(dados)
+    if eventos.feed.ativo():
+        eventos.feed.publicar([_evento_salvo(anterior, registro)])
+
+@instrumentar()
+@dados_loja.em_escrita
+def salvar_em_lote(produtos: Iterable[Produto], verificar_versao: bool = True) -> int:
+    """
+    Salva ou atualiza vários produtos com uma única leitura e uma única escrita
+    do arquivo. Retorna a quantidade de produtos gravados.
+    Como no salvar, levanta ConflitoVersaoError (sem gravar nenhum) se algum produto já
+    gravado mudou desde a leitura. `verificar_versao=False` é para cargas que substituem
+    os registros de propósito (importação): a versão gravada segue incrementando.
+    """
+    produtos = list(produtos)
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
+    
+    lista_produtos = dados.get('produtos', [])
+    
+    # Índice SKU -> posição, montado uma vez para o lote inteiro
+    indice = {p['sku']: i for i, p in enumerate(lista_produtos)}
+    if verificar_versao:
+        _conferir_versoes(produtos, {p.sku: lista_produtos[indice[p.sku]] for p in produtos if p.sku in indice})
+    
+    total = 0
+    anunciar = eventos.feed.ativo()
+    alteracoes = []
+    for produto in produtos:
+        idx = indice.get(produto.sku)
+        anterior = None
+        if idx is None:
+            indice[produto.sku] = len(lista_produtos)
+            registro = _registro_versionado(produto, None)
+            lista_produtos.append(registro)
+        else:
+            anterior = lista_produtos[idx]
+            registro = lista_produtos[idx] = _registro_versionado(produto, anterior)
+        if anunciar:
+            alteracoes.append(_evento_salvo(anterior, registro))
+        total += 1
+        
+    dados['produtos'] = lista_produtos
+    _salvar_dados(dados)
+    eventos.feed.publicar(alteracoes)
+    return total
+
+@instrumentar()
+@dados_loja.em_escrita
+def ajustar_estoques_se_versao(ajustes: Iterable[Tuple[str, int, int]]) -> Dict[str, int]:
+    """
+    Compare-and-swap do estoque: para cada (sku, variação, versão lida), aplica a variação
+    somente se o registro ainda estiver na versão lida. É tudo ou nada: se algum SKU mudou
+    desde a leitura, levanta ConflitoVersaoError sem gravar nada; se o estoque ficaria
+    negativo, levanta ValorInvalidoError. Retorna as novas versões por SKU.
+    """
+    ajustes = list(ajustes)
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
+    lista_produtos = dados.get('produtos', [])
+
+    pendentes = {sku for sku, _, _ in ajustes}
+    if len(pendentes) != len(ajustes):
+        raise ValorInvalidoError("Cada SKU deve aparecer uma única vez nos ajustes de estoque.")
+    posicoes = {p['sku']: i for i, p in enumerate(lista_produtos) if p['sku'] in pendentes}
+
+    faltantes = pendentes - posicoes.keys()
+    if faltantes:
+        raise EntidadeNaoEncontradaError(f"Produto(s) não encontrado(s): {', '.join(sorted(faltantes))}.")
+
+    conflitos = [sku for sku, _, versao in ajustes if lista_produtos[posicoes[sku]].get('versao', 0) != versao]
+    if conflitos:
+        raise ConflitoVersaoError(f"Produto(s) alterado(s) por outra operação: {', '.join(conflitos)}.")
+
+    novas_versoes = {}
+    alteracoes = []
+    for sku, variacao, versao in ajustes:
+        idx = posicoes[sku]
+        registro = dict(lista_produtos[idx])
+        registro['estoque'] = registro.get('estoque', 0) + variacao
+        if registro['estoque'] < 0:
+            raise ValorInvalidoError(f"Estoque insuficiente para {registro['nome']}.")
+        registro['versao'] = versao + 1
+        alteracoes.append(_evento_estoque(lista_produtos[idx], registro))
+        lista_produtos[idx] = registro
+        novas_versoes[sku] = registro['versao']
+
+    dados['produtos'] = lista_produtos
+    _salvar_dados(dados)
+    eventos.feed.publicar(alteracoes)
+    return novas_versoes
 
+@instrumentar()
+@dados_loja.em_escrita
+def repor_estoques(quantidades: Dict[str, int]) -> Dict[str, int]:
+    """
+    Devolve ao estoque, em uma única escrita, quantidades baixadas antes (ex.: pedido
+    cancelado). Soma sem conferência de versão (a versão avança, para que uma baixa
+    otimista que leu o valor anterior entre em conflito). SKUs que não existem mais ou
+    não são de Produtos Físicos são ignorados. Retorna o novo estoque por SKU.
+    """
+    dados = dados_loja.copia_para_alteracao(_carregar_dados())
+    lista_produtos = dados.get('produtos', [])
+    posicoes = {
+        p['sku']: i for i, p in enumerate(lista_produtos)
+        if p['sku'] in quantidades and p.get('tipo') == 'ProdutoFisico'
+    }
+
+    novos_estoques = {}
+    alteracoes = []
+    for sku, idx in posicoes.items():
+        registro = dict(lista_produtos[idx])
+        registro['estoque'] = registro.get('estoque', 0) + quantidades[sku]
+        if registro['estoque'] < 0:
+            raise ValorInvalidoError(f"Estoque insuficiente para {registro['nome']}.")
+        registro['versao'] = registro.get('versao', 0) + 1
+        alteracoes.append(_evento_estoque(lista_produtos[idx], registro))
+        lista_produtos[idx] = registro
+        novos_estoques[sku] = registro['estoque']
+
+    if novos_estoques:
+        dados['produtos'] = lista_produtos
+        _salvar_dados(dados)
+        eventos.feed.publicar(alteracoes)
+    return novos_estoques
+
+@instrumentar()
 def buscar_por_sku(sku: str) -> Optional[Produto]:
     """Busca um produto pelo SKU."""
     sku = sku.strip().upper()
@@ -106,11 +250,43 @@ def buscar_por_sku(sku: str) -> Optional[Produto]:
     
     for p in dados.get('produtos', []):
         if p['sku'] == sku:
-            return _deserializar_produto(p)
+            return _deserializar_produto(p, dados_loja.esquema_confiavel(dados))
             
     return None
 
+@instrumentar()
+def buscar_por_skus(skus: Iterable[str]) -> Dict[str, Produto]:
+    """
+    Busca vários produtos pelo SKU em uma única passada pela lista, hidratando apenas os
+    encontrados. Retorna SKU -> Produto (os SKUs não encontrados ficam de fora).
+    """
+    procurados = {sku.strip().upper() for sku in skus}
+    dados = _carregar_dados()
+    confiavel = dados_loja.esquema_confiavel(dados)
+    encontrados: Dict[str, Produto] = {}
+    for p in dados.get('produtos', []):
+        if p['sku'] in procurados:
+            encontrados[p['sku']] = _deserializar_produto(p, confiavel)
+            if len(encontrados) == len(procurados):
+                break
+    return encontrados
+
+@instrumentar()
 def carregar_todos() -> List[Produto]:
     """Retorna a lista completa de todos os produtos."""
     dados = _carregar_dados()
-    return [_deserializar_produto(p) for p in dados.get('produtos', [])]
\ No newline at end of file
+    confiavel = dados_loja.esquema_confiavel(dados)
+    return [_deserializar_produto(p, confiavel) for p in dados.get('produtos', [])]
+
+@instrumentar()
+def carregar_todos_produtos_raw() -> List[Dict[str, Any]]:
+    """Retorna a lista de produtos como dicionários brutos (para exportação)."""
+    dados = _carregar_dados()
+    return dados.get('produtos', [])
+
+def iterar_produtos_raw() -> Iterator[Dict[str, Any]]:
+    """
+    Produtos brutos, um a um: da loja em memória se ela já estiver carregada, senão lidos
+    aos poucos do arquivo (sem carregar as outras coleções nem a lista inteira).
+    """
+    return dados_loja.iterar_colecao('produtos')
\ No newline at end of file
@@ -1,49 +1,270 @@
+import copy
 import json
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+import repositories.dados as dados_loja
+from models.exceptions import ConfiguracaoInvalidaError
+from monitoramento.instrumentacao import instrumentar
 
 SETTINGS_FILE = 'settings.json'
 
-def _get_file_path(nome_arquivo: str = SETTINGS_FILE) -> str:
-    """Gera o caminho completo para o arquivo settings.json na pasta data/."""
-    # Assume que repositories/ está um nível acima de data/
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_dir, 'data', nome_arquivo)
+# As configurações são lidas uma vez e mantidas em memória como um objeto tipado
+# (obter_configuracoes); o arquivo só é conferido de novo (mtime e tamanho) depois de
+# INTERVALO_REVALIDACAO_S segundos, então os caminhos quentes (validação de estoque,
+# reservas, frete) leem os limites sem I/O. recarregar() força a releitura.
+# Um settings.json com JSON inválido, tipo errado ou chave desconhecida numa seção
+# conhecida levanta ConfiguracaoInvalidaError. Se o arquivo quebrar depois de já ter sido
+# carregado, a última versão válida continua em uso (com um aviso) até ele ser corrigido.
+INTERVALO_REVALIDACAO_S = float(os.environ.get('LOJA_SETTINGS_REVALIDAR_S', '2.0'))
 
-def carregar_settings() -> Dict[str, Any]:
-    """Lê o conteúdo do arquivo settings.json."""
-    caminho = _get_file_path(SETTINGS_FILE)
-    
-    # Estrutura base com valores padrão
-    estrutura_base = {
-        "regra_estoque": {
-            "limite_seguranca": 5, 
-            "alerta_percentual": 0.15 
-        },
-        "frete": {
-            "valor_padrao": 25.0,
-            "prazo_dias": 5
-        }
+# Estrutura base com valores padrão
+ESTRUTURA_BASE: Dict[str, Dict[str, Any]] = {
+    "regra_estoque": {
+        "limite_seguranca": 5,
+        "alerta_percentual": 0.15
+    },
+    "frete": {
+        "valor_padrao": 25.0,
+        "prazo_dias": 5
+    },
+    "reserva_estoque": {
+        "ttl_segundos": 900
+    },
+    "sessoes_carrinho": {
+        "capacidade_memoria": 10000,
+        "ttl_segundos": 604800
+    },
+    "gateway_pagamento": {
+        "concorrencia": 64,
+        "timeout_segundos": 2.0,
+        "tentativas": 3
+    },
+    "idempotencia": {
+        "capacidade_memoria": 10000,
+        "ttl_segundos": 86400
+    },
+    "arquivamento": {
+        "idade_dias": 365,
+        "compressao": "gzip"
+    },
+    "eventos": {
+        "tamanho_segmento_bytes": 8388608,
+        "segmentos_retidos": 8
     }
-    
-    # 1. Tenta criar o arquivo e a estrutura de diretórios se não existir
-    if not os.path.exists(caminho):
+}
+
+
+class RegraEstoque(NamedTuple):
+    limite_seguranca: int
+    alerta_percentual: float
+
+
+class RegraFrete(NamedTuple):
+    valor_padrao: float
+    prazo_dias: int
+
+
+class ReservaEstoque(NamedTuple):
+    ttl_segundos: float
+
+
+class SessoesCarrinho(NamedTuple):
+    capacidade_memoria: int
+    ttl_segundos: float
+
+
+class GatewayPagamento(NamedTuple):
+    concorrencia: int
+    timeout_segundos: float
+    tentativas: int
+
+
+class Idempotencia(NamedTuple):
+    capacidade_memoria: int
+    ttl_segundos: float
+
+
+class Arquivamento(NamedTuple):
+    idade_dias: int
+    compressao: str
+
+
+class Eventos(NamedTuple):
+    tamanho_segmento_bytes: int
+    segmentos_retidos: int
+
+
+class Configuracoes(NamedTuple):
+    """Conteúdo validado do settings.json (imutável; compartilhado entre threads)."""
+    regra_estoque: RegraEstoque
+    frete: RegraFrete
+    reserva_estoque: ReservaEstoque
+    sessoes_carrinho: SessoesCarrinho
+    gateway_pagamento: GatewayPagamento
+    idempotencia: Idempotencia
+    arquivamento: Arquivamento
+    eventos: Eventos
+
+
+_SECOES = {
+    'regra_estoque': RegraEstoque,
+    'frete': RegraFrete,
+    'reserva_estoque': ReservaEstoque,
+    'sessoes_carrinho': SessoesCarrinho,
+    'gateway_pagamento': GatewayPagamento,
+    'idempotencia': Idempotencia,
+    'arquivamento': Arquivamento,
+    'eventos': Eventos,
+}
+
+# Campo -> (tipos aceitos, condição, descrição da condição)
+_REGRAS_CAMPOS = {
+    ('regra_estoque', 'limite_seguranca'): ((int,), lambda v: v >= 0, "inteiro >= 0"),
+    ('regra_estoque', 'alerta_percentual'): ((int, float), lambda v: 0 <= v <= 1, "número entre 0 e 1"),
+    ('frete', 'valor_padrao'): ((int, float), lambda v: v >= 0, "número >= 0"),
+    ('frete', 'prazo_dias'): ((int,), lambda v: v >= 0, "inteiro >= 0"),
+    ('reserva_estoque', 'ttl_segundos'): ((int, float), lambda v: v > 0, "número > 0"),
+    ('sessoes_carrinho', 'capacidade_memoria'): ((int,), lambda v: v >= 1, "inteiro >= 1"),
+    ('sessoes_carrinho', 'ttl_segundos'): ((int, float), lambda v: v > 0, "número > 0"),
+    ('gateway_pagamento', 'concorrencia'): ((int,), lambda v: v >= 1, "inteiro >= 1"),
+    ('gateway_pagamento', 'timeout_segundos'): ((int, float), lambda v: v > 0, "número > 0"),
+    ('gateway_pagamento', 'tentativas'): ((int,), lambda v: v >= 1, "inteiro >= 1"),
+    ('idempotencia', 'capacidade_memoria'): ((int,), lambda v: v >= 1, "inteiro >= 1"),
+    ('idempotencia', 'ttl_segundos'): ((int, float), lambda v: v > 0, "número > 0"),
+    ('arquivamento', 'idade_dias'): ((int,), lambda v: v >= 0, "inteiro >= 0"),
+    ('arquivamento', 'compressao'): ((str,), lambda v: v in ('gzip', 'lzma'), "'gzip' ou 'lzma'"),
+    ('eventos', 'tamanho_segmento_bytes'): ((int,), lambda v: v >= 1024, "inteiro >= 1024"),
+    # Ao menos um segmento fechado: o nome dele guarda onde o log ativo começa
+    ('eventos', 'segmentos_retidos'): ((int,), lambda v: v >= 1, "inteiro >= 1"),
+}
+
+
+class _Carregado(NamedTuple):
+    caminho: str
+    assinatura: Optional[Tuple[int, int]]
+    configuracoes: Configuracoes
+    bruto: Dict[str, Any]
+
+
+_trava = threading.Lock()
+_carregado: Optional[_Carregado] = None
+# Quando o arquivo foi conferido pela última vez (time.monotonic)
+_conferido_em = 0.0
+# Assinatura do arquivo inválido já avisado (para avisar uma vez só)
+_assinatura_avisada: Optional[Tuple[int, int]] = None
+
+
+def _get_file_path(nome_arquivo: str = SETTINGS_FILE) -> str:
+    """Gera o caminho completo para o arquivo settings.json na pasta de dados."""
+    return dados_loja._get_file_path(nome_arquivo)
+
+def _assinatura_arquivo(caminho: str) -> Optional[Tuple[int, int]]:
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+def validar(dados: Any, origem: str = SETTINGS_FILE) -> Tuple[Configuracoes, Dict[str, Any]]:
+    """
+    Mescla o conteúdo lido com os padrões (seção a seção) e confere tipos e valores.
+    Retorna o objeto tipado e o dicionário mesclado; levanta ConfiguracaoInvalidaError
+    listando todos os problemas encontrados. Seções desconhecidas são mantidas no dicionário.
+    """
+    if not isinstance(dados, dict):
+        raise ConfiguracaoInvalidaError(f"{origem}: o conteúdo deve ser um objeto JSON.")
+
+    erros: List[str] = []
+    mesclado = {**copy.deepcopy(ESTRUTURA_BASE), **{k: v for k, v in dados.items() if k not in ESTRUTURA_BASE}}
+    secoes = {}
+    for secao, classe in _SECOES.items():
+        valores = dados.get(secao, {})
+        if not isinstance(valores, dict):
+            erros.append(f"'{secao}' deve ser um objeto.")
+            continue
+        for chave in valores.keys() - set(classe._fields):
+            erros.append(f"'{secao}.{chave}' não é uma configuração conhecida.")
+        mesclado[secao].update({k: v for k, v in valores.items() if k in classe._fields})
+        for campo in classe._fields:
+            valor = mesclado[secao][campo]
+            tipos, condicao, descricao = _REGRAS_CAMPOS[(secao, campo)]
+            # bool é subclasse de int, mas true/false não são números válidos aqui
+            if isinstance(valor, bool) or not isinstance(valor, tipos) or not condicao(valor):
+                erros.append(f"'{secao}.{campo}' deve ser {descricao} (encontrado: {valor!r}).")
+        if not erros:
+            secoes[secao] = classe(**mesclado[secao])
+
+    if erros:
+        raise ConfiguracaoInvalidaError(f"{origem} inválido: " + " ".join(sorted(erros)))
+    return Configuracoes(**secoes), mesclado
+
+def _ler_arquivo(caminho: str) -> _Carregado:
+    """Lê e valida o arquivo; cria o settings.json com os padrões se ele não existir."""
+    assinatura = _assinatura_arquivo(caminho)
+    if assinatura is None:
         try:
             os.makedirs(os.path.dirname(caminho), exist_ok=True)
             with open(caminho, 'w', encoding='utf-8') as f:
-                json.dump(estrutura_base, f, indent=4, ensure_ascii=False)
-            return estrutura_base
-        except:
-            # Em caso de falha ao criar/escrever, retorna a estrutura base em memória
-            return estrutura_base 
-            
-    # 2. Tenta ler o arquivo existente
+                json.dump(ESTRUTURA_BASE, f, indent=4, ensure_ascii=False)
+            assinatura = _assinatura_arquivo(caminho)
+        except OSError:
+            # Pasta sem permissão de escrita: os padrões valem só em memória
+            pass
+        configuracoes, mesclado = validar(ESTRUTURA_BASE, caminho)
+        return _Carregado(caminho, assinatura, configuracoes, mesclado)
+
     try:
         with open(caminho, 'r', encoding='utf-8') as f:
             dados = json.load(f)
-            # Mescla: garante que valores persistidos (dados) sobrescrevam os padrões (estrutura_base),
-            # mas mantém os padrões para chaves que faltam no arquivo.
-            return {**estrutura_base, **dados} 
-    except:
-        # Se houver erro de leitura ou JSONDecodeError, retorna a estrutura base
-        return estrutura_base
\ No newline at end of file
+    except json.JSONDecodeError as e:
+        raise ConfiguracaoInvalidaError(f"{caminho} não é um JSON válido: {e}") from e
+    except OSError as e:
+        raise ConfiguracaoInvalidaError(f"Não foi possível ler {caminho}: {e}") from e
+    configuracoes, mesclado = validar(dados, caminho)
+    return _Carregado(caminho, assinatura, configuracoes, mesclado)
+
+def _atual(forcar: bool = False) -> _Carregado:
+    global _carregado, _conferido_em, _assinatura_avisada
+    caminho = _get_file_path(SETTINGS_FILE)
+    carregado = _carregado
+    agora = time.monotonic()
+    # Caminho rápido: nada a conferir ainda
+    if not forcar and carregado is not None and carregado.caminho == caminho and agora - _conferido_em < INTERVALO_REVALIDACAO_S:
+        return carregado
+
+    with _trava:
+        carregado = _carregado
+        valido = carregado is not None and carregado.caminho == caminho
+        if valido and not forcar and _assinatura_arquivo(caminho) == carregado.assinatura:
+            _conferido_em = agora
+            return carregado
+        try:
+            _carregado = _ler_arquivo(caminho)
+        except ConfiguracaoInvalidaError as e:
+            if forcar or not valido:
+                raise
+            # Arquivo editado e quebrado em uso: mantém a última versão válida
+            assinatura = _assinatura_arquivo(caminho)
+            if assinatura != _assinatura_avisada:
+                _assinatura_avisada = assinatura
+                print(f"⚠️ Aviso: {e} Mantendo as configurações carregadas anteriormente.")
+            _conferido_em = agora
+            return carregado
+        _conferido_em = agora
+        return _carregado
+
+def obter_configuracoes() -> Configuracoes:
+    """Configurações tipadas, da memória (revalidadas pelo mtime a cada INTERVALO_REVALIDACAO_S)."""
+    return _atual().configuracoes
+
+@instrumentar()
+def recarregar() -> Configuracoes:
+    """Relê o settings.json agora (ex.: logo depois de editá-lo). Levanta ConfiguracaoInvalidaError se ele estiver inválido."""
+    return _atual(forcar=True).configuracoes
+
+@instrumentar()
+def carregar_settings() -> Dict[str, Any]:
+    """Conteúdo do settings.json como dicionário (mesclado com os padrões; cópia independente do cache)."""
+    return copy.deepcopy(_atual().bruto)
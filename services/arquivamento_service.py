@@ -0,0 +1,76 @@
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from models.vendas import Pedido
+from models.exceptions import ValorInvalidoError
+from repositories import arquivo_pedidos, pedido_repository, settings_repository
+from monitoramento.instrumentacao import instrumentar
+
+# Arquivamento de pedidos antigos: pedidos em estado final (sem transições seguintes no
+# grafo do Pedido, ex.: ENTREGUE e CANCELADO) criados há mais de `idade_dias` saem do
+# loja.json e vão para os segmentos comprimidos de repositories/arquivo_pedidos.py.
+# Como nenhum deles pode mudar de estado, os segmentos são gravados sem a trava de escrita;
+# só a remoção do loja.json é uma alteração (uma única escrita).
+# Se a execução for interrompida entre a gravação dos segmentos e a remoção, a próxima
+# execução encontra os pedidos já arquivados e apenas os retira do loja.json.
+
+ESTADOS_ARQUIVAVEIS = frozenset(estado for estado, seguintes in Pedido.TRANSICOES.items() if not seguintes)
+
+
+class ArquivamentoService:
+    """Move pedidos antigos e finalizados para o arquivo frio."""
+
+    @staticmethod
+    @instrumentar()
+    def arquivar_pedidos(
+        idade_dias: Optional[int] = None,
+        compressao: Optional[str] = None,
+        agora: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Arquiva os pedidos em estado final criados antes de `agora - idade_dias` (padrões
+        na seção "arquivamento" do settings.json). Retorna quantos pedidos foram
+        arquivados, os segmentos criados e quantos saíram do loja.json.
+        """
+        configuracao = settings_repository.obter_configuracoes().arquivamento
+        idade_dias = configuracao.idade_dias if idade_dias is None else idade_dias
+        compressao = compressao or configuracao.compressao
+        if idade_dias < 0:
+            raise ValorInvalidoError("A idade mínima para arquivamento não pode ser negativa.")
+        limite = (agora or datetime.now()) - timedelta(days=idade_dias)
+
+        inicio = time.perf_counter()
+        candidatos = []
+        for registro in pedido_repository.carregar_todos_pedidos_raw():
+            if registro.get('estado') not in ESTADOS_ARQUIVAVEIS:
+                continue
+            data = arquivo_pedidos.data_do_registro(registro)
+            if data is not None and data < limite:
+                candidatos.append(registro)
+
+        # Já arquivados por uma execução interrompida: só falta retirá-los do loja.json
+        novos = [r for r in candidatos if not arquivo_pedidos.contem(r['codigo_pedido'])]
+        segmentos = arquivo_pedidos.gravar_segmentos(novos, compressao)
+        removidos = pedido_repository.remover_por_codigos(r['codigo_pedido'] for r in candidatos)
+
+        return {
+            'limite': limite,
+            'arquivados': len(novos),
+            'recuperados': len(candidatos) - len(novos),
+            'removidos_do_ativo': removidos,
+            'segmentos': [
+                {'arquivo': s['arquivo'], 'quantidade': s['quantidade'], 'bytes': s['bytes']} for s in segmentos
+            ],
+            'duracao_s': time.perf_counter() - inicio,
+        }
+
+    @staticmethod
+    def resumo_arquivo() -> Dict[str, Any]:
+        """Totais do arquivo frio, pelo manifesto (sem abrir nenhum segmento)."""
+        segmentos = arquivo_pedidos.carregar_manifesto()['segmentos']
+        return {
+            'segmentos': len(segmentos),
+            'pedidos': sum(s['quantidade'] for s in segmentos),
+            'bytes': sum(s.get('bytes', 0) for s in segmentos),
+            'meses': sorted({s['mes'] for s in segmentos}),
+        }
@@ -0,0 +1,184 @@
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from repositories import pedido_repository
+from monitoramento.instrumentacao import instrumentar
+
+# Vencimento de boletos: pedidos PENDENTE pagos com boleto seguram o estoque até o
+# pagamento; depois do vencimento, são cancelados e o estoque volta para a loja.
+#
+# Um índice em heap, ordenado pelo vencimento, guarda (vencimento, código, posição no
+# arquivo) de cada pedido pendente. Ele é montado uma vez percorrendo os pedidos ativos
+# brutos um a um (sem hidratar nenhum nem carregar a lista inteira; os arquivados estão
+# sempre em estado final) e depois recebe cada boleto novo do PedidoService. A thread de
+# fundo dorme até o próximo vencimento; a cada varredura todos os pedidos vencidos passam
+# juntos pela transição em lote do PedidoService (cancelamento e devolução do estoque em
+# uma única escrita por varredura).
+# Pedidos que deixaram de estar pendentes (pagos, cancelados à mão) são descartados ao
+# sair do heap.
+
+ATRASO_INICIAL_PADRAO_S = 5.0
+
+
+def _vencimento_do_registro(dados_pedido: Dict[str, Any]) -> Optional[datetime]:
+    """Vencimento de um pedido bruto PENDENTE pago com boleto (None nos demais)."""
+    pagamento = dados_pedido.get('pagamento')
+    if dados_pedido.get('estado') != 'PENDENTE' or not pagamento or pagamento.get('tipo') != 'PagamentoBoleto':
+        return None
+    return datetime.fromisoformat(pagamento['data_vencimento'])
+
+
+class VarredorBoletos:
+    """Cancela os pedidos de boleto vencidos e devolve o estoque, uma escrita por varredura."""
+
+    def __init__(self, agora: Callable[[], datetime] = datetime.now):
+        self._agora = agora
+        self._condicao = threading.Condition()
+        self._vencimentos: List[Tuple[datetime, str, Optional[int]]] = []
+        self._indexado = False
+        # Boletos registrados enquanto o índice é montado (não aparecem na leitura já feita)
+        self._registrados_na_indexacao: Optional[List[Tuple[datetime, str, Optional[int]]]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._parar = False
+        self._estatisticas = Counter()
+
+    # --- Índice ---
+
+    @instrumentar()
+    def indexar(self) -> int:
+        """(Re)monta o índice a partir dos pedidos brutos. Retorna quantos boletos estão pendentes."""
+        with self._condicao:
+            self._registrados_na_indexacao = []
+        entradas = []
+        for i, p in enumerate(pedido_repository.iterar_pedidos_ativos_raw()):
+            vencimento = _vencimento_do_registro(p)
+            if vencimento is not None:
+                entradas.append((vencimento, p['codigo_pedido'], i))
+        with self._condicao:
+            lidos = {codigo for _, codigo, _ in entradas}
+            entradas.extend(e for e in self._registrados_na_indexacao if e[1] not in lidos)
+            self._registrados_na_indexacao = None
+            heapq.heapify(entradas)
+            self._vencimentos = entradas
+            self._indexado = True
+            self._condicao.notify()
+        return len(entradas)
+
+    def registrar(self, codigo_pedido: str, vencimento: datetime, posicao: Optional[int] = None):
+        """Inclui no índice um boleto recém-emitido (chamado pelo PedidoService)."""
+        with self._condicao:
+            entrada = (vencimento, codigo_pedido, posicao)
+            heapq.heappush(self._vencimentos, entrada)
+            if self._registrados_na_indexacao is not None:
+                self._registrados_na_indexacao.append(entrada)
+            # Acorda a thread se este vencer antes do prazo em que ela ia acordar
+            if self._vencimentos[0][1] == codigo_pedido:
+                self._condicao.notify()
+
+    def pendentes(self) -> int:
+        """Entradas no índice (pode incluir pedidos já pagos, descartados na varredura)."""
+        return len(self._vencimentos)
+
+    def proximo_vencimento(self) -> Optional[datetime]:
+        with self._condicao:
+            return self._vencimentos[0][0] if self._vencimentos else None
+
+    def estatisticas(self) -> Dict[str, int]:
+        return dict(self._estatisticas)
+
+    # --- Varredura ---
+
+    @instrumentar()
+    def varrer(self) -> Dict[str, int]:
+        """
+        Cancela todos os boletos já vencidos em uma única transação (uma escrita da loja).
+        Retorna quantos foram cancelados e quantos saíram do índice sem cancelamento
+        (já não estavam pendentes). Se a gravação falhar, os vencidos voltam para o índice
+        (a próxima varredura tenta de novo) e a exceção segue para quem chamou.
+        """
+        if not self._indexado:
+            self.indexar()
+        agora = self._agora()
+        with self._condicao:
+            vencidos = []
+            while self._vencimentos and self._vencimentos[0][0] <= agora:
+                vencidos.append(heapq.heappop(self._vencimentos))
+        try:
+            resultado = Counter(self._cancelar(vencidos) if vencidos else {})
+        except Exception:
+            with self._condicao:
+                for entrada in vencidos:
+                    heapq.heappush(self._vencimentos, entrada)
+            raise
+        self._estatisticas.update(resultado)
+        self._estatisticas['varreduras'] += 1
+        return {'cancelados': resultado['cancelados'], 'ignorados': resultado['ignorados']}
+
+    def _cancelar(self, vencidos: List[Tuple[datetime, str, Optional[int]]]) -> Dict[str, int]:
+        # Importação local: o PedidoService registra os boletos novos neste módulo
+        from services.pedido_service import PedidoService
+        posicoes = {codigo: posicao for _, codigo, posicao in vencidos if posicao is not None}
+        # Só pedidos ainda PENDENTE são cancelados; a devolução do estoque vai na mesma escrita
+        resultados = PedidoService.transicionar_pedidos(
+            {codigo: 'CANCELADO' for _, codigo, _ in vencidos}, estado_origem='PENDENTE', posicoes=posicoes
+        )
+        cancelados = sum(1 for r in resultados if r.sucesso)
+        return {'cancelados': cancelados, 'ignorados': len(resultados) - cancelados}
+
+    # --- Thread de fundo ---
+
+    def iniciar(self, atraso_inicial_s: float = ATRASO_INICIAL_PADRAO_S) -> bool:
+        """
+        Liga a varredura em segundo plano. O índice é montado depois de `atraso_inicial_s`
+        (para não disputar a carga inicial da loja com o menu). Retorna False se já estiver ativa.
+        """
+        with self._condicao:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._parar = False
+            self._thread = threading.Thread(
+                target=self._executar, args=(atraso_inicial_s,), name='varredor-boletos', daemon=True
+            )
+        self._thread.start()
+        return True
+
+    def parar(self):
+        with self._condicao:
+            self._parar = True
+            self._condicao.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def esta_ativo(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _executar(self, atraso_inicial_s: float):
+        with self._condicao:
+            if self._condicao.wait_for(lambda: self._parar, timeout=atraso_inicial_s):
+                return
+        while True:
+            try:
+                self.varrer()
+            except Exception:
+                # Uma falha (ex.: arquivo travado) não derruba a thread; os vencidos voltaram
+                # para o índice, então a próxima volta (depois da pausa) tenta de novo
+                self._estatisticas['falhas'] += 1
+                time.sleep(1.0)
+            with self._condicao:
+                if self._parar:
+                    return
+                if self._vencimentos:
+                    espera = (self._vencimentos[0][0] - self._agora()).total_seconds()
+                    if espera > 0:
+                        self._condicao.wait(espera)
+                else:
+                    self._condicao.wait()
+                if self._parar:
+                    return
+
+
+# Instância usada pelo PedidoService e pelo app
+varredor = VarredorBoletos()
@@ -1,39 +1,50 @@
 from models.vendas import Carrinho
 from models.transacoes import Frete, Cupom 
+from models.entidades import ProdutoFisico
 from models.exceptions import ValorInvalidoError
-import repositories.produto_repository as produto_repository
+from services.reserva_service import reservas
+from repositories import settings_repository
 import math
 from typing import Optional 
+from monitoramento.instrumentacao import instrumentar
 
+@instrumentar()
 def adicionar_item_ao_carrinho(carrinho: Carrinho, sku: str, quantidade: int):
-    produto = produto_repository.buscar_por_sku(sku)
-    
-    if not produto or not produto.is_ativo:
-        raise ValorInvalidoError(f"Produto com SKU '{sku}' não encontrado ou inativo.")
-        
     if quantidade <= 0:
         raise ValorInvalidoError("A quantidade deve ser maior que zero.")
         
-    # Busca a quantidade atual do produto no carrinho
-    quantidade_atual = 0
-    for item in carrinho.itens:
-        if item.produto.sku == sku:
-            quantidade_atual = item.quantidade
-            break
-            
-    nova_quantidade_total = quantidade_atual + quantidade
+    # Reserva o estoque de Produtos Físicos até o checkout (ou até o prazo vencer).
+    # A reserva já valida o produto e o disponível descontando os outros carrinhos.
+    produto = reservas.reservar(carrinho.id_sessao, sku, quantidade)
     
-    # Verifica o estoque total (apenas para ProdutoFisico que tem estoque)
-    if hasattr(produto, 'estoque'):
-        if produto.estoque < nova_quantidade_total:
-            # CORREÇÃO: Informa o total disponível
+    # Demais produtos não são reservados: apenas confere o estoque total
+    if not isinstance(produto, ProdutoFisico):
+        quantidade_atual = 0
+        for item in carrinho.itens:
+            if item.produto.sku == sku:
+                quantidade_atual = item.quantidade
+                break
+        if produto.estoque < quantidade_atual + quantidade:
             raise ValorInvalidoError(
                 f"Estoque insuficiente. Disponível: {produto.estoque}. Você já tem {quantidade_atual} no carrinho."
             )
             
     carrinho.adicionar_item(produto, quantidade)
     
+
+@instrumentar()
+def remover_item_do_carrinho(carrinho: Carrinho, sku: str):
+    """Remove o item do carrinho e solta a reserva de estoque correspondente."""
+    carrinho.remover_item(sku)
+    reservas.liberar(carrinho.id_sessao, sku)
+
+
+def descartar_carrinho(carrinho: Carrinho):
+    """Solta todas as reservas de um carrinho abandonado."""
+    reservas.liberar(carrinho.id_sessao)
+    
     
+@instrumentar()
 def calcular_frete(carrinho: Carrinho, cep_destino: str) -> Frete:
     """
     Simula o cálculo do frete baseado no peso total do carrinho.
@@ -58,9 +69,9 @@ def calcular_frete(carrinho: Carrinho, cep_destino: str) -> Frete:
     # Arredonda o valor do frete para duas casas decimais, arredondando para cima (ceil)
     valor_frete = math.ceil(valor_frete * 100) / 100
 
-    # Simulação de Prazo: 3 dias base + 1 dia por 5kg de peso. Mínimo de 5 dias.
+    # Simulação de Prazo: 3 dias base + 1 dia por 5kg de peso. Mínimo de frete.prazo_dias (settings.json).
     prazo_dias = 3 + int(peso_total_kg / 5) 
-    prazo_dias = max(5, prazo_dias) 
+    prazo_dias = max(settings_repository.obter_configuracoes().frete.prazo_dias, prazo_dias) 
     
     # Cria e retorna o objeto Frete completo
     return Frete(
@@ -70,6 +81,7 @@ def calcular_frete(carrinho: Carrinho, cep_destino: str) -> Frete:
         prazo_dias=prazo_dias 
     )
 
+@instrumentar()
 def buscar_cupom(cupom_codigo: str) -> Optional[Cupom]:
     """
     Simula a busca de um cupom.
@@ -96,6 +108,7 @@ def buscar_cupom(cupom_codigo: str) -> Optional[Cupom]:
         return None
 
 
+@instrumentar()
 def calcular_desconto_cupom(carrinho: Carrinho, cupom: Cupom) -> float:
     """
     Calcula o valor do desconto de um cupom válido no subtotal do carrinho.
@@ -1,19 +1,43 @@
+import random
+import time
+from typing import Dict
 from repositories import produto_repository, settings_repository
-from models.exceptions import ValorInvalidoError
+from models.exceptions import ValorInvalidoError, ConflitoVersaoError
 from models.vendas import ItemCarrinho
 from models.entidades import ProdutoFisico 
+from monitoramento.instrumentacao import instrumentar
+
+# Controle otimista da baixa de estoque: tentativas antes de desistir e espera base entre
+# elas (recuo exponencial com sorteio, para que as baixas em conflito não colidam de novo)
+MAX_TENTATIVAS_BAIXA = 8
+ESPERA_BASE_CONFLITO_S = 0.001
 
 class EstoqueService:
     """Gerencia regras de estoque, como limites de segurança e baixa."""
 
     @staticmethod
+    def _validar_item(produto_em_estoque, nome: str, quantidade: int, limite_seguranca: int):
+        """Aplica as regras de disponibilidade e limite de segurança a um item."""
+        # 1. Validação Simples de Estoque
+        if not produto_em_estoque or produto_em_estoque.estoque < quantidade:
+            raise ValorInvalidoError(f"Estoque insuficiente para {nome}. Disponível: {produto_em_estoque.estoque}")
+        
+        # 2. Regra de Limite de Segurança
+        estoque_apos_compra = produto_em_estoque.estoque - quantidade
+        
+        if estoque_apos_compra < limite_seguranca:
+            raise ValorInvalidoError(
+                f"Não é possível vender {nome}. A compra excederia o limite de segurança de {limite_seguranca} unidades. Estoque atual: {produto_em_estoque.estoque}."
+            )
+
+    @staticmethod
+    @instrumentar()
     def validar_baixa_estoque(itens_carrinho: list[ItemCarrinho]):
         """
         Valida se a baixa de estoque é possível, respeitando o limite de segurança
         e a disponibilidade de estoque para Produtos Físicos.
         """
-        settings = settings_repository.carregar_settings()
-        limite_seguranca = settings['regra_estoque']['limite_seguranca']
+        limite_seguranca = settings_repository.obter_configuracoes().regra_estoque.limite_seguranca
         
         for item in itens_carrinho:
             # CORREÇÃO: Usando a propriedade pública 'sku' e 'nome'
@@ -24,34 +48,44 @@ class EstoqueService:
             
             # Checa apenas Produtos Físicos (ou aqueles que têm estoque gerenciável)
             if isinstance(produto_em_estoque, ProdutoFisico):
-                
-                # 1. Validação Simples de Estoque
-                if not produto_em_estoque or produto_em_estoque.estoque < item.quantidade:
-                    raise ValorInvalidoError(f"Estoque insuficiente para {nome}. Disponível: {produto_em_estoque.estoque}")
-                
-                # 2. Regra de Limite de Segurança
-                estoque_apos_compra = produto_em_estoque.estoque - item.quantidade
-                
-                if estoque_apos_compra < limite_seguranca:
-                    raise ValorInvalidoError(
-                        f"Não é possível vender {nome}. A compra excederia o limite de segurança de {limite_seguranca} unidades. Estoque atual: {produto_em_estoque.estoque}."
-                    )
+                EstoqueService._validar_item(produto_em_estoque, nome, item.quantidade, limite_seguranca)
 
     @staticmethod
+    @instrumentar()
     def realizar_baixa_estoque(itens_carrinho: list[ItemCarrinho]):
-        """Realiza a baixa de estoque e persiste as alterações."""
-        
+        """
+        Realiza a baixa de estoque e persiste as alterações, com controle otimista:
+        lê cada produto (e sua versão), revalida as regras com os valores atuais e grava
+        todas as baixas de uma vez só se nenhum dos produtos mudou desde a leitura.
+        Em conflito, relê e tenta de novo (até MAX_TENTATIVAS_BAIXA vezes). Um conflito em
+        um SKU não afeta as baixas de outros SKUs.
+        """
+        limite_seguranca = settings_repository.obter_configuracoes().regra_estoque.limite_seguranca
+
+        # Quantidade total por SKU (o mesmo produto pode aparecer em mais de um item)
+        quantidades: Dict[str, int] = {}
+        nomes: Dict[str, str] = {}
         for item in itens_carrinho:
-            # CORREÇÃO: Usando a propriedade pública 'sku'
             sku = item.produto.sku
-            
-            produto_em_estoque = produto_repository.buscar_por_sku(sku)
-            
-            # Só realiza a baixa se for um Produto Físico (ou gerenciável)
-            if isinstance(produto_em_estoque, ProdutoFisico) and produto_em_estoque:
-                
-                # Ajusta o estoque (método deve existir na classe Produto/ProdutoFisico)
-                produto_em_estoque.ajustar_estoque(-item.quantidade) 
+            quantidades[sku] = quantidades.get(sku, 0) + item.quantidade
+            nomes[sku] = item.produto.nome
+
+        for tentativa in range(1, MAX_TENTATIVAS_BAIXA + 1):
+            ajustes = []
+            for sku, quantidade in quantidades.items():
+                produto_em_estoque = produto_repository.buscar_por_sku(sku)
                 
-                # CORREÇÃO: Usando a função correta do repositório
-                produto_repository.salvar(produto_em_estoque)
\ No newline at end of file
+                # Só realiza a baixa se for um Produto Físico (ou gerenciável)
+                if isinstance(produto_em_estoque, ProdutoFisico):
+                    EstoqueService._validar_item(produto_em_estoque, nomes[sku], quantidade, limite_seguranca)
+                    ajustes.append((sku, -quantidade, produto_em_estoque.versao))
+
+            if not ajustes:
+                return
+            try:
+                produto_repository.ajustar_estoques_se_versao(ajustes)
+                return
+            except ConflitoVersaoError:
+                if tentativa == MAX_TENTATIVAS_BAIXA:
+                    raise
+                time.sleep(random.uniform(0, ESPERA_BASE_CONFLITO_S * 2 ** tentativa))
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from models.vendas import Pedido
+from repositories import idempotencia_repository, pedido_repository, settings_repository
+from monitoramento.instrumentacao import instrumentar
+
+# Checkout idempotente: a mesma chave de idempotência devolve sempre o mesmo Pedido.
+#
+# Quem repete uma requisição (modo lote, API) depois de um erro ou de um tempo esgotado
+# passa a mesma chave; o checkout roda uma única vez. Os resultados concluídos ficam na
+# memória numa lista LRU limitada a `idempotencia.capacidade_memoria`, com prazo de
+# `idempotencia.ttl_segundos` (padrão 24 h) desde o checkout: a repetição devolve o Pedido
+# original com uma consulta a um dicionário, sem tocar no estoque nem nos arquivos.
+#
+# Repetições que chegam enquanto o checkout da chave ainda está em andamento esperam por
+# ele e recebem o mesmo resultado (ou a mesma exceção). Um checkout que termina em exceção
+# não é guardado: a próxima repetição executa de novo.
+#
+# Para sobreviver a reinícios, a chave é gravada no disco (repositories/
+# idempotencia_repository.py) com o código do pedido antes do pagamento. Depois de
+# reiniciar, a primeira repetição procura esse pedido na loja; se ele não tiver sido
+# gravado (o processo caiu no meio), o checkout é refeito com o mesmo código.
+
+INTERVALO_VARREDURA_S = 60.0
+VARREDURA_LOTE = 10000
+
+# checkout(codigo_pedido, registrar) -> Pedido. `codigo_pedido` é o código a reutilizar
+# (ou None); `registrar(codigo)` grava a chave, chamado depois de montar o pedido e antes
+# do pagamento.
+Checkout = Callable[[Optional[str], Callable[[str], None]], Pedido]
+CheckoutAsync = Callable[[Optional[str], Callable[[str], None]], Awaitable[Pedido]]
+
+
+class _Resultado:
+    __slots__ = ('pedido', 'expira_em')
+
+    def __init__(self, pedido: Pedido, expira_em: float):
+        self.pedido = pedido
+        self.expira_em = expira_em
+
+
+class IdempotenciaService:
+    """Guarda o Pedido de cada chave de idempotência: LRU na memória, as chaves também no disco."""
+
+    def __init__(self, capacidade: Optional[int] = None, ttl_s: Optional[float] = None,
+                 relogio: Callable[[], float] = time.time):
+        # capacidade/ttl_s fixos (ex.: benchmarks); None segue o settings.json
+        self._capacidade = capacidade
+        self._ttl_s = ttl_s
+        self._relogio = relogio
+        self._trava = threading.Lock()
+        self._concluidos: 'OrderedDict[str, _Resultado]' = OrderedDict()
+        # chave -> Future do checkout em andamento (compartilhado por threads e loops asyncio)
+        self._em_andamento: Dict[str, Future] = {}
+        self._varrido_em = 0.0
+        self._contadores = {'executados': 0, 'repetidos': 0, 'recuperados': 0, 'coalescidos': 0, 'falhas': 0}
+
+    # --- Operações ---
+
+    def executar(self, chave: str, checkout: Checkout) -> Pedido:
+        """Executa o checkout uma única vez por chave; repetições devolvem o mesmo Pedido."""
+        pedido, futuro, dono = self._iniciar(chave)
+        if pedido is not None:
+            return pedido
+        if not dono:
+            return futuro.result()
+        try:
+            pedido, codigo = self._do_disco(chave)
+            if pedido is None:
+                pedido = checkout(codigo, self._registrador(chave))
+        except BaseException as erro:
+            self._concluir(chave, futuro, erro=erro)
+            raise
+        self._concluir(chave, futuro, pedido)
+        return pedido
+
+    async def executar_async(self, chave: str, checkout: CheckoutAsync) -> Pedido:
+        """Como executar(), para checkouts assíncronos (a espera pelo disco roda em uma thread)."""
+        pedido, futuro, dono = self._iniciar(chave)
+        if pedido is not None:
+            return pedido
+        if not dono:
+            return await asyncio.wrap_future(futuro)
+        try:
+            pedido, codigo = await asyncio.to_thread(self._do_disco, chave)
+            if pedido is None:
+                pedido = await checkout(codigo, self._registrador(chave))
+        except BaseException as erro:
+            self._concluir(chave, futuro, erro=erro)
+            raise
+        self._concluir(chave, futuro, pedido)
+        return pedido
+
+    @instrumentar()
+    def consultar(self, chave: str) -> Optional[Pedido]:
+        """Pedido já concluído com a chave (da memória ou, depois de reiniciar, do disco), ou None."""
+        pedido = self._iniciar(chave, consulta=True)[0]
+        if pedido is None:
+            pedido = self._do_disco(chave)[0]
+        return pedido
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Chaves na memória, no disco e em andamento, e os contadores desde o início do processo."""
+        capacidade, ttl_s = self._regras()
+        with self._trava:
+            return {
+                'em_memoria': len(self._concluidos), 'em_andamento': len(self._em_andamento),
+                'capacidade': capacidade, 'ttl_s': ttl_s,
+                'no_disco': idempotencia_repository.contar(),
+                **self._contadores,
+            }
+
+    # --- Auxiliares ---
+
+    def _regras(self) -> Tuple[int, float]:
+        regras = settings_repository.obter_configuracoes().idempotencia
+        return (self._capacidade if self._capacidade is not None else regras.capacidade_memoria,
+                self._ttl_s if self._ttl_s is not None else regras.ttl_segundos)
+
+    def _iniciar(self, chave: str, consulta: bool = False) -> Tuple[Optional[Pedido], Optional[Future], bool]:
+        """
+        (pedido concluído, None, False) se a chave já foi executada; senão (None, futuro,
+        dono): quem chega primeiro é o dono do futuro e executa o checkout, os demais esperam.
+        Com `consulta`, só procura o concluído na memória.
+        """
+        with self._trava:
+            resultado = self._concluidos.get(chave)
+            if resultado is not None:
+                if resultado.expira_em > self._relogio():
+                    self._concluidos.move_to_end(chave)
+                    self._contadores['repetidos'] += 1
+                    return resultado.pedido, None, False
+                del self._concluidos[chave]
+            if consulta:
+                return None, None, False
+            futuro = self._em_andamento.get(chave)
+            if futuro is not None:
+                self._contadores['coalescidos'] += 1
+                return None, futuro, False
+            futuro = Future()
+            self._em_andamento[chave] = futuro
+            return None, futuro, True
+
+    def _do_disco(self, chave: str) -> Tuple[Optional[Pedido], Optional[str]]:
+        """
+        Procura a chave gravada por um processo anterior: (pedido, código) se o checkout foi
+        concluído (o pedido já vai para a memória), (None, código) se caiu antes de gravar o
+        pedido e (None, None) se a chave é nova.
+        """
+        registro = idempotencia_repository.buscar(chave, self._relogio())
+        if registro is None:
+            return None, None
+        codigo, expira_em = registro
+        # Código exato: a busca por prefixo acharia um pedido mais longo com o mesmo começo
+        pedido = pedido_repository.buscar_por_codigos([codigo]).get(codigo)
+        if pedido is None:
+            return None, codigo
+        capacidade, _ = self._regras()
+        with self._trava:
+            self._guardar(chave, pedido, expira_em, capacidade)
+            self._contadores['recuperados'] += 1
+        return pedido, codigo
+
+    def _registrador(self, chave: str) -> Callable[[str], None]:
+        def registrar(codigo_pedido: str):
+            _, ttl_s = self._regras()
+            idempotencia_repository.registrar(chave, codigo_pedido, self._relogio() + ttl_s)
+        return registrar
+
+    def _concluir(self, chave: str, futuro: Future, pedido: Optional[Pedido] = None, erro: Optional[BaseException] = None):
+        """Guarda o resultado do dono, solta a chave e acorda quem estava esperando."""
+        capacidade, ttl_s = self._regras()
+        with self._trava:
+            del self._em_andamento[chave]
+            agora = self._relogio()
+            if erro is None:
+                self._guardar(chave, pedido, agora + ttl_s, capacidade)
+                self._contadores['executados'] += 1
+            else:
+                self._contadores['falhas'] += 1
+            varrer = agora - self._varrido_em >= INTERVALO_VARREDURA_S
+            if varrer:
+                self._varrido_em = agora
+        if erro is None:
+            futuro.set_result(pedido)
+        else:
+            futuro.set_exception(erro)
+        if varrer:
+            idempotencia_repository.remover_vencidos(agora, VARREDURA_LOTE)
+
+    def _guardar(self, chave: str, pedido: Pedido, expira_em: float, capacidade: int):
+        """Coloca o resultado na memória, descartando os menos usados além da capacidade. Chamado com a trava."""
+        self._concluidos[chave] = _Resultado(pedido, expira_em)
+        self._concluidos.move_to_end(chave)
+        while len(self._concluidos) > capacidade:
+            self._concluidos.popitem(last=False)
+
+
+idempotencia = IdempotenciaService()
@@ -0,0 +1,282 @@
+import shlex
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Iterable, Any, Tuple
+from models.entidades import Cliente, Endereco
+from models.vendas import Carrinho
+from models.exceptions import ValorInvalidoError, EntidadeNaoEncontradaError, ECommerceBaseError
+import repositories.cliente_repository as cliente_repository
+import services.carrinho_service as carrinho_service
+from services.pedido_service import PedidoService
+from services import idempotencia_service
+from services.relatorio_service import RelatorioService
+
+# Comandos aceitos no arquivo de lote (uma linha por comando, '#' inicia comentário):
+#
+#   cadastrar_cliente <cpf> "<nome>" <email>
+#   endereco <cpf> <cep> "<logradouro>" <numero> "<cidade>" <uf>
+#   cliente <sessao> <cpf>                      associa o cliente ao carrinho da sessão
+#   adicionar <sessao> <sku> <quantidade>
+#   remover <sessao> <sku>
+#   checkout <sessao> <cartao|boleto> [bandeira=VISA] [cupom=CODIGO] [cep=00000000] [chave=IDEMPOTENCIA]
+#                                               com chave, repetir a linha devolve o mesmo pedido
+#   limpar <sessao>
+#   status <codigo_pedido> <NOVO_ESTADO>
+#   transicionar <ESTADO_ORIGEM> <NOVO_ESTADO> [codigo ...]   em lote; sem códigos, todos os pedidos no estado de origem
+#   relatorio <clientes|produtos|pedidos|faturamento> [dia|mes] [desde=AAAA-MM-DD] [ate=AAAA-MM-DD]
+
+
+class ResultadoComando:
+    """Resultado da execução de uma linha do arquivo de lote."""
+
+    def __init__(self, linha: int, comando: str, sucesso: bool, latencia_ms: float, mensagem: str = ""):
+        self.linha = linha
+        self.comando = comando
+        self.sucesso = sucesso
+        self.latencia_ms = latencia_ms
+        self.mensagem = mensagem
+
+    def __str__(self):
+        status = "OK " if self.sucesso else "ERR"
+        texto = f"[{self.linha:>5}] {status} {self.comando:<18} {self.latencia_ms:9.3f} ms"
+        return f"{texto}  {self.mensagem}" if self.mensagem else texto
+
+
+class LoteService:
+    """
+    Executa um roteiro de comandos sem interação humana, chamando os mesmos serviços
+    usados pelo CLI. Cada sessão nomeada tem o seu próprio carrinho, permitindo
+    intercalar várias sessões de compra no mesmo roteiro.
+    """
+
+    def __init__(self):
+        self._sessoes: Dict[str, Carrinho] = {}
+        self._resultados: List[ResultadoComando] = []
+
+    @property
+    def sessoes(self) -> Dict[str, Carrinho]: return self._sessoes
+    @property
+    def resultados(self) -> List[ResultadoComando]: return self._resultados
+
+    def carrinho_da_sessao(self, sessao: str) -> Carrinho:
+        if sessao not in self._sessoes:
+            self._sessoes[sessao] = Carrinho()
+        return self._sessoes[sessao]
+
+    def executar_arquivo(self, caminho: str) -> Iterable[ResultadoComando]:
+        """Executa o arquivo linha a linha, devolvendo cada resultado assim que termina."""
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for num_linha, texto in enumerate(f, start=1):
+                resultado = self.executar_linha(texto, num_linha)
+                if resultado:
+                    yield resultado
+
+    def executar_linha(self, texto: str, num_linha: int = 0) -> Optional[ResultadoComando]:
+        """Interpreta e executa uma linha. Linhas vazias e comentários retornam None."""
+        try:
+            tokens = shlex.split(texto, comments=True)
+        except ValueError as e:
+            resultado = ResultadoComando(num_linha, "?", False, 0.0, f"Linha mal formada: {e}")
+            self._resultados.append(resultado)
+            return resultado
+
+        if not tokens:
+            return None
+
+        comando, argumentos = tokens[0].lower(), tokens[1:]
+        manipulador = getattr(self, f"_cmd_{comando}", None)
+
+        inicio = time.perf_counter()
+        try:
+            if manipulador is None:
+                raise ValorInvalidoError(f"Comando '{comando}' desconhecido.")
+            mensagem = manipulador(*argumentos)
+            sucesso = True
+        except (ECommerceBaseError, ValueError) as e:
+            mensagem = str(e)
+            sucesso = False
+        except Exception as e:
+            # Argumentos a mais/a menos chegam aqui como TypeError; o roteiro continua
+            mensagem = f"{e.__class__.__name__}: {e}"
+            sucesso = False
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+
+        resultado = ResultadoComando(num_linha, comando, sucesso, latencia_ms, mensagem or "")
+        self._resultados.append(resultado)
+        return resultado
+
+    def resumo(self, duracao_total_s: float) -> Dict[str, Any]:
+        """Consolida contagem, vazão e latências (média, p50, p95, máx) por comando."""
+        por_comando = defaultdict(list)
+        for r in self._resultados:
+            por_comando[r.comando].append(r.latencia_ms)
+
+        estatisticas = {}
+        for comando, latencias in sorted(por_comando.items()):
+            ordenadas = sorted(latencias)
+            estatisticas[comando] = {
+                'quantidade': len(ordenadas),
+                'media_ms': sum(ordenadas) / len(ordenadas),
+                'p50_ms': _percentil(ordenadas, 0.50),
+                'p95_ms': _percentil(ordenadas, 0.95),
+                'max_ms': ordenadas[-1],
+            }
+
+        total = len(self._resultados)
+        return {
+            'comandos': total,
+            'sucessos': sum(1 for r in self._resultados if r.sucesso),
+            'falhas': sum(1 for r in self._resultados if not r.sucesso),
+            'duracao_s': duracao_total_s,
+            'comandos_por_s': total / duracao_total_s if duracao_total_s > 0 else 0.0,
+            'por_comando': estatisticas,
+        }
+
+    # --- Comandos ---
+
+    def _cmd_cadastrar_cliente(self, cpf: str, nome: str, email: str) -> str:
+        cliente = Cliente(cpf=cpf, nome=nome, email=email)
+        cliente_repository.salvar(cliente)
+        return f"Cliente {cliente.cpf} cadastrado."
+
+    def _cmd_endereco(self, cpf: str, cep: str, logradouro: str, numero: str, cidade: str, uf: str) -> str:
+        cliente = self._buscar_cliente(cpf)
+        cliente.adicionar_endereco(Endereco(cep=cep, logradouro=logradouro, numero=numero, cidade=cidade, uf=uf))
+        cliente_repository.salvar(cliente)
+        return f"Endereço adicionado ao cliente {cliente.cpf}."
+
+    def _cmd_cliente(self, sessao: str, cpf: str) -> str:
+        cliente = self._buscar_cliente(cpf)
+        self.carrinho_da_sessao(sessao).cliente = cliente
+        return f"Sessão '{sessao}' associada a {cliente.nome}."
+
+    def _cmd_adicionar(self, sessao: str, sku: str, quantidade: str) -> str:
+        carrinho = self.carrinho_da_sessao(sessao)
+        carrinho_service.adicionar_item_ao_carrinho(carrinho, sku.strip().upper(), int(quantidade))
+        return f"Sessão '{sessao}': {len(carrinho.itens)} item(s)."
+
+    def _cmd_remover(self, sessao: str, sku: str) -> str:
+        carrinho_service.remover_item_do_carrinho(self.carrinho_da_sessao(sessao), sku.strip().upper())
+        return f"SKU {sku.upper()} removido da sessão '{sessao}'."
+
+    def _cmd_limpar(self, sessao: str) -> str:
+        if sessao in self._sessoes:
+            carrinho_service.descartar_carrinho(self._sessoes[sessao])
+        self._sessoes[sessao] = Carrinho()
+        return f"Sessão '{sessao}' reiniciada."
+
+    def _cmd_checkout(self, sessao: str, metodo: str, *opcoes: str) -> str:
+        carrinho = self.carrinho_da_sessao(sessao)
+        parametros = _ler_opcoes(opcoes)
+        chave = parametros.get('chave')
+
+        # Repetição de um checkout já concluído: o carrinho da sessão já foi esvaziado
+        if chave:
+            anterior = idempotencia_service.idempotencia.consultar(chave)
+            if anterior is not None:
+                return f"Pedido {anterior.codigo_pedido} {anterior.estado} R$ {anterior.total:.2f} (repetição da chave {chave})"
+
+        if not carrinho.cliente:
+            raise EntidadeNaoEncontradaError(f"Sessão '{sessao}' sem cliente associado.")
+
+        cep_destino = parametros.get('cep')
+        if not cep_destino:
+            if not carrinho.cliente.enderecos:
+                raise ValorInvalidoError("Cliente sem endereço cadastrado.")
+            cep_destino = carrinho.cliente.enderecos[0].cep
+
+        cupom = None
+        if parametros.get('cupom'):
+            cupom = carrinho_service.buscar_cupom(parametros['cupom'])
+            if not cupom:
+                raise ValorInvalidoError(f"Cupom '{parametros['cupom']}' inválido/não encontrado.")
+
+        info_pagamento = {}
+        if 'bandeira' in parametros:
+            info_pagamento['bandeira'] = parametros['bandeira']
+
+        frete = carrinho_service.calcular_frete(carrinho, cep_destino)
+        pedido = PedidoService.finalizar_compra(
+            carrinho=carrinho,
+            frete=frete,
+            metodo_pagamento=metodo,
+            info_pagamento=info_pagamento,
+            cupom=cupom,
+            chave_idempotencia=chave
+        )
+
+        # Mesmo comportamento do CLI: o carrinho da sessão é esvaziado após o checkout
+        self._sessoes[sessao] = Carrinho()
+        return f"Pedido {pedido.codigo_pedido} {pedido.estado} R$ {pedido.total:.2f}"
+
+    def _cmd_status(self, codigo: str, novo_estado: str) -> str:
+        pedido = PedidoService.atualizar_estado_pedido(codigo, novo_estado.upper())
+        return f"Pedido {pedido.codigo_pedido} -> {pedido.estado}"
+
+    def _cmd_transicionar(self, estado_origem: str, novo_estado: str, *codigos: str) -> str:
+        estado_origem = estado_origem.upper()
+        codigos = codigos or PedidoService.codigos_no_estado(estado_origem)
+        resultados = PedidoService.transicionar_pedidos(
+            {codigo: novo_estado for codigo in codigos}, estado_origem=estado_origem
+        )
+        sucessos = sum(1 for r in resultados if r.sucesso)
+        if sucessos < len(resultados):
+            primeira_falha = next(r for r in resultados if not r.sucesso)
+            raise ValorInvalidoError(f"{sucessos}/{len(resultados)} pedido(s) -> {novo_estado.upper()}; {primeira_falha}")
+        return f"{sucessos} pedido(s) {estado_origem} -> {novo_estado.upper()}"
+
+    def _cmd_relatorio(self, tipo: str, *opcoes: str) -> str:
+        tipo = tipo.lower()
+        periodo = 'dia'
+        if opcoes and '=' not in opcoes[0]:
+            periodo, opcoes = opcoes[0], opcoes[1:]
+        inicio, fim = _ler_intervalo(_ler_opcoes(opcoes))
+        if tipo == 'clientes':
+            RelatorioService.relatorio_clientes()
+        elif tipo == 'produtos':
+            RelatorioService.relatorio_produtos()
+        elif tipo == 'pedidos':
+            RelatorioService.relatorio_pedidos(inicio, fim)
+        elif tipo == 'faturamento':
+            dados = RelatorioService.relatorio_ocupacao_por_periodo(periodo, inicio, fim)
+            return f"{len(dados)} período(s), total R$ {sum(dados.values()):.2f}"
+        else:
+            raise ValorInvalidoError(f"Relatório '{tipo}' desconhecido.")
+        return f"Relatório de {tipo} gerado."
+
+    @staticmethod
+    def _buscar_cliente(cpf: str) -> Cliente:
+        cliente = cliente_repository.buscar_por_cpf(cpf)
+        if not cliente:
+            raise EntidadeNaoEncontradaError(f"Cliente com CPF {cpf} não encontrado.")
+        return cliente
+
+
+def _ler_opcoes(opcoes: Iterable[str]) -> Dict[str, str]:
+    """Converte argumentos 'chave=valor' em dicionário."""
+    parametros = {}
+    for opcao in opcoes:
+        if '=' not in opcao:
+            raise ValorInvalidoError(f"Opção '{opcao}' deve estar no formato chave=valor.")
+        chave, valor = opcao.split('=', 1)
+        parametros[chave.strip().lower()] = valor.strip()
+    return parametros
+
+
+def _ler_intervalo(parametros: Dict[str, str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Converte desde=/ate= (AAAA-MM-DD, inclusivos) no intervalo [inicio, fim) dos relatórios."""
+    try:
+        inicio = datetime.strptime(parametros['desde'], '%Y-%m-%d') if 'desde' in parametros else None
+        ate = datetime.strptime(parametros['ate'], '%Y-%m-%d') if 'ate' in parametros else None
+    except ValueError as e:
+        raise ValorInvalidoError(f"Data inválida (use AAAA-MM-DD): {e}")
+    return inicio, (ate + timedelta(days=1)) if ate else None
+
+
+def _percentil(ordenados: List[float], fracao: float) -> float:
+    """Percentil por posição mais próxima sobre uma lista já ordenada."""
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, int(round(fracao * len(ordenados))) - 1))
+    return ordenados[indice]
@@ -0,0 +1,247 @@
+import asyncio
+import math
+import random
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from models.exceptions import GatewayIndisponivelError
+from repositories import settings_repository
+
+# Autorização de pagamentos com cartão por um gateway externo, sem bloquear o checkout.
+#
+# Um gateway de verdade leva centenas de milissegundos por autorização. Aqui a espera é
+# assíncrona (asyncio): enquanto um checkout aguarda o gateway, o mesmo loop atende os
+# outros (PedidoService.finalizar_compra_async). O ProcessadorPagamentos limita as
+# autorizações em andamento (`gateway_pagamento.concorrencia`), dá a cada tentativa
+# `gateway_pagamento.timeout_segundos` e repete, até `gateway_pagamento.tentativas`
+# vezes, as que falham de forma transitória (erro ou tempo esgotado), com espera
+# exponencial e variação aleatória entre elas. Recusas não são repetidas.
+#
+# Toda tentativa leva a mesma chave (o código do pedido): se o gateway processou a
+# cobrança mas a resposta se perdeu, a repetição devolve o mesmo resultado em vez de
+# cobrar de novo. Esgotadas as tentativas, o pagamento fica FALHOU (o pedido é cancelado)
+# e o processador pede ao gateway o estorno da chave, caso alguma tentativa tenha cobrado.
+# O checkout também pede o estorno (estornar()) se o pedido não puder ser gravado depois
+# de uma cobrança aprovada.
+#
+# O GatewaySimulado faz o papel do gateway localmente, com latência log-normal, taxas de
+# recusa por bandeira, erros transitórios e respostas que nunca chegam. Os padrões
+# reproduzem as regras do pagamento síncrono (PedidoService._processar_pagamento):
+# valor abaixo de R$ 5,00 e Master Card são recusados, o resto aprovado, sem espera.
+
+APROVADO = 'APROVADO'
+RECUSADO = 'FALHOU'
+ESTORNADO = 'ESTORNADO'
+
+VALOR_MINIMO = 5.00
+RECUSA_POR_BANDEIRA_PADRAO = {'MASTER CARD': 1.0}
+BACKOFF_BASE_S = 0.05
+BACKOFF_MAX_S = 1.0
+# Cobranças já processadas lembradas pelo simulador (para responder às repetições)
+COBRANCAS_LEMBRADAS = 100000
+
+
+class GatewaySimulado:
+    """Gateway de pagamento local, configurável, para desenvolvimento e benchmarks."""
+
+    def __init__(
+        self,
+        latencia_mediana_s: float = 0.0,
+        latencia_sigma: float = 0.0,
+        taxa_erro: float = 0.0,
+        taxa_sem_resposta: float = 0.0,
+        recusa_por_bandeira: Optional[Dict[str, float]] = None,
+        recusa_padrao: float = 0.0,
+        valor_minimo: float = VALOR_MINIMO,
+        semente: Optional[int] = None
+    ):
+        """
+        `latencia_mediana_s`/`latencia_sigma`: latência log-normal (mediana * e^(sigma * N(0, 1))).
+        `taxa_erro`: fração das chamadas que falham de forma transitória (nada é cobrado).
+        `taxa_sem_resposta`: fração das chamadas que cobram mas nunca respondem (o cliente
+        só sai pelo tempo esgotado). `recusa_por_bandeira` (bandeira em maiúsculas -> fração
+        recusada) e `recusa_padrao` (demais bandeiras): recusas definitivas.
+        """
+        self.latencia_mediana_s = latencia_mediana_s
+        self.latencia_sigma = latencia_sigma
+        self.taxa_erro = taxa_erro
+        self.taxa_sem_resposta = taxa_sem_resposta
+        self.recusa_por_bandeira = {b.upper(): taxa for b, taxa in (recusa_por_bandeira if recusa_por_bandeira is not None else RECUSA_POR_BANDEIRA_PADRAO).items()}
+        self.recusa_padrao = recusa_padrao
+        self.valor_minimo = valor_minimo
+        self._rng = random.Random(semente)
+        self._trava = threading.Lock()
+        # chave -> resultado das cobranças processadas (uma cobrança por chave)
+        self._processadas: 'OrderedDict[str, str]' = OrderedDict()
+        self._contadores = {'chamadas': 0, 'cobrancas': 0, 'repetidas': 0, 'erros': 0, 'sem_resposta': 0, 'estornos': 0}
+
+    def _latencia(self) -> float:
+        if self.latencia_mediana_s <= 0:
+            return 0.0
+        return self.latencia_mediana_s * math.exp(self.latencia_sigma * self._rng.gauss(0.0, 1.0))
+
+    def _decidir(self, valor: float, bandeira: str) -> str:
+        if valor < self.valor_minimo:
+            return RECUSADO
+        taxa = self.recusa_por_bandeira.get(bandeira.strip().upper(), self.recusa_padrao)
+        return RECUSADO if self._rng.random() < taxa else APROVADO
+
+    async def autorizar(self, chave: str, valor: float, bandeira: str) -> str:
+        """APROVADO ou FALHOU; levanta GatewayIndisponivelError nas falhas transitórias."""
+        with self._trava:
+            self._contadores['chamadas'] += 1
+            latencia = self._latencia()
+            sorteio = self._rng.random()
+        if latencia:
+            await asyncio.sleep(latencia)
+
+        with self._trava:
+            anterior = self._processadas.get(chave)
+            if anterior is not None:
+                # Repetição de uma cobrança já processada: mesmo resultado, sem cobrar de novo
+                self._contadores['repetidas'] += 1
+                return anterior
+            if sorteio < self.taxa_erro:
+                self._contadores['erros'] += 1
+                raise GatewayIndisponivelError("Gateway de pagamento indisponível (erro transitório).")
+            resultado = self._decidir(valor, bandeira)
+            self._processadas[chave] = resultado
+            if len(self._processadas) > COBRANCAS_LEMBRADAS:
+                self._processadas.popitem(last=False)
+            self._contadores['cobrancas'] += 1
+            sem_resposta = sorteio < self.taxa_erro + self.taxa_sem_resposta
+            if sem_resposta:
+                self._contadores['sem_resposta'] += 1
+        if sem_resposta:
+            # Cobrou, mas a resposta não chega: quem chamou sai pelo tempo esgotado
+            await asyncio.Event().wait()
+        return resultado
+
+    async def estornar(self, chave: str):
+        """Anula a cobrança aprovada da chave (se houver); a chave continua respondendo, como ESTORNADO."""
+        latencia = self._latencia()
+        if latencia:
+            await asyncio.sleep(latencia)
+        with self._trava:
+            if self._processadas.get(chave) == APROVADO:
+                self._processadas[chave] = ESTORNADO
+                self._contadores['estornos'] += 1
+
+    def cobrancas(self) -> Dict[str, str]:
+        """chave -> resultado das cobranças lembradas (APROVADO, FALHOU ou ESTORNADO)."""
+        with self._trava:
+            return dict(self._processadas)
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._trava:
+            return dict(self._contadores)
+
+
+class ProcessadorPagamentos:
+    """Autoriza pagamentos no gateway com concorrência limitada, tempo máximo e repetições."""
+
+    def __init__(
+        self,
+        gateway: Optional[GatewaySimulado] = None,
+        concorrencia: Optional[int] = None,
+        timeout_s: Optional[float] = None,
+        tentativas: Optional[int] = None,
+        backoff_base_s: float = BACKOFF_BASE_S,
+        backoff_max_s: float = BACKOFF_MAX_S,
+        semente: Optional[int] = None
+    ):
+        # concorrencia/timeout_s/tentativas fixos (ex.: benchmarks); None segue o settings.json
+        self.gateway = gateway if gateway is not None else GatewaySimulado()
+        self._concorrencia = concorrencia
+        self._timeout_s = timeout_s
+        self._tentativas = tentativas
+        self._backoff_base_s = backoff_base_s
+        self._backoff_max_s = backoff_max_s
+        self._rng = random.Random(semente)
+        self._trava = threading.Lock()
+        # O semáforo pertence a um loop asyncio: recriado se o processador for usado em outro
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._em_andamento = 0
+        self._contadores = {
+            'autorizacoes': 0, 'aprovadas': 0, 'recusadas': 0, 'esgotadas': 0,
+            'tentativas': 0, 'repeticoes': 0, 'erros': 0, 'tempo_esgotado': 0, 'em_andamento_max': 0,
+            'estornos_falhos': 0,
+        }
+
+    def _regras(self) -> Tuple[int, float, int]:
+        regras = settings_repository.obter_configuracoes().gateway_pagamento
+        return (self._concorrencia if self._concorrencia is not None else regras.concorrencia,
+                self._timeout_s if self._timeout_s is not None else regras.timeout_segundos,
+                self._tentativas if self._tentativas is not None else regras.tentativas)
+
+    def _semaforo_do_loop(self, concorrencia: int) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaforo = loop, asyncio.Semaphore(concorrencia)
+        return self._semaforo
+
+    def _espera(self, tentativa: int) -> float:
+        """Espera exponencial com variação aleatória (metade fixa, metade sorteada)."""
+        teto = min(self._backoff_max_s, self._backoff_base_s * (2 ** tentativa))
+        with self._trava:
+            return teto / 2 + self._rng.uniform(0, teto / 2)
+
+    def _contar(self, nome: str, quantidade: int = 1):
+        with self._trava:
+            self._contadores[nome] += quantidade
+
+    async def autorizar(self, chave: str, valor: float, bandeira: str) -> str:
+        """
+        Autoriza a cobrança no gateway: APROVADO ou FALHOU (recusada ou sem resposta
+        depois de todas as tentativas). `chave` identifica a cobrança em todas as tentativas.
+        """
+        concorrencia, timeout_s, tentativas = self._regras()
+        semaforo = self._semaforo_do_loop(concorrencia)
+        self._contar('autorizacoes')
+        for tentativa in range(tentativas):
+            if tentativa:
+                self._contar('repeticoes')
+                await asyncio.sleep(self._espera(tentativa - 1))
+            # A vaga no gateway só é ocupada durante a chamada, não durante a espera
+            async with semaforo:
+                with self._trava:
+                    self._em_andamento += 1
+                    self._contadores['tentativas'] += 1
+                    self._contadores['em_andamento_max'] = max(self._contadores['em_andamento_max'], self._em_andamento)
+                try:
+                    resultado = await asyncio.wait_for(self.gateway.autorizar(chave, valor, bandeira), timeout_s)
+                except asyncio.TimeoutError:
+                    self._contar('tempo_esgotado')
+                    continue
+                except GatewayIndisponivelError:
+                    self._contar('erros')
+                    continue
+                finally:
+                    with self._trava:
+                        self._em_andamento -= 1
+            self._contar('aprovadas' if resultado == APROVADO else 'recusadas')
+            return resultado
+        self._contar('esgotadas')
+        await self.estornar(chave, timeout_s)
+        return RECUSADO
+
+    async def estornar(self, chave: str, timeout_s: Optional[float] = None):
+        """
+        Pede o estorno da cobrança da chave (melhor esforço): uma que pode ter sido feita
+        sem resposta ou uma aprovada cujo pedido não foi gravado. `timeout_s` None segue o
+        settings.json.
+        """
+        if timeout_s is None:
+            timeout_s = self._regras()[1]
+        try:
+            await asyncio.wait_for(self.gateway.estornar(chave), timeout_s)
+        except (asyncio.TimeoutError, GatewayIndisponivelError):
+            self._contar('estornos_falhos')
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._trava:
+            return dict(self._contadores)
+
+
+processador = ProcessadorPagamentos()
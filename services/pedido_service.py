@@ -2,66 +2,221 @@ from models.vendas import Carrinho, Pedido
 from models.transacoes import Frete, Cupom, Pagamento, PagamentoCartao, PagamentoBoleto
 from models.entidades import Cliente
 from models.exceptions import ValorInvalidoError, EntidadeNaoEncontradaError
-from services.estoque_service import EstoqueService 
-from repositories import pedido_repository
-from typing import Optional, Dict, Any
+from services.reserva_service import reservas
+from services.boleto_service import varredor
+import repositories.dados as dados_loja
+from repositories import pedido_repository, produto_repository, arquivo_pedidos
+from services import pagamento_service
+from services.pagamento_service import ProcessadorPagamentos
+from services import idempotencia_service
+from typing import Optional, Dict, Any, Callable, Iterable, List, Tuple, Union
+import asyncio
+from monitoramento.instrumentacao import instrumentar
+from monitoramento import rastreamento
+
+class ResultadoTransicao:
+    """Resultado da transição de estado de um pedido dentro de um lote."""
+
+    def __init__(self, codigo_pedido: str, estado_anterior: Optional[str], estado_novo: str, sucesso: bool, mensagem: str = ""):
+        self.codigo_pedido = codigo_pedido
+        self.estado_anterior = estado_anterior
+        self.estado_novo = estado_novo
+        self.sucesso = sucesso
+        self.mensagem = mensagem
+
+    def __str__(self):
+        status = "OK " if self.sucesso else "ERR"
+        texto = f"{status} {self.codigo_pedido} {self.estado_anterior or '?'} -> {self.estado_novo}"
+        return f"{texto}  {self.mensagem}" if self.mensagem else texto
+
 
 class PedidoService:
     """Orquestra o processo de checkout, criação, pagamento e gestão de Pedidos."""
 
     @staticmethod
+    @instrumentar()
+    @rastreamento.rastrear('checkout')
     def finalizar_compra(
         carrinho: Carrinho, 
         frete: Frete, 
         metodo_pagamento: str, 
         info_pagamento: Dict[str, Any], 
-        cupom: Optional[Cupom] = None
+        cupom: Optional[Cupom] = None,
+        chave_idempotencia: Optional[str] = None
     ) -> Pedido:
         """
         Finaliza a compra, cria o Pedido, tenta processar o pagamento e realiza 
-        a baixa de estoque se o pagamento for bem-sucedido.
+        a baixa de estoque se o pagamento for bem-sucedido. A disponibilidade vem das
+        reservas feitas ao adicionar os itens; a baixa apenas converte essas reservas.
+        Com `chave_idempotencia`, repetições com a mesma chave devolvem o Pedido original
+        sem executar o checkout de novo (services/idempotencia_service.py).
+        """
+        if chave_idempotencia is not None:
+            return idempotencia_service.idempotencia.executar(
+                chave_idempotencia,
+                lambda codigo, registrar: PedidoService._executar_checkout(
+                    carrinho, frete, metodo_pagamento, info_pagamento, cupom, codigo, registrar
+                )
+            )
+        return PedidoService._executar_checkout(carrinho, frete, metodo_pagamento, info_pagamento, cupom)
+
+    @staticmethod
+    def _executar_checkout(
+        carrinho: Carrinho, 
+        frete: Frete, 
+        metodo_pagamento: str, 
+        info_pagamento: Dict[str, Any], 
+        cupom: Optional[Cupom] = None,
+        codigo_pedido: Optional[str] = None,
+        registrar: Optional[Callable[[str], None]] = None
+    ) -> Pedido:
+        pedido = PedidoService._preparar_checkout(carrinho, frete, metodo_pagamento, cupom, codigo_pedido)
+        if registrar is not None:
+            registrar(pedido.codigo_pedido)
+        
+        # 3. Processamento do Pagamento
+        with rastreamento.span('pagamento'):
+            pagamento = PedidoService._processar_pagamento(
+                pedido.cliente, 
+                pedido._total, 
+                metodo_pagamento, 
+                info_pagamento
+            )
+        return PedidoService._concluir_checkout(pedido, carrinho, pagamento)
+
+    @staticmethod
+    async def finalizar_compra_async(
+        carrinho: Carrinho, 
+        frete: Frete, 
+        metodo_pagamento: str, 
+        info_pagamento: Dict[str, Any], 
+        cupom: Optional[Cupom] = None,
+        processador: Optional[ProcessadorPagamentos] = None,
+        chave_idempotencia: Optional[str] = None
+    ) -> Pedido:
+        """
+        Variante assíncrona do finalizar_compra: o cartão é autorizado pelo pipeline de
+        pagamentos (services/pagamento_service.py) e, enquanto o gateway responde, o loop
+        atende os outros checkouts em andamento. A validação e a baixa/gravação rodam em
+        uma thread (asyncio.to_thread), pois esperam travas e disco. Não gera trace (o
+        rastreamento é por thread). `chave_idempotencia` como no finalizar_compra.
+        """
+        if chave_idempotencia is not None:
+            return await idempotencia_service.idempotencia.executar_async(
+                chave_idempotencia,
+                lambda codigo, registrar: PedidoService._executar_checkout_async(
+                    carrinho, frete, metodo_pagamento, info_pagamento, cupom, processador, codigo, registrar
+                )
+            )
+        return await PedidoService._executar_checkout_async(carrinho, frete, metodo_pagamento, info_pagamento, cupom, processador)
+
+    @staticmethod
+    async def _executar_checkout_async(
+        carrinho: Carrinho, 
+        frete: Frete, 
+        metodo_pagamento: str, 
+        info_pagamento: Dict[str, Any], 
+        cupom: Optional[Cupom] = None,
+        processador: Optional[ProcessadorPagamentos] = None,
+        codigo_pedido: Optional[str] = None,
+        registrar: Optional[Callable[[str], None]] = None
+    ) -> Pedido:
+        processador = processador if processador is not None else pagamento_service.processador
+        pedido = await asyncio.to_thread(PedidoService._preparar_checkout, carrinho, frete, metodo_pagamento, cupom, codigo_pedido)
+        if registrar is not None:
+            await asyncio.to_thread(registrar, pedido.codigo_pedido)
+        
+        cobrado = False
+        if metodo_pagamento.lower() == 'cartao':
+            bandeira = info_pagamento.get('bandeira', 'VISA')
+            status = await processador.autorizar(pedido.codigo_pedido, pedido._total, bandeira)
+            pagamento = PagamentoCartao(valor=pedido._total, status=status, bandeira=bandeira)
+            cobrado = pagamento.is_aprovado
+        else:
+            # Boleto (emitido localmente, sem gateway) ou método inválido
+            pagamento = PedidoService._processar_pagamento(pedido.cliente, pedido._total, metodo_pagamento, info_pagamento)
+        try:
+            return await asyncio.to_thread(PedidoService._concluir_checkout, pedido, carrinho, pagamento)
+        except Exception:
+            # O gateway já cobrou e o pedido não foi gravado (ex.: estoque insuficiente,
+            # conflitos esgotados, falha de disco): estorna antes de propagar o erro
+            if cobrado:
+                await processador.estornar(pedido.codigo_pedido)
+            raise
+
+    @staticmethod
+    def _preparar_checkout(
+        carrinho: Carrinho, 
+        frete: Frete, 
+        metodo_pagamento: str, 
+        cupom: Optional[Cupom], 
+        codigo_pedido: Optional[str] = None
+    ) -> Pedido:
+        """
+        Valida o carrinho, garante as reservas e monta o Pedido (etapas 1 e 2 do checkout).
+        `codigo_pedido` reaproveita o código de um checkout interrompido (idempotência).
         """
         if not carrinho.itens:
             raise ValorInvalidoError("O carrinho não pode estar vazio para finalizar a compra.")
         if not carrinho.cliente:
              raise EntidadeNaoEncontradaError("Cliente deve ser associado ao carrinho.")
         
-        # 1. Validação de Estoque (Regra de Negócio de Segurança)
-        EstoqueService.validar_baixa_estoque(carrinho.itens)
-        
-        # 2. Criação do Objeto Pedido
-        pedido = Pedido(
-            cliente=carrinho.cliente,
-            carrinho=carrinho,
-            frete=frete,
-            cupom=cupom
-        )
+        rastreamento.anotar_trace(itens=len(carrinho.itens), metodo_pagamento=metodo_pagamento)
         
-        # 3. Processamento do Pagamento
-        pagamento = PedidoService._processar_pagamento(
-            pedido.cliente, 
-            pedido._total, 
-            metodo_pagamento, 
-            info_pagamento
-        )
+        # 1. Validação de Estoque: confere (e renova) as reservas do carrinho, reservando
+        # o que faltar com as mesmas regras (disponível e limite de segurança)
+        with rastreamento.span('validacao_estoque'):
+            reservas.garantir(carrinho)
         
+        # 2. Criação do Objeto Pedido (cálculo de subtotal, desconto e total)
+        with rastreamento.span('construcao_pedido'):
+            pedido = Pedido(
+                cliente=carrinho.cliente,
+                carrinho=carrinho,
+                frete=frete,
+                cupom=cupom,
+                codigo_pedido=codigo_pedido
+            )
+        return pedido
+
+    @staticmethod
+    def _concluir_checkout(pedido: Pedido, carrinho: Carrinho, pagamento: Pagamento) -> Pedido:
+        """Associa o pagamento e grava o pedido com a baixa de estoque (etapas 4 e 5 do checkout)."""
         # 4. Associa o Pagamento e Atualiza o Estado
         pedido.pagamento = pagamento # Usa o setter do Pedido
         
-        if pagamento.is_aprovado:
-            # Baixa de estoque e atualização de status
-            pedido.estado = "PAGO" # Usa o setter de estado
-            EstoqueService.realizar_baixa_estoque(carrinho.itens)
+        boleto_pendente = isinstance(pagamento, PagamentoBoleto) and not pagamento.is_aprovado
+        if pagamento.is_aprovado or boleto_pendente:
+            # Baixa de estoque e atualização de status. O boleto segura o estoque até o
+            # pagamento; se vencer, o varredor de boletos cancela o pedido e devolve o estoque.
+            pedido.estado = "PAGO" if pagamento.is_aprovado else "PENDENTE" # Usa o setter de estado
+            posicao = None
+
+            def persistir():
+                # 5. Persiste o Pedido, na mesma transação da baixa de estoque
+                nonlocal posicao
+                with rastreamento.span('persistencia_pedido'):
+                    posicao = pedido_repository.salvar(pedido)
+
+            with rastreamento.span('baixa_estoque'):
+                reservas.converter(carrinho, junto=persistir)
         else:
-            # Define o status baseado no pagamento. Se for boleto, é PENDENTE. Se falhou, é CANCELADO.
-            pedido.estado = "PENDENTE" if metodo_pagamento.lower() == 'boleto' else "CANCELADO" 
+            # Pagamento recusado: o pedido é CANCELADO e as reservas são soltas
+            pedido.estado = "CANCELADO" 
+            reservas.liberar(carrinho.id_sessao)
             
-        # 5. Persiste o Pedido
-        pedido_repository.salvar(pedido)
+            # 5. Persiste o Pedido
+            with rastreamento.span('persistencia_pedido'):
+                posicao = pedido_repository.salvar(pedido)
+        if boleto_pendente:
+            varredor.registrar(pedido.codigo_pedido, pagamento.data_vencimento, posicao)
+        
+        rastreamento.anotar_trace(codigo_pedido=pedido.codigo_pedido, estado=pedido.estado)
         return pedido
 
 
     @staticmethod
+    @instrumentar()
     def _processar_pagamento(
         cliente: Cliente, 
         valor_total: float, 
@@ -101,12 +256,83 @@ class PedidoService:
         raise ValorInvalidoError(f"Método de pagamento '{metodo}' inválido.")
 
     @staticmethod
+    @instrumentar()
     def atualizar_estado_pedido(codigo_pedido: str, novo_estado: str) -> Pedido:
-        """Atualiza o estado de um pedido persistido."""
+        """Atualiza o estado de um pedido persistido (código completo ou prefixo)."""
         pedido = pedido_repository.buscar_por_codigo(codigo_pedido)
         if not pedido:
             raise EntidadeNaoEncontradaError(f"Pedido com código {codigo_pedido} não encontrado.")
             
-        pedido.estado = novo_estado # Usa o setter de estado
-        pedido_repository.salvar(pedido)
-        return pedido
\ No newline at end of file
+        resultado = PedidoService.transicionar_pedidos({pedido.codigo_pedido: novo_estado})[0]
+        if not resultado.sucesso:
+            raise ValorInvalidoError(resultado.mensagem)
+        pedido._estado = resultado.estado_novo # Já validado e gravado pelo lote
+        return pedido
+
+    @staticmethod
+    @instrumentar()
+    def transicionar_pedidos(
+        transicoes: Union[Dict[str, str], Iterable[Tuple[str, str]]],
+        estado_origem: Optional[str] = None,
+        tudo_ou_nada: bool = False,
+        posicoes: Optional[Dict[str, int]] = None
+    ) -> List[ResultadoTransicao]:
+        """
+        Muda o estado de vários pedidos (código exato -> novo estado) de uma vez.
+        Valida todas as transições contra o grafo Pedido.TRANSICOES antes de gravar e
+        aplica as válidas em uma única escrita, sem hidratar os pedidos. Cancelamentos de
+        pedidos com estoque já baixado devolvem o estoque na mesma escrita.
+        Com `estado_origem`, só move pedidos que estejam nesse estado; com `tudo_ou_nada`,
+        nada é gravado se alguma transição for inválida. Retorna um resultado por pedido.
+        """
+        pares = transicoes.items() if isinstance(transicoes, dict) else transicoes
+        alvo = {codigo.strip().upper(): estado.strip().upper() for codigo, estado in pares}
+        resultados = []
+        aplicar: Dict[str, str] = {}
+
+        with dados_loja.transacao():
+            registros = pedido_repository.carregar_raw_por_codigos(alvo.keys(), posicoes)
+            for codigo, novo_estado in alvo.items():
+                if codigo not in registros:
+                    # Arquivados estão sempre em estado final: não há transição possível
+                    mensagem = "Pedido arquivado (estado final)." if arquivo_pedidos.contem(codigo) else "Pedido não encontrado."
+                    resultados.append(ResultadoTransicao(codigo, None, novo_estado, False, mensagem))
+                    continue
+                anterior = registros[codigo][1]['estado']
+                try:
+                    if estado_origem and anterior != estado_origem:
+                        raise ValorInvalidoError(f"Pedido está em {anterior}, não em {estado_origem}.")
+                    Pedido.validar_transicao(anterior, novo_estado)
+                except ValorInvalidoError as e:
+                    resultados.append(ResultadoTransicao(codigo, anterior, novo_estado, False, str(e)))
+                    continue
+                resultados.append(ResultadoTransicao(codigo, anterior, novo_estado, True))
+                aplicar[codigo] = novo_estado
+
+            if tudo_ou_nada and len(aplicar) < len(alvo):
+                for resultado in resultados:
+                    if resultado.sucesso:
+                        resultado.sucesso = False
+                        resultado.mensagem = "Não aplicado: o lote tem transições inválidas."
+                return resultados
+            if not aplicar:
+                return resultados
+
+            reposicao: Dict[str, int] = {}
+            for codigo, novo_estado in aplicar.items():
+                registro = registros[codigo][1]
+                if novo_estado == 'CANCELADO' and registro['estado'] in Pedido.ESTADOS_COM_ESTOQUE_BAIXADO:
+                    for item in registro['carrinho']['itens']:
+                        reposicao[item['produto_sku']] = reposicao.get(item['produto_sku'], 0) + item['quantidade']
+
+            pedido_repository.atualizar_estados(aplicar, {codigo: registros[codigo][0] for codigo in aplicar})
+            if reposicao:
+                produto_repository.repor_estoques(reposicao)
+        return resultados
+
+    @staticmethod
+    @instrumentar()
+    def codigos_no_estado(estado: str) -> List[str]:
+        """Códigos dos pedidos que estão no estado informado (sem hidratar os pedidos)."""
+        estado = estado.strip().upper()
+        return [p['codigo_pedido'] for p in pedido_repository.iterar_pedidos_ativos_raw() if p['estado'] == estado]
\ No newline at end of file
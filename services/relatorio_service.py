@@ -1,37 +1,61 @@
-from repositories import pedido_repository, cliente_repository, produto_repository
+from repositories import pedido_repository, cliente_repository, produto_repository, arquivo_pedidos
 from datetime import datetime
 from collections import defaultdict
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from models.vendas import Pedido 
+from monitoramento.instrumentacao import instrumentar
 
 class RelatorioService:
     """Gera relatórios de vendas e métricas."""
 
     @staticmethod
-    def relatorio_ocupacao_por_periodo(periodo: str = 'dia') -> Dict[str, float]:
-        """ Relatório de Faturamento Agrupado (Ocupação por Período). """
-        
-        # Usa dados RAW para eficiência
-        dados_pedidos = pedido_repository.carregar_todos_pedidos_raw()
+    @instrumentar()
+    def relatorio_ocupacao_por_periodo(
+        periodo: str = 'dia',
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None
+    ) -> Dict[str, float]:
+        """
+        Relatório de Faturamento Agrupado (Ocupação por Período), opcionalmente restrito
+        aos pedidos criados em [inicio, fim). Inclui os pedidos arquivados: segmentos
+        inteiros dentro do intervalo entram pelo faturamento diário do manifesto, e só os
+        que o cruzam em parte são lidos.
+        """
         faturamento_por_periodo = defaultdict(float)
         
         formato_data = '%Y-%m-%d'
         if periodo.lower() == 'mes':
             formato_data = '%Y-%m'
 
-        for pedido_data in dados_pedidos:
+        def acumular(pedido_data):
             try:
                 # Acessa diretamente os dados do dicionário (RAW)
                 total_pedido = pedido_data['total']
                 data_pedido = datetime.fromisoformat(pedido_data['data_criacao'])
+                if not arquivo_pedidos.no_periodo(data_pedido, inicio, fim):
+                    return
                 chave_periodo = data_pedido.strftime(formato_data)
                 faturamento_por_periodo[chave_periodo] += total_pedido
             except (ValueError, KeyError):
-                continue 
+                return
+
+        # Usa dados RAW, lidos aos poucos (históricos maiores que a memória)
+        for pedido_data in pedido_repository.iterar_pedidos_ativos_raw():
+            acumular(pedido_data)
+
+        for segmento in arquivo_pedidos.segmentos(inicio, fim):
+            if arquivo_pedidos.contido_no_periodo(segmento, inicio, fim):
+                for dia, total in segmento['faturamento_por_dia'].items():
+                    # 'AAAA-MM-DD' -> chave do período ('AAAA-MM-DD' ou 'AAAA-MM')
+                    faturamento_por_periodo[datetime.strptime(dia, '%Y-%m-%d').strftime(formato_data)] += total
+            else:
+                for pedido_data in arquivo_pedidos.ler_segmento(segmento):
+                    acumular(pedido_data)
 
         return dict(sorted(faturamento_por_periodo.items()))
 
     @staticmethod
+    @instrumentar()
     def relatorio_clientes() -> str:
         clientes = cliente_repository.carregar_todos()
         if not clientes:
@@ -51,6 +75,7 @@ class RelatorioService:
         return output
 
     @staticmethod
+    @instrumentar()
     def relatorio_produtos() -> str:
         produtos = produto_repository.carregar_todos()
         if not produtos:
@@ -77,8 +102,10 @@ class RelatorioService:
         return output
 
     @staticmethod
-    def relatorio_pedidos() -> str:
-        pedidos = pedido_repository.carregar_todos()
+    @instrumentar()
+    def relatorio_pedidos(inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> str:
+        # Ativos e arquivados; com período, só os segmentos do arquivo que o cruzam são lidos
+        pedidos = pedido_repository.carregar_por_periodo(inicio, fim)
         if not pedidos:
             return "Nenhum pedido registrado."
             
@@ -0,0 +1,283 @@
+import heapq
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from models.entidades import Produto, ProdutoFisico
+from models.vendas import Carrinho
+from models.exceptions import ValorInvalidoError, ConflitoVersaoError
+from repositories import produto_repository, settings_repository
+import repositories.dados as dados_loja
+from services.estoque_service import MAX_TENTATIVAS_BAIXA, ESPERA_BASE_CONFLITO_S
+from monitoramento.instrumentacao import instrumentar
+
+# Reservas de estoque com prazo, do "adicionar ao carrinho" até o checkout.
+#
+# Cada carrinho (pelo id_sessao) segura uma quantidade por SKU de Produto Físico até
+# `ttl_segundos` depois da última atividade. O total reservado por SKU fica em um
+# dicionário, então o disponível (estoque físico - reservas vivas) sai em O(1). Os prazos
+# ficam em um heap ordenado pelo vencimento; as reservas vencidas são soltas no começo de
+# cada operação, sem thread de fundo. No checkout, as reservas viram uma única baixa em
+# lote pelo compare-and-swap de versão (produto_repository.ajustar_estoques_se_versao),
+# com as versões lidas ao reservar; os produtos só são relidos se outra operação os gravou.
+#
+# A trava das reservas protege apenas os dicionários da memória: a leitura dos produtos e
+# a escrita na loja acontecem fora dela.
+#
+# As reservas vivem na memória do processo: valem para o CLI e o modo lote, não entre
+# processos diferentes.
+
+
+class _ReservasCarrinho:
+    __slots__ = ('quantidades', 'versoes', 'expira_em')
+
+    def __init__(self, expira_em: float):
+        self.quantidades: Dict[str, int] = {}
+        # SKU -> versão do produto na última leitura ao reservar (esperada pela baixa)
+        self.versoes: Dict[str, int] = {}
+        self.expira_em = expira_em
+
+
+class ReservaService:
+    """Mantém as reservas de estoque dos carrinhos abertos."""
+
+    def __init__(self, relogio: Callable[[], float] = time.monotonic):
+        self._relogio = relogio
+        self._trava = threading.Lock()
+        self._carrinhos: Dict[str, _ReservasCarrinho] = {}
+        self._reservado: Dict[str, int] = {}
+        # (vencimento, sequência, id_sessao); entradas de prazos já renovados são ignoradas ao sair
+        self._vencimentos: List[Tuple[float, int, str]] = []
+        self._sequencia = 0
+
+    # --- Consultas ---
+
+    def reservado(self, sku: str) -> int:
+        """Quantidade do SKU segurada por carrinhos (as vencidas saem na próxima operação)."""
+        return self._reservado.get(sku, 0)
+
+    def disponivel(self, produto: Produto) -> int:
+        """Estoque físico menos as reservas vivas do produto."""
+        return produto.estoque - self._reservado.get(produto.sku, 0)
+
+    def reservas_do_carrinho(self, id_sessao: str) -> Dict[str, int]:
+        with self._trava:
+            self._expirar(self._relogio())
+            reservas = self._carrinhos.get(id_sessao)
+            return dict(reservas.quantidades) if reservas else {}
+
+    # --- Operações ---
+
+    @instrumentar()
+    def reservar(self, id_sessao: str, sku: str, quantidade: int) -> Produto:
+        """
+        Segura `quantidade` unidades do SKU para o carrinho e renova o prazo de todas as
+        reservas dele. Levanta ValorInvalidoError se o produto não existir, estiver inativo
+        ou se o disponível (já descontadas as reservas de todos os carrinhos) não comportar
+        a quantidade sem violar o limite de segurança. Retorna o produto lido.
+        """
+        limite_seguranca, ttl_s = self._regras()
+        produto = produto_repository.buscar_por_sku(sku)
+        if not produto or not produto.is_ativo:
+            raise ValorInvalidoError(f"Produto com SKU '{sku}' não encontrado ou inativo.")
+
+        with self._trava:
+            agora = self._relogio()
+            self._expirar(agora)
+            if isinstance(produto, ProdutoFisico):
+                self._segurar(id_sessao, produto, quantidade, limite_seguranca, agora + ttl_s)
+            self._renovar(id_sessao, agora + ttl_s)
+            return produto
+
+    @instrumentar()
+    def garantir(self, carrinho: Carrinho):
+        """
+        Confere que as reservas do carrinho cobrem todos os itens físicos, reservando o que
+        faltar (carrinhos montados sem passar pelo carrinho_service), e renova o prazo.
+        """
+        self._garantir(carrinho, *self._regras())
+
+    @instrumentar()
+    def converter(self, carrinho: Carrinho, junto: Optional[Callable[[], None]] = None) -> Dict[str, int]:
+        """
+        Transforma as reservas do carrinho na baixa de estoque (uma escrita para todos os
+        SKUs) e as encerra. Retorna a quantidade baixada por SKU.
+        A baixa só é gravada se os produtos ainda estiverem na versão lida ao reservar; se
+        outra operação gravou algum deles (outro processo, ajuste de estoque), relê os
+        produtos, confere de novo o disponível e o limite de segurança (ValorInvalidoError,
+        como ao reservar) e tenta de novo (até MAX_TENTATIVAS_BAIXA vezes). As reservas seguem valendo durante a escrita, então o
+        disponível dos outros carrinhos não muda no meio.
+        `junto` (ex.: gravar o pedido) roda na mesma transação da baixa: as duas alterações
+        são confirmadas juntas ou nenhuma é.
+        """
+        limite_seguranca, ttl_s = self._regras()
+        quantidades, versoes = self._garantir(carrinho, limite_seguranca, ttl_s)
+        for tentativa in range(1, MAX_TENTATIVAS_BAIXA + 1):
+            try:
+                with dados_loja.transacao():
+                    if quantidades:
+                        produto_repository.ajustar_estoques_se_versao(
+                            (sku, -quantidade, versoes[sku]) for sku, quantidade in quantidades.items()
+                        )
+                    if junto is not None:
+                        junto()
+                break
+            except ConflitoVersaoError:
+                if tentativa == MAX_TENTATIVAS_BAIXA:
+                    raise
+                time.sleep(random.uniform(0, ESPERA_BASE_CONFLITO_S * 2 ** tentativa))
+                produtos = self._ler(quantidades)
+                with self._trava:
+                    self._revalidar(carrinho.id_sessao, quantidades, produtos, limite_seguranca)
+                versoes = {sku: produto.versao for sku, produto in produtos.items()}
+        with self._trava:
+            self._soltar(carrinho.id_sessao)
+        return quantidades
+
+    def liberar(self, id_sessao: str, sku: Optional[str] = None):
+        """Solta as reservas do carrinho (todas, ou só as do SKU informado)."""
+        with self._trava:
+            self._soltar(id_sessao, sku)
+
+    def expirar(self) -> int:
+        """Solta as reservas vencidas. Retorna quantos carrinhos perderam as reservas."""
+        with self._trava:
+            return self._expirar(self._relogio())
+
+    # --- Auxiliares (chamados com a trava adquirida) ---
+
+    @staticmethod
+    def _regras() -> Tuple[int, float]:
+        configuracoes = settings_repository.obter_configuracoes()
+        return configuracoes.regra_estoque.limite_seguranca, configuracoes.reserva_estoque.ttl_segundos
+
+    @staticmethod
+    def _ler(skus: Iterable[str]) -> Dict[str, Optional[Produto]]:
+        """Lê os produtos (fora da trava)."""
+        return {sku: produto_repository.buscar_por_sku(sku) for sku in skus}
+
+    def _garantir(self, carrinho: Carrinho, limite_seguranca: int, ttl_s: float) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """
+        Reserva o que faltar para os itens físicos do carrinho e renova o prazo. Retorna as
+        quantidades e as versões esperadas por SKU. Os produtos que faltam são lidos fora da
+        trava; se as reservas mudarem enquanto isso (ex.: venceram), lê os que faltarem de novo.
+        """
+        quantidades = self._quantidades(carrinho)
+        produtos: Dict[str, Optional[Produto]] = {}
+        while True:
+            with self._trava:
+                agora = self._relogio()
+                self._expirar(agora)
+                faltando = [sku for sku in self._faltas(carrinho.id_sessao, quantidades) if sku not in produtos]
+                if not faltando:
+                    self._cobrir(carrinho.id_sessao, quantidades, produtos, limite_seguranca, agora + ttl_s)
+                    self._renovar(carrinho.id_sessao, agora + ttl_s)
+                    reservas = self._carrinhos.get(carrinho.id_sessao)
+                    versoes = {sku: reservas.versoes[sku] for sku in quantidades} if reservas else {}
+                    return quantidades, versoes
+            produtos.update(self._ler(faltando))
+
+    def _segurar(self, id_sessao: str, produto: Produto, quantidade: int, limite_seguranca: int, expira_em: float):
+        disponivel = self.disponivel(produto)
+        if disponivel - quantidade < limite_seguranca:
+            reservas = self._carrinhos.get(id_sessao)
+            ja_reservado = reservas.quantidades.get(produto.sku, 0) if reservas else 0
+            raise ValorInvalidoError(
+                f"Estoque insuficiente para {produto.nome}. Disponível: {max(0, disponivel - limite_seguranca)}. "
+                f"Você já tem {ja_reservado} reservado(s) no carrinho."
+            )
+        reservas = self._carrinhos.get(id_sessao)
+        if reservas is None:
+            reservas = self._carrinhos[id_sessao] = _ReservasCarrinho(expira_em)
+            # Já entra no heap: a reserva vence mesmo se a operação falhar depois daqui
+            self._renovar(id_sessao, expira_em)
+        reservas.quantidades[produto.sku] = reservas.quantidades.get(produto.sku, 0) + quantidade
+        reservas.versoes[produto.sku] = produto.versao
+        self._reservado[produto.sku] = self._reservado.get(produto.sku, 0) + quantidade
+
+    @staticmethod
+    def _quantidades(carrinho: Carrinho) -> Dict[str, int]:
+        """Quantidade total por SKU dos itens físicos do carrinho."""
+        quantidades: Dict[str, int] = {}
+        for item in carrinho.itens:
+            if isinstance(item.produto, ProdutoFisico):
+                quantidades[item.produto.sku] = quantidades.get(item.produto.sku, 0) + item.quantidade
+        return quantidades
+
+    def _faltas(self, id_sessao: str, quantidades: Dict[str, int]) -> Dict[str, int]:
+        """Quantidade de cada SKU ainda não coberta pelas reservas do carrinho."""
+        reservas = self._carrinhos.get(id_sessao)
+        faltas = {}
+        for sku, quantidade in quantidades.items():
+            falta = quantidade - (reservas.quantidades.get(sku, 0) if reservas else 0)
+            if falta > 0:
+                faltas[sku] = falta
+        return faltas
+
+    def _cobrir(self, id_sessao: str, quantidades: Dict[str, int], produtos: Dict[str, Optional[Produto]],
+                limite_seguranca: int, expira_em: float):
+        """Reserva o que faltar, com os produtos já lidos (todos os SKUs em falta estão em `produtos`)."""
+        for sku, falta in self._faltas(id_sessao, quantidades).items():
+            produto = produtos[sku]
+            if not isinstance(produto, ProdutoFisico):
+                raise ValorInvalidoError(f"Produto com SKU '{sku}' não encontrado.")
+            self._segurar(id_sessao, produto, falta, limite_seguranca, expira_em)
+
+    def _revalidar(self, id_sessao: str, quantidades: Dict[str, int], produtos: Dict[str, Optional[Produto]],
+                   limite_seguranca: int):
+        """Confere, com os produtos relidos, que o estoque ainda cobre o carrinho além das reservas dos outros."""
+        reservas = self._carrinhos.get(id_sessao)
+        for sku, quantidade in quantidades.items():
+            produto = produtos[sku]
+            if not isinstance(produto, ProdutoFisico):
+                raise ValorInvalidoError(f"Produto com SKU '{sku}' não encontrado.")
+            # As reservas do próprio carrinho (se ainda valerem) não concorrem com ele
+            disponivel = self.disponivel(produto) + (reservas.quantidades.get(sku, 0) if reservas else 0)
+            if disponivel - quantidade < limite_seguranca:
+                raise ValorInvalidoError(
+                    f"Estoque insuficiente para {produto.nome}. Disponível: {max(0, disponivel - limite_seguranca)}."
+                )
+
+    def _renovar(self, id_sessao: str, expira_em: float):
+        reservas = self._carrinhos.get(id_sessao)
+        if reservas is None:
+            return
+        reservas.expira_em = expira_em
+        self._sequencia += 1
+        heapq.heappush(self._vencimentos, (expira_em, self._sequencia, id_sessao))
+        # Renovações deixam entradas antigas no heap; reconstrói quando elas dominam
+        if len(self._vencimentos) > 2 * len(self._carrinhos) + 64:
+            self._vencimentos = [(r.expira_em, 0, i) for i, r in self._carrinhos.items()]
+            heapq.heapify(self._vencimentos)
+
+    def _soltar(self, id_sessao: str, sku: Optional[str] = None):
+        reservas = self._carrinhos.get(id_sessao)
+        if reservas is None:
+            return
+        skus = [sku] if sku is not None else list(reservas.quantidades)
+        for s in skus:
+            quantidade = reservas.quantidades.pop(s, 0)
+            reservas.versoes.pop(s, None)
+            if quantidade:
+                restante = self._reservado[s] - quantidade
+                if restante:
+                    self._reservado[s] = restante
+                else:
+                    del self._reservado[s]
+        if not reservas.quantidades:
+            del self._carrinhos[id_sessao]
+
+    def _expirar(self, agora: float) -> int:
+        soltos = 0
+        while self._vencimentos and self._vencimentos[0][0] <= agora:
+            expira_em, _, id_sessao = heapq.heappop(self._vencimentos)
+            reservas = self._carrinhos.get(id_sessao)
+            # Só vale a entrada do prazo atual (renovações empilham prazos novos)
+            if reservas is not None and reservas.expira_em <= agora:
+                self._soltar(id_sessao)
+                soltos += 1
+        return soltos
+
+
+# Instância usada pelo carrinho_service e pelo PedidoService
+reservas = ReservaService()
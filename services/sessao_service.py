@@ -0,0 +1,254 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from models.vendas import Carrinho, ItemCarrinho
+from models.entidades import Cliente
+from models.exceptions import ValorInvalidoError
+from repositories import carrinho_repository, cliente_repository, produto_repository, settings_repository
+from services.reserva_service import reservas
+from monitoramento.instrumentacao import instrumentar
+
+# Carrinhos das sessões (um por id de sessão), para vários usuários ao mesmo tempo.
+#
+# Os carrinhos em uso ficam na memória numa lista LRU limitada a
+# `sessoes_carrinho.capacidade_memoria` (settings.json); ao passar do limite, os menos
+# usados vão para o disco (repositories/carrinho_repository.py, pelo Carrinho.to_dict) e
+# voltam na próxima vez que a sessão for pedida. Assim a memória fica fixa mesmo com
+# milhões de sessões paradas. Carrinhos vazios e sem cliente não vão para o disco.
+#
+# Cada acesso renova o prazo da sessão (`sessoes_carrinho.ttl_segundos`, padrão 7 dias,
+# no relógio de parede, pois o prazo sobrevive a reinícios). Sessões vencidas são
+# descartadas: as da memória no começo de cada operação (estão no início da lista LRU), as
+# do disco por uma varredura em lotes a cada INTERVALO_VARREDURA_S (ou por expirar()).
+#
+# Os carrinhos da memória são gravados no disco só quando saem dela e em gravar_todos()
+# (chamado na saída do CLI): se o processo morrer antes, volta a última versão gravada.
+# Quem alterar um carrinho obtido há algum tempo deve chamar salvar(carrinho), que o
+# recoloca na memória caso ele tenha sido despejado nesse meio tempo.
+#
+# As reservas de estoque (services/reserva_service.py) não são gravadas com o carrinho:
+# um carrinho restaurado depois de reiniciar o processo reserva de novo no checkout
+# (ReservaService.converter cobre o que faltar).
+
+INTERVALO_VARREDURA_S = 60.0
+VARREDURA_LOTE = 10000
+
+
+class _Sessao:
+    __slots__ = ('carrinho', 'expira_em', 'gravado')
+
+    def __init__(self, carrinho: Carrinho, expira_em: float, gravado: bool):
+        self.carrinho = carrinho
+        self.expira_em = expira_em
+        # Se pode haver uma linha da sessão no disco (para apagá-la quando o carrinho esvaziar)
+        self.gravado = gravado
+
+
+class SessaoService:
+    """Guarda os carrinhos por id de sessão: LRU na memória, o restante no disco."""
+
+    def __init__(self, capacidade: Optional[int] = None, ttl_s: Optional[float] = None,
+                 relogio: Callable[[], float] = time.time):
+        # capacidade/ttl_s fixos (ex.: benchmarks); None segue o settings.json
+        self._capacidade = capacidade
+        self._ttl_s = ttl_s
+        self._relogio = relogio
+        self._trava = threading.Lock()
+        self._quentes: 'OrderedDict[str, _Sessao]' = OrderedDict()
+        self._varrido_em = 0.0
+        self._contadores = {'acertos': 0, 'restaurados': 0, 'novos': 0, 'despejados': 0, 'expirados': 0}
+
+    # --- Operações ---
+
+    @instrumentar()
+    def obter(self, id_sessao: str) -> Carrinho:
+        """Carrinho da sessão: da memória, do disco ou, se não houver (ou venceu), um novo vazio."""
+        return self.obter_varios([id_sessao])[id_sessao]
+
+    @instrumentar()
+    def obter_varios(self, ids_sessao: Iterable[str]) -> Dict[str, Carrinho]:
+        """
+        Carrinhos de várias sessões de uma vez: os que estão no disco são lidos em uma
+        consulta e os produtos e clientes de todos eles são buscados em uma passada.
+        """
+        ids = list(dict.fromkeys(ids_sessao))
+        capacidade, ttl_s = self._regras()
+        with self._trava:
+            agora = self._relogio()
+            self._expirar_memoria(agora)
+            faltantes = []
+            for id_sessao in ids:
+                sessao = self._quentes.get(id_sessao)
+                if sessao is None:
+                    faltantes.append(id_sessao)
+                    continue
+                sessao.expira_em = agora + ttl_s
+                self._quentes.move_to_end(id_sessao)
+                self._contadores['acertos'] += 1
+
+            if faltantes:
+                registros = carrinho_repository.carregar(faltantes, agora)
+                restaurados = self._restaurar({id_sessao: registro for id_sessao, (registro, _) in registros.items()})
+                self._contadores['restaurados'] += len(restaurados)
+                self._contadores['novos'] += len(faltantes) - len(restaurados)
+                for id_sessao in faltantes:
+                    carrinho = restaurados.get(id_sessao) or self._carrinho_vazio(id_sessao)
+                    self._quentes[id_sessao] = _Sessao(carrinho, agora + ttl_s, id_sessao in registros)
+
+            resultado = {id_sessao: self._quentes[id_sessao].carrinho for id_sessao in ids}
+            self._despejar(capacidade)
+            self._varrer_disco(agora)
+            return resultado
+
+    def novo(self, cliente: Optional[Cliente] = None) -> Carrinho:
+        """Abre uma sessão nova (id gerado pelo próprio Carrinho) e devolve o carrinho vazio."""
+        carrinho = Carrinho(cliente=cliente)
+        self.salvar(carrinho)
+        return carrinho
+
+    def salvar(self, carrinho: Carrinho):
+        """Renova a sessão do carrinho, recolocando-o na memória se tiver sido despejado."""
+        capacidade, ttl_s = self._regras()
+        with self._trava:
+            agora = self._relogio()
+            self._expirar_memoria(agora)
+            sessao = self._quentes.get(carrinho.id_sessao)
+            if sessao is None:
+                self._quentes[carrinho.id_sessao] = _Sessao(carrinho, agora + ttl_s, True)
+            else:
+                sessao.carrinho = carrinho
+                sessao.expira_em = agora + ttl_s
+                self._quentes.move_to_end(carrinho.id_sessao)
+            self._despejar(capacidade)
+
+    def descartar(self, id_sessao: str):
+        """Encerra a sessão: apaga o carrinho da memória e do disco e solta as reservas dele."""
+        with self._trava:
+            self._quentes.pop(id_sessao, None)
+            carrinho_repository.remover([id_sessao])
+        reservas.liberar(id_sessao)
+
+    @instrumentar()
+    def gravar_todos(self) -> int:
+        """Grava no disco os carrinhos da memória (que continuam nela). Retorna quantos foram gravados."""
+        with self._trava:
+            return self._gravar(list(self._quentes.items()))
+
+    @instrumentar()
+    def expirar(self) -> int:
+        """Descarta agora todas as sessões vencidas, da memória e do disco. Retorna quantas."""
+        with self._trava:
+            agora = self._relogio()
+            expirados = self._expirar_memoria(agora)
+            while True:
+                removidos = carrinho_repository.remover_vencidos(agora, VARREDURA_LOTE)
+                expirados += removidos
+                self._contadores['expirados'] += removidos
+                if removidos < VARREDURA_LOTE:
+                    break
+            self._varrido_em = agora
+            return expirados
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Sessões na memória e no disco e os contadores desde o início do processo."""
+        capacidade, ttl_s = self._regras()
+        with self._trava:
+            return {
+                'em_memoria': len(self._quentes), 'capacidade': capacidade, 'ttl_s': ttl_s,
+                'no_disco': carrinho_repository.contar(), 'bytes_disco': carrinho_repository.tamanho(),
+                **self._contadores,
+            }
+
+    # --- Auxiliares (chamados com a trava adquirida) ---
+
+    def _regras(self) -> Tuple[int, float]:
+        regras = settings_repository.obter_configuracoes().sessoes_carrinho
+        return (self._capacidade if self._capacidade is not None else regras.capacidade_memoria,
+                self._ttl_s if self._ttl_s is not None else regras.ttl_segundos)
+
+    @staticmethod
+    def _carrinho_vazio(id_sessao: str) -> Carrinho:
+        carrinho = Carrinho()
+        carrinho._id_sessao = id_sessao
+        return carrinho
+
+    @staticmethod
+    def _restaurar(registros: Dict[str, Dict[str, Any]]) -> Dict[str, Carrinho]:
+        """
+        Monta os carrinhos a partir dos Carrinho.to_dict gravados, buscando os produtos e
+        clientes de todos eles de uma vez. Itens de produtos que não existem mais saem do
+        carrinho; o preço de cada item é o gravado (o do momento em que foi adicionado).
+        Registros fora do formato ficam de fora (a sessão recomeça com um carrinho vazio).
+        """
+        skus = {item['produto_sku'] for registro in registros.values() for item in registro.get('itens') or ()}
+        cpfs = {registro['cliente_cpf'] for registro in registros.values() if registro.get('cliente_cpf')}
+        produtos = produto_repository.buscar_por_skus(skus) if skus else {}
+        clientes = cliente_repository.buscar_por_cpfs(cpfs) if cpfs else {}
+
+        carrinhos: Dict[str, Carrinho] = {}
+        for id_sessao, registro in registros.items():
+            itens = []
+            try:
+                for dados_item in registro.get('itens') or ():
+                    produto = produtos.get(dados_item['produto_sku'])
+                    if produto is None:
+                        continue
+                    item = ItemCarrinho(produto=produto, quantidade=dados_item['quantidade'])
+                    item._preco_unitario = dados_item['preco_unitario']
+                    itens.append(item)
+            except (KeyError, TypeError, ValorInvalidoError):
+                continue
+            carrinho = Carrinho(cliente=clientes.get(registro.get('cliente_cpf')), itens=itens)
+            carrinho._id_sessao = id_sessao
+            carrinhos[id_sessao] = carrinho
+        return carrinhos
+
+    def _gravar(self, sessoes: List[Tuple[str, _Sessao]]) -> int:
+        """Grava os carrinhos com conteúdo e apaga do disco os que esvaziaram."""
+        gravar, apagar = [], []
+        for id_sessao, sessao in sessoes:
+            carrinho = sessao.carrinho
+            if carrinho.itens or carrinho.cliente:
+                gravar.append((id_sessao, carrinho.to_dict(), sessao.expira_em))
+                sessao.gravado = True
+            elif sessao.gravado:
+                apagar.append(id_sessao)
+                sessao.gravado = False
+        if apagar:
+            carrinho_repository.remover(apagar)
+        return carrinho_repository.gravar(gravar)
+
+    def _despejar(self, capacidade: int):
+        """Leva para o disco os menos usados que passarem da capacidade."""
+        excedentes = len(self._quentes) - capacidade
+        if excedentes <= 0:
+            return
+        self._gravar([self._quentes.popitem(last=False) for _ in range(excedentes)])
+        self._contadores['despejados'] += excedentes
+
+    def _expirar_memoria(self, agora: float) -> int:
+        """Descarta as sessões vencidas da memória (as do começo da lista LRU)."""
+        vencidas = []
+        while self._quentes:
+            id_sessao, sessao = next(iter(self._quentes.items()))
+            if sessao.expira_em > agora:
+                break
+            self._quentes.popitem(last=False)
+            vencidas.append((id_sessao, sessao))
+        if vencidas:
+            carrinho_repository.remover(id_sessao for id_sessao, sessao in vencidas if sessao.gravado)
+            for id_sessao, _ in vencidas:
+                reservas.liberar(id_sessao)
+            self._contadores['expirados'] += len(vencidas)
+        return len(vencidas)
+
+    def _varrer_disco(self, agora: float):
+        """Apaga um lote de sessões vencidas do disco a cada INTERVALO_VARREDURA_S."""
+        if agora - self._varrido_em < INTERVALO_VARREDURA_S:
+            return
+        self._varrido_em = agora
+        self._contadores['expirados'] += carrinho_repository.remover_vencidos(agora, VARREDURA_LOTE)
+
+
+sessoes = SessaoService()
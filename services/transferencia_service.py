@@ -0,0 +1,258 @@
+import csv
+import gzip
+import json
+import os
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from models.entidades import Produto, Cliente
+from models.exceptions import ValorInvalidoError, DocumentoInvalidoError
+import repositories.produto_repository as produto_repository
+import repositories.cliente_repository as cliente_repository
+import repositories.pedido_repository as pedido_repository
+from monitoramento.instrumentacao import instrumentar
+
+FORMATOS_VALIDOS = ['ndjson', 'csv']
+COLECOES_VALIDAS = ['produtos', 'clientes', 'pedidos']
+
+# Registros serializados por escrita na exportação (limita o buffer em memória)
+TAMANHO_BLOCO_EXPORTACAO = 10000
+
+# Registros validados por escrita na importação. Cada lote regrava o loja.json inteiro,
+# então lotes maiores reduzem o custo total ao preço de mais memória.
+TAMANHO_LOTE_IMPORTACAO = 250000
+
+# Evita que um arquivo muito ruim gere um relatório de erros gigante
+LIMITE_ERROS_REPORTADOS = 100
+
+# Colunas do CSV por coleção. Campos aninhados (listas/dicionários) são gravados como JSON.
+COLUNAS_CSV = {
+    'produtos': ['sku', 'nome', 'categoria', 'preco_unitario', 'estoque', 'is_ativo', 'tipo', 'peso'],
+    'clientes': ['cpf', 'nome', 'email', 'data_cadastro', 'enderecos'],
+    'pedidos': [
+        'codigo_pedido', 'cliente_cpf', 'data_criacao', 'estado', 'subtotal', 'desconto', 'total',
+        'carrinho', 'frete', 'cupom', 'pagamento'
+    ],
+}
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _inferir_formato(caminho: str) -> str:
+    """Deduz o formato pela extensão (.csv ou .csv.gz -> csv; demais -> ndjson)."""
+    nome = caminho[:-3] if caminho.endswith('.gz') else caminho
+    return 'csv' if nome.lower().endswith('.csv') else 'ndjson'
+
+
+def _abrir_para_escrita(caminho: str, comprimir: bool):
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    if comprimir:
+        return gzip.open(caminho, 'wt', encoding='utf-8', newline='')
+    return open(caminho, 'w', encoding='utf-8', newline='')
+
+
+def _abrir_para_leitura(caminho: str):
+    """Abre o arquivo em modo texto, detectando gzip pelos bytes iniciais."""
+    with open(caminho, 'rb') as f:
+        comprimido = f.read(2) == GZIP_MAGIC
+    if comprimido:
+        return gzip.open(caminho, 'rt', encoding='utf-8', newline='')
+    return open(caminho, 'r', encoding='utf-8', newline='')
+
+
+def _validar_parametros(colecao: str, formato: str):
+    if colecao not in COLECOES_VALIDAS:
+        raise ValorInvalidoError(f"Coleção '{colecao}' inválida. Use: {', '.join(COLECOES_VALIDAS)}.")
+    if formato not in FORMATOS_VALIDOS:
+        raise ValorInvalidoError(f"Formato '{formato}' inválido. Use: {', '.join(FORMATOS_VALIDOS)}.")
+
+
+# Conversões CSV <-> dicionário
+
+def _para_linha_csv(colecao: str, registro: Dict[str, Any]) -> List[Any]:
+    linha = []
+    for coluna in COLUNAS_CSV[colecao]:
+        valor = registro.get(coluna)
+        if isinstance(valor, (dict, list)):
+            valor = json.dumps(valor, ensure_ascii=False)
+        elif valor is None:
+            valor = ''
+        linha.append(valor)
+    return linha
+
+
+def _texto_para_bool(valor: str) -> bool:
+    return valor.strip().lower() in ('true', '1', 'sim', 's', 'yes')
+
+
+def _produto_de_csv(linha: Dict[str, str]) -> Dict[str, Any]:
+    registro = {
+        'sku': linha['sku'],
+        'nome': linha['nome'],
+        'categoria': linha.get('categoria', ''),
+        'preco_unitario': float(linha['preco_unitario']),
+        'estoque': int(linha['estoque']) if linha.get('estoque') else 0,
+        'is_ativo': _texto_para_bool(linha['is_ativo']) if linha.get('is_ativo') else True,
+        'tipo': linha.get('tipo') or 'Produto',
+    }
+    if linha.get('peso'):
+        registro['peso'] = float(linha['peso'])
+    return registro
+
+
+def _cliente_de_csv(linha: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        'cpf': linha['cpf'],
+        'nome': linha['nome'],
+        'email': linha['email'],
+        'data_cadastro': linha.get('data_cadastro') or None,
+        'enderecos': json.loads(linha['enderecos']) if linha.get('enderecos') else [],
+    }
+
+
+# Conversões dicionário -> entidade (passando pela validação dos construtores)
+
+def _produto_de_registro(registro: Dict[str, Any]) -> Produto:
+    registro = dict(registro)
+    registro['sku'] = str(registro['sku']).strip().upper() # Mesmo padrão do cadastro via CLI
+    return produto_repository._deserializar_produto(registro)
+
+
+def _cliente_de_registro(registro: Dict[str, Any]) -> Cliente:
+    return cliente_repository._deserializar_cliente(registro)
+
+
+class TransferenciaService:
+    """Exportação e importação em massa (NDJSON/CSV, opcionalmente gzip) de produtos, clientes e pedidos."""
+
+    @staticmethod
+    @instrumentar()
+    def exportar(
+        colecao: str,
+        caminho: str,
+        formato: Optional[str] = None,
+        comprimir: Optional[bool] = None,
+        tamanho_lote: int = TAMANHO_BLOCO_EXPORTACAO
+    ) -> int:
+        """
+        Exporta uma coleção para NDJSON ou CSV, escrevendo em blocos de `tamanho_lote`
+        registros. Se `comprimir` não for informado, usa gzip quando o caminho termina em .gz.
+        Retorna a quantidade de registros exportados.
+        """
+        formato = (formato or _inferir_formato(caminho)).lower()
+        _validar_parametros(colecao, formato)
+        if comprimir is None:
+            comprimir = caminho.endswith('.gz')
+
+        registros = TransferenciaService._registros_brutos(colecao)
+        total = 0
+
+        with _abrir_para_escrita(caminho, comprimir) as f:
+            if formato == 'csv':
+                escritor = csv.writer(f)
+                escritor.writerow(COLUNAS_CSV[colecao])
+                for bloco in _em_blocos(registros, tamanho_lote):
+                    escritor.writerows(_para_linha_csv(colecao, r) for r in bloco)
+                    total += len(bloco)
+            else:
+                for bloco in _em_blocos(registros, tamanho_lote):
+                    f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in bloco))
+                    total += len(bloco)
+
+        return total
+
+    @staticmethod
+    @instrumentar()
+    def importar_produtos(
+        caminho: str,
+        formato: Optional[str] = None,
+        tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO
+    ) -> Dict[str, Any]:
+        """
+        Importa produtos de NDJSON/CSV (gzip detectado automaticamente). Cada registro passa
+        pela validação de Produto/ProdutoFisico; os válidos são gravados em lotes de
+        `tamanho_lote` (uma escrita do arquivo por lote). SKUs existentes são atualizados.
+        """
+        return TransferenciaService._importar(
+            caminho, 'produtos', formato, tamanho_lote,
+            # A importação substitui os registros (não é uma edição de cópia lida da loja)
+            _produto_de_csv, _produto_de_registro,
+            lambda produtos: produto_repository.salvar_em_lote(produtos, verificar_versao=False)
+        )
+
+    @staticmethod
+    @instrumentar()
+    def importar_clientes(
+        caminho: str,
+        formato: Optional[str] = None,
+        tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO
+    ) -> Dict[str, Any]:
+        """
+        Importa clientes de NDJSON/CSV (gzip detectado automaticamente), validando CPF,
+        dados obrigatórios e endereços. CPFs existentes são atualizados.
+        """
+        return TransferenciaService._importar(
+            caminho, 'clientes', formato, tamanho_lote,
+            _cliente_de_csv, _cliente_de_registro, cliente_repository.salvar_em_lote
+        )
+
+    @staticmethod
+    def _registros_brutos(colecao: str) -> Iterable[Dict[str, Any]]:
+        # Lidos aos poucos do arquivo (memória limitada), sem carregar a loja inteira
+        if colecao == 'produtos':
+            return produto_repository.iterar_produtos_raw()
+        if colecao == 'clientes':
+            return cliente_repository.iterar_clientes_raw()
+        # Inclui os pedidos arquivados, lidos segmento a segmento
+        return pedido_repository.iterar_pedidos_raw()
+
+    @staticmethod
+    def _importar(
+        caminho: str,
+        colecao: str,
+        formato: Optional[str],
+        tamanho_lote: int,
+        conversor_csv: Callable[[Dict[str, str]], Dict[str, Any]],
+        construtor: Callable[[Dict[str, Any]], Any],
+        salvar_em_lote: Callable[[Iterable[Any]], int]
+    ) -> Dict[str, Any]:
+        formato = (formato or _inferir_formato(caminho)).lower()
+        _validar_parametros(colecao, formato)
+
+        resultado = {'importados': 0, 'rejeitados': 0, 'erros': []}
+
+        def entidades_validas(linhas: Iterator[Tuple[int, Any]]) -> Iterator[Any]:
+            for num_linha, bruto in linhas:
+                try:
+                    registro = conversor_csv(bruto) if formato == 'csv' else json.loads(bruto)
+                    yield construtor(registro)
+                except (ValorInvalidoError, DocumentoInvalidoError, KeyError, ValueError, TypeError) as e:
+                    resultado['rejeitados'] += 1
+                    if len(resultado['erros']) < LIMITE_ERROS_REPORTADOS:
+                        resultado['erros'].append(f"Linha {num_linha}: {e.__class__.__name__}: {e}")
+
+        with _abrir_para_leitura(caminho) as f:
+            if formato == 'csv':
+                # A linha 1 é o cabeçalho
+                linhas = enumerate(csv.DictReader(f), start=2)
+            else:
+                linhas = ((n, l) for n, l in enumerate(f, start=1) if l.strip())
+
+            validas = entidades_validas(linhas)
+            while True:
+                lote = list(islice(validas, tamanho_lote))
+                if not lote:
+                    break
+                resultado['importados'] += salvar_em_lote(lote)
+
+        return resultado
+
+
+def _em_blocos(registros: Iterable[Dict[str, Any]], tamanho: int) -> Iterator[List[Dict[str, Any]]]:
+    iterador = iter(registros)
+    while True:
+        bloco = list(islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+import repositories.dados as dados_loja
+from models.exceptions import PersistenciaError
+from repositories import pedido_repository
+from services.boleto_service import VarredorBoletos
+from services.pedido_service import PedidoService
+from benchmarks.gerador_dados import gerar_loja
+
+
+class TestVarredura(unittest.TestCase):
+    """Boletos vencidos cuja gravação falhou continuam no índice e são cancelados depois."""
+
+    def setUp(self):
+        self.pasta_anterior = dados_loja._pasta_dados
+        self.pasta = tempfile.mkdtemp(prefix='loja-teste-')
+        dados_loja.definir_pasta_dados(self.pasta)
+        loja = gerar_loja(5, 5, 20, 1)
+        boletos = [p for p in loja['pedidos'] if p.get('pagamento', {}).get('tipo') == 'PagamentoBoleto']
+        self.assertTrue(boletos, "a loja gerada precisa de pelo menos um pedido com boleto")
+        self.codigo = boletos[0]['codigo_pedido']
+        boletos[0]['estado'] = 'PENDENTE'
+        dados_loja.salvar_dados_loja(loja)
+        self.varredor = VarredorBoletos(agora=lambda: datetime(2100, 1, 1))
+
+    def tearDown(self):
+        dados_loja.definir_pasta_dados(self.pasta_anterior)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def _estado(self) -> str:
+        return pedido_repository.buscar_por_codigos([self.codigo])[self.codigo].estado
+
+    def test_falha_na_gravacao_tenta_de_novo(self):
+        original = PedidoService.transicionar_pedidos
+        falhas = [PersistenciaError("arquivo travado")]
+
+        def transicionar(*args, **kwargs):
+            if falhas:
+                raise falhas.pop()
+            return original(*args, **kwargs)
+
+        with mock.patch.object(PedidoService, 'transicionar_pedidos', side_effect=transicionar):
+            with self.assertRaises(PersistenciaError):
+                self.varredor.varrer()
+            self.assertEqual(self._estado(), 'PENDENTE')
+            self.assertGreaterEqual(self.varredor.pendentes(), 1)
+
+            resultado = self.varredor.varrer()
+        self.assertGreaterEqual(resultado['cancelados'], 1)
+        self.assertEqual(self._estado(), 'CANCELADO')
+        self.assertEqual(self.varredor.pendentes(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
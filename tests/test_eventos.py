@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import repositories.dados as dados_loja
+from repositories import cliente_repository, eventos, pedido_repository, produto_repository
+from benchmarks.gerador_dados import gerar_loja
+
+
+class TestVersoesNoLog(unittest.TestCase):
+    """Só os eventos de produtos (registros versionados) levam versões no alteracoes.log."""
+
+    def setUp(self):
+        self.pasta_anterior = dados_loja._pasta_dados
+        self.pasta = tempfile.mkdtemp(prefix='loja-teste-')
+        dados_loja.definir_pasta_dados(self.pasta)
+        eventos.feed.definir_log(True)
+        dados_loja.salvar_dados_loja(gerar_loja(5, 5, 5, 1))
+
+    def tearDown(self):
+        eventos.feed.definir_log(True)
+        dados_loja.definir_pasta_dados(self.pasta_anterior)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def _linhas_do_log(self):
+        with open(eventos.caminho_log(), encoding='utf-8') as f:
+            return [json.loads(linha) for linha in f]
+
+    def test_clientes_e_pedidos_sem_versao_produtos_com_versao(self):
+        cliente_repository.salvar(cliente_repository.carregar_todos()[0])
+        pedido = pedido_repository.carregar_todos_pedidos_raw()[0]
+        novo_estado = 'PENDENTE' if pedido['estado'] != 'PENDENTE' else 'PAGO'
+        pedido_repository.atualizar_estados({pedido['codigo_pedido']: novo_estado})
+        produto = produto_repository.carregar_todos()[0]
+        versao = produto.versao
+        produto_repository.salvar(produto)
+
+        linhas = {linha['tipo']: linha for linha in self._linhas_do_log()}
+        for tipo in (eventos.CLIENTE_SALVO, eventos.PEDIDO_ESTADO):
+            self.assertNotIn('versao_anterior', linhas[tipo])
+            self.assertNotIn('versao_nova', linhas[tipo])
+        self.assertEqual(linhas[eventos.PRODUTO_SALVO]['versao_anterior'], versao)
+        self.assertEqual(linhas[eventos.PRODUTO_SALVO]['versao_nova'], versao + 1)
+
+    def test_evento_lido_do_log_sem_versao(self):
+        evento = eventos.EventoAlteracao(eventos.CLIENTE_SALVO, '12345678909', detalhes={'novo': True})
+        lido = eventos.EventoAlteracao.de_dict(evento.to_dict())
+        self.assertIsNone(lido.versao_anterior)
+        self.assertIsNone(lido.versao_nova)
+        self.assertEqual(lido.detalhes, {'novo': True})
+
+
+class TestSegmentosDoLog(unittest.TestCase):
+    """O log é fechado em segmentos limitados; o offset global segue valendo entre eles."""
+
+    def setUp(self):
+        self.pasta_anterior = dados_loja._pasta_dados
+        self.pasta = tempfile.mkdtemp(prefix='loja-teste-')
+        dados_loja.definir_pasta_dados(self.pasta)
+        with open(os.path.join(self.pasta, 'settings.json'), 'w', encoding='utf-8') as f:
+            json.dump({'eventos': {'tamanho_segmento_bytes': 1024, 'segmentos_retidos': 2}}, f)
+        eventos.feed.definir_log(True)
+        self.publicados = 0
+
+    def tearDown(self):
+        eventos.feed.definir_log(True)
+        dados_loja.definir_pasta_dados(self.pasta_anterior)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def _publicar(self, quantidade: int):
+        for _ in range(quantidade):
+            self.publicados += 1
+            eventos.feed.publicar([eventos.EventoAlteracao(
+                eventos.CLIENTE_SALVO, f"{self.publicados:011d}", detalhes={'novo': True}
+            )])
+
+    def _sequencias(self, offset: int = 0):
+        lidos = list(eventos.ler_log(offset))
+        return [evento.sequencia for evento, _ in lidos], (lidos[-1][1] if lidos else offset)
+
+    def test_offset_continua_valendo_depois_da_troca(self):
+        self._publicar(5)
+        sequencias, offset = self._sequencias()
+        self.assertEqual(sequencias, [1, 2, 3, 4, 5])
+        self._publicar(10)
+        self.assertTrue(eventos._segmentos(eventos.caminho_log()))
+        sequencias, fim = self._sequencias(offset)
+        self.assertEqual(sequencias, list(range(6, 16)))
+        self.assertEqual(fim, eventos._fim_do_log(eventos.caminho_log()))
+
+    def test_retencao_apaga_os_segmentos_mais_antigos(self):
+        self._publicar(100)
+        caminho = eventos.caminho_log()
+        self.assertEqual(len(eventos._segmentos(caminho)), 2)
+        tamanho_total = sum(os.path.getsize(c) for _, c in eventos._segmentos(caminho)) + os.path.getsize(caminho)
+        self.assertLess(tamanho_total, 3 * 1024)
+
+        # Do começo: recomeça no segmento mais antigo que restou, sem lacunas dali em diante
+        sequencias, _ = self._sequencias(0)
+        self.assertGreater(sequencias[0], 1)
+        self.assertEqual(sequencias, list(range(sequencias[0], 101)))
+
+
+if __name__ == '__main__':
+    unittest.main()
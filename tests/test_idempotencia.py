@@ -0,0 +1,60 @@
+import shutil
+import tempfile
+import time
+import unittest
+import repositories.dados as dados_loja
+from repositories import idempotencia_repository
+from services.idempotencia_service import IdempotenciaService
+from benchmarks.gerador_dados import gerar_loja
+
+
+class TestRecuperacaoDoDisco(unittest.TestCase):
+    """Depois de reiniciar, a chave recupera o pedido com o código exato que ela gravou."""
+
+    def setUp(self):
+        self.pasta_anterior = dados_loja._pasta_dados
+        self.pasta = tempfile.mkdtemp(prefix='loja-teste-')
+        dados_loja.definir_pasta_dados(self.pasta)
+        loja = gerar_loja(5, 5, 2, 1)
+        # O pedido mais longo vem antes: uma busca por prefixo de 'TESTE-1' acharia 'TESTE-10'
+        loja['pedidos'][0]['codigo_pedido'] = 'TESTE-10'
+        loja['pedidos'][1]['codigo_pedido'] = 'TESTE-1'
+        dados_loja.salvar_dados_loja(loja)
+
+    def tearDown(self):
+        idempotencia_repository.fechar()
+        dados_loja.definir_pasta_dados(self.pasta_anterior)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def _reiniciado(self, codigo: str) -> IdempotenciaService:
+        # Chave gravada por um processo anterior; o serviço novo começa com a memória vazia
+        idempotencia_repository.registrar('chave', codigo, time.time() + 60)
+        return IdempotenciaService(ttl_s=60)
+
+    def test_codigo_prefixo_de_outro(self):
+        servico = self._reiniciado('TESTE-1')
+        self.assertEqual(servico.consultar('chave').codigo_pedido, 'TESTE-1')
+
+        def checkout(codigo, registrar):
+            self.fail("O pedido já estava gravado: o checkout não deveria rodar de novo.")
+        self.assertEqual(servico.executar('chave', checkout).codigo_pedido, 'TESTE-1')
+
+    def test_codigo_que_tem_outro_como_prefixo(self):
+        servico = self._reiniciado('TESTE-10')
+        self.assertEqual(servico.consultar('chave').codigo_pedido, 'TESTE-10')
+
+    def test_pedido_nao_gravado_refaz_com_o_mesmo_codigo(self):
+        servico = self._reiniciado('TESTE-100')
+        self.assertIsNone(servico.consultar('chave'))
+        codigos = []
+
+        def checkout(codigo, registrar):
+            codigos.append(codigo)
+            raise RuntimeError("fim do teste")
+        with self.assertRaises(RuntimeError):
+            servico.executar('chave', checkout)
+        self.assertEqual(codigos, ['TESTE-100'])
+
+
+if __name__ == '__main__':
+    unittest.main()
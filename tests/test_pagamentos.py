@@ -0,0 +1,67 @@
+import asyncio
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import repositories.dados as dados_loja
+from models.exceptions import PersistenciaError
+from models.vendas import Carrinho
+from repositories import cliente_repository, pedido_repository, produto_repository
+import services.carrinho_service as carrinho_service
+from services.pagamento_service import APROVADO, ESTORNADO, GatewaySimulado, ProcessadorPagamentos
+from services.pedido_service import PedidoService
+from services.reserva_service import reservas
+from benchmarks.gerador_dados import gerar_loja
+
+
+class TestEstornoNoCheckoutAsync(unittest.TestCase):
+    """Cobrança aprovada cujo pedido não chega a ser gravado termina estornada."""
+
+    def setUp(self):
+        self.pasta_anterior = dados_loja._pasta_dados
+        self.pasta = tempfile.mkdtemp(prefix='loja-teste-')
+        dados_loja.definir_pasta_dados(self.pasta)
+        loja = gerar_loja(20, 10, 0, 1)
+        for produto in loja['produtos']:
+            produto['estoque'] = 1000
+        dados_loja.salvar_dados_loja(loja)
+
+        self.carrinho = Carrinho()
+        self.carrinho.cliente = next(c for c in cliente_repository.carregar_todos() if c.enderecos)
+        sku = next(p['sku'] for p in produto_repository.carregar_todos_produtos_raw()
+                   if p.get('tipo') == 'ProdutoFisico' and p.get('is_ativo', True))
+        carrinho_service.adicionar_item_ao_carrinho(self.carrinho, sku, 2)
+        self.frete = carrinho_service.calcular_frete(self.carrinho, self.carrinho.cliente.enderecos[0].cep)
+
+        # Gateway sem latência que aprova tudo
+        self.gateway = GatewaySimulado(recusa_por_bandeira={})
+        self.processador = ProcessadorPagamentos(self.gateway, concorrencia=1, timeout_s=1.0, tentativas=1)
+
+    def tearDown(self):
+        carrinho_service.descartar_carrinho(self.carrinho)
+        dados_loja.definir_pasta_dados(self.pasta_anterior)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def _checkout(self):
+        return asyncio.run(PedidoService.finalizar_compra_async(
+            self.carrinho, self.frete, 'cartao', {'bandeira': 'VISA'}, processador=self.processador
+        ))
+
+    def test_falha_depois_da_aprovacao_estorna(self):
+        with mock.patch.object(reservas, 'converter', side_effect=PersistenciaError("disco cheio")):
+            with self.assertRaises(PersistenciaError):
+                self._checkout()
+        cobrancas = self.gateway.cobrancas()
+        self.assertEqual(len(cobrancas), 1)
+        codigo, resultado = next(iter(cobrancas.items()))
+        self.assertEqual(resultado, ESTORNADO)
+        self.assertFalse(pedido_repository.buscar_por_codigos([codigo]))
+
+    def test_checkout_gravado_mantem_a_cobranca(self):
+        pedido = self._checkout()
+        self.assertEqual(pedido.estado, 'PAGO')
+        self.assertEqual(self.gateway.cobrancas(), {pedido.codigo_pedido: APROVADO})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+import unittest
+import repositories.dados as dados_loja
+from models.exceptions import ValorInvalidoError
+from models.vendas import Carrinho
+from repositories import produto_repository, settings_repository
+import services.carrinho_service as carrinho_service
+from services.reserva_service import reservas
+from benchmarks.gerador_dados import gerar_loja
+
+ESTOQUE = 20
+QUANTIDADE = 5
+
+
+class TestConversaoComConflito(unittest.TestCase):
+    """Estoque alterado fora das reservas entre o reservar e o checkout."""
+
+    def setUp(self):
+        self.pasta_anterior = dados_loja._pasta_dados
+        self.pasta = tempfile.mkdtemp(prefix='loja-teste-')
+        dados_loja.definir_pasta_dados(self.pasta)
+        loja = gerar_loja(5, 5, 0, 1)
+        fisico = next(p for p in loja['produtos'] if p.get('tipo') == 'ProdutoFisico')
+        fisico['estoque'], fisico['is_ativo'] = ESTOQUE, True
+        self.sku = fisico['sku']
+        dados_loja.salvar_dados_loja(loja)
+        self.limite = settings_repository.obter_configuracoes().regra_estoque.limite_seguranca
+
+        self.carrinho = Carrinho()
+        carrinho_service.adicionar_item_ao_carrinho(self.carrinho, self.sku, QUANTIDADE)
+
+    def tearDown(self):
+        carrinho_service.descartar_carrinho(self.carrinho)
+        dados_loja.definir_pasta_dados(self.pasta_anterior)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def _baixa_externa(self, quantidade: int):
+        """Outro processo (sem as reservas deste) baixa estoque e avança a versão."""
+        produto = produto_repository.buscar_por_sku(self.sku)
+        produto_repository.ajustar_estoques_se_versao([(self.sku, -quantidade, produto.versao)])
+
+    def _estoque(self) -> int:
+        return produto_repository.buscar_por_sku(self.sku).estoque
+
+    def test_conflito_que_violaria_o_limite_de_seguranca(self):
+        # Sobra uma unidade a menos do que o carrinho precisa para ficar no limite
+        self._baixa_externa(ESTOQUE - self.limite - QUANTIDADE + 1)
+        antes = self._estoque()
+        with self.assertRaises(ValorInvalidoError):
+            reservas.converter(self.carrinho)
+        self.assertEqual(self._estoque(), antes)
+
+    def test_conflito_com_estoque_suficiente_conclui(self):
+        self._baixa_externa(1)
+        self.assertEqual(reservas.converter(self.carrinho), {self.sku: QUANTIDADE})
+        self.assertEqual(self._estoque(), ESTOQUE - 1 - QUANTIDADE)
+        self.assertEqual(reservas.reservado(self.sku), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()